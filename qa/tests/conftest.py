@@ -0,0 +1,10 @@
+"""Make the orchestrator and test-tool modules importable from the unit tests."""
+
+import sys
+from pathlib import Path
+
+TESTING_DIR = Path(__file__).resolve().parents[2] / "testing"
+
+for path in (TESTING_DIR / "orchestrator", TESTING_DIR / "tools"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
@@ -0,0 +1,102 @@
+"""Alert rule state transitions in testing/orchestrator/utils/alert_rules.py."""
+
+import pytest
+
+pytest.importorskip("yaml")
+
+from utils.alert_rules import (  # noqa: E402
+    DEFAULT_RULES_FILE,
+    FALLBACK_RULES,
+    AlertEngine,
+    AlertRule,
+    load_rules,
+)
+
+
+def _rule(**overrides):
+    settings = dict(
+        name="cpu_high",
+        metric="cpu_percent",
+        comparator=">",
+        threshold=80.0,
+        for_seconds=10.0,
+        hysteresis=5.0,
+        message="CPU {value:.0f}% > {threshold:.0f}%",
+    )
+    settings.update(overrides)
+    return AlertRule(**settings)
+
+
+def _statuses(events):
+    return [event.status for event in events]
+
+
+def test_fires_only_after_for_duration():
+    """A breach must hold for `for` seconds; an interruption restarts the timer."""
+    engine = AlertEngine([_rule()])
+    assert engine.observe("cpu_percent", 90, 0) == []
+    assert engine.observe("cpu_percent", 70, 5) == []
+    assert engine.observe("cpu_percent", 90, 6) == []
+    assert engine.observe("cpu_percent", 95, 15) == []
+
+    events = engine.observe("cpu_percent", 95, 16)
+    assert _statuses(events) == ["firing"]
+    assert events[0].started_at == 6
+    assert events[0].message == "CPU 95% > 80%"
+    assert engine.observe("cpu_percent", 99, 20) == []
+
+
+def test_resolves_only_past_hysteresis():
+    """Recovery requires crossing threshold - hysteresis, and emits one event."""
+    engine = AlertEngine([_rule(for_seconds=0)])
+    assert _statuses(engine.observe("cpu_percent", 85, 0)) == ["firing"]
+    assert engine.observe("cpu_percent", 78, 1) == []
+    assert len(engine.firing()) == 1
+
+    assert _statuses(engine.observe("cpu_percent", 74, 2)) == ["resolved"]
+    assert engine.firing() == []
+    assert engine.observe("cpu_percent", 70, 3) == []
+
+
+def test_state_is_tracked_per_series_and_match():
+    """Each label set has its own state; match limits which series are evaluated."""
+    engine = AlertEngine([_rule(for_seconds=0, match={"app": "api"})])
+    assert engine.observe("cpu_percent", 95, 0, {"app": "web"}) == []
+    for task in ("t1", "t2"):
+        events = engine.observe("cpu_percent", 95, 0, {"app": "api", "task": task})
+        assert _statuses(events) == ["firing"]
+    assert len(engine.firing()) == 2
+
+
+def test_message_labels_cannot_shadow_value():
+    """Labels named value/threshold no longer crash formatting."""
+    rule = _rule(message="{app}: {value:.0f} > {threshold:.0f}")
+    labels = {"app": "api", "value": "label", "threshold": "label"}
+    assert rule.format_message(91.2, labels) == "api: 91 > 80"
+    assert rule.format_message(91.2, {}) == "cpu_high: cpu_percent=91.2"
+
+
+def test_pending_state_of_vanished_series_is_evicted():
+    """Series that stop reporting do not keep pending state forever."""
+    engine = AlertEngine([_rule(for_seconds=60)], stale_after=30)
+    engine.observe("cpu_percent", 95, 0, {"task": "finished"})
+    engine.observe("cpu_percent", 95, 0, {"task": "running"})
+    assert len(engine._states) == 2
+
+    engine.observe("cpu_percent", 95, 40, {"task": "running"})
+    assert list(engine._states) == [("cpu_high", (("task", "running"),))]
+
+
+def test_shipped_rules_are_loaded_from_yaml(tmp_path):
+    """The YAML file is the source of truth; the fallback only covers a missing file."""
+    assert DEFAULT_RULES_FILE.exists()
+    names = {rule.name for rule in load_rules()}
+    assert {rule["name"] for rule in FALLBACK_RULES} < names
+
+    fallback = load_rules(tmp_path / "missing.yml")
+    assert [rule.name for rule in fallback] == [r["name"] for r in FALLBACK_RULES]
+
+
+def test_invalid_rule_is_rejected():
+    with pytest.raises(ValueError):
+        _rule(comparator="~")
@@ -0,0 +1,80 @@
+"""Time-budget task selection in testing/orchestrator/utils/budget.py."""
+
+from itertools import combinations
+
+import pytest
+
+from utils.budget import BudgetItem, build_items, parse_budget, select_within_budget
+from utils.test_history import TaskStats
+
+
+def _item(task_id, duration, probability):
+    return BudgetItem(task_id, duration, probability, has_history=True)
+
+
+@pytest.mark.parametrize(
+    "value, seconds",
+    [("90", 90), ("90s", 90), ("5m", 300), ("1.5h", 5400), (" 2M ", 120)],
+)
+def test_parse_budget_units(value, seconds):
+    assert parse_budget(value) == seconds
+
+
+@pytest.mark.parametrize("value", ["", "0", "0m", "-5", "5d", "five"])
+def test_parse_budget_rejects_invalid_values(value):
+    with pytest.raises(ValueError):
+        parse_budget(value)
+
+
+def test_selection_matches_brute_force_optimum():
+    """The DP picks the subset with the most expected failures that fits."""
+    items = [
+        _item("a", 40, 0.30),
+        _item("b", 30, 0.25),
+        _item("c", 30, 0.25),
+        _item("d", 50, 0.45),
+        _item("e", 10, 0.05),
+        _item("f", 25, 0.20),
+    ]
+    best = max(
+        sum(i.failure_probability for i in subset)
+        for size in range(len(items) + 1)
+        for subset in combinations(items, size)
+        if sum(i.duration for i in subset) <= 100
+    )
+    plan = select_within_budget(items, budget=100)
+    assert plan.expected_failures == pytest.approx(best)
+    assert sum(i.duration for i in plan.selected) <= 100
+    assert {i.task_id for i in plan.selected} | {i.task_id for i in plan.deferred} == {
+        i.task_id for i in items
+    }
+    probabilities = [i.failure_probability for i in plan.selected]
+    assert probabilities == sorted(probabilities, reverse=True)
+
+
+def test_workers_scale_capacity_but_not_the_per_task_limit():
+    items = [_item("a", 60, 0.5), _item("b", 60, 0.5), _item("long", 120, 0.9)]
+    plan = select_within_budget(items, budget=60, workers=2)
+    assert {i.task_id for i in plan.selected} == {"a", "b"}
+    assert [i.task_id for i in plan.deferred] == ["long"]
+    assert plan.expected_duration == 60
+
+
+def test_zero_or_oversized_budget():
+    items = [_item("a", 10, 0.5), _item("b", 20, 0.1)]
+    assert select_within_budget(items, budget=0).selected == []
+    assert len(select_within_budget(items, budget=0).deferred) == 2
+    plan = select_within_budget(items, budget=10**6)
+    assert [i.task_id for i in plan.selected] == ["a", "b"]
+    assert plan.deferred == []
+
+
+def test_build_items_uses_median_duration_without_history():
+    history = {
+        "a": TaskStats(runs=4, failures=1, avg_duration=10),
+        "b": TaskStats(runs=4, failures=0, avg_duration=30),
+    }
+    items = {i.task_id: i for i in build_items(["a", "b", "new"], history, 99)}
+    assert items["new"].duration == 20
+    assert not items["new"].has_history
+    assert build_items(["x"], {}, 99)[0].duration == 99
@@ -0,0 +1,88 @@
+"""Git change detection in testing/orchestrator/utils/change_detection.py."""
+
+import shutil
+import subprocess
+
+import pytest
+
+from utils.change_detection import ChangeDetector, FileChange, parse_name_status
+
+
+def test_parse_name_status_with_renames_and_odd_paths():
+    """-z output keeps tabs, spaces and newlines inside paths intact."""
+    output = "\0".join(
+        [
+            "M",
+            "src/a b.ts",
+            "R087",
+            "old/name.ts",
+            "new/name.ts",
+            "C100",
+            "lib/x.ts",
+            "lib/y.ts",
+            "D",
+            "weird\tname\nfile.ts",
+            "",
+        ]
+    )
+    assert parse_name_status(output) == [
+        FileChange(path="src/a b.ts", status="M"),
+        FileChange(path="new/name.ts", status="R", old_path="old/name.ts"),
+        FileChange(path="lib/y.ts", status="C", old_path="lib/x.ts"),
+        FileChange(path="weird\tname\nfile.ts", status="D"),
+    ]
+    assert parse_name_status("") == []
+
+
+def _git(cwd, *args):
+    subprocess.run(
+        ["git", "-c", "user.name=t", "-c", "user.email=t@t", *args],
+        cwd=cwd,
+        check=True,
+        capture_output=True,
+    )
+
+
+@pytest.fixture
+def repo(tmp_path):
+    if shutil.which("git") is None:
+        pytest.skip("git is not installed")
+    _git(tmp_path, "init", "-q", "-b", "main")
+    (tmp_path / "keep.ts").write_text("export const keep = 1;\n" * 20)
+    (tmp_path / "edit.ts").write_text("export const edit = 1;\n")
+    _git(tmp_path, "add", ".")
+    _git(tmp_path, "commit", "-q", "-m", "base")
+    _git(tmp_path, "checkout", "-q", "-b", "feature")
+    yield tmp_path
+    ChangeDetector.clear_cache()
+
+
+def test_detect_reports_renames_and_untracked_files(repo):
+    _git(repo, "mv", "keep.ts", "moved.ts")
+    _git(repo, "commit", "-q", "-m", "move")
+    (repo / "edit.ts").write_text("export const edit = 2;\n")
+    (repo / "new file.ts").write_text("export {};\n")
+
+    change_set = ChangeDetector(str(repo)).detect("main")
+    assert change_set.renames == {"keep.ts": "moved.ts"}
+    assert set(change_set.files) == {"keep.ts", "moved.ts", "edit.ts", "new file.ts"}
+    assert FileChange(path="new file.ts", status="?") in change_set.changes
+
+    committed = ChangeDetector(str(repo)).detect("main", include_worktree=False)
+    assert set(committed.files) == {"keep.ts", "moved.ts"}
+
+
+def test_worktree_results_are_not_stale(repo):
+    """Edits after a first detection show up without clearing any cache."""
+    detector = ChangeDetector(str(repo))
+    assert detector.detect("main").files == []
+    (repo / "edit.ts").write_text("export const edit = 2;\n")
+    assert detector.detect("main").files == ["edit.ts"]
+    (repo / "untracked.ts").write_text("export {};\n")
+    assert detector.detect("main").files == ["edit.ts", "untracked.ts"]
+
+
+def test_committed_ranges_are_cached(repo):
+    detector = ChangeDetector(str(repo))
+    first = detector.detect("main", include_worktree=False)
+    assert detector.detect("main", include_worktree=False) is first
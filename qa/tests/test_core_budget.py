@@ -0,0 +1,90 @@
+"""CPU core splitting in testing/orchestrator/utils/core_budget.py."""
+
+import json
+
+from utils.core_budget import CoreBudget, inject_worker_flags
+
+
+def test_acquire_splits_free_cores_across_remaining_slots():
+    budget = CoreBudget(slots=3, cores=list(range(8)))
+    first = budget.acquire("a")
+    second = budget.acquire("b")
+    third = budget.acquire("c")
+    assert [first.workers, second.workers, third.workers] == [2, 3, 3]
+    assert budget.free == 0
+    assert budget.acquire("a") is first
+
+    budget.release("b")
+    assert budget.free == 3
+    assert budget.acquire("d").workers == 3
+    assert budget.reserved == 8
+
+
+def test_fewer_concurrent_tasks_get_more_cores():
+    budget = CoreBudget(slots=4, cores=list(range(8)))
+    assert budget.acquire("a", concurrent=2).workers == 4
+    assert budget.acquire("b", concurrent=2).workers == 4
+
+
+def test_oversubscribed_tasks_still_get_one_worker_and_release_is_bounded():
+    budget = CoreBudget(slots=2, cores=[0])
+    assert budget.acquire("a").workers == 1
+    assert budget.acquire("b").workers == 1
+    budget.release("a")
+    budget.release("b")
+    budget.release("unknown")
+    assert budget.free == budget.total == 1
+
+
+def test_pinned_cpus_are_disjoint_and_returned(monkeypatch):
+    monkeypatch.setattr("os.sched_setaffinity", lambda pid, cpus: None, raising=False)
+    budget = CoreBudget(slots=2, pin_cpus=True, cores=[0, 1, 2, 3])
+    first = budget.acquire("a")
+    second = budget.acquire("b")
+    assert first.cpus == [0, 1] and second.cpus == [2, 3]
+    budget.release("a")
+    assert budget.acquire("c").cpus == [0, 1]
+
+
+def test_reserved_cores_are_not_handed_out():
+    budget = CoreBudget(slots=1, reserve_cores=2, cores=list(range(6)))
+    assert budget.acquire("a").workers == 4
+
+
+def test_worker_flags_are_injected_per_runner(tmp_path):
+    assert inject_worker_flags("npx jest --ci", 2, tmp_path) == (
+        "npx jest --ci --maxWorkers=2"
+    )
+    assert inject_worker_flags("npx vitest run", 2, tmp_path) == (
+        "npx vitest run --maxWorkers=2 --minWorkers=1"
+    )
+    assert inject_worker_flags("npx playwright test", 3, tmp_path) == (
+        "npx playwright test --workers=3"
+    )
+
+
+def test_explicit_worker_flags_are_respected(tmp_path):
+    """A concurrency flag on the command line or in the script body wins."""
+    for command in ("npx jest -w 4", "npx jest --runInBand", "npx vitest --threads"):
+        assert inject_worker_flags(command, 2, tmp_path) == command
+
+    (tmp_path / "package.json").write_text(
+        json.dumps(
+            {
+                "scripts": {
+                    "test": "jest --maxWorkers=50%",
+                    "test:ci": "tsc && jest --ci",
+                }
+            }
+        )
+    )
+    assert inject_worker_flags("npm test", 2, tmp_path) == "npm test"
+    assert inject_worker_flags("npm run test:ci -- -i", 2, tmp_path) == (
+        "npm run test:ci -- -i"
+    )
+    assert inject_worker_flags("npm run test:ci", 2, tmp_path) == (
+        "npm run test:ci -- --maxWorkers=2"
+    )
+    assert inject_worker_flags("cd . && pnpm test:ci", 2, tmp_path) == (
+        "cd . && pnpm test:ci --maxWorkers=2"
+    )
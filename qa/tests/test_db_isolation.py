@@ -0,0 +1,166 @@
+"""Template/clone slot accounting in testing/orchestrator/utils/db_isolation.py."""
+
+import shlex
+import sqlite3
+import sys
+import threading
+
+import pytest
+
+pytest.importorskip("rich")
+
+from config import AppConfig, DatabaseConfig  # noqa: E402
+from config import TestConfig as OrchestratorConfig  # noqa: E402
+from utils.db_isolation import DatabaseIsolationError, DatabaseProvisioner  # noqa: E402
+
+# Creates the SQLite template and counts how many times setup ran.
+SETUP = (
+    "import os, sqlite3; "
+    "sqlite3.connect(os.environ['DATABASE_URL'][len('file:'):]).execute("
+    "'CREATE TABLE IF NOT EXISTS t (x)'); "
+    "open('setup.log', 'a').write('x')"
+)
+FAILING_SETUP = "open('setup.log', 'a').write('x'); raise SystemExit(1)"
+
+
+def _config(tmp_path, setup_command):
+    (tmp_path / "api").mkdir()
+    database = DatabaseConfig(
+        required=True,
+        engine="sqlite",
+        database="db/test.sqlite",
+        setup_command=setup_command,
+    )
+    config = OrchestratorConfig(
+        project={"root": str(tmp_path)},
+        apps={
+            "api": AppConfig(name="api", type="backend", path="api", database=database)
+        },
+    )
+    config.execution.parallel_workers = 2
+    config.execution.flaky_management["quarantine_lane"] = {"enabled": False}
+    return config
+
+
+@pytest.fixture
+def provisioner(tmp_path):
+    setup = f"{shlex.quote(sys.executable)} -c {shlex.quote(SETUP)}"
+    provisioner = DatabaseProvisioner(_config(tmp_path, setup))
+    yield provisioner
+    provisioner.cleanup()
+
+
+def _setup_runs(tmp_path):
+    log = tmp_path / "api" / "setup.log"
+    return len(log.read_text()) if log.exists() else 0
+
+
+def test_slots_default_to_scheduler_concurrency(tmp_path):
+    """Without max_slots, one clone per concurrently running task is available."""
+    config = _config(tmp_path, None)
+    assert DatabaseProvisioner(config).max_slots == config.max_concurrency == 2
+
+    config.execution.flaky_management["quarantine_lane"] = {
+        "enabled": True,
+        "max_workers": 2,
+    }
+    assert DatabaseProvisioner(config).max_slots == 4
+
+
+def test_template_prepared_once_and_slots_are_distinct(tmp_path, provisioner):
+    """Setup runs once per app; concurrent leases get different clones."""
+    first = provisioner.acquire("t1", "api")
+    second = provisioner.acquire("t2", "api")
+    assert _setup_runs(tmp_path) == 1
+    assert {first["TEST_DB_WORKER"], second["TEST_DB_WORKER"]} == {"0", "1"}
+    assert first["DATABASE_URL"] != second["DATABASE_URL"]
+
+    provisioner.release("t1")
+    third = provisioner.acquire("t3", "api")
+    assert third["TEST_DB_WORKER"] == first["TEST_DB_WORKER"]
+    assert _setup_runs(tmp_path) == 1
+
+
+def test_acquire_waits_for_a_released_slot(provisioner):
+    """When all slots are leased, acquire blocks until one is returned."""
+    provisioner.acquire("t1", "api")
+    provisioner.acquire("t2", "api")
+
+    result = {}
+    waiter = threading.Thread(
+        target=lambda: result.update(provisioner.acquire("t3", "api"))
+    )
+    waiter.start()
+    waiter.join(0.2)
+    assert waiter.is_alive()
+
+    provisioner.release("t2")
+    waiter.join(5)
+    assert not waiter.is_alive()
+    assert result["TEST_DB_WORKER"] == "1"
+
+
+def test_release_while_waiting_cancels_the_wait(provisioner):
+    """Releasing a task that is still waiting fails its acquire; no slot leaks."""
+    provisioner.acquire("t1", "api")
+    provisioner.acquire("t2", "api")
+
+    errors = []
+
+    def wait():
+        try:
+            provisioner.acquire("t3", "api")
+        except DatabaseIsolationError as e:
+            errors.append(e)
+
+    waiter = threading.Thread(target=wait)
+    waiter.start()
+    waiter.join(0.2)
+    provisioner.release("t3")
+    waiter.join(5)
+    assert not waiter.is_alive()
+    assert len(errors) == 1
+
+    # The leased slots are untouched; a freed slot is still handed out.
+    provisioner.release("t1")
+    assert provisioner.acquire("t4", "api")["TEST_DB_WORKER"] == "0"
+
+
+def test_prepare_failure_is_sticky_until_reset(tmp_path):
+    """A failed setup is not retried by every task, only after reset_failures()."""
+    failing = f"{shlex.quote(sys.executable)} -c {shlex.quote(FAILING_SETUP)}"
+    provisioner = DatabaseProvisioner(_config(tmp_path, failing))
+
+    for task_id in ("t1", "t2"):
+        with pytest.raises(DatabaseIsolationError, match="模板数据库准备失败"):
+            provisioner.acquire(task_id, "api")
+    assert _setup_runs(tmp_path) == 1
+    assert provisioner.prepare_error("api")
+
+    provisioner.reset_failures()
+    assert provisioner.prepare_error("api") is None
+    with pytest.raises(DatabaseIsolationError):
+        provisioner.acquire("t3", "api")
+    assert _setup_runs(tmp_path) == 2
+
+
+def test_sqlite_clone_includes_wal_contents(tmp_path, provisioner):
+    """Rows still in the template's -wal file reach the clone."""
+    provisioner.acquire("t1", "api")
+    template = tmp_path / "api" / "db" / "test_api_tpl.sqlite"
+    writer = sqlite3.connect(template)
+    try:
+        writer.execute("PRAGMA journal_mode=WAL")
+        writer.execute("PRAGMA wal_autocheckpoint=0")
+        writer.execute("INSERT INTO t VALUES (42)")
+        writer.commit()
+        assert template.with_name(template.name + "-wal").stat().st_size
+
+        env = provisioner.acquire("t2", "api")
+        clone = sqlite3.connect(env["DATABASE_URL"][len("file:") :])
+        try:
+            assert clone.execute("SELECT x FROM t").fetchall() == [(42,)]
+        finally:
+            clone.close()
+    finally:
+        writer.close()
@@ -0,0 +1,134 @@
+"""Database reset strategies in testing/tools/enhanced_test_tools.py."""
+
+import asyncio
+import sqlite3
+
+import pytest
+
+import enhanced_test_tools
+from enhanced_test_tools import ResetStrategy
+from enhanced_test_tools import TestDatabaseManager as DatabaseManager
+
+SCHEMA = """
+CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT);
+CREATE TABLE posts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER REFERENCES users(id),
+    title TEXT
+);
+CREATE TABLE _prisma_migrations (id TEXT PRIMARY KEY);
+INSERT INTO users (name) VALUES ('alice');
+INSERT INTO posts (user_id, title) VALUES (1, 'hello');
+INSERT INTO _prisma_migrations VALUES ('0001_init');
+"""
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+@pytest.fixture
+def manager(tmp_path):
+    path = tmp_path / "test.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    conn.close()
+    manager = DatabaseManager(f"sqlite:///{path}")
+    manager._connect().execute("PRAGMA foreign_keys = ON")
+    yield manager
+    manager.close()
+
+
+def _count(manager, table):
+    return manager._connect().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_strategy_order(manager):
+    """Only truncate is available until a snapshot or wrapping transaction exists."""
+    assert manager.available_strategies() == [ResetStrategy.TRUNCATE]
+    run(manager.take_snapshot())
+    run(manager.begin_transaction())
+    assert manager.available_strategies() == [
+        ResetStrategy.TRANSACTION,
+        ResetStrategy.SNAPSHOT,
+        ResetStrategy.TRUNCATE,
+    ]
+
+
+def test_unknown_backend_has_no_strategy():
+    """Unsupported URLs fail loudly instead of picking a strategy."""
+    manager = DatabaseManager("mysql://localhost/test")
+    assert manager.available_strategies() == []
+    with pytest.raises(ValueError):
+        run(manager.reset_database())
+
+
+def test_truncate_keeps_excluded_tables_and_restores_pragma(manager):
+    """Truncate empties business tables, resets AUTOINCREMENT, keeps foreign_keys."""
+    assert run(manager.reset_database()) == ResetStrategy.TRUNCATE
+    assert _count(manager, "users") == _count(manager, "posts") == 0
+    assert _count(manager, "_prisma_migrations") == 1
+
+    conn = manager._connect()
+    assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+    conn.execute("INSERT INTO users (name) VALUES ('bob')")
+    assert conn.execute("SELECT id FROM users").fetchone()[0] == 1
+
+
+def test_transaction_rolls_back_to_savepoint(manager):
+    """Each reset rolls back to the suite savepoint, which stays usable."""
+    run(manager.begin_transaction())
+    conn = manager._connect()
+    for _ in range(2):
+        conn.execute("INSERT INTO users (name) VALUES ('bob')")
+        assert run(manager.reset_database()) == ResetStrategy.TRANSACTION
+        assert _count(manager, "users") == 1
+    run(manager.end_transaction())
+
+
+def test_truncate_inside_transaction_does_not_commit(manager):
+    """Truncating inside the wrapping transaction leaves it open and rollback-able."""
+    run(manager.begin_transaction())
+    run(manager.reset_database(ResetStrategy.TRUNCATE))
+    assert _count(manager, "users") == 0
+    assert manager._connect().in_transaction
+
+    run(manager.end_transaction())
+    assert _count(manager, "users") == _count(manager, "posts") == 1
+
+
+def test_snapshot_restores_data(manager):
+    """Restoring the snapshot brings back the rows present when it was taken."""
+    run(manager.take_snapshot())
+    manager._connect().execute("DELETE FROM posts")
+    manager._connect().execute("INSERT INTO users (name) VALUES ('bob')")
+
+    assert run(manager.reset_database()) == ResetStrategy.SNAPSHOT
+    assert _count(manager, "users") == _count(manager, "posts") == 1
+
+
+def test_unavailable_strategy_is_rejected(manager):
+    """Asking for a strategy that is not set up raises."""
+    with pytest.raises(ValueError):
+        run(manager.reset_database(ResetStrategy.SNAPSHOT))
+
+
+def test_pg_snapshot_excludes_untouched_tables(monkeypatch, tmp_path):
+    """pg_dump skips data of excluded tables, which restore_snapshot never truncates."""
+    calls = []
+
+    class Result:
+        returncode = 0
+        stderr = ""
+
+    def fake_run(args, **kwargs):
+        calls.append(args)
+        return Result()
+
+    monkeypatch.setattr(enhanced_test_tools.subprocess, "run", fake_run)
+    manager = DatabaseManager("postgresql://localhost/test")
+    run(manager.take_snapshot(str(tmp_path / "snapshot.dump")))
+
+    assert calls[0][0] == "pg_dump"
+    assert '--exclude-table-data="_prisma_migrations"' in calls[0]
+    assert '--exclude-table-data="migrations"' in calls[0]
@@ -0,0 +1,68 @@
+"""Affected-app closure in testing/orchestrator/utils/dependency_graph.py."""
+
+import json
+
+import pytest
+
+pytest.importorskip("yaml")
+
+from utils.dependency_graph import WorkspaceGraph  # noqa: E402
+
+
+def _package(root, rel, name, *deps):
+    path = root / rel / "package.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        json.dumps({"name": name, "dependencies": {d: "workspace:*" for d in deps}})
+    )
+
+
+@pytest.fixture
+def graph(tmp_path):
+    """web -> core -> ui, admin -> ui, and site -> admin via app config."""
+    (tmp_path / "pnpm-workspace.yaml").write_text(
+        "packages:\n  - apps/*\n  - packages/*\n"
+    )
+    _package(tmp_path, "packages/ui", "@repo/ui")
+    _package(tmp_path, "packages/core", "@repo/core", "@repo/ui")
+    _package(tmp_path, "apps/web", "web", "@repo/core")
+    _package(tmp_path, "apps/admin", "admin", "@repo/ui")
+    _package(tmp_path, "apps/site", "site")
+    return WorkspaceGraph(
+        str(tmp_path),
+        apps={"web": "./apps/web", "admin": "apps/admin", "site": "apps/site"},
+        app_dependencies={"site": ["admin"]},
+        cache_path=tmp_path / ".cache" / "graph.json",
+    )
+
+
+def test_changes_reach_transitive_dependents(graph):
+    assert graph.affected_apps(["packages/ui/button.ts"]) == {"web", "admin", "site"}
+    assert graph.affected_apps(["packages/core/index.ts"]) == {"web"}
+    assert graph.affected_apps(["apps/admin/src/a.ts"]) == {"admin", "site"}
+    assert graph.affected_apps(["apps/web/src/a.ts"]) == {"web"}
+
+
+def test_unowned_files_affect_every_app(graph):
+    """Tooling and CI files outside any package cannot be narrowed."""
+    everything = {"web", "admin", "site"}
+    assert graph.affected_apps(["testing/test_config.yml"]) == everything
+    assert graph.affected_apps([".github/workflows/ci.yml"]) == everything
+    assert graph.affected_apps(["pnpm-lock.yaml"]) == everything
+
+
+def test_documentation_outside_packages_affects_nothing(graph):
+    assert graph.affected_apps(["README.md", "docs/setup.txt"]) == set()
+    assert graph.affected_apps(["apps/web/README.md"]) == {"web"}
+
+
+def test_manifest_change_invalidates_cached_closure(graph, tmp_path):
+    graph.load()
+    reloaded = WorkspaceGraph(
+        str(tmp_path),
+        apps={"web": "./apps/web", "admin": "apps/admin", "site": "apps/site"},
+        app_dependencies={"site": ["admin"]},
+        cache_path=tmp_path / ".cache" / "graph.json",
+    )
+    _package(tmp_path, "apps/site", "site", "@repo/core")
+    assert reloaded.affected_apps(["packages/core/a.ts"]) == {"web", "site"}
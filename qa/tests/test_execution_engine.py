@@ -0,0 +1,204 @@
+"""Execution backends (utils/execution_engine.py) and the serve /execute allowlist."""
+
+import asyncio
+import os
+import shlex
+import signal
+import socket
+import sys
+import time
+
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("rich")
+
+from aiohttp import web  # noqa: E402
+from config import AppConfig  # noqa: E402
+from config import TestConfig as OrchestratorConfig  # noqa: E402
+from run_server import RunServer  # noqa: E402
+from utils.core_budget import inject_worker_flags  # noqa: E402
+from utils.execution_engine import (  # noqa: E402
+    ExecutionRequest,
+    RemoteBackend,
+    create_backend,
+)
+
+posix_only = pytest.mark.skipif(
+    not hasattr(signal, "SIGSTOP"), reason="needs POSIX job control"
+)
+
+
+def _alive(pid):
+    """True while pid exists and is not a zombie."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+async def _wait_for_pid(backend, task_id):
+    for _ in range(200):
+        if backend.pid(task_id) is not None:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("process did not start")
+
+
+@posix_only
+@pytest.mark.parametrize("name", ["thread", "asyncio"])
+def test_timeout_excludes_suspended_time(name):
+    """A task suspended past its timeout still completes once resumed."""
+    backend = create_backend(name, max_workers=1)
+    command = f"{shlex.quote(sys.executable)} -c 'import time; time.sleep(0.6)'"
+
+    async def scenario():
+        run = asyncio.ensure_future(
+            backend.execute(ExecutionRequest("t", command, timeout=1.0))
+        )
+        await _wait_for_pid(backend, "t")
+        assert backend.suspend("t")
+        await asyncio.sleep(1.2)
+        assert not run.done()
+        assert backend.resume("t")
+        return await run
+
+    result = asyncio.run(scenario())
+    backend.shutdown()
+    assert not result.timed_out
+    assert result.return_code == 0
+    assert result.duration > 1.2
+
+
+@posix_only
+@pytest.mark.parametrize("name", ["thread", "asyncio"])
+def test_timeout_kills_running_task(name):
+    backend = create_backend(name, max_workers=1)
+    result = asyncio.run(
+        backend.execute(ExecutionRequest("t", "sleep 30", timeout=0.3))
+    )
+    backend.shutdown()
+    assert result.timed_out
+    assert result.duration < 5
+
+
+@posix_only
+@pytest.mark.parametrize("name", ["thread", "asyncio"])
+def test_cancel_terminates_the_process_group(tmp_path, name):
+    """Cancelling a suspended shell also stops the children it spawned."""
+    backend = create_backend(name, max_workers=1)
+    pid_file = tmp_path / "child.pid"
+    command = f"sleep 30 & echo $! > {shlex.quote(str(pid_file))}; wait"
+
+    async def scenario():
+        run = asyncio.ensure_future(backend.execute(ExecutionRequest("t", command)))
+        await _wait_for_pid(backend, "t")
+        while not pid_file.exists() or not pid_file.read_text().strip():
+            await asyncio.sleep(0.01)
+        assert backend.suspend("t")
+        assert backend.cancel("t")
+        return await asyncio.wait_for(run, 5), int(pid_file.read_text())
+
+    result, child = asyncio.run(scenario())
+    backend.shutdown()
+    assert result.cancelled
+    for _ in range(100):
+        if not _alive(child):
+            break
+        time.sleep(0.02)
+    assert not _alive(child)
+
+
+def test_remote_control_does_not_block_the_event_loop(tmp_path):
+    """Control requests to an unresponsive server return without waiting."""
+    path = tmp_path / "serve.sock"
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(str(path))
+    listener.listen(1)
+    backend = RemoteBackend(f"unix:{path}")
+    backend._active["t"] = backend._remote_id("t")
+
+    async def scenario():
+        started = time.monotonic()
+        assert backend.suspend("t")
+        assert backend.cancel("t")
+        return time.monotonic() - started
+
+    try:
+        assert asyncio.run(scenario()) < 0.5
+    finally:
+        backend.shutdown()
+        listener.close()
+
+
+# ----------------------------------------------------------------------
+# /execute allowlist
+# ----------------------------------------------------------------------
+
+
+@pytest.fixture
+def server(tmp_path):
+    (tmp_path / "apps" / "web").mkdir(parents=True)
+    config = OrchestratorConfig(
+        project={"root": str(tmp_path)},
+        apps={
+            "web": AppConfig(
+                name="web",
+                type="frontend",
+                path="apps/web",
+                commands={"test_unit": "npx jest --ci", "test_e2e": "npm run e2e"},
+            )
+        },
+    )
+    return RunServer(config)
+
+
+def test_orchestrator_request_shape(server, tmp_path):
+    server._check_execution(
+        ExecutionRequest(
+            "t",
+            "cd apps/web && npx jest --ci --maxWorkers=2",
+            cwd=str(tmp_path),
+        )
+    )
+
+
+def test_run_tests_request_shape(server, tmp_path):
+    """run_tests.py: shell string, cwd is the app path relative to the project."""
+    execution = ExecutionRequest("t", "npx jest --ci", cwd="apps/web")
+    server._check_execution(execution)
+    assert execution.cwd == str(tmp_path / "apps" / "web")
+
+
+def test_enhanced_run_tests_request_shape(server, tmp_path):
+    """enhanced_run_tests.py: whitespace-split list, absolute app directory."""
+    server._check_execution(
+        ExecutionRequest(
+            "t", "npx jest --ci".split(), cwd=os.path.join(str(tmp_path), "apps/web")
+        )
+    )
+
+
+def test_smart_scheduler_request_shape(server, tmp_path):
+    """smart_scheduler.py: shlex list with worker flags and a nice/ionice prefix."""
+    app_dir = tmp_path / "apps" / "web"
+    command = inject_worker_flags("npx jest --ci", 2, app_dir)
+    args = ["nice", "-n", "10", "ionice", "-c", "3"] + shlex.split(command)
+    server._check_execution(ExecutionRequest("t", args, cwd=str(app_dir)))
+
+
+@pytest.mark.parametrize(
+    "command, cwd",
+    [
+        ("npx jest --ci; rm -rf /", "apps/web"),
+        (["sh", "-c", "npx jest --ci"], "apps/web"),
+        (["nice", "-n", "-5", "npx", "jest", "--ci"], "apps/web"),
+        ("npx jest --ci", ".."),
+        ("npx jest --ci", "."),
+        ("cd apps/web && npx jest --ci", "apps/web"),
+    ],
+)
+def test_rejected_requests(server, command, cwd):
+    with pytest.raises(web.HTTPForbidden):
+        server._check_execution(ExecutionRequest("t", command, cwd=cwd))
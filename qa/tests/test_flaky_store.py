@@ -0,0 +1,124 @@
+"""Sliding-window flaky scoring in testing/orchestrator/utils/flaky_store.py."""
+
+import random
+import threading
+
+import pytest
+
+from utils.flaky_store import CROSS_VERSION_FLIP_WEIGHT, FlakyPolicy, FlakyStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = FlakyStore(
+        store_path=tmp_path / "flaky-list.json",
+        policy=FlakyPolicy(window=5, quarantine_after=3, min_runs=5),
+    )
+    yield store
+    store.close()
+
+
+def _recount(window):
+    """Recompute the window counters from the window string."""
+    failures = sum(c.upper() == "F" for c in window)
+    flips = version_flips = 0
+    for previous, current in zip(window, window[1:]):
+        if previous.upper() != current.upper():
+            flips += 1
+            version_flips += current.islower()
+    return failures, flips, version_flips
+
+
+def test_incremental_counters_match_window(store):
+    """Counters updated per record equal a full recount after the window slides."""
+    rng = random.Random(7)
+    # Avoid the quarantine threshold so every record keeps the same policy path.
+    store.policy.quarantine_after = 10**6
+    store.policy.quarantine_score = 2.0
+    for _ in range(200):
+        stats = store.record(
+            "app:unit", rng.random() < 0.5, version=rng.choice(["v1", "v2"])
+        )
+        assert len(stats.window) <= store.policy.window
+        assert (
+            stats.window_failures,
+            stats.window_flips,
+            stats.window_version_flips,
+        ) == _recount(stats.window)
+
+
+def test_same_version_flips_quarantine(store):
+    """Three pass/fail flips on one code version quarantine the test."""
+    for passed in (True, False, True):
+        stats = store.record("app:unit", passed, version="v1")
+        assert not stats.quarantined
+    stats = store.record("app:unit", False, version="v1")
+    assert stats.window_version_flips == 3
+    assert stats.quarantined
+    assert store.contains("app:unit")
+
+
+def test_cross_version_flips_are_down_weighted(store):
+    """Cross-version flips are down-weighted and never trigger the flip rule."""
+    for i, passed in enumerate((True, False, True, False)):
+        stats = store.record("app:unit", passed, version=f"v{i}")
+    assert stats.window_flips == 3
+    assert stats.window_version_flips == 0
+    assert stats.score == pytest.approx(CROSS_VERSION_FLIP_WEIGHT)
+    assert not stats.quarantined
+
+
+def test_persistent_failure_is_not_flaky(store):
+    """An always-failing test scores 0 and is a deterministic failure."""
+    for _ in range(6):
+        stats = store.record("app:unit", False, version="v1")
+    assert stats.score == 0.0
+    assert stats.failure_rate == 1.0
+    assert stats.deterministic_failure
+    assert not stats.quarantined
+
+
+def test_release_after_pass_streak(store):
+    """A quarantined test is released after a clean window and a long pass streak."""
+    store.policy.release_after = 5
+    for passed in (True, False, True, False):
+        store.record("app:unit", passed, version="v1")
+    assert store.get("app:unit").quarantined
+
+    for _ in range(4):
+        stats = store.record("app:unit", True, version="v1")
+        assert stats.quarantined
+    stats = store.record("app:unit", True, version="v1")
+    assert stats.window == "ppppp"
+    assert not stats.quarantined
+
+
+
+def test_state_is_shared_between_instances(tmp_path, store):
+    """A second store on the same database sees committed records."""
+    store.record("app:unit", False, version="v1")
+    other = FlakyStore(store_path=tmp_path / "flaky-list.json")
+    try:
+        assert other.get("app:unit").failures == 1
+        other.record("app:unit", True, version="v1")
+        assert store.get("app:unit").passes == 1
+    finally:
+        other.close()
+
+
+def test_concurrent_records_are_not_lost(tmp_path, store):
+    """Writers on separate connections never overwrite each other's counts."""
+    writers = [FlakyStore(store_path=tmp_path / "flaky-list.json") for _ in range(4)]
+
+    def record(writer):
+        for _ in range(25):
+            writer.record("app:unit", True)
+
+    threads = [threading.Thread(target=record, args=(w,)) for w in writers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for writer in writers:
+        writer.close()
+    assert store.get("app:unit").passes == 100
@@ -0,0 +1,160 @@
+"""File-level test selection in testing/orchestrator/utils/import_graph.py."""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from utils.dependency_graph import WorkspaceGraph
+from utils.import_graph import ImportGraph
+from utils.runner_args import runner_filters, runner_path_patterns
+
+
+def _write(root, rel, text=""):
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    return path
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """A pnpm-style repo with one app, one shared package and a tsconfig alias."""
+    _write(tmp_path, "pnpm-workspace.yaml", "packages:\n  - apps/*\n  - packages/*\n")
+    _write(tmp_path, "package.json", json.dumps({"name": "root"}))
+    _write(tmp_path, "apps/web/package.json", json.dumps({"name": "web"}))
+    _write(
+        tmp_path,
+        "apps/web/tsconfig.json",
+        json.dumps({"compilerOptions": {"baseUrl": ".", "paths": {"@/*": ["src/*"]}}}),
+    )
+    _write(
+        tmp_path,
+        "packages/shared/package.json",
+        json.dumps({"name": "@repo/shared", "main": "index.ts"}),
+    )
+    _write(tmp_path, "packages/shared/index.ts", "export const shared = 1;\n")
+    _write(tmp_path, "packages/shared/index.test.ts", "import './index';\n")
+    _write(tmp_path, "apps/web/src/util.ts", "import { shared } from '@repo/shared';\n")
+    _write(tmp_path, "apps/web/src/page.ts", "import { util } from '@/util';\n")
+    _write(tmp_path, "apps/web/src/page.test.ts", "import { page } from './page';\n")
+    _write(tmp_path, "apps/web/src/other.test.ts", "export {};\n")
+    return tmp_path
+
+
+def _graph(repo, tmp_path_factory):
+    cache = tmp_path_factory.mktemp("cache") / "web.json"
+    return ImportGraph(repo, repo / "apps/web", cache_path=cache).refresh()
+
+
+def test_affected_tests_follow_transitive_imports(repo, tmp_path_factory):
+    """Aliases, workspace packages and relative imports are all followed."""
+    graph = _graph(repo, tmp_path_factory)
+    assert graph.affected_tests(["packages/shared/index.ts"]) == [
+        "apps/web/src/page.test.ts"
+    ]
+    assert graph.affected_tests(["apps/web/src/page.ts"]) == [
+        "apps/web/src/page.test.ts"
+    ]
+    assert graph.affected_tests(["apps/web/src/other.test.ts"]) == [
+        "apps/web/src/other.test.ts"
+    ]
+    # Unknown files and tests outside the app are never selected.
+    assert graph.affected_tests(["README.md"]) == []
+    assert not graph.contains("packages/shared/index.test.ts")
+
+
+def test_refresh_picks_up_new_imports(repo, tmp_path_factory):
+    graph = _graph(repo, tmp_path_factory)
+    _write(repo, "apps/web/src/other.test.ts", "import '@/util';\n")
+    graph.refresh()
+    assert graph.affected_tests(["apps/web/src/util.ts"]) == [
+        "apps/web/src/other.test.ts",
+        "apps/web/src/page.test.ts",
+    ]
+
+
+def test_cache_files_do_not_collide_for_same_named_apps(tmp_path):
+    first = ImportGraph(tmp_path, tmp_path / "apps" / "web")
+    second = ImportGraph(tmp_path, tmp_path / "legacy" / "web")
+    assert first.cache_path != second.cache_path
+    assert first.cache_path == ImportGraph(tmp_path, tmp_path / "apps/web").cache_path
+
+
+def test_runner_filters_resolve_package_scripts(tmp_path):
+    """Filters and path patterns come from the script body plus forwarded args."""
+    _write(
+        tmp_path,
+        "package.json",
+        json.dumps(
+            {
+                "scripts": {
+                    "test:unit": "tsc --noEmit && jest -c jest.config.js "
+                    "--testPathPattern=unit 'src/**/*.spec.ts'"
+                }
+            }
+        ),
+    )
+    command = "npm run test:unit -- --runInBand src/a.spec.ts"
+    assert runner_filters(command, tmp_path) == ["src/**/*.spec.ts", "src/a.spec.ts"]
+    assert runner_path_patterns(command, tmp_path) == ["unit"]
+
+
+def test_runner_filters_skip_subcommands_and_option_values(tmp_path):
+    command = "cd app && npx vitest run --reporter dot tests/a.test.ts"
+    assert runner_filters(command, tmp_path) == ["tests/a.test.ts"]
+    command = "npx jest --testPathPattern integration"
+    assert runner_filters(command, tmp_path) == []
+    assert runner_path_patterns(command, tmp_path) == ["integration"]
+
+
+# ----------------------------------------------------------------------
+# Scheduler fallback to the full suite
+# ----------------------------------------------------------------------
+
+
+def _scheduler(repo, tmp_path_factory, changed):
+    pytest.importorskip("rich")
+    from scheduler import TestScheduler
+
+    # Only the attributes _affected_test_files reads; no git, store or monitor.
+    scheduler = TestScheduler.__new__(TestScheduler)
+    workspace = WorkspaceGraph(
+        str(repo),
+        apps={"web": "apps/web", "admin": "apps/admin"},
+        cache_path=tmp_path_factory.mktemp("cache") / "workspace.json",
+    )
+    scheduler.config = SimpleNamespace(project_root=str(repo), apps={})
+    scheduler.git = SimpleNamespace(repo_root=str(repo), dependency_graph=workspace)
+    scheduler.logger = SimpleNamespace(warning=lambda message: None)
+    scheduler._import_graphs = {"web": _graph(repo, tmp_path_factory)}
+    scheduler._impact_changes = changed
+    return scheduler
+
+
+@pytest.mark.parametrize(
+    "changed, expected",
+    [
+        (["apps/web/src/page.ts"], ["src/page.test.ts"]),
+        # Files of an unrelated workspace package are ignored.
+        (["apps/web/src/page.ts", "apps/admin/src/a.ts"], ["src/page.test.ts"]),
+        # Root tooling files, manifests of dependencies and app configs are not
+        # in the import graph: run everything.
+        (["apps/web/src/page.ts", "jest.config.js"], None),
+        (["apps/web/src/page.ts", "pnpm-lock.yaml"], None),
+        (["apps/web/src/page.ts", "packages/shared/package.json"], None),
+        (["apps/web/src/page.ts", "apps/web/jest.config.js"], None),
+    ],
+)
+def test_unresolved_changes_fall_back_to_full_suite(
+    repo, tmp_path_factory, changed, expected
+):
+    _write(repo, "apps/admin/package.json", json.dumps({"name": "admin"}))
+    _write(
+        repo,
+        "apps/web/package.json",
+        json.dumps({"name": "web", "dependencies": {"@repo/shared": "workspace:*"}}),
+    )
+    scheduler = _scheduler(repo, tmp_path_factory, changed)
+    app_config = SimpleNamespace(path="apps/web")
+    assert scheduler._affected_test_files("web", app_config) == expected
@@ -0,0 +1,122 @@
+"""OpenMetrics exposition in testing/orchestrator/utils/metrics.py."""
+
+import math
+import urllib.request
+
+import pytest
+
+from utils.metrics import (
+    CONTENT_TYPE,
+    Counter,
+    Gauge,
+    Histogram,
+    MetricFamily,
+    Registry,
+    start_http_server,
+)
+
+
+@pytest.fixture
+def registry():
+    return Registry()
+
+
+def test_counter_and_gauge_exposition(registry):
+    """Counters expose name_total samples; families end with # EOF."""
+    counter = Counter("jobs", "Jobs run", ("suite",), registry=registry)
+    counter.inc(suite="unit")
+    counter.inc(2, suite="unit")
+    gauge = Gauge("queue_depth", "Queued tasks", registry=registry)
+    gauge.set(1.5)
+
+    assert registry.render() == (
+        "# TYPE jobs counter\n"
+        "# HELP jobs Jobs run\n"
+        'jobs_total{suite="unit"} 3\n'
+        "# TYPE queue_depth gauge\n"
+        "# HELP queue_depth Queued tasks\n"
+        "queue_depth 1.5\n"
+        "# EOF\n"
+    )
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    histogram = Histogram(
+        "duration_seconds",
+        "Task duration",
+        ("suite",),
+        buckets=(1, 5),
+        registry=registry,
+    )
+    for value in (0.5, 3, 3, 60):
+        histogram.observe(value, suite="e2e")
+
+    lines = registry.render().splitlines()
+    assert lines[2:] == [
+        'duration_seconds_bucket{suite="e2e",le="1"} 1',
+        'duration_seconds_bucket{suite="e2e",le="5"} 3',
+        'duration_seconds_bucket{suite="e2e",le="+Inf"} 4',
+        'duration_seconds_count{suite="e2e"} 4',
+        'duration_seconds_sum{suite="e2e"} 66.5',
+        "# EOF",
+    ]
+
+
+def test_label_values_and_help_are_escaped(registry):
+    counter = Counter(
+        "errors", 'Errors with "quotes"\nand lines', ("path",), registry=registry
+    )
+    counter.inc(path='C:\\tmp\\"x"\n')
+    text = registry.render()
+    assert '# HELP errors Errors with \\"quotes\\"\\nand lines\n' in text
+    assert 'errors_total{path="C:\\\\tmp\\\\\\"x\\"\\n"} 1\n' in text
+
+
+def test_special_values_and_empty_families(registry):
+    gauge = Gauge("ratio", "Ratio", ("kind",), registry=registry)
+    gauge.set(math.inf, kind="up")
+    gauge.set(math.nan, kind="nan")
+    Counter("unused", "Never incremented", registry=registry)
+    text = registry.render()
+    assert 'ratio{kind="up"} +Inf' in text
+    assert 'ratio{kind="nan"} NaN' in text
+    assert "unused" not in text
+
+
+def test_collectors_sum_gauges_and_failures_are_isolated(registry):
+    """Two schedulers report queue depth; a broken collector is skipped."""
+
+    def scheduler(depth):
+        return lambda: [MetricFamily("queued", "gauge", "Queued").add(depth, lane="a")]
+
+    def broken():
+        raise RuntimeError("boom")
+
+    registry.register_collector("one", scheduler(2))
+    registry.register_collector("two", scheduler(3))
+    registry.register_collector("broken", broken)
+    assert 'queued{lane="a"} 5\n' in registry.render()
+
+    registry.unregister_collector("two")
+    assert 'queued{lane="a"} 2\n' in registry.render()
+
+
+def test_labels_must_match_declaration(registry):
+    counter = Counter("jobs", "Jobs", ("suite",), registry=registry)
+    with pytest.raises(ValueError):
+        counter.inc(app="web")
+    with pytest.raises(ValueError):
+        Counter("jobs", "Duplicate", registry=registry)
+
+
+def test_http_endpoint_serves_openmetrics(registry):
+    Gauge("up", "Up", registry=registry).set(1)
+    server = start_http_server(0, registry=registry)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            assert response.headers["Content-Type"] == CONTENT_TYPE
+            assert response.read().decode().endswith("up 1\n# EOF\n")
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,77 @@
+"""Startup-time budget for the test orchestrator CLI (testing/orchestrator/main.py)."""
+
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("typer")
+pytest.importorskip("rich")
+
+ORCHESTRATOR_DIR = Path(__file__).resolve().parents[2] / "testing" / "orchestrator"
+
+# Seconds; override on slow machines with ORCHESTRATOR_STARTUP_BUDGET.
+STARTUP_BUDGET = float(os.environ.get("ORCHESTRATOR_STARTUP_BUDGET", "0.4"))
+
+# Subsystems that must only be imported by the commands that need them.
+LAZY_MODULES = [
+    "scheduler",
+    "run_server",
+    "watch_daemon",
+    "psutil",
+    "aiohttp",
+    "yaml",
+    "jinja2",
+    "pandas",
+    "matplotlib",
+    "seaborn",
+]
+
+
+def _run_cli(*args):
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "main.py", *args],
+        cwd=ORCHESTRATOR_DIR,
+        capture_output=True,
+        text=True,
+    )
+    return process, time.perf_counter() - start
+
+
+def test_help_within_startup_budget():
+    """`python main.py --help` starts within the budget (best of three runs)."""
+    timings = []
+    for _ in range(3):
+        process, elapsed = _run_cli("--help")
+        assert process.returncode == 0, process.stderr
+        timings.append(elapsed)
+    assert min(timings) <= STARTUP_BUDGET, (
+        f"main.py --help took {min(timings):.3f}s (budget {STARTUP_BUDGET:.3f}s)"
+    )
+
+
+def test_help_does_not_import_heavy_subsystems():
+    """Building the CLI must not import the scheduler or optional heavy dependencies."""
+    probe = (
+        "import sys\n"
+        "sys.argv = ['main.py', '--help']\n"
+        "import main\n"
+        "try:\n"
+        "    main.app()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        f"print('LOADED:' + ','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))\n"
+    )
+    process = subprocess.run(
+        [sys.executable, "-c", probe],
+        cwd=ORCHESTRATOR_DIR,
+        capture_output=True,
+        text=True,
+    )
+    assert process.returncode == 0, process.stderr
+    loaded = process.stdout.rsplit("LOADED:", 1)[-1].strip()
+    assert loaded == "", f"eagerly imported: {loaded}"
@@ -0,0 +1,73 @@
+"""Co-failure test selection in testing/orchestrator/utils/predictive_selection.py."""
+
+import pytest
+
+from utils.predictive_selection import CoFailureModel, path_keys
+
+CHANGE = ["apps/web/src/a.ts"]
+
+
+@pytest.fixture
+def model(tmp_path):
+    """Ten full runs where web fails on every other web change and api never fails."""
+    model = CoFailureModel(store_path=tmp_path / "co-failure.json")
+    for i in range(10):
+        model.update(CHANGE, {"web": i % 2 == 0, "api": True}, full_run=True)
+    return model
+
+
+def test_path_keys_generalize_to_parent_directories():
+    assert path_keys("apps/web/src/a.ts") == [
+        "apps/web/src/a.ts",
+        "apps/web/src",
+        "apps/web",
+        "apps",
+    ]
+    assert path_keys("README.md") == ["README.md"]
+
+
+def test_low_scoring_tasks_are_skipped(model):
+    result = model.select(["web", "api"], CHANGE, threshold=0.2, min_observations=5)
+    assert result.selected == ["web"]
+    assert result.skipped == ["api"]
+    assert result.scores["web"] > 0.2 > result.scores["api"]
+    assert not result.full_run
+
+
+def test_sibling_files_use_directory_statistics(model):
+    result = model.select(
+        ["web", "api"], ["apps/web/src/b.ts"], threshold=0.2, min_observations=5
+    )
+    assert result.selected == ["web"]
+
+
+def test_tasks_without_enough_observations_always_run(model):
+    result = model.select(
+        ["web", "api", "new"], ["packages/ui/x.ts"], threshold=0.2, min_observations=5
+    )
+    assert result.selected == ["web", "api", "new"]
+    assert result.scores == {"web": 1.0, "api": 1.0, "new": 1.0}
+
+
+def test_safety_net_keeps_the_highest_scoring_task(model):
+    """When every task is below the threshold the best one still runs."""
+    result = model.select(["web", "api"], CHANGE, threshold=0.99, min_observations=5)
+    assert result.selected == ["web"]
+    assert result.skipped == ["api"]
+
+
+@pytest.mark.parametrize("changed", [[], CHANGE])
+def test_full_runs(model, changed):
+    """No detected change, or the periodic safety run, selects everything."""
+    for _ in range(19):
+        model.update(CHANGE, {"web": True, "api": True}, full_run=False)
+    result = model.select(["web", "api"], changed, full_run_every=20)
+    assert result.full_run
+    assert result.selected == ["web", "api"]
+
+
+def test_model_round_trips_through_its_store(model, tmp_path):
+    model.save()
+    reloaded = CoFailureModel(store_path=tmp_path / "co-failure.json")
+    assert reloaded.runs == 10
+    assert reloaded.score("web", CHANGE, 5) == model.score("web", CHANGE, 5)
@@ -0,0 +1,51 @@
+"""RingBuffer and RollingWindow in testing/orchestrator/utils/ring_buffer.py."""
+
+import math
+
+import pytest
+
+from utils.ring_buffer import RingBuffer, RollingWindow
+
+
+def test_ring_buffer_window_sum_after_wraparound():
+    """Window sums stay exact after the buffer overwrites its oldest samples."""
+    ring = RingBuffer(4)
+    for t in range(10):
+        ring.append(float(t), float(t))
+    assert len(ring) == 4
+    assert ring.oldest() == (6.0, 6.0)
+    assert ring.window_sum() == (4, 6.0 + 7 + 8 + 9)
+    assert ring.window_sum(8.0) == (2, 17.0)
+    assert ring.window_sum(100.0) == (0, 0.0)
+
+
+def test_ring_buffer_ignores_non_finite_values():
+    """NaN/inf are dropped instead of poisoning the running total."""
+    ring = RingBuffer(8)
+    for t, value in enumerate([1.0, math.nan, 2.0, math.inf, 3.0]):
+        ring.append(float(t), value)
+    assert ring.values() == [1.0, 2.0, 3.0]
+    assert ring.window_sum() == (3, 6.0)
+
+
+def test_rolling_window_statistics_follow_expiry():
+    """Mean, min, max and percentiles only cover samples inside the horizon."""
+    window = RollingWindow(horizon=10)
+    for t, value in enumerate([5.0, 1.0, 9.0, 3.0]):
+        window.push(float(t), value)
+    assert (window.min, window.max, window.mean) == (1.0, 9.0, 4.5)
+    assert window.percentile(50) == pytest.approx(4.0)
+
+    # t=12 expires everything before t=2.
+    window.push(12.0, 7.0)
+    assert len(window) == 3
+    assert (window.min, window.max) == (3.0, 9.0)
+    assert window.percentile(100) == 9.0
+
+
+def test_rolling_window_respects_max_samples_and_skips_nan():
+    window = RollingWindow(horizon=1000, max_samples=3)
+    for t, value in enumerate([4.0, math.nan, 1.0, 2.0, 3.0]):
+        window.push(float(t), value)
+    assert len(window) == 3
+    assert (window.min, window.max, window.mean) == (1.0, 3.0, 2.0)
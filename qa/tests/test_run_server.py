@@ -0,0 +1,101 @@
+"""Request dedup in testing/orchestrator/run_server.py."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("rich")
+
+import run_server  # noqa: E402
+from config import TestConfig as OrchestratorConfig  # noqa: E402
+from config import TestStatus as Status  # noqa: E402
+from config import TestSuite as Suite  # noqa: E402
+from run_server import RunServer, SharedExecution  # noqa: E402
+from scheduler import TestTask as Task  # noqa: E402
+
+
+class FakeScheduler:
+    """Runs each remaining task by marking it passed after a short delay."""
+
+    def __init__(self, tasks, executed):
+        self.tasks = {task.id: task for task in tasks}
+        self.config = SimpleNamespace(project_root="/repo")
+        self.on_task_complete = None
+        self.executed = executed
+
+    def _drop_tasks(self, task_ids):
+        for task_id in task_ids:
+            self.tasks.pop(task_id, None)
+
+    async def run_all(self):
+        for task in self.tasks.values():
+            self.executed.append(task.command)
+            await asyncio.sleep(0.05)
+            task.status = Status.PASSED
+            self.on_task_complete(task)
+
+    async def stop(self):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(run_server, "workspace_fingerprint", lambda: "fingerprint")
+    server = RunServer(OrchestratorConfig(project={"root": "/repo"}))
+    server.executed = []
+
+    async def plan(request):
+        tasks = [
+            Task(id=f"{app}-unit", suite=Suite.UNIT, app=app, command=command)
+            for app, command in request["tasks"]
+        ]
+        return FakeScheduler(tasks, server.executed)
+
+    server._plan = plan
+    return server
+
+
+async def _collect(server, request):
+    return [event async for event in server.submit(request)]
+
+
+def test_identical_inflight_tasks_run_once(server):
+    """Concurrent requests with the same input hash share one execution."""
+
+    async def scenario():
+        first = {"tasks": [("web", "npm test"), ("api", "pytest")]}
+        second = {"tasks": [("web", "npm test"), ("admin", "npm run e2e")]}
+        return await asyncio.gather(
+            _collect(server, first), _collect(server, second)
+        )
+
+    first, second = asyncio.run(scenario())
+    assert sorted(server.executed) == ["npm run e2e", "npm test", "pytest"]
+    shared = {task["id"]: task["shared"] for task in second[0]["tasks"]}
+    assert shared == {"web-unit": True, "admin-unit": False}
+    for events in (first, second):
+        assert events[-1] == {"event": "done", "total": 2, "passed": 2}
+    assert not server._inflight
+
+
+def test_finished_tasks_are_not_reused(server):
+    """Dedup only covers in-flight work; a later request runs again."""
+    request = {"tasks": [("web", "npm test")]}
+    asyncio.run(_collect(server, request))
+    asyncio.run(_collect(server, request))
+    assert server.executed == ["npm test", "npm test"]
+
+
+def test_late_subscriber_gets_the_stored_result():
+    async def scenario():
+        execution = SharedExecution("key", Task(id="t", suite=Suite.UNIT))
+        early = asyncio.Queue()
+        execution.subscribe(early)
+        execution.finish({"status": "passed"})
+        late = asyncio.Queue()
+        execution.subscribe(late)
+        return early.get_nowait(), late.get_nowait()
+
+    assert asyncio.run(scenario()) == (("key", {"status": "passed"}),) * 2
@@ -0,0 +1,59 @@
+"""Service readiness polling in testing/tools/enhanced_test_tools.py."""
+
+import asyncio
+import socket
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from aiohttp import web  # noqa: E402
+from enhanced_test_tools import TestUtilities as Utilities  # noqa: E402
+from utils.health_check import backoff_delays  # noqa: E402
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_backoff_delays_stay_bounded():
+    """The exponent stops growing at the cap, so long waits never overflow."""
+    delays = backoff_delays(base=0.005, cap=0.01)
+    assert all(0 <= next(delays) <= 0.01 for _ in range(5000))
+
+
+def test_wait_for_service_times_out_after_many_attempts():
+    """Thousands of refused probes end in a timeout, not an OverflowError."""
+    url = f"http://127.0.0.1:{_free_port()}/health"
+    assert not asyncio.run(Utilities.wait_for_service(url, timeout=1, interval=0.0005))
+
+
+async def _health(request):
+    return web.Response(text="ok")
+
+
+def test_wait_for_service_sees_a_late_server():
+    port = _free_port()
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_get("/health", _health)
+        runner = web.AppRunner(app)
+        await runner.setup()
+
+        async def start_later():
+            await asyncio.sleep(0.3)
+            await web.TCPSite(runner, "127.0.0.1", port).start()
+
+        starter = asyncio.ensure_future(start_later())
+        try:
+            return await Utilities.wait_for_service(
+                f"http://127.0.0.1:{port}/health", timeout=5, interval=0.1
+            )
+        finally:
+            await starter
+            await runner.cleanup()
+
+    assert asyncio.run(scenario())
@@ -0,0 +1,49 @@
+"""Per-client send queues in testing/orchestrator/utils/ws_fanout.py."""
+
+import asyncio
+
+from utils.ws_fanout import ClientChannel, FanOutSettings
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.frames = []
+
+    async def send(self, frame):
+        await asyncio.sleep(0.001)
+        self.frames.append(frame)
+
+    async def close(self, code=1000, reason=""):
+        pass
+
+
+def test_replies_survive_a_full_broadcast_queue():
+    """History replies are never evicted by drop-oldest broadcast overflow."""
+
+    async def scenario():
+        websocket = FakeWebSocket()
+        settings = FanOutSettings(queue_size=2, max_dropped=10**6)
+        channel = ClientChannel(websocket, "json", settings, lambda *_: None)
+        channel.start()
+        for i in range(50):
+            channel.offer(f"batch-{i}")
+        await channel.send("history-1")
+        for i in range(50):
+            channel.offer(f"batch-late-{i}")
+        await channel.send("history-2")
+        await asyncio.sleep(0.2)
+        await channel.close()
+        return websocket.frames, channel.dropped
+
+    frames, dropped = asyncio.run(scenario())
+    assert [f for f in frames if f.startswith("history")] == ["history-1", "history-2"]
+    assert dropped > 0
+
+
+def test_overflow_disconnects_in_disconnect_mode():
+    async def scenario():
+        settings = FanOutSettings(queue_size=1, overflow="disconnect")
+        channel = ClientChannel(FakeWebSocket(), "json", settings, lambda *_: None)
+        return channel.offer("a"), channel.offer("b")
+
+    assert asyncio.run(scenario()) == (True, False)
@@ -11,7 +11,6 @@ import os
 import signal
 import subprocess
 import sys
-import time
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, List, Optional
@@ -25,16 +24,27 @@ from rich.console import Console
 from rich.panel import Panel
 from rich.table import Table
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "orchestrator"))
+from utils.change_detection import ChangeDetector, get_changed_files  # noqa: E402
+from utils.dependency_graph import WorkspaceGraph  # noqa: E402
+from utils.execution_engine import ExecutionRequest, backend_from_config  # noqa: E402
+
 console = Console()
 
 
 class EnhancedTestRunner:
     """增强版测试运行器"""
 
-    def __init__(self, config_path: str = "real-world-config.yml"):
+    def __init__(
+        self, config_path: str = "real-world-config.yml", backend: Optional[str] = None
+    ):
         self.config_path = config_path
         self.config = self._load_config()
-        self.running_processes = []
+        self.backend = backend_from_config(
+            self._get_execution_config().get("executor"),
+            self._get_execution_config().get("max_concurrent_apps", 3),
+            override=backend,
+        )
         self.test_results = {}
         self.start_time = None
         self.end_time = None
@@ -139,31 +149,28 @@ class EnhancedTestRunner:
         return True
 
     def _get_changed_apps(self) -> List[str]:
-        """获取变更的应用"""
+        """获取变更的应用（共享变更检测结果，按 workspace 依赖图映射到应用）"""
         try:
-            # 使用 git 获取变更文件
-            result = subprocess.run(
-                ["git", "diff", "--name-only", "HEAD~1", "HEAD"],
-                capture_output=True,
-                text=True,
+            changed_files = get_changed_files()
+            apps = self.config.get("apps", {}) or {}
+            graph = WorkspaceGraph(
+                ChangeDetector().repo_root,
+                apps={
+                    name: app.get("path", f"./apps/{name}") for name, app in apps.items()
+                },
+                app_dependencies={
+                    name: app.get("dependencies", []) or [] for name, app in apps.items()
+                },
+                shared_libraries={
+                    name: lib.get("path", f"./shared/{name}")
+                    for name, lib in (self.config.get("shared_libraries") or {}).items()
+                },
             )
-
-            if result.returncode != 0:
-                return []
-
-            changed_files = result.stdout.strip().split("\n")
-            changed_apps = set()
-
-            for file_path in changed_files:
-                if file_path.startswith("apps/"):
-                    app_name = file_path.split("/")[1]
-                    changed_apps.add(app_name)
-
-            return list(changed_apps)
+            return sorted(graph.affected_apps(changed_files))
         except Exception:
             return []
 
-    def _run_app_tests(
+    async def _run_app_tests(
         self, app_name: str, app_config: Dict[str, Any], test_types: List[str]
     ) -> Dict[str, Any]:
         """运行单个应用的测试"""
@@ -192,32 +199,42 @@ class EnhancedTestRunner:
 
             console.print(f"[blue]🔬 运行 {test_type} 测试...[/blue]")
 
-            try:
-                start_time = time.time()
-                result = subprocess.run(
-                    command.split(),
+            execution = await self.backend.execute(
+                ExecutionRequest(
+                    task_id=f"{app_name}_{test_type}",
+                    command=command.split(),
                     cwd=full_path,
-                    capture_output=True,
-                    text=True,
                     timeout=1800,  # 30分钟超时
                 )
+            )
 
-                end_time = time.time()
-                duration = end_time - start_time
-
-                test_result = {
+            if execution.timed_out:
+                console.print(f"[red]❌ {test_type} 测试超时[/red]")
+                results["tests"][test_type] = {
+                    "type": test_type,
+                    "status": "timeout",
+                    "duration": execution.duration,
+                }
+            elif execution.error:
+                console.print(f"[red]❌ {test_type} 测试异常: {execution.error}[/red]")
+                results["tests"][test_type] = {
+                    "type": test_type,
+                    "status": "error",
+                    "error": execution.error,
+                }
+            else:
+                duration = execution.duration
+                results["tests"][test_type] = {
                     "type": test_type,
                     "command": command,
-                    "return_code": result.returncode,
-                    "stdout": result.stdout,
-                    "stderr": result.stderr,
+                    "return_code": execution.return_code,
+                    "stdout": execution.stdout,
+                    "stderr": execution.stderr,
                     "duration": duration,
-                    "status": "passed" if result.returncode == 0 else "failed",
+                    "status": "passed" if execution.return_code == 0 else "failed",
                 }
 
-                results["tests"][test_type] = test_result
-
-                if result.returncode == 0:
+                if execution.return_code == 0:
                     console.print(
                         f"[green]✅ {test_type} 测试通过 ({duration:.2f}s)[/green]"
                     )
@@ -225,22 +242,7 @@ class EnhancedTestRunner:
                     console.print(
                         f"[red]❌ {test_type} 测试失败 ({duration:.2f}s)[/red]"
                     )
-                    console.print(f"[red]错误信息: {result.stderr}[/red]")
-
-            except subprocess.TimeoutExpired:
-                console.print(f"[red]❌ {test_type} 测试超时[/red]")
-                results["tests"][test_type] = {
-                    "type": test_type,
-                    "status": "timeout",
-                    "duration": 1800,
-                }
-            except Exception as e:
-                console.print(f"[red]❌ {test_type} 测试异常: {e}[/red]")
-                results["tests"][test_type] = {
-                    "type": test_type,
-                    "status": "error",
-                    "error": str(e),
-                }
+                    console.print(f"[red]错误信息: {execution.stderr}[/red]")
 
         results["end_time"] = datetime.now().isoformat()
         results["status"] = "completed"
@@ -440,12 +442,10 @@ class EnhancedTestRunner:
 
     def stop_all_tests(self):
         """停止所有测试"""
-        for process in self.running_processes:
-            try:
-                process.terminate()
-            except:
-                pass
-        self.running_processes.clear()
+        try:
+            self.backend.kill_all()
+        except Exception:
+            pass
 
     async def run_tests(
         self,
@@ -524,16 +524,14 @@ class EnhancedTestRunner:
         if sequential:
             # 顺序执行
             for app_name, app_config in enabled_apps.items():
-                result = self._run_app_tests(app_name, app_config, test_types)
+                result = await self._run_app_tests(app_name, app_config, test_types)
                 results[app_name] = result
         else:
-            # 并行执行（简化版）
+            # 并行执行：应用之间并发，同一应用的测试类型按顺序执行
             tasks = []
             for app_name, app_config in enabled_apps.items():
                 task = asyncio.create_task(
-                    asyncio.to_thread(
-                        self._run_app_tests, app_name, app_config, test_types
-                    )
+                    self._run_app_tests(app_name, app_config, test_types)
                 )
                 tasks.append((app_name, task))
 
@@ -542,6 +540,7 @@ class EnhancedTestRunner:
                 results[app_name] = result
 
         self.end_time = datetime.now()
+        self.backend.shutdown()
 
         # 生成报告
         self._generate_report(results)
@@ -566,11 +565,16 @@ def main():
     parser.add_argument("--sequential", action="store_true", help="顺序执行测试")
     parser.add_argument("--changed-only", action="store_true", help="只测试变更的应用")
     parser.add_argument("--setup-only", action="store_true", help="只设置环境")
+    parser.add_argument(
+        "--backend",
+        choices=["thread", "asyncio", "process", "remote"],
+        help="执行后端（默认读取 execution.executor 配置）",
+    )
 
     args = parser.parse_args()
 
     # 创建测试运行器
-    runner = EnhancedTestRunner(args.config)
+    runner = EnhancedTestRunner(args.config, backend=args.backend)
 
     # 运行测试
     try:
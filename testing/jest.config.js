@@ -173,6 +173,6 @@ module.exports = {
     // 强制退出
     forceExit: true,
 
-    // 最大工作进程数
-    maxWorkers: '50%',
+    // 最大工作进程数（调度器通过 TEST_MAX_WORKERS 下发核心配额）
+    maxWorkers: process.env.TEST_MAX_WORKERS ? Number(process.env.TEST_MAX_WORKERS) : '50%',
 };
@@ -4,13 +4,11 @@
 """
 
 import os
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field
 from enum import Enum
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Union
 
-import yaml
-
 
 class TestSuite(Enum):
     """测试套件类型"""
@@ -62,6 +60,9 @@ class DatabaseConfig:
     seed_command: Optional[str] = None
     reset_command: Optional[str] = None
     check_command: Optional[str] = None
+    engine: str = "postgresql"  # postgresql / sqlite（sqlite 时 database 为文件路径）
+    isolation: str = "template"  # template: 每个并行 worker 独立克隆; shared: 共用一个库
+    url_env: str = "DATABASE_URL"  # 注入连接串的环境变量名
 
 
 @dataclass
@@ -159,14 +160,23 @@ class ExecutionConfig:
     retry_failed: int = 2
     fail_fast: bool = False
     max_concurrent_apps: int = 3
-    resource_threshold: Dict[str, int] = field(
-        default_factory=lambda: {"cpu_percent": 80, "memory_percent": 85}
+    # 调度准入阈值：Linux 上优先使用 PSI 停顿占比（*_pressure，avg10 %），不支持时使用 cpu_percent
+    resource_threshold: Dict[str, float] = field(
+        default_factory=lambda: {
+            "cpu_percent": 80,
+            "memory_percent": 85,
+            "cpu_pressure": 40,
+            "memory_pressure": 10,
+            "io_pressure": 30,
+        }
     )
-    smart_testing: Dict[str, bool] = field(
+    smart_testing: Dict[str, Any] = field(
         default_factory=lambda: {
             "enabled": True,
             "changed_only": False,
             "dependency_analysis": True,
+            "impact_analysis": True,
+            "predictive": {"enabled": False},
         }
     )
     flaky_management: Dict[str, Any] = field(
@@ -175,8 +185,30 @@ class ExecutionConfig:
             "max_retries": 3,
             "quarantine_after": 3,
             "skip_quarantined": False,
+            "window": 50,
+            "quarantine_score": 0.2,
+            "release_score": 0.05,
+            "release_after": 10,
+            "min_runs": 5,
+            "quarantine_lane": {
+                "enabled": True,
+                "max_workers": 1,
+                "nice": 10,
+                "grace": 300,
+            },
         }
     )
+    core_budget: Dict[str, Any] = field(
+        default_factory=lambda: {
+            "enabled": True,
+            "pin_cpus": False,
+            "reserve_cores": 0,
+        }
+    )
+    # 执行后端：thread / asyncio / process / remote（remote 需要 serve 守护进程地址）
+    executor: Dict[str, Any] = field(
+        default_factory=lambda: {"backend": "thread", "max_workers": None, "address": None}
+    )
 
 
 @dataclass
@@ -260,6 +292,14 @@ class TestConfig:
     def parallel_workers(self) -> int:
         return self.execution.parallel_workers
 
+    @property
+    def max_concurrency(self) -> int:
+        """同时运行的最大任务数：阻塞任务并发槽加上隔离通道的 worker"""
+        lane = self.execution.flaky_management.get("quarantine_lane") or {}
+        if not lane.get("enabled", True):
+            return self.parallel_workers
+        return self.parallel_workers + max(1, int(lane.get("max_workers") or 1))
+
     @property
     def test_timeout(self) -> int:
         return self.execution.test_timeout
@@ -325,6 +365,8 @@ class ConfigManager:
         if not os.path.exists(self.config_path):
             return self._create_default_config()
 
+        import yaml
+
         try:
             with open(self.config_path, "r", encoding="utf-8") as f:
                 data = yaml.safe_load(f)
@@ -355,6 +397,8 @@ class ConfigManager:
                 resource_threshold=exec_data.get("resource_threshold", {}),
                 smart_testing=exec_data.get("smart_testing", {}),
                 flaky_management=exec_data.get("flaky_management", {}),
+                core_budget=exec_data.get("core_budget", {}),
+                executor=exec_data.get("executor", {}),
             )
 
         # 解析应用配置
@@ -364,6 +408,16 @@ class ConfigManager:
                 if app_data.get("enabled", True):
                     config.apps[app_name] = self._parse_app_config(app_name, app_data)
 
+        # 解析共享库配置
+        for lib_name, lib_data in (data.get("shared_libraries") or {}).items():
+            config.shared_libraries[lib_name] = SharedLibraryConfig(
+                name=lib_data.get("name", lib_name),
+                path=lib_data.get("path", f"./shared/{lib_name}"),
+                test_command=lib_data.get("test_command", "npm test"),
+                build_command=lib_data.get("build_command", "npm run build"),
+                coverage_threshold=lib_data.get("coverage_threshold", 80),
+            )
+
         # 解析其他配置...
         config.test_suites = self._parse_test_suites(data.get("test_suites", {}))
         config.reporting = self._parse_reporting_config(data.get("reporting", {}))
@@ -477,13 +531,67 @@ class ConfigManager:
         return self.config
 
 
-# 全局配置实例
-_config_manager = ConfigManager()
-config = _config_manager.get_config()
+def config_to_dict(config: TestConfig) -> Dict[str, Any]:
+    """将配置序列化为可写入 JSON 的字典（用于预编译执行计划）"""
+    return asdict(config)
+
+
+def config_from_dict(data: Dict[str, Any]) -> TestConfig:
+    """从 config_to_dict 的结果还原配置，无需重新解析 YAML"""
+
+    def app_from_dict(app_data: Dict[str, Any]) -> AppConfig:
+        app_data = dict(app_data)
+        if isinstance(app_data.get("health_check"), dict):
+            app_data["health_check"] = HealthCheckConfig(**app_data["health_check"])
+        if app_data.get("database"):
+            app_data["database"] = DatabaseConfig(**app_data["database"])
+        if app_data.get("coverage"):
+            app_data["coverage"] = CoverageConfig(**app_data["coverage"])
+        return AppConfig(**app_data)
+
+    return TestConfig(
+        project=data["project"],
+        execution=ExecutionConfig(**data["execution"]),
+        apps={name: app_from_dict(app) for name, app in data["apps"].items()},
+        shared_libraries={
+            name: SharedLibraryConfig(**lib)
+            for name, lib in data["shared_libraries"].items()
+        },
+        database={name: DatabaseConfig(**db) for name, db in data["database"].items()},
+        test_suites={
+            name: TestSuiteConfig(**suite) for name, suite in data["test_suites"].items()
+        },
+        environments=data["environments"],
+        reporting=ReportingConfig(**data["reporting"]),
+        notification=NotificationConfig(**data["notification"]),
+        ci_cd=data["ci_cd"],
+        advanced=data["advanced"],
+    )
+
+
+# 全局配置实例（首次访问时加载，避免导入模块就解析 YAML）
+_config_manager: Optional[ConfigManager] = None
+
+
+def __getattr__(name: str) -> Any:
+    if name == "config":
+        return get_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_config_path(config_path: Optional[str] = None) -> str:
+    """配置实例对应的配置文件路径"""
+    if config_path:
+        return config_path
+    get_config()
+    return _config_manager.config_path
 
 
 def get_config(config_path: Optional[str] = None) -> TestConfig:
     """获取配置实例"""
+    global _config_manager
     if config_path:
         return ConfigManager(config_path).get_config()
-    return config
+    if _config_manager is None:
+        _config_manager = ConfigManager()
+    return _config_manager.get_config()
@@ -13,7 +13,7 @@ from datetime import datetime, timedelta
 from enum import Enum
 from pathlib import Path
 from threading import Lock
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 try:
     import aiofiles
@@ -29,6 +29,12 @@ except ImportError:
     websockets = None
     serve = None
 
+from utils.alert_rules import AlertEngine, AlertEvent
+from utils.pressure import PressureReader, pressure_percentages
+from utils.process_tree import ProcessTreeSampler
+from utils.timeseries import Cursor, RetentionPolicy, TimeSeriesStore
+from utils.ws_fanout import FanOut, FanOutSettings, encode, negotiate_encoding
+
 
 class AlertLevel(Enum):
     """告警级别"""
@@ -46,10 +52,27 @@ class MetricType(Enum):
     MEMORY_USAGE = "memory_usage"
     DISK_USAGE = "disk_usage"
     NETWORK_IO = "network_io"
+    # Linux PSI：资源争用导致的停顿时间占比（avg10）
+    CPU_PRESSURE = "cpu_pressure"
+    MEMORY_PRESSURE = "memory_pressure"
+    IO_PRESSURE = "io_pressure"
     TEST_EXECUTION = "test_execution"
     TEST_SUCCESS_RATE = "test_success_rate"
     TEST_DURATION = "test_duration"
     FLAKY_TEST_RATE = "flaky_test_rate"
+    # 按任务进程树归因的指标，tags 中带 task
+    TASK_CPU_USAGE = "task_cpu_usage"
+    TASK_MEMORY_RSS = "task_memory_rss"
+    TASK_IO_READ = "task_io_read"
+    TASK_IO_WRITE = "task_io_write"
+
+
+# 告警规则使用统一指标名（见 testing/alert_rules.yml），其余指标按原名参与评估
+ALERT_METRIC_NAMES = {
+    MetricType.CPU_USAGE.value: "cpu_percent",
+    MetricType.MEMORY_USAGE.value: "memory_percent",
+    MetricType.DISK_USAGE.value: "disk_usage_percent",
+}
 
 
 @dataclass
@@ -76,6 +99,7 @@ class Alert:
     timestamp: datetime
     resolved: bool = False
     resolved_at: Optional[datetime] = None
+    labels: Dict[str, str] = field(default_factory=dict)
 
 
 @dataclass
@@ -96,38 +120,47 @@ class TestExecution:
 class TestMonitor:
     """测试监控器"""
 
-    def __init__(self, config: Dict[str, Any] = None):
+    def __init__(
+        self,
+        config: Dict[str, Any] = None,
+        task_source: Optional[Callable[[], Dict[str, int]]] = None,
+    ):
+        """task_source 返回运行中任务的 {task_id: 根进程 pid}；也可用 track_task 逐个登记"""
         self.config = config or {}
         self.logger = setup_logger("monitor", level=logging.INFO)
 
         # 监控状态
         self.is_monitoring = False
-        self.metrics: List[Metric] = []
+        # 指标按 (名称, 标签) 分序列存储，自动降采样为 1 分钟 / 1 小时汇总，内存有上限
+        self.store = TimeSeriesStore(
+            RetentionPolicy.from_config(self.config.get("retention"))
+        )
         self.alerts: List[Alert] = []
         self.test_executions: List[TestExecution] = []
 
-        # 阈值配置
-        self.thresholds = self.config.get(
-            "thresholds",
-            {
-                "cpu_usage": 80.0,
-                "memory_usage": 85.0,
-                "disk_usage": 90.0,
-                "test_success_rate": 80.0,
-                "flaky_test_rate": 10.0,
-            },
-        )
+        # 告警规则：config["alert_rules"] 为规则列表或 YAML 路径，默认 testing/alert_rules.yml
+        self.alert_engine = AlertEngine.from_config(self.config.get("alert_rules"))
+        # 去重键（规则名 + 序列标签）-> 未恢复的告警
+        self.active_alerts: Dict[Tuple, Alert] = {}
+        self.pressure = PressureReader()
 
         # 回调函数
         self.alert_callbacks: List[Callable[[Alert], None]] = []
         self.metric_callbacks: List[Callable[[Metric], None]] = []
 
+        # 按任务进程树归因资源占用
+        self.task_source = task_source
+        self.tracked_tasks: Dict[str, int] = {}
+        self.task_sampler = ProcessTreeSampler()
+
         # 线程锁
         self.lock = Lock()
 
-        # WebSocket 服务器
+        # WebSocket 服务器：每个客户端有界队列，指标按 tick 合并成批量帧
         self.websocket_server = None
-        self.connected_clients = set()
+        self.fanout = FanOut(
+            FanOutSettings.from_config(self.config.get("websocket")), self.logger
+        )
 
     async def start_monitoring(self, interval: float = 5.0):
         """开始监控"""
@@ -141,7 +174,6 @@ class TestMonitor:
         tasks = [
             self._monitor_system_metrics(interval),
             self._monitor_test_executions(),
-            self._check_alerts(),
             self._cleanup_old_data(),
         ]
 
@@ -152,6 +184,7 @@ class TestMonitor:
         self.logger.info("🛑 停止测试监控")
         self.is_monitoring = False
 
+        await self.fanout.stop()
         if self.websocket_server:
             self.websocket_server.close()
             await self.websocket_server.wait_closed()
@@ -179,12 +212,56 @@ class TestMonitor:
                     MetricType.NETWORK_IO, network.bytes_sent + network.bytes_recv
                 )
 
+                # 资源压力（PSI），不支持的平台上不记录
+                pressure = pressure_percentages(self.pressure.read())
+                if pressure:
+                    await self._record_metric(
+                        MetricType.CPU_PRESSURE, pressure["cpu_pressure"]
+                    )
+                    await self._record_metric(
+                        MetricType.MEMORY_PRESSURE, pressure["memory_pressure"]
+                    )
+                    await self._record_metric(
+                        MetricType.IO_PRESSURE, pressure["io_pressure"]
+                    )
+
+                await self._monitor_task_metrics()
+
                 await asyncio.sleep(interval)
 
             except Exception as e:
                 self.logger.error(f"系统指标监控异常: {e}")
                 await asyncio.sleep(interval)
 
+    def track_task(self, task_id: str, pid: int):
+        """登记一个运行中任务的根进程"""
+        self.tracked_tasks[task_id] = pid
+
+    def untrack_task(self, task_id: str):
+        """任务结束后取消登记（已记录的指标保留）"""
+        self.tracked_tasks.pop(task_id, None)
+
+    async def _monitor_task_metrics(self):
+        """采样每个运行中任务的进程树，记录带 task 标签的 CPU、RSS 和 I/O 指标"""
+        roots = dict(self.tracked_tasks)
+        if self.task_source:
+            try:
+                roots.update(self.task_source())
+            except Exception as e:
+                self.logger.error(f"获取运行中任务失败: {e}")
+        if not roots:
+            return
+
+        # 扫描 /proc 放到线程池，不阻塞事件循环
+        loop = asyncio.get_running_loop()
+        usages = await loop.run_in_executor(None, self.task_sampler.sample, roots)
+        for usage in usages:
+            tags = {"task": usage.task_id}
+            await self._record_metric(MetricType.TASK_CPU_USAGE, usage.cpu_percent, tags)
+            await self._record_metric(MetricType.TASK_MEMORY_RSS, usage.rss_mb, tags)
+            await self._record_metric(MetricType.TASK_IO_READ, usage.read_rate, tags)
+            await self._record_metric(MetricType.TASK_IO_WRITE, usage.write_rate, tags)
+
     async def _monitor_test_executions(self):
         """监控测试执行"""
         while self.is_monitoring:
@@ -197,64 +274,6 @@ class TestMonitor:
                 self.logger.error(f"测试执行监控异常: {e}")
                 await asyncio.sleep(1)
 
-    async def _check_alerts(self):
-        """检查告警"""
-        while self.is_monitoring:
-            try:
-                with self.lock:
-                    # 检查 CPU 使用率告警
-                    cpu_metrics = [
-                        m for m in self.metrics if m.name == MetricType.CPU_USAGE.value
-                    ]
-                    if cpu_metrics:
-                        latest_cpu = cpu_metrics[-1]
-                        if latest_cpu.value > self.thresholds["cpu_usage"]:
-                            await self._create_alert(
-                                AlertLevel.WARNING,
-                                f"CPU 使用率过高: {latest_cpu.value:.1f}%",
-                                MetricType.CPU_USAGE.value,
-                                self.thresholds["cpu_usage"],
-                                latest_cpu.value,
-                            )
-
-                    # 检查内存使用率告警
-                    memory_metrics = [
-                        m
-                        for m in self.metrics
-                        if m.name == MetricType.MEMORY_USAGE.value
-                    ]
-                    if memory_metrics:
-                        latest_memory = memory_metrics[-1]
-                        if latest_memory.value > self.thresholds["memory_usage"]:
-                            await self._create_alert(
-                                AlertLevel.WARNING,
-                                f"内存使用率过高: {latest_memory.value:.1f}%",
-                                MetricType.MEMORY_USAGE.value,
-                                self.thresholds["memory_usage"],
-                                latest_memory.value,
-                            )
-
-                    # 检查磁盘使用率告警
-                    disk_metrics = [
-                        m for m in self.metrics if m.name == MetricType.DISK_USAGE.value
-                    ]
-                    if disk_metrics:
-                        latest_disk = disk_metrics[-1]
-                        if latest_disk.value > self.thresholds["disk_usage"]:
-                            await self._create_alert(
-                                AlertLevel.ERROR,
-                                f"磁盘使用率过高: {latest_disk.value:.1f}%",
-                                MetricType.DISK_USAGE.value,
-                                self.thresholds["disk_usage"],
-                                latest_disk.value,
-                            )
-
-                await asyncio.sleep(10)  # 每10秒检查一次告警
-
-            except Exception as e:
-                self.logger.error(f"告警检查异常: {e}")
-                await asyncio.sleep(10)
-
     async def _cleanup_old_data(self):
         """清理旧数据"""
         while self.is_monitoring:
@@ -262,10 +281,8 @@ class TestMonitor:
                 cutoff_time = datetime.now() - timedelta(hours=24)
 
                 with self.lock:
-                    # 清理旧指标
-                    self.metrics = [
-                        m for m in self.metrics if m.timestamp > cutoff_time
-                    ]
+                    # 指标按保留策略滚动覆盖，这里只删除长期没有更新的序列（如已结束的任务）
+                    self.store.prune(time.time())
 
                     # 清理旧告警
                     self.alerts = [a for a in self.alerts if a.timestamp > cutoff_time]
@@ -293,8 +310,18 @@ class TestMonitor:
             unit=self._get_metric_unit(metric_type),
         )
 
+        timestamp = metric.timestamp.timestamp()
         with self.lock:
-            self.metrics.append(metric)
+            self.store.append(
+                metric.name, timestamp, metric.value, metric.tags, metric.unit
+            )
+            # 每个样本只评估订阅该指标的规则
+            events = self.alert_engine.observe(
+                ALERT_METRIC_NAMES.get(metric.name, metric.name),
+                metric.value,
+                timestamp,
+                metric.tags,
+            )
 
         # 触发回调
         for callback in self.metric_callbacks:
@@ -304,45 +331,37 @@ class TestMonitor:
                 self.logger.error(f"指标回调异常: {e}")
 
         # 广播到 WebSocket 客户端
-        await self._broadcast_metric(metric)
-
-    async def _create_alert(
-        self,
-        level: AlertLevel,
-        message: str,
-        metric_name: str,
-        threshold: float,
-        current_value: float,
-    ):
-        """创建告警"""
-        alert_id = f"{metric_name}_{int(time.time())}"
-
-        # 检查是否已存在相同告警
-        with self.lock:
-            existing_alert = next(
-                (
-                    a
-                    for a in self.alerts
-                    if a.metric_name == metric_name and not a.resolved
-                ),
-                None,
+        self._broadcast_metric(metric)
+
+        for event in events:
+            await self._handle_alert_event(event)
+
+    async def _handle_alert_event(self, event: AlertEvent):
+        """处理规则状态变化：firing 新建告警，resolved 标记对应告警已恢复"""
+        if event.status == "firing":
+            alert = Alert(
+                id=f"{event.rule.name}_{int(event.timestamp)}",
+                level=AlertLevel(event.severity),
+                message=event.message,
+                metric_name=event.rule.metric,
+                threshold=event.rule.threshold,
+                current_value=event.value,
+                timestamp=datetime.fromtimestamp(event.timestamp),
+                labels={**event.rule.labels, **event.labels},
             )
-
-            if existing_alert:
-                return  # 避免重复告警
-
-        alert = Alert(
-            id=alert_id,
-            level=level,
-            message=message,
-            metric_name=metric_name,
-            threshold=threshold,
-            current_value=current_value,
-            timestamp=datetime.now(),
-        )
-
-        with self.lock:
-            self.alerts.append(alert)
+            with self.lock:
+                self.active_alerts[event.key] = alert
+                self.alerts.append(alert)
+            self.logger.warning(f"🚨 告警: {event.message}")
+        else:
+            with self.lock:
+                alert = self.active_alerts.pop(event.key, None)
+            if alert is None:
+                return
+            alert.resolved = True
+            alert.resolved_at = datetime.fromtimestamp(event.timestamp)
+            alert.current_value = event.value
+            self.logger.info(f"✅ 告警恢复: {alert.message}")
 
         # 触发回调
         for callback in self.alert_callbacks:
@@ -352,9 +371,7 @@ class TestMonitor:
                 self.logger.error(f"告警回调异常: {e}")
 
         # 广播到 WebSocket 客户端
-        await self._broadcast_alert(alert)
-
-        self.logger.warning(f"🚨 告警: {message}")
+        self._broadcast_alert(alert)
 
     def _get_metric_unit(self, metric_type: MetricType) -> str:
         """获取指标单位"""
@@ -363,108 +380,72 @@ class TestMonitor:
             MetricType.MEMORY_USAGE: "%",
             MetricType.DISK_USAGE: "%",
             MetricType.NETWORK_IO: "bytes",
+            MetricType.CPU_PRESSURE: "%",
+            MetricType.MEMORY_PRESSURE: "%",
+            MetricType.IO_PRESSURE: "%",
             MetricType.TEST_EXECUTION: "count",
             MetricType.TEST_SUCCESS_RATE: "%",
             MetricType.TEST_DURATION: "seconds",
             MetricType.FLAKY_TEST_RATE: "%",
+            MetricType.TASK_CPU_USAGE: "%",
+            MetricType.TASK_MEMORY_RSS: "MB",
+            MetricType.TASK_IO_READ: "bytes/s",
+            MetricType.TASK_IO_WRITE: "bytes/s",
         }
         return units.get(metric_type, "")
 
     async def _start_websocket_server(self):
-        """启动 WebSocket 服务器"""
+        """启动 WebSocket 服务器
+
+        连接路径可带 ?encoding=msgpack 请求二进制帧（需安装 msgpack）；
+        客户端发送 {"type": "history", "before": 游标, "limit": 条数} 向前翻页历史数据
+        """
         port = self.config.get("websocket_port", 8765)
 
         async def handle_client(websocket, path):
-            self.connected_clients.add(websocket)
+            channel = self.fanout.register(websocket, negotiate_encoding(path))
             self.logger.info(f"WebSocket 客户端连接: {websocket.remote_address}")
 
             try:
-                # 发送历史数据
-                await self._send_historical_data(websocket)
-
-                # 保持连接
-                await websocket.wait_closed()
+                # 发送第一页历史数据和未解决的告警
+                await self._send_historical_data(channel, include_alerts=True)
+
+                async for message in websocket:
+                    try:
+                        request = json.loads(message)
+                    except (TypeError, ValueError):
+                        continue
+                    if isinstance(request, dict) and request.get("type") == "history":
+                        await self._send_historical_data(
+                            channel, request.get("before"), request.get("limit")
+                        )
             except websockets.exceptions.ConnectionClosed:
                 pass
             finally:
-                self.connected_clients.remove(websocket)
+                self.fanout.unregister(channel)
                 self.logger.info(f"WebSocket 客户端断开: {websocket.remote_address}")
 
         self.websocket_server = await serve(handle_client, "localhost", port)
         self.logger.info(f"WebSocket 服务器启动: ws://localhost:{port}")
 
-    async def _send_historical_data(self, websocket):
-        """发送历史数据"""
-        try:
-            # 发送最近的指标
-            recent_metrics = self.metrics[-100:]  # 最近100个指标
-            for metric in recent_metrics:
-                data = {
-                    "type": "metric",
-                    "data": {
-                        "name": metric.name,
-                        "value": metric.value,
-                        "timestamp": metric.timestamp.isoformat(),
-                        "tags": metric.tags,
-                        "unit": metric.unit,
-                    },
-                }
-                await websocket.send(json.dumps(data))
-
-            # 发送未解决的告警
-            unresolved_alerts = [a for a in self.alerts if not a.resolved]
-            for alert in unresolved_alerts:
-                data = {
-                    "type": "alert",
-                    "data": {
-                        "id": alert.id,
-                        "level": alert.level.value,
-                        "message": alert.message,
-                        "metric_name": alert.metric_name,
-                        "threshold": alert.threshold,
-                        "current_value": alert.current_value,
-                        "timestamp": alert.timestamp.isoformat(),
-                    },
-                }
-                await websocket.send(json.dumps(data))
-
-        except Exception as e:
-            self.logger.error(f"发送历史数据异常: {e}")
-
-    async def _broadcast_metric(self, metric: Metric):
-        """广播指标到所有客户端"""
-        if not self.connected_clients:
-            return
-
-        data = {
+    @staticmethod
+    def _metric_item(
+        name: str, value: float, timestamp: datetime, tags: Dict[str, str], unit: str
+    ) -> Dict[str, Any]:
+        return {
             "type": "metric",
             "data": {
-                "name": metric.name,
-                "value": metric.value,
-                "timestamp": metric.timestamp.isoformat(),
-                "tags": metric.tags,
-                "unit": metric.unit,
+                "name": name,
+                "value": value,
+                "timestamp": timestamp.isoformat(),
+                "tags": tags,
+                "unit": unit,
             },
         }
 
-        message = json.dumps(data)
-        disconnected = set()
-
-        for client in self.connected_clients:
-            try:
-                await client.send(message)
-            except websockets.exceptions.ConnectionClosed:
-                disconnected.add(client)
-
-        # 清理断开的连接
-        self.connected_clients -= disconnected
-
-    async def _broadcast_alert(self, alert: Alert):
-        """广播告警到所有客户端"""
-        if not self.connected_clients:
-            return
-
-        data = {
+    @staticmethod
+    def _alert_item(alert: Alert) -> Dict[str, Any]:
+        return {
             "type": "alert",
             "data": {
                 "id": alert.id,
@@ -474,20 +455,67 @@ class TestMonitor:
                 "threshold": alert.threshold,
                 "current_value": alert.current_value,
                 "timestamp": alert.timestamp.isoformat(),
+                "labels": alert.labels,
+                "resolved": alert.resolved,
             },
         }
 
-        message = json.dumps(data)
-        disconnected = set()
+    async def _send_historical_data(
+        self,
+        channel,
+        before: Any = None,
+        limit: Optional[int] = None,
+        include_alerts: bool = False,
+    ):
+        """发送一页历史数据：{"type": "history", "items", "next_before", "has_more"}
 
-        for client in self.connected_clients:
-            try:
-                await client.send(message)
-            except websockets.exceptions.ConnectionClosed:
-                disconnected.add(client)
+        next_before 为本页第一个点的游标 [时间戳, 指标名, 标签, 序号]，原样作为下一次请求的
+        before（只传时间戳时取严格早于该时刻的点）
+        """
+        page_size = self.fanout.settings.history_page
+        limit = min(int(limit or page_size), page_size)
+        try:
+            with self.lock:
+                # 多取一个点判断是否还有更早的数据
+                points = self.store.recent(limit + 1, before=Cursor.from_json(before))
+                alerts = (
+                    [a for a in self.alerts if not a.resolved] if include_alerts else []
+                )
+            has_more = len(points) > limit
+            points = points[-limit:] if limit else []
+            items = [
+                self._metric_item(
+                    series.name,
+                    value,
+                    datetime.fromtimestamp(cursor.timestamp),
+                    series.tags,
+                    series.unit,
+                )
+                for cursor, series, value in points
+            ]
+            items.extend(self._alert_item(alert) for alert in alerts)
+            payload = {
+                "type": "history",
+                "items": items,
+                "next_before": points[0][0].to_json() if points else None,
+                "has_more": has_more,
+            }
+            await channel.send(encode(payload, channel.encoding))
 
-        # 清理断开的连接
-        self.connected_clients -= disconnected
+        except Exception as e:
+            self.logger.error(f"发送历史数据异常: {e}")
+
+    def _broadcast_metric(self, metric: Metric):
+        """广播指标：放入下一批次，不等待客户端"""
+        self.fanout.publish(
+            self._metric_item(
+                metric.name, metric.value, metric.timestamp, metric.tags, metric.unit
+            )
+        )
+
+    def _broadcast_alert(self, alert: Alert):
+        """广播告警（触发或恢复）"""
+        self.fanout.publish(self._alert_item(alert))
 
     def add_alert_callback(self, callback: Callable[[Alert], None]):
         """添加告警回调"""
@@ -497,32 +525,78 @@ class TestMonitor:
         """添加指标回调"""
         self.metric_callbacks.append(callback)
 
-    def get_metrics_summary(self) -> Dict[str, Any]:
-        """获取指标摘要"""
+    def get_metrics_summary(self, hours: float = 24) -> Dict[str, Any]:
+        """获取指标摘要（最近 hours 小时，按分钟 / 小时汇总计算）"""
+        start = time.time() - hours * 3600
         with self.lock:
-            if not self.metrics:
-                return {}
-
-            # 按指标类型分组
-            metrics_by_type = {}
-            for metric in self.metrics:
-                if metric.name not in metrics_by_type:
-                    metrics_by_type[metric.name] = []
-                metrics_by_type[metric.name].append(metric)
-
             summary = {}
-            for metric_name, metrics in metrics_by_type.items():
-                values = [m.value for m in metrics]
-                summary[metric_name] = {
-                    "count": len(values),
-                    "min": min(values),
-                    "max": max(values),
-                    "avg": sum(values) / len(values),
-                    "latest": values[-1] if values else 0,
+            for name in self.store.names():
+                aggregates = [
+                    aggregate
+                    for aggregate in (
+                        series.aggregate(start) for series in self.store.series(name)
+                    )
+                    if aggregate
+                ]
+                if not aggregates:
+                    continue
+                count = sum(a["count"] for a in aggregates)
+                latest = self.store.latest(name)
+                summary[name] = {
+                    "count": count,
+                    "min": min(a["min"] for a in aggregates),
+                    "max": max(a["max"] for a in aggregates),
+                    "avg": sum(a["avg"] * a["count"] for a in aggregates) / count,
+                    "latest": latest[1] if latest else 0,
                 }
 
             return summary
 
+    def get_task_metrics_summary(self) -> Dict[str, Dict[str, Any]]:
+        """按任务汇总进程树指标：CPU / RSS / I/O 速率的峰值和均值"""
+        task_metrics = {
+            MetricType.TASK_CPU_USAGE.value: "cpu",
+            MetricType.TASK_MEMORY_RSS.value: "rss_mb",
+            MetricType.TASK_IO_READ.value: "read_rate",
+            MetricType.TASK_IO_WRITE.value: "write_rate",
+        }
+        summary: Dict[str, Dict[str, Any]] = {}
+        with self.lock:
+            for name, key in task_metrics.items():
+                for series in self.store.series(name):
+                    task_id = series.tags.get("task")
+                    aggregate = series.aggregate() if task_id else None
+                    if not aggregate:
+                        continue
+                    summary.setdefault(task_id, {})[key] = {
+                        "peak": aggregate["max"],
+                        "avg": aggregate["avg"],
+                        "samples": aggregate["count"],
+                    }
+        return summary
+
+    def query_metrics(
+        self,
+        metric_name: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        tags: Dict[str, str] = None,
+        resolution: str = "auto",
+    ) -> List[Dict[str, Any]]:
+        """区间查询指标
+
+        resolution 可取 raw / 1m / 1h，auto 时按起点选择仍完整保留数据的最高精度；
+        每条匹配的序列返回一项，points 为 (timestamp, value) 或 (timestamp, min, max, avg, count)
+        """
+        with self.lock:
+            return self.store.query(
+                metric_name,
+                start.timestamp() if start else None,
+                end.timestamp() if end else None,
+                tags,
+                resolution,
+            )
+
     def get_alerts_summary(self) -> Dict[str, Any]:
         """获取告警摘要"""
         with self.lock:
@@ -566,16 +640,6 @@ class TestMonitor:
                 {"app": test_execution.app_name, "type": test_execution.test_type},
             )
 
-            # 检查成功率告警
-            if success_rate < self.thresholds["test_success_rate"]:
-                await self._create_alert(
-                    AlertLevel.ERROR,
-                    f"测试成功率过低: {success_rate:.1f}%",
-                    MetricType.TEST_SUCCESS_RATE.value,
-                    self.thresholds["test_success_rate"],
-                    success_rate,
-                )
-
     async def save_monitoring_data(
         self, output_dir: str = "./testing/reports/monitoring"
     ):
@@ -583,21 +647,44 @@ class TestMonitor:
         output_path = Path(output_dir)
         output_path.mkdir(parents=True, exist_ok=True)
 
-        # 保存指标数据
+        with self.lock:
+            series_list = self.store.series()
+            raw_points = sorted(
+                (timestamp, index, value)
+                for index, series in enumerate(series_list)
+                for timestamp, value in series.raw.rows()
+            )
+            rollups = [
+                {
+                    "name": series.name,
+                    "tags": series.tags,
+                    "unit": series.unit,
+                    "1m": series.query(resolution="1m")[1],
+                    "1h": series.query(resolution="1h")[1],
+                }
+                for series in series_list
+            ]
+
+        # 保存指标数据（原始精度保留期内的点）
         metrics_file = output_path / "metrics.json"
         async with aiofiles.open(metrics_file, "w", encoding="utf-8") as f:
             metrics_data = [
                 {
-                    "name": m.name,
-                    "value": m.value,
-                    "timestamp": m.timestamp.isoformat(),
-                    "tags": m.tags,
-                    "unit": m.unit,
+                    "name": series_list[index].name,
+                    "value": value,
+                    "timestamp": datetime.fromtimestamp(timestamp).isoformat(),
+                    "tags": series_list[index].tags,
+                    "unit": series_list[index].unit,
                 }
-                for m in self.metrics
+                for timestamp, index, value in raw_points
             ]
             await f.write(json.dumps(metrics_data, indent=2, ensure_ascii=False))
 
+        # 保存降采样汇总：每行为 [timestamp, min, max, avg, count]
+        rollups_file = output_path / "metrics_rollups.json"
+        async with aiofiles.open(rollups_file, "w", encoding="utf-8") as f:
+            await f.write(json.dumps(rollups, indent=2, ensure_ascii=False))
+
         # 保存告警数据
         alerts_file = output_path / "alerts.json"
         async with aiofiles.open(alerts_file, "w", encoding="utf-8") as f:
@@ -612,6 +699,7 @@ class TestMonitor:
                     "timestamp": a.timestamp.isoformat(),
                     "resolved": a.resolved,
                     "resolved_at": a.resolved_at.isoformat() if a.resolved_at else None,
+                    "labels": a.labels,
                 }
                 for a in self.alerts
             ]
@@ -622,6 +710,7 @@ class TestMonitor:
         async with aiofiles.open(summary_file, "w", encoding="utf-8") as f:
             summary_data = {
                 "metrics_summary": self.get_metrics_summary(),
+                "task_metrics_summary": self.get_task_metrics_summary(),
                 "alerts_summary": self.get_alerts_summary(),
                 "generated_at": datetime.now().isoformat(),
             }
@@ -648,13 +737,7 @@ async def main():
     """主函数"""
     # 创建监控器
     config = {
-        "thresholds": {
-            "cpu_usage": 80.0,
-            "memory_usage": 85.0,
-            "disk_usage": 90.0,
-            "test_success_rate": 80.0,
-            "flaky_test_rate": 10.0,
-        },
+        # 告警规则见 testing/alert_rules.yml
         "websocket_port": 8765,
     }
 
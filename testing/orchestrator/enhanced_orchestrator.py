@@ -6,7 +6,6 @@ AI-Code 企业级测试编排器
 
 import asyncio
 import json
-import logging
 import os
 import subprocess
 import sys
@@ -33,18 +32,21 @@ except ImportError:
 
 try:
     from reporter import TestReporter
-    from utils.flaky_store import FlakyTestStore
-    from utils.git_integration import GitIntegration
-    from utils.logger import setup_logger
+    from utils.dependency_graph import WorkspaceGraph
+    from utils.flaky_store import FlakyPolicy, FlakyTestStore
+    from utils.git_integration import GitManager as GitIntegration
+    from utils.logger import get_logger
     from utils.notification import NotificationManager
     from utils.process_manager import ProcessManager
     from utils.resource_monitor import ResourceMonitor
 except ImportError:
     # 如果模块不可用，使用模拟实现
     TestReporter = None
+    WorkspaceGraph = None
+    FlakyPolicy = None
     FlakyTestStore = None
     GitIntegration = None
-    setup_logger = None
+    get_logger = None
     NotificationManager = None
     ProcessManager = None
     ResourceMonitor = None
@@ -118,7 +120,7 @@ class TestOrchestrator:
     def __init__(self, config_path: str = "config.yml"):
         self.config_path = config_path
         self.config = self._load_config()
-        self.logger = setup_logger("orchestrator", level=logging.INFO)
+        self.logger = get_logger("orchestrator")
 
         # 初始化组件
         self.process_manager = ProcessManager()
@@ -127,7 +129,11 @@ class TestOrchestrator:
             self.config.get("notification", {})
         )
         self.git_integration = GitIntegration()
-        self.flaky_store = FlakyTestStore()
+        self.flaky_store = FlakyTestStore(
+            policy=FlakyPolicy.from_config(
+                (self.config.get("execution", {}) or {}).get("flaky_management")
+            )
+        )
         self.reporter = TestReporter()
 
         # 状态管理
@@ -221,21 +227,23 @@ class TestOrchestrator:
     def _filter_apps_by_changes(
         self, apps: List[str], changed_files: List[str]
     ) -> List[str]:
-        """根据变更文件过滤应用"""
-        filtered_apps = []
-        for app in apps:
-            app_config = self.app_configs.get(app)
-            if not app_config:
-                continue
-
-            # 检查是否有相关文件变更
-            app_path = app_config.path
-            for file_path in changed_files:
-                if file_path.startswith(app_path) or file_path.startswith("shared/"):
-                    filtered_apps.append(app)
-                    break
-
-        return filtered_apps
+        """根据变更文件过滤应用（按 workspace 依赖图计算受影响的应用）"""
+        if WorkspaceGraph is None:
+            return apps
+
+        graph = WorkspaceGraph(
+            os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+            apps={name: cfg.path for name, cfg in self.app_configs.items()},
+            app_dependencies={
+                name: cfg.dependencies or [] for name, cfg in self.app_configs.items()
+            },
+            shared_libraries={
+                name: lib.get("path", f"./shared/{name}")
+                for name, lib in (self.config.get("shared_libraries") or {}).items()
+            },
+        )
+        affected = graph.affected_apps(changed_files)
+        return [app for app in apps if app in affected]
 
     def _build_test_queue(self, apps: List[str], test_types: List[TestType]):
         """构建测试队列"""
@@ -354,12 +362,6 @@ class TestOrchestrator:
                 result.status = TestStatus.FAILED
                 result.error_message = process.stderr
 
-            # 更新 Flaky 状态
-            if result.status == TestStatus.FAILED and result.is_flaky:
-                self.flaky_store.record_failure(test_id)
-            elif result.status == TestStatus.PASSED and result.is_flaky:
-                self.flaky_store.record_success(test_id)
-
         except subprocess.TimeoutExpired:
             result.status = TestStatus.TIMEOUT
             result.error_message = "测试执行超时"
@@ -438,9 +440,8 @@ class TestOrchestrator:
 
             self.completed_tests.append(result)
 
-            # 记录到 Flaky 存储
-            if result.is_flaky:
-                self.flaky_store.update_test_status(result.test_id, result.status)
+            # 记录到 Flaky 存储：所有结果都计数，才能发现新的 flaky 测试
+            self.flaky_store.update_test_status(result.test_id, result.status)
 
     def _get_execution_summary(self) -> Dict[str, Any]:
         """获取执行摘要"""
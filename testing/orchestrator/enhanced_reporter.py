@@ -14,17 +14,9 @@ from typing import Any, Dict, List
 
 try:
     import aiofiles
-    import jinja2
-    import matplotlib.pyplot as plt
-    import pandas as pd
-    import seaborn as sns
 except ImportError:
     # 如果依赖不可用，使用模拟实现
     aiofiles = None
-    jinja2 = None
-    plt = None
-    pd = None
-    sns = None
 
 
 @dataclass
@@ -50,10 +42,19 @@ class TestReporter:
     def __init__(self):
         self.templates_dir = Path(__file__).parent / "templates"
         self.assets_dir = Path(__file__).parent / "assets"
-        self.jinja_env = jinja2.Environment(
-            loader=jinja2.FileSystemLoader(str(self.templates_dir)),
-            autoescape=jinja2.select_autoescape(["html", "xml"]),
-        )
+        self._jinja_env = None
+
+    @property
+    def jinja_env(self):
+        """模板环境（jinja2 只在生成 HTML 报告时导入）"""
+        if self._jinja_env is None:
+            import jinja2
+
+            self._jinja_env = jinja2.Environment(
+                loader=jinja2.FileSystemLoader(str(self.templates_dir)),
+                autoescape=jinja2.select_autoescape(["html", "xml"]),
+            )
+        return self._jinja_env
 
     async def generate_reports(
         self, test_data: Dict[str, Any], config: Dict[str, Any]
@@ -11,7 +11,6 @@ from dataclasses import asdict
 from pathlib import Path
 from typing import Any, Dict, List
 
-from jinja2 import Environment, FileSystemLoader, Template
 from utils.logger import get_logger
 
 from config import TestConfig
@@ -93,8 +92,9 @@ class TestReporter:
         total_duration = sum(durations) if durations else 0
         avg_duration = total_duration / len(durations) if durations else 0
 
-        # 获取失败的测试详情
-        failed_tasks = [t for t in test_results.values() if not t.is_successful]
+        # 获取失败的测试详情（隔离通道的任务不影响构建结果，单独列出）
+        failed_tasks = [t for t in test_results.values() if t.is_blocking_failure]
+        quarantined_tasks = [t for t in test_results.values() if t.quarantined]
 
         return {
             "summary": {
@@ -112,6 +112,7 @@ class TestReporter:
             "results_by_app": results_by_app,
             "results_by_suite": results_by_suite,
             "failed_tasks": [self._task_to_dict(t) for t in failed_tasks],
+            "quarantined_tasks": [self._task_to_dict(t) for t in quarantined_tasks],
             "all_tasks": [self._task_to_dict(t) for t in test_results.values()],
             "config": {
                 "parallel_workers": self.config.parallel_workers,
@@ -137,6 +138,8 @@ class TestReporter:
             "return_code": task.return_code,
             "retry_count": task.retry_count,
             "max_retries": task.max_retries,
+            "quarantined": task.quarantined,
+            "resource_usage": task.resource_usage,
         }
 
     async def _generate_json_report(self, report_data: Dict[str, Any]) -> str:
@@ -151,6 +154,9 @@ class TestReporter:
 
     async def _generate_html_report(self, report_data: Dict[str, Any]) -> str:
         """生成 HTML 格式报告"""
+        # jinja2 只在需要 HTML 报告时导入
+        from jinja2 import Environment, FileSystemLoader, Template
+
         # 创建 Jinja2 环境
         env = Environment(loader=FileSystemLoader(str(self.templates_dir)))
 
@@ -343,6 +349,14 @@ class TestReporter:
                     {% if task.error %}
                     <p><strong>错误:</strong> {{ task.error }}</p>
                     {% endif %}
+                    {% if task.resource_usage %}
+                    <p><strong>资源:</strong> CPU 峰值 {{ "%.0f"|format(task.resource_usage.peak_cpu_percent) }}%
+                       (平均 {{ "%.0f"|format(task.resource_usage.avg_cpu_percent) }}%) |
+                       RSS 峰值 {{ "%.0f"|format(task.resource_usage.peak_rss_mb) }} MB |
+                       读 {{ (task.resource_usage.read_bytes / 1048576)|round(1) }} MB /
+                       写 {{ (task.resource_usage.write_bytes / 1048576)|round(1) }} MB
+                    </p>
+                    {% endif %}
                 </div>
                 {% endfor %}
             </div>
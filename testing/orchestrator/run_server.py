@@ -0,0 +1,539 @@
+"""
+本地运行请求服务器（serve 模式）
+通过 Unix socket 或本地 HTTP 接收运行请求；输入哈希相同的在途任务只执行一次，
+结果以 NDJSON 流推送给所有订阅的请求方
+"""
+
+import asyncio
+import copy
+import hashlib
+import hmac
+import json
+import os
+import signal
+import socket
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from aiohttp import ClientSession, ClientTimeout, UnixConnector, web
+from scheduler import TestScheduler, TestTask, suite_commands
+from utils.change_detection import workspace_fingerprint
+from utils.db_isolation import DatabaseProvisioner
+from utils.execution_engine import TOKEN_ENV, ExecutionRequest, ThreadBackend
+from utils.logger import get_logger
+from utils.metrics import CONTENT_TYPE, REGISTRY
+from utils.runner_args import is_extended_argv, is_extended_command
+
+from config import TestConfig, TestStatus, TestSuite
+
+DEFAULT_SOCKET = Path(__file__).resolve().parents[1] / ".cache" / "orchestrator.sock"
+
+# 流式结果中保留的输出长度
+MAX_OUTPUT_CHARS = 4000
+
+# /execute 不允许覆盖的环境变量：会改变实际执行的程序
+FORBIDDEN_ENV = {"PATH", "BASH_ENV", "ENV", "NODE_OPTIONS", "PYTHONPATH", "PYTHONSTARTUP"}
+FORBIDDEN_ENV_PREFIXES = ("LD_", "DYLD_")
+
+
+def _strip_priority_prefix(args: List[str]) -> List[str]:
+    """去掉只降低调度优先级的前缀（nice -n <非负数>、ionice -c 3）"""
+    while True:
+        if args[:2] == ["nice", "-n"] and len(args) > 2 and args[2].isdigit():
+            args = args[3:]
+        elif args[:3] == ["ionice", "-c", "3"]:
+            args = args[3:]
+        else:
+            return args
+
+
+def task_input_hash(task: TestTask, cwd: str, fingerprint: str) -> str:
+    """任务输入哈希：命令、工作目录、环境变量、超时和工作区状态"""
+    payload = json.dumps(
+        [task.command, cwd, sorted(task.env.items()), task.timeout, fingerprint]
+    )
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def task_result(task: TestTask) -> Dict:
+    """可序列化的任务结果"""
+    return {
+        "status": task.status.value,
+        "start_time": task.start_time,
+        "end_time": task.end_time,
+        "return_code": task.return_code,
+        "error": task.error,
+        "output": task.output[-MAX_OUTPUT_CHARS:],
+        "quarantined": task.quarantined,
+        "resource_usage": task.resource_usage,
+    }
+
+
+class SharedExecution:
+    """一个在途任务及其订阅者"""
+
+    def __init__(self, key: str, task: TestTask):
+        self.key = key
+        self.task = task
+        self.subscribers: List[asyncio.Queue] = []
+        self.result: Optional[Dict] = None
+        self.done = asyncio.Event()
+
+    def subscribe(self, queue: asyncio.Queue) -> None:
+        if self.result is not None:
+            queue.put_nowait((self.key, self.result))
+        else:
+            self.subscribers.append(queue)
+
+    def finish(self, result: Dict) -> None:
+        if self.result is not None:
+            return
+        self.result = result
+        for queue in self.subscribers:
+            queue.put_nowait((self.key, result))
+        self.subscribers.clear()
+        self.done.set()
+
+
+class RunServer:
+    """运行请求服务器"""
+
+    def __init__(self, config: TestConfig, max_runs: int = 1):
+        self.config = config
+        self.logger = get_logger("serve")
+        self.import_graphs = {}
+        self.db_provisioner = DatabaseProvisioner(config)
+        self._inflight: Dict[str, SharedExecution] = {}
+        self._runs: Set[asyncio.Task] = set()
+        # 每次运行已按 max_concurrency 并发执行任务，多个请求同时运行会成倍放大负载，
+        # 因此默认同一时刻只执行一个请求的任务（在途去重仍对所有请求生效）
+        self._run_slots = asyncio.Semaphore(max(1, max_runs))
+        # remote 执行后端提交的单条命令（POST /execute）
+        self.executor = ThreadBackend(max_workers=config.parallel_workers)
+        self.token = (config.execution.executor or {}).get("token") or os.environ.get(
+            TOKEN_ENV
+        )
+        # /execute 只执行配置中的任务命令（允许追加 worker 数、测试文件等转义后的参数）：
+        # 在项目根目录执行 "cd <应用路径> && <命令>"，或在应用目录直接执行 <命令>
+        self.allowed_commands = {
+            command
+            for app_config in config.apps.values()
+            for suite in TestSuite
+            for command in suite_commands(app_config, suite)
+        }
+        self.app_commands: Dict[Path, Set[str]] = {}
+        for app_config in config.apps.values():
+            prefix = f"cd {app_config.path} && "
+            commands = {
+                command[len(prefix) :]
+                for suite in TestSuite
+                for command in suite_commands(app_config, suite)
+                if command.startswith(prefix)
+            }
+            # 独立运行器（run_tests.py 等）按 test_<类型> 读取应用的测试命令
+            commands.update(
+                command
+                for key, command in app_config.commands.items()
+                if key.startswith("test_")
+            )
+            app_dir = (Path(config.project_root) / app_config.path).resolve()
+            self.app_commands.setdefault(app_dir, set()).update(commands)
+
+    # ------------------------------------------------------------------
+    # 请求处理
+    # ------------------------------------------------------------------
+
+    async def _plan(self, request: Dict) -> TestScheduler:
+        """按请求参数生成任务（每个请求使用独立的配置副本）
+
+        调用前需先计算 workspace_fingerprint：它会清空变更检测缓存并按当前工作区重新检测，
+        变更驱动的任务选择与输入哈希因此基于同一份变更集
+        """
+        config = copy.deepcopy(self.config)
+        if (config.execution.executor or {}).get("backend") == "remote":
+            # 服务端自身在本地执行，避免请求回环
+            config.execution.executor = {**config.execution.executor, "backend": "thread"}
+        smart_testing = config.execution.smart_testing
+        if request.get("changed_only"):
+            smart_testing["changed_only"] = True
+        if request.get("predictive"):
+            smart_testing.setdefault("predictive", {})["enabled"] = True
+
+        scheduler = TestScheduler(
+            config,
+            import_graphs=self.import_graphs,
+            db_provisioner=self.db_provisioner,
+        )
+        await scheduler.add_tasks_from_suite(
+            TestSuite(request.get("suite", TestSuite.ALL.value)), request.get("app")
+        )
+        if request.get("predictive"):
+            scheduler.apply_predictive_selection()
+        if request.get("budget"):
+            scheduler.apply_budget(float(request["budget"]))
+        return scheduler
+
+    async def submit(self, request: Dict) -> AsyncIterator[Dict]:
+        """处理一个运行请求，依次产出 plan / task / done 事件"""
+        loop = asyncio.get_running_loop()
+        fingerprint = await loop.run_in_executor(None, workspace_fingerprint)
+        scheduler = await self._plan(request)
+
+        # 在途任务去重（事件循环单线程，检查与登记之间没有让出点）
+        queue: asyncio.Queue = asyncio.Queue()
+        owned: Dict[str, SharedExecution] = {}
+        shared: Dict[str, SharedExecution] = {}
+        task_keys: Dict[str, List[str]] = {}
+        for task in scheduler.tasks.values():
+            key = task_input_hash(task, scheduler.config.project_root, fingerprint)
+            execution = self._inflight.get(key)
+            if execution is None:
+                execution = SharedExecution(key, task)
+                self._inflight[key] = execution
+                owned[task.id] = execution
+            else:
+                shared[task.id] = execution
+            if key not in task_keys:
+                execution.subscribe(queue)
+            task_keys.setdefault(key, []).append(task.id)
+
+        yield {
+            "event": "plan",
+            "tasks": [
+                {"id": task_id, "key": key, "shared": task_id in shared}
+                for key, task_ids in task_keys.items()
+                for task_id in task_ids
+            ],
+        }
+
+        if owned:
+            run = asyncio.create_task(self._execute(scheduler, owned, shared))
+            self._runs.add(run)
+            run.add_done_callback(self._runs.discard)
+        else:
+            await scheduler.stop()
+
+        total = passed = 0
+        for _ in range(len(task_keys)):
+            key, result = await queue.get()
+            for task_id in task_keys[key]:
+                total += 1
+                passed += result["status"] == TestStatus.PASSED.value
+                yield {
+                    "event": "task",
+                    "id": task_id,
+                    "key": key,
+                    "shared": task_id in shared,
+                    **result,
+                }
+        yield {"event": "done", "total": total, "passed": passed}
+
+    async def _execute(
+        self,
+        scheduler: TestScheduler,
+        owned: Dict[str, SharedExecution],
+        shared: Dict[str, SharedExecution],
+    ) -> None:
+        """执行本请求新登记的任务；与请求方连接解耦，断开后其他订阅者仍能收到结果"""
+        # 依赖的任务由其他请求执行时，等它们结束后再开始
+        owned_keys = {execution.key for execution in owned.values()}
+        dependencies = {
+            task_id: list(scheduler.tasks[task_id].dependencies) for task_id in owned
+        }
+        external = {
+            task_id: [
+                shared[dep]
+                for dep in deps
+                if dep in shared
+                and shared[dep].key not in owned_keys
+                and not shared[dep].task.quarantined
+            ]
+            for task_id, deps in dependencies.items()
+        }
+        scheduler._drop_tasks(set(shared))
+        scheduler.on_task_complete = lambda task: owned[task.id].finish(
+            task_result(task)
+        )
+        try:
+            waits = {execution.done for deps in external.values() for execution in deps}
+            if waits:
+                await asyncio.gather(*(event.wait() for event in waits))
+            self._skip_failed_dependents(scheduler, owned, dependencies, external)
+            # 等待依赖时不占用运行槽，避免与正在执行这些依赖的请求互相等待
+            async with self._run_slots:
+                await scheduler.run_all()
+        except Exception as e:
+            self.logger.error(f"执行请求失败: {e}")
+        finally:
+            await scheduler.stop()
+            for task_id, execution in owned.items():
+                task = scheduler.tasks.get(task_id)
+                if execution.result is None:
+                    if not (task and task.is_completed):
+                        execution.task.status = TestStatus.ERROR
+                        execution.task.error = "任务未执行"
+                    execution.finish(task_result(execution.task))
+                self._inflight.pop(execution.key, None)
+
+    @staticmethod
+    def _skip_failed_dependents(
+        scheduler: TestScheduler,
+        owned: Dict[str, SharedExecution],
+        dependencies: Dict[str, List[str]],
+        external: Dict[str, List[SharedExecution]],
+    ) -> None:
+        """其他请求执行的依赖未通过时，跳过依赖它的任务及其在本请求内的下游"""
+        skipped = {
+            task_id
+            for task_id, executions in external.items()
+            if any(
+                execution.result is None
+                or execution.result["status"] != TestStatus.PASSED.value
+                for execution in executions
+            )
+        }
+        changed = bool(skipped)
+        while changed:
+            changed = False
+            for task_id, deps in dependencies.items():
+                if task_id not in skipped and skipped.intersection(deps):
+                    skipped.add(task_id)
+                    changed = True
+
+        for task_id in skipped:
+            task = scheduler.tasks[task_id]
+            task.status = TestStatus.SKIPPED
+            task.error = "依赖任务失败"
+            owned[task_id].finish(task_result(task))
+        scheduler._drop_tasks(skipped)
+
+    # ------------------------------------------------------------------
+    # HTTP 接口
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _is_unix_socket(request: web.Request) -> bool:
+        sock = request.transport.get_extra_info("socket") if request.transport else None
+        return sock is not None and sock.family == getattr(socket, "AF_UNIX", None)
+
+    def _has_token(self, request: web.Request) -> bool:
+        header = request.headers.get("Authorization", "")
+        return bool(self.token) and hmac.compare_digest(
+            header.encode(), f"Bearer {self.token}".encode()
+        )
+
+    @web.middleware
+    async def _guard(self, request: web.Request, handler):
+        """POST 只接受 application/json（浏览器跨站表单 / text/plain 请求无法伪造）；
+        TCP 上配置了令牌时所有 POST 都需令牌，/execute 和 /control 未配置令牌时只在 Unix socket 上提供
+        """
+        if request.method == "POST":
+            if request.content_type != "application/json":
+                raise web.HTTPUnsupportedMediaType(text="请求体必须为 application/json")
+            if not self._is_unix_socket(request):
+                privileged = request.path in ("/execute", "/control")
+                if (self.token or privileged) and not self._has_token(request):
+                    raise web.HTTPForbidden(
+                        text=f"需要令牌（{TOKEN_ENV} 或 execution.executor.token）"
+                        if self.token
+                        else f"{request.path} 仅在 Unix socket 上提供，或配置 {TOKEN_ENV}"
+                    )
+        return await handler(request)
+
+    def _check_execution(self, execution: ExecutionRequest) -> None:
+        """只允许执行配置中的任务命令：项目根目录下的完整命令，或应用目录下的应用命令；
+        相对工作目录按项目根目录解析，列表形式的命令可带后台通道的 nice / ionice 前缀"""
+        root = Path(self.config.project_root).resolve()
+        cwd = (root / (execution.cwd or ".")).resolve()
+        if cwd == root:
+            allowed = self.allowed_commands
+        elif cwd in self.app_commands:
+            allowed = self.app_commands[cwd]
+        else:
+            raise web.HTTPForbidden(text="工作目录必须为项目根目录或配置中的应用目录")
+        execution.cwd = str(cwd)
+
+        command = execution.command
+        if isinstance(command, str):
+            permitted = any(is_extended_command(command, base) for base in allowed)
+        elif isinstance(command, list) and all(isinstance(a, str) for a in command):
+            args = _strip_priority_prefix(command)
+            permitted = any(is_extended_argv(args, base) for base in allowed)
+        else:
+            permitted = False
+        if not permitted:
+            raise web.HTTPForbidden(text="命令不是配置中的测试任务命令")
+        forbidden = [
+            key
+            for key in (execution.env or {})
+            if key in FORBIDDEN_ENV or key.startswith(FORBIDDEN_ENV_PREFIXES)
+        ]
+        if forbidden:
+            raise web.HTTPForbidden(text=f"不允许设置环境变量: {', '.join(forbidden)}")
+
+    async def _handle_run(self, request: web.Request) -> web.StreamResponse:
+        try:
+            payload = await request.json()
+            TestSuite(payload.get("suite", TestSuite.ALL.value))
+        except ValueError as e:
+            raise web.HTTPBadRequest(text=str(e))
+
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        try:
+            async for event in self.submit(payload):
+                await response.write(
+                    (json.dumps(event, ensure_ascii=False) + "\n").encode()
+                )
+        except Exception as e:
+            self.logger.error(f"处理运行请求失败: {e}")
+            await response.write(
+                (json.dumps({"event": "error", "error": str(e)}, ensure_ascii=False) + "\n").encode()
+            )
+        await response.write_eof()
+        return response
+
+    async def _handle_status(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "inflight": [
+                    {"id": e.task.id, "key": e.key, "subscribers": len(e.subscribers)}
+                    for e in self._inflight.values()
+                ],
+                "executing": self.executor.running(),
+            }
+        )
+
+    async def _handle_metrics(self, request: web.Request) -> web.Response:
+        """OpenMetrics 格式的调度器 / 资源 / 缓存指标"""
+        loop = asyncio.get_running_loop()
+        body = await loop.run_in_executor(None, REGISTRY.render)
+        return web.Response(
+            body=body.encode("utf-8"), headers={"Content-Type": CONTENT_TYPE}
+        )
+
+    async def _handle_execute(self, request: web.Request) -> web.Response:
+        """执行单条命令并返回 ExecutionResult（供 remote 执行后端使用）"""
+        try:
+            payload = await request.json()
+            execution = ExecutionRequest(**payload)
+        except (TypeError, ValueError) as e:
+            raise web.HTTPBadRequest(text=str(e))
+        self._check_execution(execution)
+        result = await self.executor.execute(execution)
+        return web.json_response(asdict(result))
+
+    async def _handle_control(self, request: web.Request) -> web.Response:
+        """挂起 / 恢复 / 取消 / 发送信号给 /execute 中运行的命令"""
+        try:
+            payload = await request.json()
+            task_id = payload["task_id"]
+            action = payload["action"]
+        except (KeyError, ValueError) as e:
+            raise web.HTTPBadRequest(text=str(e))
+        if action == "suspend":
+            ok = self.executor.suspend(task_id)
+        elif action == "resume":
+            ok = self.executor.resume(task_id)
+        elif action == "cancel":
+            ok = self.executor.cancel(task_id, payload.get("signal") or signal.SIGTERM)
+        elif action == "signal" and payload.get("signal"):
+            ok = self.executor.signal(task_id, int(payload["signal"]))
+        else:
+            raise web.HTTPBadRequest(text=f"未知的操作: {action}")
+        return web.json_response({"ok": ok})
+
+    def make_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._guard])
+        app.router.add_post("/run", self._handle_run)
+        app.router.add_post("/execute", self._handle_execute)
+        app.router.add_post("/control", self._handle_control)
+        app.router.add_get("/status", self._handle_status)
+        app.router.add_get("/metrics", self._handle_metrics)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+
+    async def _on_cleanup(self, app: web.Application) -> None:
+        for run in list(self._runs):
+            run.cancel()
+        await asyncio.gather(*self._runs, return_exceptions=True)
+        await self.executor.cancel_all()
+        self.executor.shutdown()
+        self.db_provisioner.cleanup()
+
+    async def serve_forever(
+        self,
+        socket_path: Optional[str] = None,
+        host: Optional[str] = None,
+        port: int = 8765,
+    ) -> None:
+        """监听 Unix socket（默认）或本地 HTTP 地址"""
+        runner = web.AppRunner(self.make_app())
+        await runner.setup()
+        if host:
+            if not self.token:
+                self.logger.warning(
+                    f"未配置 {TOKEN_ENV}，HTTP 监听下 /execute 和 /control 不可用"
+                )
+            site = web.TCPSite(runner, host, port)
+        else:
+            path = Path(socket_path or DEFAULT_SOCKET)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.unlink(missing_ok=True)
+            site = web.UnixSite(runner, str(path))
+        await site.start()
+        self.logger.info(f"运行请求服务器已启动: {site.name}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+
+
+# ----------------------------------------------------------------------
+# 客户端
+# ----------------------------------------------------------------------
+
+
+async def stream_run(address: str, request: Dict) -> AsyncIterator[Dict]:
+    """向 serve 守护进程提交运行请求并逐条产出事件
+
+    address 为 unix:/path/to.sock 或 http://127.0.0.1:8765；
+    HTTP 地址的服务端配置了令牌时从环境变量 ORCHESTRATOR_TOKEN 读取
+    """
+    token = os.environ.get(TOKEN_ENV)
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    if address.startswith("unix:"):
+        connector = UnixConnector(path=address[len("unix:") :])
+        base_url = "http://localhost"
+    else:
+        connector = None
+        base_url = address.rstrip("/")
+
+    async with ClientSession(
+        connector=connector, timeout=ClientTimeout(total=None)
+    ) as session:
+        async with session.post(
+            f"{base_url}/run", json=request, headers=headers
+        ) as response:
+            response.raise_for_status()
+            async for line in response.content:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def task_from_event(event: Dict, suite: TestSuite) -> TestTask:
+    """将 task 事件还原为 TestTask，便于复用本地的结果输出"""
+    return TestTask(
+        id=event["id"],
+        suite=suite,
+        status=TestStatus(event["status"]),
+        start_time=event.get("start_time"),
+        end_time=event.get("end_time") or time.time(),
+        return_code=event.get("return_code"),
+        error=event.get("error", ""),
+        output=event.get("output", ""),
+        quarantined=event.get("quarantined", False),
+        resource_usage=event.get("resource_usage") or {},
+    )
@@ -5,23 +5,119 @@
 
 import asyncio
 import logging
-import os
-import subprocess
 import time
 from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 import psutil
-from utils.flaky_store import FlakyStore
+from utils.budget import BudgetPlan, build_items, select_within_budget
+from utils.change_detection import workspace_fingerprint
+from utils.core_budget import CoreAllocation, CoreBudget, inject_worker_flags
+from utils.db_isolation import DatabaseProvisioner
+from utils.execution_engine import ExecutionBackend, ExecutionRequest, backend_from_config
+from utils.execution_plan import ExecutionPlan, collect_inputs, resource_class
+from utils.dependency_graph import WorkspaceGraph, is_documentation
+from utils.flaky_store import FlakyPolicy, FlakyStats, FlakyStore
 from utils.git_integration import GitManager
+from utils.import_graph import ImportGraph, test_kind
 from utils.logger import get_logger
+from utils.metrics import (
+    LATENCY_BUCKETS,
+    REGISTRY,
+    Counter,
+    Histogram,
+    MetricFamily,
+)
+from utils.predictive_selection import CoFailureModel, SelectionResult
+from utils.pressure import pressure_percentages, read_pressure
 from utils.process_manager import ProcessManager
 from utils.resource_monitor import ResourceMonitor
-
-from config import AppConfig, TestConfig, TestStatus, TestSuite, get_config
+from utils.runner_args import (
+    append_runner_args,
+    matches_glob,
+    matches_pattern,
+    runner_filters,
+    runner_path_patterns,
+)
+from utils.test_history import TestHistory
+
+from config import (
+    AppConfig,
+    TestConfig,
+    TestStatus,
+    TestSuite,
+    config_from_dict,
+    config_to_dict,
+    get_config,
+)
+
+# 超过该数量时不再逐个传递测试文件，直接全量运行
+MAX_EXPLICIT_TEST_FILES = 200
+
+TASK_DURATION = Histogram(
+    "orchestrator_task_duration_seconds",
+    "测试任务单次尝试的执行时长",
+    ("suite", "status"),
+)
+TASK_RETRIES = Counter(
+    "orchestrator_task_retries",
+    "失败后重新排队的任务次数",
+    ("suite",),
+)
+SPAWN_LATENCY = Histogram(
+    "orchestrator_spawn_latency_seconds",
+    "从调度器派发命令到子进程创建完成的延迟",
+    ("backend",),
+    buckets=LATENCY_BUCKETS,
+)
+
+
+def suite_commands(app_config: AppConfig, suite: TestSuite) -> List[str]:
+    """测试套件对应的命令（配置中的命令，未配置时回退到默认命令）"""
+    # 优先使用配置文件中的命令
+    suite_command_map = {
+        TestSuite.UNIT: "test_unit",
+        TestSuite.INTEGRATION: "test_integration",
+        TestSuite.E2E: "test_e2e",
+        TestSuite.CONTRACT: "test_contract",
+        TestSuite.PERFORMANCE: "test_performance",
+        TestSuite.SECURITY: "security_scan",
+    }
+
+    command_type = suite_command_map.get(suite)
+    if command_type and hasattr(app_config, "get_command"):
+        command = app_config.get_command(command_type)
+        return [f"cd {app_config.path} && {command}"]
+
+    # 回退到默认命令
+    fallback_commands = {
+        TestSuite.UNIT: [
+            f"cd {app_config.path} && npm run test:unit || npm test",
+        ],
+        TestSuite.INTEGRATION: [
+            f"cd {app_config.path} && npm run test:integration || npm run test:e2e"
+        ],
+        TestSuite.E2E: [
+            f"cd {app_config.path} && npm run test:e2e || npx playwright test"
+        ],
+        TestSuite.CONTRACT: [
+            f"cd {app_config.path} && npm run test:contract || echo 'No contract tests'"
+        ],
+        TestSuite.PERFORMANCE: [
+            f"cd {app_config.path} && npm run test:performance || k6 run performance/*.js"
+        ],
+        TestSuite.SECURITY: [
+            f"cd {app_config.path} && npm audit",
+            f"cd {app_config.path} && npm run security:scan || echo 'No security scan configured'",
+        ],
+    }
+
+    return fallback_commands.get(
+        suite, [getattr(app_config, "test_command", "npm test")]
+    )
 
 
 @dataclass
@@ -45,7 +141,12 @@ class TestTask:
     output: str = ""
     error: str = ""
     return_code: Optional[int] = None
-    process: Optional[subprocess.Popen] = None
+    resource_class: str = "standard"
+    cores: Optional[CoreAllocation] = None
+    # 隔离中的 flaky 任务：在低优先级通道运行，结果不影响构建、不阻塞依赖方
+    quarantined: bool = False
+    # 进程树资源占用汇总（峰值 / 平均 CPU、峰值 RSS、累计 I/O），由资源监控采样
+    resource_usage: Dict[str, Any] = field(default_factory=dict)
 
     @property
     def duration(self) -> Optional[float]:
@@ -69,25 +170,73 @@ class TestTask:
         """是否成功"""
         return self.status == TestStatus.PASSED
 
+    @property
+    def gates_build(self) -> bool:
+        """结果是否影响构建：隔离任务失败不计入退出码"""
+        return not self.quarantined
+
+    @property
+    def is_blocking_failure(self) -> bool:
+        """是否为导致构建失败的结果"""
+        return self.gates_build and self.is_completed and not self.is_successful
+
 
 class TestScheduler:
     """测试调度器"""
 
-    def __init__(self, config: TestConfig):
+    def __init__(
+        self,
+        config: TestConfig,
+        import_graphs: Optional[Dict[str, ImportGraph]] = None,
+        db_provisioner: Optional[DatabaseProvisioner] = None,
+    ):
         self.config = config
         self.logger = get_logger("scheduler")
         self.process_manager = ProcessManager()
-        self.resource_monitor = ResourceMonitor()
+        self.resource_monitor = ResourceMonitor(task_source=self._running_task_pids)
         self.git = GitManager()
-        self.flaky_store = FlakyStore()
+        self.git.dependency_graph = WorkspaceGraph.from_config(config, self.git.repo_root)
+        self.flaky_store = FlakyStore(
+            policy=FlakyPolicy.from_config(config.execution.flaky_management)
+        )
+        self._code_version: Optional[str] = None
+        self.history = TestHistory()
+        self.co_failure: Optional[CoFailureModel] = None
+        self._selection: Optional[SelectionResult] = None
+        self._changed_files: List[str] = []
+        self._impact_changes: Optional[List[str]] = None
+        # 常驻进程（watch 守护进程）可传入共享的 import 图，跨多次运行增量刷新
+        self._import_graphs: Dict[str, ImportGraph] = (
+            import_graphs if import_graphs is not None else {}
+        )
+        # 任务结束回调，用于实时输出结果
+        self.on_task_complete: Optional[Callable[[TestTask], None]] = None
+        # 外部传入的供应器由调用方负责清理
+        self._owns_db_provisioner = db_provisioner is None
+        self.db_provisioner = db_provisioner or DatabaseProvisioner(config)
+        # 阻塞任务与隔离通道任务同时运行，核心、线程池和执行后端都按总并发切分
+        self.core_budget = CoreBudget.from_config(
+            config.max_concurrency, config.execution.core_budget
+        )
 
         self.tasks: Dict[str, TestTask] = {}
         self.running_tasks: Set[str] = set()
         self.completed_tasks: Set[str] = set()
         self.failed_tasks: Set[str] = set()
 
-        self.executor = ThreadPoolExecutor(max_workers=config.parallel_workers)
+        # 线程池只用于数据库准备等阻塞调用，测试命令由执行后端运行
+        self.executor = ThreadPoolExecutor(max_workers=config.max_concurrency)
+        self.backend: ExecutionBackend = backend_from_config(
+            config.execution.executor, config.max_concurrency
+        )
         self._shutdown = False
+        self._env_files: Dict[str, Dict[str, str]] = {}
+
+        lane = config.execution.flaky_management.get("quarantine_lane") or {}
+        self._lane_enabled = bool(lane.get("enabled", True))
+        self._lane_workers = max(1, int(lane.get("max_workers") or 1))
+        self._lane_nice = int(lane.get("nice", 10) or 0)
+        self._lane_grace = lane.get("grace", 300)
 
     async def add_task(self, task: TestTask):
         """添加测试任务"""
@@ -111,9 +260,12 @@ class TestScheduler:
             if getattr(self.config, "changed_only", True):
                 try:
                     changed = self.git.get_changed_files()
+                    if self.config.execution.smart_testing.get("impact_analysis", True):
+                        self._impact_changes = changed
                     mapped = self.git.map_files_to_apps(changed)
                     affected_apps = self.git.expand_with_dependencies(mapped)
-                    if affected_apps:
+                    if changed:
+                        # 检测到变更时以依赖图结果为准（只改文档等不触发任何应用）
                         target_apps = [a for a in target_apps if a in affected_apps]
                 except Exception:
                     # 回退为全量
@@ -122,6 +274,19 @@ class TestScheduler:
                 if app_name in self.config.apps:
                     await self._add_app_suite_tasks(app_name, suite)
 
+    async def add_tasks_for_changes(
+        self, suite: TestSuite, app: str, changed_files: List[str]
+    ):
+        """根据已知的变更文件（而非 git diff）为应用添加受影响的测试任务"""
+        self._impact_changes = list(changed_files)
+        suites = (
+            [TestSuite.UNIT, TestSuite.INTEGRATION, TestSuite.E2E]
+            if suite == TestSuite.ALL
+            else [suite]
+        )
+        for test_suite in suites:
+            await self._add_app_suite_tasks(app, test_suite)
+
     async def _add_app_suite_tasks(self, app_name: str, suite: TestSuite):
         """为特定应用和套件添加任务"""
         app_config = self.config.apps.get(app_name)
@@ -130,14 +295,41 @@ class TestScheduler:
             return
 
         # 根据套件类型生成不同的测试命令
-        commands = self._get_suite_commands(app_config, suite)
+        commands = suite_commands(app_config, suite)
+
+        # 文件级影响分析：只运行传递依赖变更文件的测试文件
+        if self._impact_changes is not None and suite in (
+            TestSuite.UNIT,
+            TestSuite.INTEGRATION,
+        ):
+            test_files = self._affected_test_files(app_name, app_config)
+            if test_files is not None:
+                commands = [
+                    narrowed
+                    for narrowed in (
+                        self._narrow_for_suite(command, app_name, suite, test_files)
+                        for command in commands
+                    )
+                    if narrowed is not None
+                ]
+                if not commands:
+                    self.logger.info(f"{app_name} 没有受变更影响的 {suite.value} 测试文件")
+                    return
 
+        skip_quarantined = self.config.execution.flaky_management.get(
+            "skip_quarantined", False
+        )
         for i, command in enumerate(commands):
             task_id = (
                 f"{app_name}-{suite.value}-{i}"
                 if len(commands) > 1
                 else f"{app_name}-{suite.value}"
             )
+            quarantined = self.flaky_store.contains(task_id)
+            if quarantined and skip_quarantined:
+                self.logger.info(f"跳过隔离中的 flaky 任务: {task_id}")
+                continue
+            quarantined = quarantined and self._lane_enabled
 
             task = TestTask(
                 id=task_id,
@@ -147,54 +339,118 @@ class TestScheduler:
                 dependencies=self._get_task_dependencies(app_name, suite),
                 env=self._get_task_env(app_config),
                 timeout=app_config.test_timeout,
-                max_retries=self.config.retry_failed,
+                # 隔离任务的每次尝试都已计入评分，重试只会占用资源
+                max_retries=0 if quarantined else self.config.retry_failed,
+                resource_class=resource_class(suite.value, app_config.type),
+                quarantined=quarantined,
             )
+            if quarantined:
+                self.logger.info(f"隔离中的 flaky 任务进入低优先级通道: {task_id}")
 
             await self.add_task(task)
 
-    def _get_suite_commands(self, app_config: AppConfig, suite: TestSuite) -> List[str]:
-        """获取测试套件命令"""
-        # 优先使用配置文件中的命令
-        suite_command_map = {
-            TestSuite.UNIT: "test_unit",
-            TestSuite.INTEGRATION: "test_integration",
-            TestSuite.E2E: "test_e2e",
-            TestSuite.CONTRACT: "test_contract",
-            TestSuite.PERFORMANCE: "test_performance",
-            TestSuite.SECURITY: "security_scan",
-        }
+    def _affected_test_files(
+        self, app_name: str, app_config: AppConfig
+    ) -> Optional[List[str]]:
+        """基于 import 图反查受影响的测试文件（应用目录相对路径）
+
+        返回 None 表示无法精确判断，需要全量运行：变更了应用内不在图中的文件（配置、样式等），
+        或应用外无法经 import 图解析的文件（根目录 jest.config / tsconfig / package.json /
+        lockfile、应用所依赖的 workspace 包的清单等）；只有属于其他不相关 workspace 包的
+        文件可以忽略。
+        """
+        repo_root = Path(self.git.repo_root)
+        app_dir = (self._command_root() / app_config.path).resolve()
+        try:
+            app_prefix = app_dir.relative_to(repo_root).as_posix() + "/"
+        except ValueError:
+            return None
 
-        command_type = suite_command_map.get(suite)
-        if command_type and hasattr(app_config, "get_command"):
-            command = app_config.get_command(command_type)
-            return [f"cd {app_config.path} && {command}"]
-
-        # 回退到默认命令
-        fallback_commands = {
-            TestSuite.UNIT: [
-                f"cd {app_config.path} && npm run test:unit || npm test",
-            ],
-            TestSuite.INTEGRATION: [
-                f"cd {app_config.path} && npm run test:integration || npm run test:e2e"
-            ],
-            TestSuite.E2E: [
-                f"cd {app_config.path} && npm run test:e2e || npx playwright test"
-            ],
-            TestSuite.CONTRACT: [
-                f"cd {app_config.path} && npm run test:contract || echo 'No contract tests'"
-            ],
-            TestSuite.PERFORMANCE: [
-                f"cd {app_config.path} && npm run test:performance || k6 run performance/*.js"
-            ],
-            TestSuite.SECURITY: [
-                f"cd {app_config.path} && npm audit",
-                f"cd {app_config.path} && npm run security:scan || echo 'No security scan configured'",
-            ],
-        }
+        graph = self._import_graphs.get(app_name)
+        try:
+            if graph is None:
+                graph = ImportGraph(repo_root, app_dir)
+                self._import_graphs[app_name] = graph
+            # 按 mtime/哈希增量刷新，未变化的文件不会重新解析
+            graph.refresh()
+        except Exception as e:
+            self.logger.warning(f"构建 {app_name} import 图失败: {e}")
+            return None
+
+        relevant = [f for f in self._impact_changes if graph.contains(f)]
+        if not relevant or any(
+            self._may_affect(app_name, f)
+            for f in self._impact_changes
+            if not graph.contains(f)
+        ):
+            return None
+
+        tests = graph.affected_tests(relevant)
+        if len(tests) > MAX_EXPLICIT_TEST_FILES:
+            return None
+        return [t[len(app_prefix) :] for t in tests]
+
+    def _may_affect(self, app_name: str, path: str) -> bool:
+        """不在 import 图中的变更文件是否可能影响应用（无所属节点时除文档外均按影响处理）"""
+        try:
+            workspace = self.git.dependency_graph
+            owner = workspace.owner_of(path)
+        except Exception:
+            return True
+        if owner is None:
+            return not is_documentation(path)
+        return app_name in workspace.affected.get(owner, [app_name])
+
+    def _narrow_for_suite(
+        self, command: str, app_name: str, suite: TestSuite, test_files: List[str]
+    ) -> Optional[str]:
+        """只保留属于该套件的受影响测试文件并收窄命令；没有受影响的文件时返回 None
+
+        运行器的位置参数与追加的文件是「或」关系：脚本已带文件过滤（如 src/**/*.spec.ts）时
+        按其 glob 判断套件是否受影响，但不追加文件，整体运行该脚本；
+        jest 的 --testPathPattern 用于筛选本套件的文件，没有任何过滤时按路径约定分流
+        """
+        root = self._command_root()
+        filters = runner_filters(command, root)
+        globs = [f for f in filters if "/" in f or "*" in f]
+        patterns = runner_path_patterns(command, root)
+        if globs:
+            matched = [f for f in test_files if any(matches_glob(f, g) for g in globs)]
+        elif filters:
+            matched = list(test_files)
+        elif patterns:
+            matched = [
+                f for f in test_files if any(matches_pattern(f, p) for p in patterns)
+            ]
+        else:
+            matched = [f for f in test_files if test_kind(f) == suite.value]
+        if not matched:
+            return None
+        if filters:
+            self.logger.info(
+                f"{app_name} {suite.value} 的测试命令已有文件过滤 {filters}，不收窄测试文件"
+            )
+            return command
+        return self._narrow_command(command, matched)
 
-        return fallback_commands.get(
-            suite, [getattr(app_config, "test_command", "npm test")]
-        )
+    def _narrow_command(self, command: str, test_files: List[str]) -> str:
+        """把测试文件作为显式路径传给 jest/vitest"""
+
+        def build(runner: str, tokens: List[str]) -> Optional[List[str]]:
+            if runner == "jest":
+                return ["--runTestsByPath", *test_files]
+            if runner == "vitest":
+                return list(test_files)
+            return None
+
+        return append_runner_args(command, self._command_root(), build)
+
+    def _command_root(self) -> Path:
+        """应用路径的基准目录：优先项目根目录，不存在时回退到仓库根目录"""
+        project_root = Path(self.config.project_root).resolve()
+        if any((project_root / app.path).is_dir() for app in self.config.apps.values()):
+            return project_root
+        return Path(self.git.repo_root)
 
     def _get_task_dependencies(self, app_name: str, suite: TestSuite) -> List[str]:
         """获取任务依赖"""
@@ -234,7 +490,9 @@ class TestScheduler:
         return env
 
     def _load_env_file(self, env_file: str) -> Dict[str, str]:
-        """加载环境变量文件"""
+        """加载环境变量文件（同一调度器内每个文件只解析一次）"""
+        if env_file in self._env_files:
+            return dict(self._env_files[env_file])
         env = {}
         try:
             with open(env_file, "r") as f:
@@ -246,7 +504,32 @@ class TestScheduler:
         except Exception as e:
             self.logger.warning(f"无法加载环境文件 {env_file}: {e}")
 
-        return env
+        self._env_files[env_file] = env
+        return dict(env)
+
+    def export_tasks(self) -> List[Dict[str, Any]]:
+        """导出任务定义（命令、环境、依赖 DAG、资源等级），用于预编译执行计划"""
+        return [
+            {
+                "id": task.id,
+                "suite": task.suite.value,
+                "app": task.app,
+                "command": task.command,
+                "dependencies": task.dependencies,
+                "env": task.env,
+                "timeout": task.timeout,
+                "max_retries": task.max_retries,
+                "resource_class": task.resource_class,
+                "quarantined": task.quarantined,
+            }
+            for task in self.tasks.values()
+        ]
+
+    def load_tasks(self, entries: List[Dict[str, Any]]):
+        """从执行计划加载任务，跳过任务生成"""
+        for entry in entries:
+            task = TestTask(**{**entry, "suite": TestSuite(entry["suite"])})
+            self.tasks[task.id] = task
 
     async def run_all(self) -> Dict[str, TestTask]:
         """运行所有测试任务"""
@@ -258,25 +541,167 @@ class TestScheduler:
 
         # 启动资源监控
         self.resource_monitor.start()
+        metrics_key = f"scheduler:{id(self)}"
+        REGISTRY.register_collector(metrics_key, self.collect_metrics)
 
         try:
+            await self._prepare_databases()
             await self._execute_tasks()
         finally:
+            REGISTRY.unregister_collector(metrics_key)
             self.resource_monitor.stop()
             await self._cleanup()
 
         # 汇总结果
+        self._record_history()
         self._log_summary()
         return self.tasks
 
+    def apply_budget(self, budget: float) -> BudgetPlan:
+        """按时间预算裁剪任务：保留期望发现失败最多的子集，其余延后"""
+        history = self.history.read()
+        items = build_items(
+            list(self.tasks.keys()),
+            history,
+            default_duration=self.config.execution.task_timeout / 10,
+        )
+        plan = select_within_budget(items, budget, self.config.parallel_workers)
+
+        self._drop_tasks({item.task_id for item in plan.deferred})
+        self.logger.info(
+            f"预算 {budget:.0f}s: 选择 {len(plan.selected)} 个任务，"
+            f"延后 {len(plan.deferred)} 个任务"
+        )
+        return plan
+
+    def apply_predictive_selection(self) -> SelectionResult:
+        """按变更路径与任务失败的历史共现关系裁剪任务"""
+        options = self.config.execution.smart_testing.get("predictive", {}) or {}
+        try:
+            self._changed_files = self.git.get_changed_files()
+        except Exception:
+            self._changed_files = []
+
+        self.co_failure = CoFailureModel()
+        self._selection = self.co_failure.select(
+            list(self.tasks.keys()),
+            self._changed_files,
+            threshold=options.get("threshold", 0.1),
+            min_observations=options.get("min_observations", 5),
+            full_run_every=options.get("full_run_every", 20),
+        )
+        self._drop_tasks(set(self._selection.skipped))
+
+        if self._selection.full_run:
+            self.logger.info(f"预测选择: 全量运行 ({self._selection.reason})")
+        else:
+            self.logger.info(
+                f"预测选择 ({self._selection.reason}): 运行 {len(self._selection.selected)} 个任务，"
+                f"跳过 {len(self._selection.skipped)} 个任务"
+            )
+        return self._selection
+
+    def _drop_tasks(self, task_ids: Set[str]):
+        """移除未选中的任务，并解除它们对已选任务的依赖阻塞"""
+        for task_id in task_ids:
+            self.tasks.pop(task_id, None)
+        for task in self.tasks.values():
+            task.dependencies = [d for d in task.dependencies if d not in task_ids]
+
+    def _record_history(self):
+        """记录本次运行的耗时和结果"""
+        results = [
+            (task.id, task.duration, task.is_successful)
+            for task in self.tasks.values()
+            if task.duration is not None
+            and task.status in (TestStatus.PASSED, TestStatus.FAILED, TestStatus.ERROR)
+        ]
+        if not results:
+            return
+        try:
+            self.history.record(results)
+        except Exception as e:
+            self.logger.warning(f"写入测试历史失败: {e}")
+
+        # 增量更新共现矩阵
+        if self.co_failure is not None:
+            try:
+                # 隔离任务的结果主要是噪声，不计入共现矩阵
+                self.co_failure.update(
+                    self._changed_files,
+                    {
+                        task_id: passed
+                        for task_id, _, passed in results
+                        if not self.tasks[task_id].quarantined
+                    },
+                    full_run=bool(self._selection and self._selection.full_run),
+                )
+                self.co_failure.save()
+            except Exception as e:
+                self.logger.warning(f"更新共现矩阵失败: {e}")
+
+    def _needs_database(self, task: TestTask) -> bool:
+        """任务所属套件声明了 requires_database（单元测试、lint 等不分配数据库）"""
+        suite_config = self.config.test_suites.get(task.suite.value)
+        return bool(task.app and suite_config and suite_config.requires_database)
+
+    async def _prepare_databases(self):
+        """为需要数据库的应用准备模板库（每个应用只 setup/seed 一次）"""
+        app_names = sorted(
+            {task.app for task in self.tasks.values() if self._needs_database(task)}
+        )
+        # 上次运行的失败不延续到本次（watch / serve 复用同一个供应器）
+        self.db_provisioner.reset_failures(app_names)
+        loop = asyncio.get_event_loop()
+        for app_name in app_names:
+            app_config = self.config.apps.get(app_name)
+            if not app_config or not app_config.database:
+                continue
+            try:
+                await loop.run_in_executor(
+                    self.executor, self.db_provisioner.prepare, app_name, app_config
+                )
+            except Exception as e:
+                self.logger.error(f"准备 {app_name} 数据库失败: {e}")
+                self._fail_database_tasks(app_name, str(e))
+
+    def _fail_database_tasks(self, app_name: str, reason: str):
+        """模板准备失败：依赖该数据库的任务直接记为错误，不再逐个重试 setup/seed"""
+        now = time.time()
+        for task in self.tasks.values():
+            if (
+                task.app == app_name
+                and task.status == TestStatus.PENDING
+                and self._needs_database(task)
+            ):
+                task.status = TestStatus.ERROR
+                task.error = reason
+                task.start_time = task.end_time = now
+                self.failed_tasks.add(task.id)
+                self._notify_complete(task)
+
     async def _execute_tasks(self):
         """执行测试任务"""
-        while not self._all_tasks_completed() and not self._shutdown:
+        lane = None
+        if any(t.quarantined and not t.is_completed for t in self.tasks.values()):
+            lane = asyncio.ensure_future(self._run_quarantine_lane())
+        try:
+            await self._execute_blocking_tasks()
+            if lane:
+                await self._drain_quarantine_lane(lane)
+        finally:
+            if lane and not lane.done():
+                lane.cancel()
+                await asyncio.gather(lane, return_exceptions=True)
+
+    async def _execute_blocking_tasks(self):
+        """执行影响构建结果的任务（关键路径）"""
+        while not self._blocking_tasks_completed() and not self._shutdown:
             # 获取可执行的任务
             ready_tasks = self._get_ready_tasks()
 
             if not ready_tasks:
-                if self.running_tasks:
+                if self._blocking_running():
                     # 等待运行中的任务完成
                     await asyncio.sleep(1)
                     continue
@@ -300,14 +725,16 @@ class TestScheduler:
     def _get_ready_tasks(self) -> List[TestTask]:
         """获取可执行的任务"""
         ready = []
+        # 隔离通道不占用阻塞任务的并发槽
         max_parallel = min(
             self.config.parallel_workers,
-            self.config.parallel_workers - len(self.running_tasks),
+            self.config.parallel_workers - len(self._blocking_running()),
         )
 
         for task in self.tasks.values():
             if (
                 task.status == TestStatus.PENDING
+                and not task.quarantined
                 and len(ready) < max_parallel
                 and self._dependencies_satisfied(task)
             ):
@@ -319,22 +746,166 @@ class TestScheduler:
         """检查任务依赖是否满足"""
         for dep_id in task.dependencies:
             dep_task = self.tasks.get(dep_id)
-            if not dep_task or not dep_task.is_successful:
+            # 本次未调度的依赖（例如变更驱动时未受影响的应用）和隔离任务不阻塞任务
+            if dep_task and not dep_task.quarantined and not dep_task.is_successful:
                 return False
         return True
 
+    def _running_task_pids(self) -> Dict[str, int]:
+        """运行中任务的根进程 pid（资源监控线程调用，用于按进程树归因）"""
+        pids = {}
+        for task_id in list(self.running_tasks):
+            pid = self.backend.pid(task_id)
+            if pid:
+                pids[task_id] = pid
+        return pids
+
+    def _blocking_running(self) -> List[str]:
+        """运行中的阻塞任务"""
+        return [
+            task_id for task_id in self.running_tasks if not self.tasks[task_id].quarantined
+        ]
+
+    def collect_metrics(self) -> List[MetricFamily]:
+        """调度器当前状态（/metrics 抓取时调用）"""
+        # 在抓取线程中调用，先复制一份避免与事件循环并发修改
+        pending = [
+            task
+            for task in list(self.tasks.values())
+            if task.status == TestStatus.PENDING and not task.quarantined
+        ]
+        ready = sum(1 for task in pending if self._dependencies_satisfied(task))
+        running = {"blocking": 0, "quarantine": 0}
+        for task_id in list(self.running_tasks):
+            lane = "quarantine" if self.tasks[task_id].quarantined else "blocking"
+            running[lane] += 1
+        workers = self.config.parallel_workers
+
+        families = [
+            MetricFamily(
+                "orchestrator_queue_depth", "gauge", "等待执行的阻塞任务数"
+            ).add(len(pending)),
+            MetricFamily(
+                "orchestrator_ready_tasks", "gauge", "依赖已满足、可立即执行的任务数"
+            ).add(ready),
+            MetricFamily("orchestrator_running_tasks", "gauge", "运行中的任务数")
+            .add(running["blocking"], lane="blocking")
+            .add(running["quarantine"], lane="quarantine"),
+            MetricFamily("orchestrator_worker_slots", "gauge", "并发槽位")
+            .add(min(workers, running["blocking"]), state="used")
+            .add(max(0, workers - running["blocking"]), state="free"),
+        ]
+        if self.core_budget:
+            families.append(
+                MetricFamily("orchestrator_core_budget", "gauge", "CPU 核心预算")
+                .add(self.core_budget.reserved, state="reserved")
+                .add(self.core_budget.free, state="free")
+            )
+        return families
+
+    async def _run_quarantine_lane(self):
+        """隔离通道：只利用阻塞任务空出的并发槽，以低优先级运行隔离中的任务"""
+        running: Set[asyncio.Future] = set()
+        try:
+            while not self._shutdown:
+                pending = [
+                    t
+                    for t in self.tasks.values()
+                    if t.quarantined and t.status == TestStatus.PENDING
+                ]
+                if not pending and not running:
+                    break
+
+                spare = self.config.parallel_workers - len(self._blocking_running())
+                if not self._blocking_tasks_completed() and any(
+                    t.status == TestStatus.PENDING and not t.quarantined
+                    and self._dependencies_satisfied(t)
+                    for t in self.tasks.values()
+                ):
+                    # 有阻塞任务等待调度时让出空闲槽
+                    spare = 0
+                for task in pending:
+                    if len(running) >= min(spare, self._lane_workers):
+                        break
+                    ready = self._lane_dependencies_ready(task)
+                    if ready is None:
+                        continue
+                    if not ready:
+                        task.status = TestStatus.SKIPPED
+                        task.error = "依赖任务失败"
+                        self._notify_complete(task)
+                        continue
+                    running.add(asyncio.ensure_future(self._execute_single_task(task)))
+
+                if running:
+                    _, running = await asyncio.wait(running, timeout=0.5)
+                else:
+                    await asyncio.sleep(0.5)
+        finally:
+            for future in running:
+                future.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+    def _lane_dependencies_ready(self, task: TestTask) -> Optional[bool]:
+        """隔离任务的依赖状态：None 为等待中，False 为阻塞依赖已失败"""
+        for dep_id in task.dependencies:
+            dep_task = self.tasks.get(dep_id)
+            if not dep_task or dep_task.quarantined:
+                continue
+            if not dep_task.is_completed:
+                return None
+            if not dep_task.is_successful:
+                return False
+        return True
+
+    async def _drain_quarantine_lane(self, lane: asyncio.Future):
+        """阻塞任务结束后，最多再等待 grace 秒让隔离通道跑完，超时的任务记为跳过"""
+        grace = self._lane_grace
+        if grace is None:
+            await lane
+            return
+        done, _ = await asyncio.wait({lane}, timeout=max(0.0, float(grace)))
+        if done:
+            return
+        lane.cancel()
+        await asyncio.gather(lane, return_exceptions=True)
+        for task in self.tasks.values():
+            if task.quarantined and not task.is_completed:
+                task.status = TestStatus.SKIPPED
+                task.error = f"隔离通道超过等待时间 ({grace}s)"
+                self._notify_complete(task)
+        self.logger.info(f"隔离通道超过等待时间 {grace}s，剩余隔离任务已跳过")
+
     def _has_available_resources(self) -> bool:
         """检查是否有可用资源"""
-        cpu_percent = psutil.cpu_percent(interval=1)
+        # 没有运行中的任务时总是放行，外部负载不会让调度饿死
+        if not self._blocking_running():
+            return True
+
+        thresholds = self.config.execution.resource_threshold
         memory_percent = psutil.virtual_memory().percent
+        if memory_percent >= thresholds.get("memory_percent", 85):
+            return False
+
+        # PSI 可用时按真实停顿时间限流：CPU 使用率高但没有任务在排队时照常调度
+        pressure = pressure_percentages(read_pressure())
+        if pressure:
+            return (
+                pressure["cpu_pressure"] < thresholds.get("cpu_pressure", 40)
+                and pressure["memory_pressure"] < thresholds.get("memory_pressure", 10)
+                and pressure["io_pressure"] < thresholds.get("io_pressure", 30)
+            )
 
-        return cpu_percent < 80 and memory_percent < 85
+        # 非阻塞采样：返回距上次调用以来的 CPU 使用率，避免每轮调度阻塞 1 秒
+        cpu_percent = psutil.cpu_percent(interval=None)
+        return cpu_percent < thresholds.get("cpu_percent", 80)
 
     async def _execute_ready_tasks(self, ready_tasks: List[TestTask]):
         """并行执行准备好的任务"""
         tasks = []
         for task in ready_tasks:
-            if len(self.running_tasks) < self.config.parallel_workers:
+            if len(self._blocking_running()) < self.config.parallel_workers:
                 tasks.append(self._execute_single_task(task))
 
         if tasks:
@@ -349,9 +920,35 @@ class TestScheduler:
         self.logger.info(f"开始执行任务: {task.id}")
 
         try:
-            # 在线程池中执行命令
             loop = asyncio.get_event_loop()
-            await loop.run_in_executor(self.executor, self._run_task_command, task)
+
+            # 为任务分配独立的数据库克隆
+            if self._needs_database(task):
+                db_env = await loop.run_in_executor(
+                    self.executor, self.db_provisioner.acquire, task.id, task.app
+                )
+                task.env.update(db_env)
+
+            # 按并发任务数切分 CPU 核心，限制测试运行器的 worker 数
+            if self.core_budget:
+                active = sum(
+                    1
+                    for t in self.tasks.values()
+                    if t.status in (TestStatus.PENDING, TestStatus.RUNNING)
+                )
+                task.cores = self.core_budget.acquire(task.id, concurrent=active)
+                task.env.update(task.cores.env())
+
+            await self._run_task_command(task)
+
+        except asyncio.CancelledError:
+            # 运行被取消（例如 watch 模式下有更新的变更），不计为失败；
+            # 隔离通道超时取消的只是该任务本身
+            if not task.quarantined:
+                self._shutdown = True
+            task.status = TestStatus.SKIPPED
+            task.error = "任务被取消"
+            raise
 
         except Exception as e:
             self.logger.error(f"任务 {task.id} 执行异常: {e}")
@@ -361,67 +958,125 @@ class TestScheduler:
         finally:
             task.end_time = time.time()
             self.running_tasks.discard(task.id)
-
+            TASK_DURATION.observe(
+                task.duration or 0.0, suite=task.suite.value, status=task.status.value
+            )
+            task.resource_usage = self.resource_monitor.get_task_usage(task.id) or {}
+            self.db_provisioner.release(task.id)
+            if self.core_budget:
+                self.core_budget.release(task.id)
+            stats = None
+            if task.status in (TestStatus.PASSED, TestStatus.FAILED):
+                # 每次尝试都计入 flaky 评分窗口，达到阈值时自动隔离 / 解除隔离
+                stats = await self._record_flaky_attempt(task)
             if task.is_successful:
                 self.completed_tasks.add(task.id)
-            else:
+            elif task.status != TestStatus.SKIPPED:
                 self.failed_tasks.add(task.id)
 
-                # 重试失败的任务
+                # 重试失败的任务；同一代码版本上确定性失败的不再重试
                 if task.retry_count < task.max_retries:
-                    await self._retry_task(task)
-                else:
-                    # flaky 隔离：重试后仍失败，标记为隔离并写入清单
-                    self.logger.warning(f"任务 {task.id} 标记为 flaky/隔离")
-                    try:
-                        self.flaky_store.add(task.id)
-                    except Exception as e:
-                        self.logger.error(f"写入 flaky 清单失败: {e}")
-
-    def _run_task_command(self, task: TestTask):
-        """在子进程中运行测试命令"""
+                    if task.app and self.db_provisioner.prepare_error(task.app):
+                        self.logger.info(f"任务 {task.id} 的数据库不可用，不再重试")
+                    elif stats and stats.deterministic_failure:
+                        self.logger.info(f"任务 {task.id} 在当前版本上确定性失败，不再重试")
+                    else:
+                        await self._retry_task(task)
+
+            # 只回调最终结果（进入重试的任务状态已重置为 PENDING）
+            if task.is_completed:
+                self._notify_complete(task)
+
+    def _notify_complete(self, task: TestTask):
+        """回调任务最终结果"""
+        if not self.on_task_complete:
+            return
         try:
-            env = {**os.environ, **task.env}
-
-            process = subprocess.Popen(
-                task.command,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                env=env,
-                cwd=self.config.project_root,
+            self.on_task_complete(task)
+        except Exception as e:
+            self.logger.debug(f"任务回调异常: {e}")
+
+    async def _run_task_command(self, task: TestTask):
+        """通过执行后端运行测试命令"""
+        command = task.command
+        if task.cores:
+            command = inject_worker_flags(
+                command, task.cores.workers, Path(self.config.project_root)
             )
 
-            task.process = process
-
-            # 等待进程完成或超时
-            try:
-                output, _ = process.communicate(timeout=task.timeout)
-                task.output = output
-                task.return_code = process.returncode
-
-                if process.returncode == 0:
-                    task.status = TestStatus.PASSED
-                else:
-                    task.status = TestStatus.FAILED
-
-            except subprocess.TimeoutExpired:
-                process.kill()
-                task.status = TestStatus.ERROR
-                task.error = f"任务超时 ({task.timeout}s)"
+        dispatched_at = time.time()
+        result = await self.backend.execute(
+            ExecutionRequest(
+                task_id=task.id,
+                command=command,
+                cwd=self.config.project_root,
+                env=task.env,
+                timeout=task.timeout,
+                merge_stderr=True,
+                nice=self._lane_nice if task.quarantined else 0,
+            ),
+            on_start=task.cores.apply_affinity if task.cores else None,
+        )
+        if result.spawned_at >= dispatched_at:
+            SPAWN_LATENCY.observe(
+                result.spawned_at - dispatched_at, backend=result.backend or "unknown"
+            )
+        if result.cancelled or self._shutdown:
+            # 调度器已停止，进程是被主动终止的
+            return
 
-        except Exception as e:
+        task.output = result.stdout
+        task.return_code = result.return_code
+        if result.error:
             task.status = TestStatus.ERROR
-            task.error = str(e)
+            task.error = result.error
+        elif result.timed_out:
+            task.status = TestStatus.ERROR
+            task.error = f"任务超时 ({task.timeout}s)"
+        elif result.return_code == 0:
+            task.status = TestStatus.PASSED
+        else:
+            task.status = TestStatus.FAILED
+
+    async def _record_flaky_attempt(self, task: TestTask) -> Optional[FlakyStats]:
+        """记录一次尝试结果（SQLite 写入放到线程池，不阻塞事件循环）"""
+        if not self.config.execution.flaky_management.get("enabled", True):
+            return None
+        passed = task.status == TestStatus.PASSED
+        loop = asyncio.get_running_loop()
+        try:
+            if self._code_version is None:
+                # 被测代码版本：HEAD + 未提交变更，区分 flaky 与真实破坏
+                self._code_version = await loop.run_in_executor(
+                    self.executor, workspace_fingerprint, self.git.repo_root
+                )
+            was_quarantined = self.flaky_store.contains(task.id)
+            stats = await loop.run_in_executor(
+                self.executor,
+                self.flaky_store.record,
+                task.id,
+                passed,
+                self._code_version,
+            )
+            if stats.quarantined and not was_quarantined:
+                self.logger.warning(
+                    f"任务 {task.id} flaky 评分 {stats.score:.2f}"
+                    f"（同版本翻转 {stats.window_version_flips} 次），标记为隔离"
+                )
+            elif was_quarantined and not stats.quarantined:
+                self.logger.info(f"任务 {task.id} 已连续通过 {stats.pass_streak} 次，解除隔离")
+            return stats
+        except Exception as e:
+            self.logger.error(f"写入 flaky 记录失败: {e}")
+            return None
 
     async def _retry_task(self, task: TestTask):
         """重试失败的任务"""
         task.retry_count += 1
+        TASK_RETRIES.inc(suite=task.suite.value)
         task.status = TestStatus.PENDING
         task.start_time = None
         task.end_time = None
-        task.process = None
 
         self.logger.info(
             f"重试任务 {task.id} (第 {task.retry_count}/{task.max_retries} 次)"
@@ -434,20 +1089,22 @@ class TestScheduler:
         """检查是否所有任务都已完成"""
         return all(task.is_completed for task in self.tasks.values())
 
+    def _blocking_tasks_completed(self) -> bool:
+        """检查影响构建结果的任务是否都已完成"""
+        return all(
+            task.is_completed for task in self.tasks.values() if not task.quarantined
+        )
+
     async def _cleanup(self):
         """清理资源"""
-        # 终止所有运行中的进程
-        for task in self.tasks.values():
-            if task.process and task.process.poll() is None:
-                try:
-                    task.process.terminate()
-                    await asyncio.sleep(2)
-                    if task.process.poll() is None:
-                        task.process.kill()
-                except:
-                    pass
+        # 终止所有运行中的进程组：最多等待 2 秒优雅退出，之后强制终止
+        await self.backend.cancel_all(grace=2)
+        self.backend.shutdown()
 
+        if self._owns_db_provisioner:
+            self.db_provisioner.cleanup()
         self.executor.shutdown(wait=True)
+        self.flaky_store.close()
 
     def _log_summary(self):
         """输出执行摘要"""
@@ -465,11 +1122,17 @@ class TestScheduler:
         self.logger.info(f"通过: {passed}")
         self.logger.info(f"失败: {failed}")
         self.logger.info(f"错误: {errors}")
+        quarantined = [t for t in self.tasks.values() if t.quarantined]
+        if quarantined:
+            quarantined_passed = len([t for t in quarantined if t.is_successful])
+            self.logger.info(
+                f"隔离通道: {quarantined_passed}/{len(quarantined)} 通过（不影响构建结果）"
+            )
         self.logger.info(f"总耗时: {total_duration:.2f}s")
         self.logger.info("=" * 60)
 
         # 输出失败任务详情
-        failed_tasks = [t for t in self.tasks.values() if not t.is_successful]
+        failed_tasks = [t for t in self.tasks.values() if t.is_blocking_failure]
         if failed_tasks:
             self.logger.error("失败任务详情:")
             for task in failed_tasks:
@@ -483,19 +1146,87 @@ class TestScheduler:
 
 # 工具函数
 async def run_test_suite(
-    config: TestConfig, suite: TestSuite, app: Optional[str] = None
+    config: TestConfig,
+    suite: TestSuite,
+    app: Optional[str] = None,
+    budget: Optional[float] = None,
+    on_plan: Optional[Callable[[BudgetPlan], None]] = None,
 ) -> Dict[str, TestTask]:
     """运行测试套件的便利函数"""
     scheduler = TestScheduler(config)
 
     try:
-        await scheduler.add_tasks_from_suite(suite, app)
+        await _select_tasks(scheduler, suite, app, budget, on_plan)
         results = await scheduler.run_all()
         return results
     finally:
         await scheduler.stop()
 
 
+async def _select_tasks(
+    scheduler: TestScheduler,
+    suite: TestSuite,
+    app: Optional[str],
+    budget: Optional[float],
+    on_plan: Optional[Callable[[BudgetPlan], None]],
+):
+    """生成任务并按预测选择和时间预算裁剪"""
+    await scheduler.add_tasks_from_suite(suite, app)
+    predictive = scheduler.config.execution.smart_testing.get("predictive", {}) or {}
+    if predictive.get("enabled", False):
+        scheduler.apply_predictive_selection()
+    if budget:
+        plan = scheduler.apply_budget(budget)
+        if on_plan:
+            on_plan(plan)
+
+
+async def compile_plan(
+    config: TestConfig,
+    suite: TestSuite,
+    app: Optional[str] = None,
+    budget: Optional[float] = None,
+    config_path: Optional[str] = None,
+) -> ExecutionPlan:
+    """生成任务并编译为执行计划（不执行）"""
+    scheduler = TestScheduler(config)
+    try:
+        await _select_tasks(scheduler, suite, app, budget, None)
+    finally:
+        scheduler.executor.shutdown(wait=False)
+        scheduler.backend.shutdown()
+
+    smart_testing = config.execution.smart_testing
+    change_driven = not app and config.changed_only
+    predictive = (smart_testing.get("predictive", {}) or {}).get("enabled", False)
+    return ExecutionPlan(
+        options={
+            "suite": suite.value,
+            "app": app,
+            "changed_only": config.changed_only,
+            "predictive": predictive,
+            "budget": budget,
+        },
+        inputs=collect_inputs(
+            config_path,
+            [a.env_file for a in config.apps.values() if a.env_file],
+            include_workspace=change_driven or predictive,
+        ),
+        config=config_to_dict(config),
+        tasks=scheduler.export_tasks(),
+    )
+
+
+async def run_plan(plan: ExecutionPlan) -> Dict[str, TestTask]:
+    """直接执行预编译的计划"""
+    scheduler = TestScheduler(config_from_dict(plan.config))
+    try:
+        scheduler.load_tasks(plan.tasks)
+        return await scheduler.run_all()
+    finally:
+        await scheduler.stop()
+
+
 if __name__ == "__main__":
     import os
 
@@ -0,0 +1,370 @@
+"""
+声明式告警规则引擎
+
+规则从 YAML 加载（指标、比较符、阈值、持续时间、回差、级别、标签），每到一个样本只评估
+订阅该指标的规则，按 (规则, 序列标签) 维护 pending / firing 状态：持续满足 for 时长才触发，
+越过回差才恢复，触发和恢复各只产生一次事件。评估开销与保存了多少历史数据无关
+"""
+
+from __future__ import annotations
+
+import operator
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import yaml
+
+# 规则统一使用的指标名（与 ResourceSnapshot 字段一致），各监控器上报前换算到这些名字
+# cpu_percent / memory_percent / disk_usage_percent：使用率 %
+# cpu_pressure / memory_pressure / io_pressure：PSI avg10 停顿占比 %
+# test_success_rate：%，test_failure_rate：0~1
+
+COMPARATORS: Dict[str, Callable[[float, float], bool]] = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+SEVERITIES = ("info", "warning", "error", "critical")
+
+DEFAULT_RULES_FILE = Path(__file__).resolve().parents[2] / "alert_rules.yml"
+
+# 规则文件缺失时的最小兜底规则，完整默认规则以 testing/alert_rules.yml 为准
+FALLBACK_RULES: List[Dict[str, Any]] = [
+    {
+        "name": "cpu_critical",
+        "metric": "cpu_percent",
+        "comparator": ">=",
+        "threshold": 90,
+        "for": "15s",
+        "hysteresis": 5,
+        "severity": "critical",
+        "message": "CPU 使用率过高: {value:.1f}%",
+    },
+    {
+        "name": "memory_critical",
+        "metric": "memory_percent",
+        "comparator": ">=",
+        "threshold": 95,
+        "hysteresis": 2,
+        "severity": "critical",
+        "message": "内存使用率过高: {value:.1f}%",
+    },
+    {
+        "name": "disk_high",
+        "metric": "disk_usage_percent",
+        "comparator": ">",
+        "threshold": 90,
+        "hysteresis": 1,
+        "severity": "critical",
+        "message": "磁盘使用率过高: {value:.1f}%",
+    },
+]
+
+# 序列超过该时长（秒）没有新样本时，丢弃其 pending 状态
+DEFAULT_STALE_AFTER = 300.0
+
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_duration(value: Union[str, int, float, None]) -> float:
+    """持续时间：数字（秒）或 "30s" / "5m" / "1h" / "1d" """
+    if value is None or value == "":
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip()
+    unit = _DURATION_UNITS.get(text[-1:].lower())
+    if unit is None:
+        return float(text)
+    return float(text[:-1]) * unit
+
+
+@dataclass
+class AlertRule:
+    """一条告警规则"""
+
+    name: str
+    metric: str
+    comparator: str = ">"
+    threshold: float = 0.0
+    # 条件需持续满足的秒数，0 表示第一个样本即触发
+    for_seconds: float = 0.0
+    # 恢复时需越过阈值的幅度：> / >= 规则在 value 回落到 threshold - hysteresis 以下时恢复
+    hysteresis: float = 0.0
+    severity: str = "warning"
+    # 附加到告警上的标签
+    labels: Dict[str, str] = field(default_factory=dict)
+    # 只评估标签包含这些键值的序列（如只看某个 app）
+    match: Dict[str, str] = field(default_factory=dict)
+    message: str = ""
+
+    def __post_init__(self):
+        if self.comparator not in COMPARATORS:
+            raise ValueError(f"告警规则 {self.name}: 不支持的比较符 {self.comparator}")
+        if self.severity not in SEVERITIES:
+            raise ValueError(f"告警规则 {self.name}: 不支持的级别 {self.severity}")
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AlertRule":
+        return cls(
+            name=data["name"],
+            metric=data["metric"],
+            comparator=data.get("comparator", ">"),
+            threshold=float(data.get("threshold", 0.0)),
+            for_seconds=parse_duration(data.get("for")),
+            hysteresis=float(data.get("hysteresis", 0.0)),
+            severity=data.get("severity", "warning"),
+            labels=dict(data.get("labels") or {}),
+            match=dict(data.get("match") or {}),
+            message=data.get("message", ""),
+        )
+
+    def matches(self, labels: Dict[str, str]) -> bool:
+        return all(labels.get(k) == v for k, v in self.match.items())
+
+    def breached(self, value: float) -> bool:
+        return COMPARATORS[self.comparator](value, self.threshold)
+
+    def recovered(self, value: float) -> bool:
+        """触发后是否已越过回差恢复"""
+        if self.comparator in (">", ">="):
+            return not COMPARATORS[self.comparator](value, self.threshold - self.hysteresis)
+        if self.comparator in ("<", "<="):
+            return not COMPARATORS[self.comparator](value, self.threshold + self.hysteresis)
+        return not self.breached(value)
+
+    def format_message(self, value: float, labels: Dict[str, str]) -> str:
+        template = self.message or f"{self.metric} {self.comparator} {{threshold}}: {{value}}"
+        # value / threshold 优先于同名的序列标签
+        fields = {**labels, "value": value, "threshold": self.threshold}
+        try:
+            return template.format(**fields)
+        except (KeyError, IndexError, ValueError):
+            return f"{self.name}: {self.metric}={value}"
+
+
+@dataclass
+class AlertEvent:
+    """规则状态变化：firing（开始告警）或 resolved（恢复）"""
+
+    rule: AlertRule
+    status: str
+    value: float
+    labels: Dict[str, str]
+    started_at: float  # 开始满足条件的时间
+    timestamp: float
+    message: str
+
+    @property
+    def key(self) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+        """去重键：规则名 + 序列标签"""
+        return self.rule.name, tuple(sorted(self.labels.items()))
+
+    @property
+    def severity(self) -> str:
+        return self.rule.severity
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "rule": self.rule.name,
+            "metric": self.rule.metric,
+            "status": self.status,
+            "severity": self.rule.severity,
+            "value": self.value,
+            "threshold": self.rule.threshold,
+            "labels": {**self.rule.labels, **self.labels},
+            "started_at": self.started_at,
+            "timestamp": self.timestamp,
+            "message": self.message,
+        }
+
+
+@dataclass
+class _RuleState:
+    pending_since: float
+    updated: float
+    firing: bool = False
+    value: float = 0.0
+
+
+def load_rules(
+    source: Union[str, Path, Iterable[Dict[str, Any]], None] = None,
+) -> List[AlertRule]:
+    """加载规则：规则字典列表、YAML 文件路径（顶层 rules 列表），默认 testing/alert_rules.yml
+
+    文件不存在时使用 FALLBACK_RULES
+    """
+    if source is None:
+        source = DEFAULT_RULES_FILE
+    if isinstance(source, (str, Path)):
+        path = Path(source)
+        if not path.exists():
+            return [AlertRule.from_dict(rule) for rule in FALLBACK_RULES]
+        with open(path, "r", encoding="utf-8") as f:
+            data = yaml.safe_load(f) or {}
+        source = data.get("rules", []) if isinstance(data, dict) else data
+    return [AlertRule.from_dict(rule) for rule in source]
+
+
+class AlertEngine:
+    """增量评估告警规则并维护告警状态
+
+    只为处于 pending / firing 的 (规则, 序列) 保存状态，恢复后即删除；
+    超过 stale_after 秒没有新样本的序列（如已结束的任务），其 pending 状态也会被丢弃
+    """
+
+    def __init__(
+        self,
+        rules: Optional[Iterable[AlertRule]] = None,
+        stale_after: float = DEFAULT_STALE_AFTER,
+    ):
+        self.stale_after = stale_after
+        self._last_sweep: Optional[float] = None
+        self.rules: List[AlertRule] = []
+        self._by_metric: Dict[str, List[AlertRule]] = {}
+        self._states: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], _RuleState] = {}
+        self._listeners: List[Callable[[AlertEvent], None]] = []
+        for rule in load_rules() if rules is None else rules:
+            self.add_rule(rule)
+
+    @classmethod
+    def from_config(
+        cls, source: Union[str, Path, Iterable[Dict[str, Any]], None] = None
+    ) -> "AlertEngine":
+        return cls(load_rules(source))
+
+    def add_rule(self, rule: AlertRule) -> None:
+        self.rules.append(rule)
+        self._by_metric.setdefault(rule.metric, []).append(rule)
+
+    def add_listener(self, callback: Callable[[AlertEvent], None]) -> None:
+        """注册状态变化回调"""
+        self._listeners.append(callback)
+
+    @property
+    def metrics(self) -> List[str]:
+        """有规则订阅的指标"""
+        return list(self._by_metric)
+
+    def observe(
+        self,
+        metric: str,
+        value: Optional[float],
+        timestamp: Optional[float] = None,
+        labels: Optional[Dict[str, str]] = None,
+    ) -> List[AlertEvent]:
+        """输入一个样本，返回由此产生的状态变化"""
+        rules = self._by_metric.get(metric)
+        if not rules or value is None:
+            return []
+        timestamp = time.time() if timestamp is None else timestamp
+        labels = labels or {}
+        label_key = tuple(sorted(labels.items()))
+        events = []
+        for rule in rules:
+            if not rule.matches(labels):
+                continue
+            key = (rule.name, label_key)
+            state = self._states.get(key)
+            if state is not None and state.firing:
+                state.value = value
+                state.updated = timestamp
+                if rule.recovered(value):
+                    del self._states[key]
+                    events.append(
+                        self._event(rule, "resolved", value, labels, state.pending_since, timestamp)
+                    )
+                continue
+
+            if not rule.breached(value):
+                # 条件中断，pending 重新计时
+                self._states.pop(key, None)
+                continue
+            if state is None:
+                state = self._states[key] = _RuleState(
+                    pending_since=timestamp, updated=timestamp
+                )
+            state.value = value
+            state.updated = timestamp
+            if timestamp - state.pending_since >= rule.for_seconds:
+                state.firing = True
+                events.append(
+                    self._event(rule, "firing", value, labels, state.pending_since, timestamp)
+                )
+
+        self._evict_stale(timestamp)
+        for event in events:
+            for callback in self._listeners:
+                callback(event)
+        return events
+
+    def _evict_stale(self, now: float) -> None:
+        """丢弃长时间没有样本的序列的 pending 状态（每 stale_after 秒最多扫描一次）"""
+        if self._last_sweep is None:
+            self._last_sweep = now
+        if now - self._last_sweep < self.stale_after:
+            return
+        self._last_sweep = now
+        cutoff = now - self.stale_after
+        for key in [
+            key
+            for key, state in self._states.items()
+            if not state.firing and state.updated < cutoff
+        ]:
+            del self._states[key]
+
+    def observe_many(
+        self,
+        values: Dict[str, Optional[float]],
+        timestamp: Optional[float] = None,
+        labels: Optional[Dict[str, str]] = None,
+    ) -> List[AlertEvent]:
+        """同一时刻的多个指标"""
+        events = []
+        for metric, value in values.items():
+            events.extend(self.observe(metric, value, timestamp, labels))
+        return events
+
+    def _event(
+        self,
+        rule: AlertRule,
+        status: str,
+        value: float,
+        labels: Dict[str, str],
+        started_at: float,
+        timestamp: float,
+    ) -> AlertEvent:
+        return AlertEvent(
+            rule=rule,
+            status=status,
+            value=value,
+            labels=dict(labels),
+            started_at=started_at,
+            timestamp=timestamp,
+            message=(
+                rule.format_message(value, labels)
+                if status == "firing"
+                else f"{rule.name} 已恢复: {rule.metric}={value:.4g}"
+            ),
+        )
+
+    def firing(self) -> List[Dict[str, Any]]:
+        """当前处于告警状态的 (规则, 序列)"""
+        rules = {rule.name: rule for rule in self.rules}
+        return [
+            {
+                "rule": name,
+                "severity": rules[name].severity,
+                "labels": {**rules[name].labels, **dict(label_key)},
+                "value": state.value,
+                "since": state.pending_since,
+            }
+            for (name, label_key), state in self._states.items()
+            if state.firing
+        ]
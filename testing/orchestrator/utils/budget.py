@@ -0,0 +1,124 @@
+"""
+时间预算选择：在给定时间内挑选期望发现失败最多的任务子集（0/1 背包）
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from statistics import median
+from typing import Dict, List
+
+from utils.test_history import TaskStats
+
+# 背包容量离散化的最大格数，保证 DP 规模可控
+MAX_BUCKETS = 2000
+
+_BUDGET_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([smh]?)\s*$", re.IGNORECASE)
+_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_budget(value: str) -> float:
+    """解析时间预算，如 90、90s、5m、1.5h，返回秒数"""
+    match = _BUDGET_PATTERN.match(value or "")
+    if not match:
+        raise ValueError(f"无法解析时间预算: {value}")
+    seconds = float(match.group(1)) * _UNITS[match.group(2).lower()]
+    if seconds <= 0:
+        raise ValueError(f"时间预算必须大于 0: {value}")
+    return seconds
+
+
+@dataclass
+class BudgetItem:
+    """候选任务"""
+
+    task_id: str
+    duration: float
+    failure_probability: float
+    has_history: bool
+
+
+@dataclass
+class BudgetPlan:
+    """预算选择结果"""
+
+    budget: float
+    workers: int
+    selected: List[BudgetItem] = field(default_factory=list)
+    deferred: List[BudgetItem] = field(default_factory=list)
+
+    @property
+    def expected_duration(self) -> float:
+        """按并行度估算的耗时"""
+        return sum(item.duration for item in self.selected) / max(1, self.workers)
+
+    @property
+    def expected_failures(self) -> float:
+        """预计能发现的失败数"""
+        return sum(item.failure_probability for item in self.selected)
+
+
+def build_items(
+    task_ids: List[str], history: Dict[str, TaskStats], default_duration: float
+) -> List[BudgetItem]:
+    """根据历史统计构建候选项，无历史的任务使用已知耗时的中位数"""
+    known = [history[t].avg_duration for t in task_ids if t in history]
+    fallback = median(known) if known else default_duration
+
+    items = []
+    for task_id in task_ids:
+        stats = history.get(task_id)
+        items.append(
+            BudgetItem(
+                task_id=task_id,
+                duration=stats.avg_duration if stats else fallback,
+                failure_probability=(stats or TaskStats()).failure_probability,
+                has_history=stats is not None,
+            )
+        )
+    return items
+
+
+def select_within_budget(
+    items: List[BudgetItem], budget: float, workers: int = 1
+) -> BudgetPlan:
+    """0/1 背包选择：容量为 budget * workers，单个任务耗时不能超过 budget"""
+    plan = BudgetPlan(budget=budget, workers=max(1, workers))
+    capacity = budget * plan.workers
+
+    candidates = [item for item in items if item.duration <= budget]
+    plan.deferred = [item for item in items if item.duration > budget]
+    if capacity <= 0:
+        # 零或负预算（例如请求中直接传入的 0）：全部延后，避免按 0 容量离散化
+        candidates = []
+        plan.deferred = list(items)
+
+    resolution = capacity / MAX_BUCKETS
+    slots = MAX_BUCKETS
+    weights = [max(1, int(round(item.duration / resolution))) for item in candidates]
+
+    # best[c] 为容量 c 时的最大期望失败数，keep[i][c] 记录是否选择第 i 项
+    best = [0.0] * (slots + 1)
+    keep = [bytearray(slots + 1) for _ in candidates]
+    for i, item in enumerate(candidates):
+        weight = weights[i]
+        value = item.failure_probability
+        for c in range(slots, weight - 1, -1):
+            if best[c - weight] + value > best[c]:
+                best[c] = best[c - weight] + value
+                keep[i][c] = 1
+
+    chosen = set()
+    c = slots
+    for i in range(len(candidates) - 1, -1, -1):
+        if keep[i][c]:
+            chosen.add(i)
+            c -= weights[i]
+
+    for i, item in enumerate(candidates):
+        (plan.selected if i in chosen else plan.deferred).append(item)
+
+    plan.selected.sort(key=lambda item: -item.failure_probability)
+    plan.deferred.sort(key=lambda item: -item.failure_probability)
+    return plan
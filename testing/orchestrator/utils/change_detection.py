@@ -0,0 +1,176 @@
+"""
+变更检测服务：一次 `git diff -z --name-status` 对比 merge-base（包含已暂存和未暂存的修改），
+加上未跟踪文件，识别重命名；提交之间的对比结果按 (base sha, head sha) 在进程内缓存，
+供所有运行器共享，包含工作区的结果随时可能变化，每次重新检测
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import subprocess
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from utils.metrics import record_cache
+
+DEFAULT_BASE_REF = os.environ.get("TEST_BASE_REF", "origin/main")
+
+# git 的空树对象，用于没有父提交的仓库
+EMPTY_TREE = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+
+
+@dataclass
+class FileChange:
+    """单个文件变更"""
+
+    path: str
+    status: str  # A/M/D/R/C/T/U，未跟踪文件为 ?
+    old_path: Optional[str] = None  # 重命名/复制的原路径
+
+
+@dataclass
+class ChangeSet:
+    """一次变更检测的结果"""
+
+    base_sha: str
+    head_sha: str
+    changes: List[FileChange] = field(default_factory=list)
+
+    @property
+    def files(self) -> List[str]:
+        """所有受影响的路径（重命名同时包含新旧路径）"""
+        paths: Dict[str, None] = {}
+        for change in self.changes:
+            if change.old_path:
+                paths[change.old_path] = None
+            paths[change.path] = None
+        return list(paths)
+
+    @property
+    def renames(self) -> Dict[str, str]:
+        """原路径 -> 新路径"""
+        return {
+            c.old_path: c.path for c in self.changes if c.status == "R" and c.old_path
+        }
+
+
+def parse_name_status(output: str) -> List[FileChange]:
+    """解析 `git diff -z --name-status` 的输出"""
+    tokens = output.split("\0")
+    changes = []
+    i = 0
+    while i < len(tokens) and tokens[i]:
+        status = tokens[i][0]
+        if status in ("R", "C"):
+            changes.append(
+                FileChange(path=tokens[i + 2], status=status, old_path=tokens[i + 1])
+            )
+            i += 3
+        else:
+            changes.append(FileChange(path=tokens[i + 1], status=status))
+            i += 2
+    return changes
+
+
+class ChangeDetector:
+    """变更检测器（同一进程内按 (base sha, head sha) 缓存提交之间的对比结果）"""
+
+    _cache: Dict[Tuple[str, str, str], ChangeSet] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, repo_root: Optional[str] = None) -> None:
+        self.repo_root = Path(
+            repo_root or Path(__file__).resolve().parents[3]
+        ).as_posix()
+
+    def _git(self, *args: str) -> Tuple[int, str]:
+        process = subprocess.run(
+            ["git", *args],
+            cwd=self.repo_root,
+            capture_output=True,
+            text=True,
+        )
+        return process.returncode, process.stdout
+
+    def _rev_parse(self, ref: str) -> Optional[str]:
+        code, out = self._git("rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}")
+        return out.strip() if code == 0 and out.strip() else None
+
+    def _resolve_base(self, base_ref: str, head_sha: str) -> str:
+        """基准提交：base_ref 与 HEAD 的 merge-base，不可用时退回父提交"""
+        base_sha = self._rev_parse(base_ref)
+        if base_sha:
+            code, out = self._git("merge-base", base_sha, head_sha)
+            if code == 0 and out.strip():
+                return out.strip()
+        return self._rev_parse(f"{head_sha}~1") or EMPTY_TREE
+
+    def detect(
+        self,
+        base_ref: Optional[str] = None,
+        head_ref: str = "HEAD",
+        include_worktree: bool = True,
+    ) -> ChangeSet:
+        """检测变更；include_worktree 为真时包含工作区、暂存区和未跟踪文件"""
+        head_sha = self._rev_parse(head_ref)
+        if head_sha is None:
+            return ChangeSet(base_sha="", head_sha="")
+        base_sha = self._resolve_base(base_ref or DEFAULT_BASE_REF, head_sha)
+
+        # 工作区、暂存区和未跟踪文件不体现在 sha 中，不能缓存
+        key = (self.repo_root, base_sha, head_sha)
+        if not include_worktree:
+            with self._lock:
+                cached = self._cache.get(key)
+            record_cache("change_detection", hit=cached is not None)
+            if cached is not None:
+                return cached
+
+        # 不指定 head 时 git diff 对比的是工作区，已包含已提交、已暂存和未暂存的修改
+        diff_args = ["diff", "-z", "--name-status", "-M", base_sha]
+        if not include_worktree:
+            diff_args.append(head_sha)
+        code, out = self._git(*diff_args)
+        changes = parse_name_status(out) if code == 0 else []
+
+        if include_worktree:
+            code, out = self._git("ls-files", "-z", "--others", "--exclude-standard")
+            if code == 0:
+                changes.extend(
+                    FileChange(path=path, status="?") for path in out.split("\0") if path
+                )
+
+        change_set = ChangeSet(base_sha=base_sha, head_sha=head_sha, changes=changes)
+        if not include_worktree:
+            with self._lock:
+                self._cache[key] = change_set
+        return change_set
+
+    @classmethod
+    def clear_cache(cls) -> None:
+        with cls._lock:
+            cls._cache.clear()
+
+
+def get_changed_files(
+    repo_root: Optional[str] = None, base_ref: Optional[str] = None
+) -> List[str]:
+    """便捷函数：返回相对仓库根目录的变更文件列表"""
+    return ChangeDetector(repo_root).detect(base_ref).files
+
+
+def workspace_fingerprint(repo_root: Optional[str] = None) -> str:
+    """工作区状态指纹：HEAD 提交 + 所有未提交变更文件的 mtime/大小"""
+    detector = ChangeDetector(repo_root)
+    change_set = detector.detect()
+    digest = hashlib.sha1(change_set.head_sha.encode())
+    for path in sorted(change_set.files):
+        try:
+            stat = os.stat(os.path.join(detector.repo_root, path))
+            digest.update(f"{path}:{stat.st_mtime_ns}:{stat.st_size}".encode())
+        except OSError:
+            digest.update(f"{path}:-".encode())
+    return digest.hexdigest()
@@ -0,0 +1,148 @@
+"""
+CPU 核心预算：在并行运行的测试任务之间切分核心，并把配额下发给 jest/vitest/playwright
+避免每个测试进程都按 cpus-1 启动 worker 导致的成倍超订
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from utils.runner_args import append_runner_args
+
+# 已显式指定并发的参数，遇到时不再注入
+_WORKER_FLAGS = ("--maxWorkers", "-w", "--workers", "-j", "--threads", "--runInBand", "-i")
+
+
+def available_cores() -> List[int]:
+    """当前进程可用的 CPU 编号（遵循已有的 affinity/cgroup 限制）"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+@dataclass
+class CoreAllocation:
+    """单个任务的核心配额"""
+
+    task_id: str
+    workers: int
+    cpus: List[int] = field(default_factory=list)  # 绑核时的 CPU 编号，未绑核为空
+
+    def env(self) -> Dict[str, str]:
+        """需要注入到任务进程的环境变量"""
+        return {
+            "UV_THREADPOOL_SIZE": str(self.workers),
+            "TEST_MAX_WORKERS": str(self.workers),
+        }
+
+    def apply_affinity(self, pid: int) -> None:
+        """将进程绑定到分配的核心（之后派生的子进程会继承）"""
+        if self.cpus and hasattr(os, "sched_setaffinity"):
+            try:
+                os.sched_setaffinity(pid, self.cpus)
+            except OSError:
+                pass
+
+
+class CoreBudget:
+    """核心预算：按剩余槽位公平切分空闲核心"""
+
+    def __init__(
+        self,
+        slots: int,
+        pin_cpus: bool = False,
+        reserve_cores: int = 0,
+        cores: Optional[List[int]] = None,
+    ):
+        cores = list(cores) if cores is not None else available_cores()
+        if reserve_cores > 0 and len(cores) > reserve_cores:
+            # 为调度器本身和系统保留核心
+            cores = cores[: len(cores) - reserve_cores]
+
+        self.slots = max(1, slots)
+        self.pin_cpus = pin_cpus and hasattr(os, "sched_setaffinity")
+        self.total = len(cores)
+        self._free_cpus = cores
+        self._free = len(cores)
+        self._allocations: Dict[str, CoreAllocation] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, slots: int, options: Optional[Dict]) -> Optional["CoreBudget"]:
+        """从 execution.core_budget 配置创建，未启用时返回 None"""
+        options = options or {}
+        if not options.get("enabled", True):
+            return None
+        return cls(
+            slots=slots,
+            pin_cpus=options.get("pin_cpus", False),
+            reserve_cores=options.get("reserve_cores", 0),
+        )
+
+    @property
+    def free(self) -> int:
+        """未分配的核心数"""
+        return self._free
+
+    @property
+    def reserved(self) -> int:
+        """已分配给运行中任务的 worker 数（每个任务至少 1 个，可能超过 total）"""
+        with self._lock:
+            return sum(a.workers for a in self._allocations.values())
+
+    def acquire(self, task_id: str, concurrent: Optional[int] = None) -> CoreAllocation:
+        """为任务分配核心
+
+        concurrent 为预计同时运行的任务数（含本任务），用于在任务较少时
+        给每个任务更多核心；默认按全部槽位切分。
+        """
+        with self._lock:
+            if task_id in self._allocations:
+                return self._allocations[task_id]
+
+            sharers = min(self.slots, concurrent or self.slots)
+            remaining_slots = max(1, sharers - len(self._allocations))
+            workers = max(1, self._free // remaining_slots)
+
+            cpus: List[int] = []
+            if self.pin_cpus and self._free_cpus:
+                cpus = self._free_cpus[:workers]
+                self._free_cpus = self._free_cpus[len(cpus) :]
+
+            self._free = max(0, self._free - workers)
+            allocation = CoreAllocation(task_id=task_id, workers=workers, cpus=cpus)
+            self._allocations[task_id] = allocation
+            return allocation
+
+    def release(self, task_id: str) -> None:
+        """归还任务占用的核心"""
+        with self._lock:
+            allocation = self._allocations.pop(task_id, None)
+            if allocation is None:
+                return
+            self._free = min(self.total, self._free + allocation.workers)
+            if allocation.cpus:
+                self._free_cpus = sorted(self._free_cpus + allocation.cpus)
+
+
+def _worker_args(workers: int):
+    def build(runner: str, tokens: List[str]) -> Optional[List[str]]:
+        # 已显式指定并发时不再注入
+        if any(t.split("=")[0] in _WORKER_FLAGS for t in tokens):
+            return None
+        if runner == "playwright":
+            return [f"--workers={workers}"]
+        if runner == "vitest":
+            return [f"--maxWorkers={workers}", "--minWorkers=1"]
+        return [f"--maxWorkers={workers}"]
+
+    return build
+
+
+def inject_worker_flags(command: str, workers: int, cwd: Path) -> str:
+    """为命令中的 jest/vitest/playwright 调用注入 worker 数"""
+    return append_runner_args(command, cwd, _worker_args(workers))
@@ -0,0 +1,334 @@
+"""
+数据库隔离：每个应用只 setup/seed 一次模板库，并为每个并行 worker 克隆独立的数据库
+PostgreSQL 使用 CREATE DATABASE ... TEMPLATE，SQLite 使用在线备份 API 复制
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import subprocess
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import quote
+
+from utils.logger import get_logger
+
+from config import AppConfig, DatabaseConfig, TestConfig
+
+
+class DatabaseIsolationError(RuntimeError):
+    """数据库准备或克隆失败"""
+
+
+def build_database_url(db: DatabaseConfig, database: str, base_dir: Path) -> str:
+    """根据数据库配置构建连接串"""
+    if db.engine == "sqlite":
+        return f"file:{_sqlite_path(database, base_dir)}"
+    auth = quote(db.username, safe="")
+    if db.password:
+        auth += ":" + quote(db.password, safe="")
+    url = f"postgresql://{auth}@{db.host}:{db.port}/{database}"
+    if db.ssl:
+        url += "?sslmode=require"
+    return url
+
+
+def _sqlite_path(database: str, base_dir: Path) -> Path:
+    """解析 SQLite 文件路径（相对路径基于应用目录）"""
+    path = Path(database)
+    return path if path.is_absolute() else (base_dir / path).resolve()
+
+
+def _remove_sqlite(path: Path) -> None:
+    """删除 SQLite 数据库及其 -wal / -shm / -journal 文件"""
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        Path(f"{path}{suffix}").unlink(missing_ok=True)
+
+
+def _clone_sqlite(source: Path, target: Path) -> None:
+    """复制 SQLite 模板库：备份 API 会读到仍在 -wal 中的已提交数据，
+    直接复制主文件则会丢失；旧克隆的 -wal 也要先删除，否则会被重放到新库上"""
+    _remove_sqlite(target)
+    src = sqlite3.connect(source)
+    try:
+        dst = sqlite3.connect(target)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+    finally:
+        src.close()
+
+
+def _quote_ident(name: str) -> str:
+    """PostgreSQL 标识符转义"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+class DatabaseProvisioner:
+    """数据库供应器：模板库准备一次，worker 级克隆按需创建"""
+
+    def __init__(self, config: TestConfig, max_slots: Optional[int] = None):
+        """max_slots 为每个应用的克隆数，默认按调度器最大并发（含隔离通道）；
+        槽位用尽时 acquire 等待其他任务归还，不报错"""
+        self.config = config
+        self.logger = get_logger("db_isolation")
+        self.project_root = Path(config.project_root).resolve()
+        self.max_slots = max(1, max_slots or config.max_concurrency)
+
+        self._lock = threading.Lock()
+        self._slot_released = threading.Condition(self._lock)
+        self._prepared: Dict[str, bool] = {}
+        # 模板准备失败的应用及原因：本次运行内不再重试 setup/seed
+        self._failed: Dict[str, str] = {}
+        # 等待槽位的任务，以及等待期间已被 release（任务取消）的任务
+        self._waiting: Set[str] = set()
+        self._abandoned: Set[str] = set()
+        self._prepare_locks: Dict[str, threading.Lock] = {}
+        self._free_slots: Dict[str, List[int]] = {}
+        self._leases: Dict[str, Tuple[str, int]] = {}
+        self._clones: Dict[str, Tuple[DatabaseConfig, str, Path]] = {}
+
+    # ------------------------------------------------------------------
+    # 命名
+    # ------------------------------------------------------------------
+
+    def _app_dir(self, app_config: AppConfig) -> Path:
+        return (self.project_root / app_config.path).resolve()
+
+    def _template_name(self, app_name: str, db: DatabaseConfig) -> str:
+        if db.engine == "sqlite":
+            path = Path(db.database)
+            return str(path.with_name(f"{path.stem}_{app_name}_tpl{path.suffix}"))
+        return f"{db.database}_{app_name}_tpl"
+
+    def _clone_name(self, app_name: str, db: DatabaseConfig, slot: int) -> str:
+        if db.engine == "sqlite":
+            path = Path(db.database)
+            return str(path.with_name(f"{path.stem}_{app_name}_w{slot}{path.suffix}"))
+        return f"{db.database}_{app_name}_w{slot}"
+
+    @staticmethod
+    def _is_isolated(app_config: AppConfig) -> bool:
+        db = app_config.database
+        return bool(db and db.required and db.isolation == "template")
+
+    # ------------------------------------------------------------------
+    # 模板准备
+    # ------------------------------------------------------------------
+
+    def prepare(self, app_name: str, app_config: AppConfig) -> None:
+        """为应用准备模板库（setup + seed 仅执行一次，失败后直接抛出上次的错误）"""
+        if not self._is_isolated(app_config) or self._prepared.get(app_name):
+            return
+
+        with self._lock:
+            prepare_lock = self._prepare_locks.setdefault(app_name, threading.Lock())
+
+        with prepare_lock:
+            if self._prepared.get(app_name):
+                return
+            if app_name in self._failed:
+                raise DatabaseIsolationError(self._failed[app_name])
+            try:
+                self._prepare_template(app_name, app_config)
+            except Exception as e:
+                self._failed[app_name] = f"{app_name} 模板数据库准备失败: {e}"
+                raise DatabaseIsolationError(self._failed[app_name]) from e
+
+    def prepare_error(self, app_name: str) -> Optional[str]:
+        """应用模板准备失败的原因（未失败时为 None）"""
+        return self._failed.get(app_name)
+
+    def reset_failures(self, app_names: Optional[List[str]] = None) -> None:
+        """清除失败记录，下次 prepare 重新执行 setup/seed（每次运行开始时调用）"""
+        with self._lock:
+            for app_name in list(self._failed if app_names is None else app_names):
+                self._failed.pop(app_name, None)
+
+    def _prepare_template(self, app_name: str, app_config: AppConfig) -> None:
+        """执行 DROP/CREATE 模板库和 setup/seed 命令"""
+        db = app_config.database
+        app_dir = self._app_dir(app_config)
+        template = self._template_name(app_name, db)
+        env = {db.url_env: build_database_url(db, template, app_dir)}
+
+        self.logger.info(f"准备 {app_name} 模板数据库: {template}")
+        if db.engine == "sqlite":
+            _sqlite_path(template, app_dir).parent.mkdir(parents=True, exist_ok=True)
+        else:
+            self._pg_execute(db, f"DROP DATABASE IF EXISTS {_quote_ident(template)}")
+            self._pg_execute(db, f"CREATE DATABASE {_quote_ident(template)}")
+
+        for command in (db.setup_command, db.seed_command):
+            if command:
+                self._run_command(command, app_dir, env)
+
+        with self._lock:
+            self._free_slots.setdefault(app_name, list(range(self.max_slots)))
+            self._prepared[app_name] = True
+
+    def prepare_all(self, app_names: List[str]) -> None:
+        """为一组应用准备模板库"""
+        for app_name in app_names:
+            app_config = self.config.apps.get(app_name)
+            if app_config:
+                self.prepare(app_name, app_config)
+
+    # ------------------------------------------------------------------
+    # worker 克隆
+    # ------------------------------------------------------------------
+
+    def acquire(self, task_id: str, app_name: str) -> Dict[str, str]:
+        """为任务分配一个 worker 槽位并从模板克隆数据库，返回需要注入的环境变量
+
+        槽位用尽时阻塞等待归还；等待期间任务被 release（取消）则抛出 DatabaseIsolationError
+        """
+        app_config = self.config.apps.get(app_name)
+        if not app_config or not app_config.database or not app_config.database.required:
+            return {}
+
+        db = app_config.database
+        app_dir = self._app_dir(app_config)
+        if not self._is_isolated(app_config):
+            return {db.url_env: build_database_url(db, db.database, app_dir)}
+
+        self.prepare(app_name, app_config)
+
+        with self._slot_released:
+            free = self._free_slots.setdefault(app_name, list(range(self.max_slots)))
+            if not free:
+                self.logger.info(f"任务 {task_id} 等待 {app_name} 的空闲数据库槽位")
+            self._waiting.add(task_id)
+            try:
+                while not free and task_id not in self._abandoned:
+                    self._slot_released.wait()
+                if task_id in self._abandoned:
+                    raise DatabaseIsolationError(f"任务 {task_id} 在等待数据库槽位时被取消")
+            finally:
+                self._waiting.discard(task_id)
+                self._abandoned.discard(task_id)
+            slot = free.pop(0)
+            self._leases[task_id] = (app_name, slot)
+
+        clone = self._clone_name(app_name, db, slot)
+        template = self._template_name(app_name, db)
+        try:
+            if db.engine == "sqlite":
+                _clone_sqlite(
+                    _sqlite_path(template, app_dir), _sqlite_path(clone, app_dir)
+                )
+            else:
+                self._pg_execute(db, f"DROP DATABASE IF EXISTS {_quote_ident(clone)}")
+                self._pg_execute(
+                    db,
+                    f"CREATE DATABASE {_quote_ident(clone)} "
+                    f"TEMPLATE {_quote_ident(template)}",
+                )
+        except Exception:
+            self.release(task_id)
+            raise
+
+        with self._lock:
+            self._clones[clone] = (db, clone, app_dir)
+
+        url = build_database_url(db, clone, app_dir)
+        self.logger.debug(f"任务 {task_id} 使用数据库 {clone}")
+        return {db.url_env: url, "TEST_DB_WORKER": str(slot)}
+
+    def release(self, task_id: str) -> None:
+        """归还任务占用的槽位（克隆在下次分配时从模板重建）；任务仍在等待槽位时取消等待"""
+        with self._slot_released:
+            lease = self._leases.pop(task_id, None)
+            if lease:
+                app_name, slot = lease
+                self._free_slots.setdefault(app_name, []).append(slot)
+            elif task_id in self._waiting:
+                self._abandoned.add(task_id)
+            else:
+                return
+            self._slot_released.notify_all()
+
+    def cleanup(self) -> None:
+        """删除所有克隆库"""
+        with self._lock:
+            clones = list(self._clones.values())
+            self._clones.clear()
+
+        for db, clone, app_dir in clones:
+            try:
+                if db.engine == "sqlite":
+                    _remove_sqlite(_sqlite_path(clone, app_dir))
+                else:
+                    self._pg_execute(
+                        db, f"DROP DATABASE IF EXISTS {_quote_ident(clone)}"
+                    )
+            except Exception as e:
+                self.logger.warning(f"删除克隆数据库 {clone} 失败: {e}")
+
+    # ------------------------------------------------------------------
+    # 执行
+    # ------------------------------------------------------------------
+
+    def _run_command(self, command: str, cwd: Path, env: Dict[str, str]) -> None:
+        """执行 setup/seed 命令"""
+        process = subprocess.run(
+            command,
+            shell=True,
+            cwd=cwd,
+            env={**os.environ, **env},
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode != 0:
+            raise DatabaseIsolationError(
+                f"命令执行失败 ({command}): {process.stderr.strip()[-500:]}"
+            )
+
+    def _pg_execute(self, db: DatabaseConfig, sql: str) -> None:
+        """在维护库 postgres 上以 autocommit 执行语句（优先 psycopg2，回退 psql）"""
+        try:
+            import psycopg2
+        except ImportError:
+            psycopg2 = None
+
+        if psycopg2 is not None:
+            conn = psycopg2.connect(
+                host=db.host,
+                port=db.port,
+                user=db.username,
+                password=db.password,
+                dbname="postgres",
+            )
+            try:
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(sql)
+            finally:
+                conn.close()
+            return
+
+        process = subprocess.run(
+            [
+                "psql",
+                "-h",
+                db.host,
+                "-p",
+                str(db.port),
+                "-U",
+                db.username,
+                "-d",
+                "postgres",
+                "-v",
+                "ON_ERROR_STOP=1",
+                "-c",
+                sql,
+            ],
+            env={**os.environ, "PGPASSWORD": db.password},
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode != 0:
+            raise DatabaseIsolationError(f"psql 执行失败: {process.stderr.strip()}")
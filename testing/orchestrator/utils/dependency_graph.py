@@ -0,0 +1,270 @@
+"""
+Workspace 依赖图：根据 pnpm workspace 的 package.json 依赖、应用配置的 dependencies
+和共享库配置推导「某个包变更会影响哪些应用」，按清单哈希缓存反向依赖闭包
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterable, List, Optional, Set
+
+import yaml
+
+DEFAULT_CACHE_PATH = (
+    Path(__file__).resolve().parents[2] / ".cache" / "dependency-graph.json"
+)
+
+# 仓库根目录下影响所有应用的文件
+GLOBAL_FILES = {"package.json", "pnpm-lock.yaml", "pnpm-workspace.yaml", "tsconfig.json"}
+
+# 不属于任何包时也不影响测试的文档文件
+DOC_SUFFIXES = (".md", ".mdx", ".rst")
+DOC_DIRS = {"docs", "doc"}
+
+_DEPENDENCY_FIELDS = ("dependencies", "devDependencies", "peerDependencies")
+
+
+def discover_workspace_packages(repo_root: Path) -> Dict[str, Path]:
+    """按 pnpm-workspace.yaml 的 packages 模式发现 workspace 包：包名 -> 目录"""
+    packages: Dict[str, Path] = {}
+    workspace = repo_root / "pnpm-workspace.yaml"
+    if not workspace.is_file():
+        return packages
+    try:
+        patterns = (yaml.safe_load(workspace.read_text(encoding="utf-8")) or {}).get(
+            "packages", []
+        )
+    except (OSError, yaml.YAMLError):
+        return packages
+    for pattern in patterns:
+        if pattern.startswith("!"):
+            continue
+        for manifest in sorted(repo_root.glob(f"{pattern.rstrip('/')}/package.json")):
+            if "node_modules" in manifest.parts:
+                continue
+            try:
+                name = json.loads(manifest.read_text(encoding="utf-8")).get("name")
+            except (OSError, ValueError):
+                continue
+            if name:
+                packages[name] = manifest.parent
+    return packages
+
+
+def _normalize(path: str) -> str:
+    """配置中的相对路径（./apps/blog）规范为仓库相对路径（apps/blog）"""
+    return PurePosixPath(os.path.normpath(path)).as_posix().strip("/")
+
+
+def is_documentation(path: str) -> bool:
+    """仓库相对路径是否为文档文件"""
+    return path.endswith(DOC_SUFFIXES) or path.split("/", 1)[0] in DOC_DIRS
+
+
+class WorkspaceGraph:
+    """应用与共享库的依赖图
+
+    节点为应用名（配置中的 key）、共享库名或其他 workspace 包名；
+    affected[node] 为该节点变更时需要测试的应用集合（反向依赖的传递闭包）。
+    """
+
+    def __init__(
+        self,
+        repo_root: str,
+        apps: Optional[Dict[str, str]] = None,
+        app_dependencies: Optional[Dict[str, List[str]]] = None,
+        shared_libraries: Optional[Dict[str, str]] = None,
+        cache_path: Optional[Path] = None,
+    ) -> None:
+        self.repo_root = Path(repo_root).resolve()
+        self.cache_path = cache_path or DEFAULT_CACHE_PATH
+        self._apps = {name: _normalize(path) for name, path in (apps or {}).items()}
+        self._app_dependencies = app_dependencies or {}
+        self._shared = {
+            name: _normalize(path) for name, path in (shared_libraries or {}).items()
+        }
+        self.nodes: Dict[str, str] = {}  # 节点 -> 仓库相对目录
+        self.apps: Set[str] = set()
+        self.affected: Dict[str, List[str]] = {}
+        self._loaded = False
+
+    @classmethod
+    def from_config(cls, config, repo_root: str) -> "WorkspaceGraph":
+        """从 TestConfig 创建"""
+        return cls(
+            repo_root,
+            apps={name: app.path for name, app in config.apps.items()},
+            app_dependencies={
+                name: list(app.dependencies or []) for name, app in config.apps.items()
+            },
+            shared_libraries={
+                name: lib.path for name, lib in config.shared_libraries.items()
+            },
+        )
+
+    # ------------------------------------------------------------------
+    # 构建与缓存
+    # ------------------------------------------------------------------
+
+    def _fingerprint(self, packages: Dict[str, Path]) -> str:
+        digest = hashlib.sha1()
+        digest.update(
+            json.dumps(
+                [self._apps, self._app_dependencies, self._shared], sort_keys=True
+            ).encode()
+        )
+        for manifest in [self.repo_root / "pnpm-workspace.yaml"] + [
+            packages[name] / "package.json" for name in sorted(packages)
+        ]:
+            try:
+                digest.update(manifest.read_bytes())
+            except OSError:
+                pass
+        return digest.hexdigest()
+
+    def load(self) -> "WorkspaceGraph":
+        """加载依赖图：清单哈希未变时直接使用缓存的闭包"""
+        if self._loaded:
+            return self
+        packages = discover_workspace_packages(self.repo_root)
+        fingerprint = self._fingerprint(packages)
+
+        try:
+            data = json.loads(self.cache_path.read_text(encoding="utf-8"))
+            if data.get("fingerprint") == fingerprint:
+                self.nodes = data["nodes"]
+                self.apps = set(data["apps"])
+                self.affected = data["affected"]
+                self._loaded = True
+                return self
+        except (OSError, ValueError, KeyError):
+            pass
+
+        self._build(packages)
+        self._loaded = True
+        # 多个进程可能同时重建：各自写临时文件再原子替换，读方不会读到半截的缓存
+        tmp_path = self.cache_path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_text(
+                json.dumps(
+                    {
+                        "fingerprint": fingerprint,
+                        "nodes": self.nodes,
+                        "apps": sorted(self.apps),
+                        "affected": self.affected,
+                    },
+                    ensure_ascii=False,
+                ),
+                encoding="utf-8",
+            )
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            tmp_path.unlink(missing_ok=True)
+        return self
+
+    def _node_for_dir(self, rel_dir: str, package_name: str) -> str:
+        for name, path in self._apps.items():
+            if path == rel_dir:
+                return name
+        for name, path in self._shared.items():
+            if path == rel_dir:
+                return name
+        parts = rel_dir.split("/")
+        if len(parts) == 2 and parts[0] == "apps":
+            # 未在配置中的应用目录以目录名作为应用名
+            return parts[1]
+        return package_name
+
+    def _build(self, packages: Dict[str, Path]) -> None:
+        node_by_package: Dict[str, str] = {}
+        for package_name, directory in packages.items():
+            rel_dir = directory.relative_to(self.repo_root).as_posix()
+            node = self._node_for_dir(rel_dir, package_name)
+            node_by_package[package_name] = node
+            self.nodes[node] = rel_dir
+
+        # 配置中的应用和共享库即使不是 workspace 包也作为节点
+        for name, path in {**self._shared, **self._apps}.items():
+            self.nodes.setdefault(name, path)
+        self.apps = set(self._apps) or {
+            node for node, path in self.nodes.items() if path.startswith("apps/")
+        }
+
+        # 正向边：节点 -> 它依赖的节点
+        depends_on: Dict[str, Set[str]] = {node: set() for node in self.nodes}
+        for package_name, directory in packages.items():
+            try:
+                manifest = json.loads(
+                    (directory / "package.json").read_text(encoding="utf-8")
+                )
+            except (OSError, ValueError):
+                continue
+            node = node_by_package[package_name]
+            for field in _DEPENDENCY_FIELDS:
+                for dep in manifest.get(field, {}) or {}:
+                    if dep in node_by_package and node_by_package[dep] != node:
+                        depends_on[node].add(node_by_package[dep])
+        for app, deps in self._app_dependencies.items():
+            depends_on.setdefault(app, set()).update(d for d in deps if d != app)
+
+        # 反向边并计算每个节点的受影响应用（传递闭包）
+        dependents: Dict[str, Set[str]] = {node: set() for node in depends_on}
+        for node, deps in depends_on.items():
+            for dep in deps:
+                dependents.setdefault(dep, set()).add(node)
+
+        for node in dependents:
+            seen = {node}
+            stack = [node]
+            while stack:
+                for parent in dependents.get(stack.pop(), ()):
+                    if parent not in seen:
+                        seen.add(parent)
+                        stack.append(parent)
+            self.affected[node] = sorted(seen & self.apps)
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    def owner_of(self, path: str) -> Optional[str]:
+        """文件所属的节点（目录前缀最长匹配）"""
+        self.load()
+        best, best_len = None, -1
+        for node, rel_dir in self.nodes.items():
+            if (path == rel_dir or path.startswith(rel_dir + "/")) and len(
+                rel_dir
+            ) > best_len:
+                best, best_len = node, len(rel_dir)
+        return best
+
+    def affected_apps(self, files: Iterable[str]) -> Set[str]:
+        """变更文件影响的应用集合
+
+        不属于任何节点的文件（测试配置、CI、根目录工具配置等）无法判断影响范围，
+        按影响所有应用处理；只有文档文件例外
+        """
+        self.load()
+        result: Set[str] = set()
+        for path in files:
+            if path in GLOBAL_FILES:
+                return set(self.apps)
+            owner = self.owner_of(path)
+            if owner is not None:
+                result.update(self.affected.get(owner, []))
+            elif not is_documentation(path):
+                return set(self.apps)
+        return result
+
+    def dependents_closure(self, apps: Iterable[str]) -> Set[str]:
+        """应用及所有传递依赖它们的应用"""
+        self.load()
+        result: Set[str] = set()
+        for app in apps:
+            result.add(app)
+            result.update(self.affected.get(app, []))
+        return result
@@ -0,0 +1,614 @@
+"""
+统一执行引擎：四个测试入口（run_tests / enhanced_run_tests / smart_scheduler / orchestrator）
+共用的命令执行接口，后端可插拔（thread / asyncio / process / remote）
+
+所有后端提供相同的语义：独立进程组、超时（挂起期间不计时）、挂起/恢复/取消，
+以及统一的 ExecutionResult，便于在同一套任务上横向对比吞吐
+"""
+
+from __future__ import annotations
+
+import asyncio
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import time
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, MutableMapping, Optional, Set, Union
+
+# 轮询间隔：检查超时、挂起状态的粒度
+POLL_INTERVAL = 0.5
+
+_POSIX = os.name == "posix"
+_SIGTERM = signal.SIGTERM
+_SIGKILL = getattr(signal, "SIGKILL", signal.SIGTERM)
+
+
+@dataclass
+class ExecutionRequest:
+    """一次命令执行请求；command 为字符串时经 shell 执行，为列表时直接执行"""
+
+    task_id: str
+    command: Union[str, List[str]]
+    cwd: Optional[str] = None
+    env: Dict[str, str] = field(default_factory=dict)  # 叠加在当前环境变量之上
+    timeout: Optional[float] = None
+    merge_stderr: bool = False  # stderr 合并到 stdout
+    nice: int = 0  # 相对当前进程的 nice 增量，>0 时降低整个进程组的调度优先级
+
+
+@dataclass
+class ExecutionResult:
+    """执行结果"""
+
+    task_id: str
+    return_code: Optional[int] = None
+    stdout: str = ""
+    stderr: str = ""
+    start_time: float = 0.0
+    spawned_at: float = 0.0  # 子进程实际创建完成的时间，用于统计启动延迟
+    end_time: float = 0.0
+    timed_out: bool = False
+    cancelled: bool = False
+    error: str = ""  # 进程无法启动等执行层错误
+    backend: str = ""
+
+    @property
+    def duration(self) -> float:
+        return max(0.0, self.end_time - self.start_time)
+
+    @property
+    def success(self) -> bool:
+        return (
+            self.return_code == 0
+            and not self.timed_out
+            and not self.cancelled
+            and not self.error
+        )
+
+
+def signal_process_group(pid: int, sig: int) -> bool:
+    """向进程组发送信号（shell 派生的 jest/playwright worker 一并处理）"""
+    try:
+        if _POSIX:
+            os.killpg(pid, sig)
+        else:
+            os.kill(pid, sig)
+        return True
+    except (ProcessLookupError, PermissionError, OSError):
+        return False
+
+
+def lower_priority(pid: int, nice: int) -> None:
+    """按 nice 增量降低进程组的 CPU 调度优先级（之后派生的子进程继承该值）"""
+    if nice <= 0 or not _POSIX:
+        return
+    try:
+        target = min(19, os.getpriority(os.PRIO_PROCESS, 0) + nice)
+        os.setpriority(os.PRIO_PGRP, pid, target)
+    except (ProcessLookupError, PermissionError, OSError):
+        pass
+
+
+def _pid_key(task_id: str) -> str:
+    return f"pid:{task_id}"
+
+
+def _paused_key(task_id: str) -> str:
+    return f"paused:{task_id}"
+
+
+def _cancelled_key(task_id: str) -> str:
+    return f"cancelled:{task_id}"
+
+
+def _popen_args(request: ExecutionRequest) -> Dict[str, Any]:
+    return {
+        "shell": isinstance(request.command, str),
+        "cwd": request.cwd,
+        "env": {**os.environ, **request.env},
+        "stdout": subprocess.PIPE,
+        "stderr": subprocess.STDOUT if request.merge_stderr else subprocess.PIPE,
+        "start_new_session": _POSIX,
+    }
+
+
+def run_blocking(
+    request: ExecutionRequest,
+    state: MutableMapping,
+    on_start: Optional[Callable[[int], None]] = None,
+    backend: str = "thread",
+) -> ExecutionResult:
+    """同步执行一条命令（线程池和进程池后端共用）
+
+    state 记录运行中的 pid、挂起和取消标记，由后端在其他线程/进程中修改
+    """
+    task_id = request.task_id
+    result = ExecutionResult(task_id=task_id, start_time=time.time(), backend=backend)
+    try:
+        process = subprocess.Popen(
+            request.command, text=True, errors="replace", **_popen_args(request)
+        )
+    except OSError as e:
+        result.error = str(e)
+        result.end_time = time.time()
+        return result
+
+    result.spawned_at = time.time()
+    state[_pid_key(task_id)] = process.pid
+    lower_priority(process.pid, request.nice)
+    try:
+        if on_start:
+            on_start(process.pid)
+        deadline = result.start_time + request.timeout if request.timeout else None
+        while True:
+            slice_start = time.time()
+            try:
+                stdout, stderr = process.communicate(timeout=POLL_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                if state.get(_paused_key(task_id)):
+                    # 挂起期间不计入超时
+                    if deadline:
+                        deadline += time.time() - slice_start
+                elif deadline and time.time() > deadline:
+                    signal_process_group(process.pid, _SIGKILL)
+                    stdout, stderr = process.communicate()
+                    result.timed_out = True
+                    break
+        result.return_code = process.returncode
+        result.stdout = stdout or ""
+        result.stderr = stderr or ""
+    finally:
+        if process.poll() is None:
+            signal_process_group(process.pid, _SIGKILL)
+            process.wait()
+        state.pop(_pid_key(task_id), None)
+        state.pop(_paused_key(task_id), None)
+        result.cancelled = bool(state.pop(_cancelled_key(task_id), False))
+    result.end_time = time.time()
+    return result
+
+
+class ExecutionBackend(ABC):
+    """执行后端基类：本地后端通过 pid 表实现挂起/恢复/取消"""
+
+    name = ""
+
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max(1, max_workers)
+        self._state: MutableMapping = {}
+
+    @abstractmethod
+    async def _execute(
+        self, request: ExecutionRequest, on_start: Optional[Callable[[int], None]]
+    ) -> ExecutionResult:
+        """执行一条命令并等待结束"""
+
+    async def execute(
+        self,
+        request: ExecutionRequest,
+        on_start: Optional[Callable[[int], None]] = None,
+    ) -> ExecutionResult:
+        """执行一条命令；on_start 在进程启动后以 pid 调用（例如绑核）
+
+        等待方被取消时终止对应进程组
+        """
+        try:
+            return await self._execute(request, on_start)
+        except asyncio.CancelledError:
+            self.cancel(request.task_id)
+            raise
+
+    async def run_many(
+        self,
+        requests: List[ExecutionRequest],
+        on_result: Optional[Callable[[ExecutionResult], None]] = None,
+    ) -> List[ExecutionResult]:
+        """以 max_workers 为上限并发执行一批命令，结果顺序与请求一致"""
+        semaphore = asyncio.Semaphore(self.max_workers)
+
+        async def run_one(request: ExecutionRequest) -> ExecutionResult:
+            async with semaphore:
+                result = await self.execute(request)
+            if on_result:
+                on_result(result)
+            return result
+
+        return list(await asyncio.gather(*(run_one(r) for r in requests)))
+
+    # ------------------------------------------------------------------
+    # 运行时控制
+    # ------------------------------------------------------------------
+
+    def pid(self, task_id: str) -> Optional[int]:
+        """运行中任务的进程组 id"""
+        return self._state.get(_pid_key(task_id))
+
+    def running(self) -> List[str]:
+        """运行中的任务 id"""
+        prefix = _pid_key("")
+        return [key[len(prefix) :] for key in list(self._state.keys()) if key.startswith(prefix)]
+
+    def is_running(self, task_id: str) -> bool:
+        return self.pid(task_id) is not None
+
+    def signal(self, task_id: str, sig: int) -> bool:
+        """向任务的进程组发送信号"""
+        pid = self.pid(task_id)
+        return pid is not None and signal_process_group(pid, sig)
+
+    def suspend(self, task_id: str) -> bool:
+        """挂起任务（SIGSTOP），挂起期间不计入超时"""
+        if not hasattr(signal, "SIGSTOP") or not self.signal(task_id, signal.SIGSTOP):
+            return False
+        self._state[_paused_key(task_id)] = True
+        return True
+
+    def resume(self, task_id: str) -> bool:
+        """恢复被挂起的任务（SIGCONT）"""
+        self._state.pop(_paused_key(task_id), None)
+        return hasattr(signal, "SIGCONT") and self.signal(task_id, signal.SIGCONT)
+
+    def cancel(self, task_id: str, sig: int = _SIGTERM) -> bool:
+        """终止任务，结果标记为 cancelled"""
+        if not self.is_running(task_id):
+            return False
+        self._state[_cancelled_key(task_id)] = True
+        sent = self.signal(task_id, sig)
+        if self._state.get(_paused_key(task_id)):
+            # 被挂起的进程收到 SIGCONT 后才会处理 SIGTERM
+            self.resume(task_id)
+        return sent
+
+    def kill_all(self, sig: int = _SIGTERM) -> None:
+        """立即向所有运行中的任务发送信号（可在信号处理器中调用）"""
+        for task_id in self.running():
+            self.cancel(task_id, sig)
+
+    async def cancel_all(self, grace: float = 2.0) -> None:
+        """终止所有运行中的任务：先 SIGTERM，grace 秒后仍未退出的强制终止"""
+        running = self.running()
+        for task_id in running:
+            self.cancel(task_id)
+        deadline = time.time() + grace
+        while running and time.time() < deadline:
+            await asyncio.sleep(0.05)
+            running = [task_id for task_id in running if self.is_running(task_id)]
+        for task_id in running:
+            self.signal(task_id, _SIGKILL)
+
+    def shutdown(self) -> None:
+        """释放后端资源（之后再次执行时按需重建）"""
+
+
+class ThreadBackend(ExecutionBackend):
+    """线程池后端：每个任务占用一个线程阻塞等待子进程"""
+
+    name = "thread"
+
+    def __init__(self, max_workers: int = 4):
+        super().__init__(max_workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def _execute(self, request, on_start):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, run_blocking, request, self._state, on_start, self.name
+        )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+class AsyncioBackend(ExecutionBackend):
+    """asyncio 后端：由事件循环直接管理子进程，不占用线程"""
+
+    name = "asyncio"
+
+    async def _execute(self, request, on_start):
+        task_id = request.task_id
+        result = ExecutionResult(task_id=task_id, start_time=time.time(), backend=self.name)
+        popen_args = _popen_args(request)
+        shell = popen_args.pop("shell")
+        try:
+            if shell:
+                process = await asyncio.create_subprocess_shell(request.command, **popen_args)
+            else:
+                process = await asyncio.create_subprocess_exec(*request.command, **popen_args)
+        except OSError as e:
+            result.error = str(e)
+            result.end_time = time.time()
+            return result
+
+        result.spawned_at = time.time()
+        self._state[_pid_key(task_id)] = process.pid
+        lower_priority(process.pid, request.nice)
+        communicate = asyncio.ensure_future(process.communicate())
+        try:
+            if on_start:
+                on_start(process.pid)
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + request.timeout if request.timeout else None
+            while True:
+                slice_start = loop.time()
+                done, _ = await asyncio.wait({communicate}, timeout=POLL_INTERVAL)
+                if done:
+                    break
+                if self._state.get(_paused_key(task_id)):
+                    if deadline:
+                        deadline += loop.time() - slice_start
+                elif deadline and loop.time() > deadline:
+                    signal_process_group(process.pid, _SIGKILL)
+                    result.timed_out = True
+                    await communicate
+                    break
+            stdout, stderr = communicate.result()
+            result.return_code = process.returncode
+            result.stdout = (stdout or b"").decode("utf-8", errors="replace")
+            result.stderr = (stderr or b"").decode("utf-8", errors="replace")
+        finally:
+            if process.returncode is None:
+                signal_process_group(process.pid, _SIGKILL)
+                communicate.cancel()
+                await asyncio.shield(process.wait())
+            self._state.pop(_pid_key(task_id), None)
+            self._state.pop(_paused_key(task_id), None)
+            result.cancelled = bool(self._state.pop(_cancelled_key(task_id), False))
+        result.end_time = time.time()
+        return result
+
+
+class ProcessPoolBackend(ExecutionBackend):
+    """进程池后端：在独立的 worker 进程中等待子进程，避免调度进程的 GIL/fd 压力
+
+    pid 与挂起/取消标记通过 multiprocessing.Manager 共享；
+    on_start 在调度进程中轮询到 pid 后调用
+    """
+
+    name = "process"
+
+    def __init__(self, max_workers: int = 4):
+        super().__init__(max_workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._manager = None
+
+    def _ensure_started(self) -> None:
+        if self._executor is None:
+            import multiprocessing
+
+            self._manager = multiprocessing.Manager()
+            self._state = self._manager.dict()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+    async def _execute(self, request, on_start):
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self._executor, run_blocking, request, self._state, None, self.name
+        )
+        if on_start:
+            while not future.done():
+                pid = self.pid(request.task_id)
+                if pid is not None:
+                    on_start(pid)
+                    break
+                await asyncio.wait({future}, timeout=0.05)
+        return await future
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+            self._state = {}
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """经 Unix socket 的 HTTP 连接"""
+
+    def __init__(self, path: str, timeout: float = 5):
+        super().__init__("localhost", timeout=timeout)
+        self._socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._socket_path)
+
+
+# serve 守护进程以 TCP 监听时的共享令牌（Authorization: Bearer <token>）
+TOKEN_ENV = "ORCHESTRATOR_TOKEN"
+
+
+class RemoteBackend(ExecutionBackend):
+    """远程后端：将命令提交给 serve 守护进程（POST /execute）执行
+
+    命令在服务端的工作区中运行，cwd 需为服务端可见的路径；
+    pid 不回传，on_start 不会被调用；运行时控制经 POST /control 转发；
+    在事件循环中调用 suspend / resume / cancel 时控制请求由单独的线程按顺序发送，
+    不阻塞事件循环，只要任务仍在远程执行即返回 True；
+    HTTP 地址需要与服务端相同的令牌（token 或环境变量 ORCHESTRATOR_TOKEN）
+    """
+
+    name = "remote"
+
+    def __init__(self, address: str, max_workers: int = 4, token: Optional[str] = None):
+        super().__init__(max_workers)
+        if not address:
+            raise ValueError("remote 后端需要 address（unix:/path 或 http://host:port）")
+        self.address = address
+        self.token = token or os.environ.get(TOKEN_ENV)
+        # 同一服务端可能服务多个客户端，任务 id 加上客户端前缀避免冲突
+        self._client_id = uuid.uuid4().hex[:8]
+        self._active: Dict[str, str] = {}
+        # 单线程保证控制请求按调用顺序到达服务端（先挂起后恢复）
+        self._control_executor: Optional[ThreadPoolExecutor] = None
+        self._pending_controls: Set[asyncio.Future] = set()
+
+    def _remote_id(self, task_id: str) -> str:
+        return f"{self._client_id}:{task_id}"
+
+    def _headers(self) -> Dict[str, str]:
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        return headers
+
+    async def _execute(self, request, on_start):
+        from aiohttp import ClientSession, ClientTimeout, UnixConnector
+
+        if self.address.startswith("unix:"):
+            connector = UnixConnector(path=self.address[len("unix:") :])
+            base_url = "http://localhost"
+        else:
+            connector = None
+            base_url = self.address.rstrip("/")
+
+        payload = asdict(request)
+        payload["task_id"] = self._remote_id(request.task_id)
+        self._active[request.task_id] = payload["task_id"]
+        start_time = time.time()
+        try:
+            async with ClientSession(
+                connector=connector, timeout=ClientTimeout(total=None)
+            ) as session:
+                async with session.post(
+                    f"{base_url}/execute", json=payload, headers=self._headers()
+                ) as response:
+                    response.raise_for_status()
+                    data = await response.json()
+            data.update(task_id=request.task_id, backend=self.name)
+            return ExecutionResult(**data)
+        except asyncio.CancelledError:
+            # 在移出 _active 之前转发取消，服务端随之终止进程组
+            self.cancel(request.task_id)
+            raise
+        except Exception as e:
+            return ExecutionResult(
+                task_id=request.task_id,
+                start_time=start_time,
+                end_time=time.time(),
+                error=f"远程执行失败: {e}",
+                backend=self.name,
+            )
+        finally:
+            self._active.pop(request.task_id, None)
+
+    def _control(self, task_id: str, action: str, sig: Optional[int] = None) -> bool:
+        remote_id = self._active.get(task_id)
+        if remote_id is None:
+            return False
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return self._post_control(remote_id, action, sig)
+        if self._control_executor is None:
+            self._control_executor = ThreadPoolExecutor(max_workers=1)
+        future = loop.run_in_executor(
+            self._control_executor, self._post_control, remote_id, action, sig
+        )
+        self._pending_controls.add(future)
+        future.add_done_callback(self._pending_controls.discard)
+        return True
+
+    def _post_control(self, remote_id: str, action: str, sig: Optional[int]) -> bool:
+        """POST /control（阻塞，最多等待 5 秒）"""
+        if self.address.startswith("unix:"):
+            connection = _UnixHTTPConnection(self.address[len("unix:") :])
+        else:
+            connection = http.client.HTTPConnection(
+                self.address.split("://", 1)[-1].rstrip("/"), timeout=5
+            )
+        try:
+            body = json.dumps({"task_id": remote_id, "action": action, "signal": sig})
+            connection.request("POST", "/control", body, self._headers())
+            response = connection.getresponse()
+            return response.status == 200 and json.loads(response.read()).get("ok", False)
+        except (OSError, ValueError, http.client.HTTPException):
+            return False
+        finally:
+            connection.close()
+
+    def pid(self, task_id: str) -> Optional[int]:
+        return None
+
+    def running(self) -> List[str]:
+        return list(self._active)
+
+    def is_running(self, task_id: str) -> bool:
+        return task_id in self._active
+
+    def signal(self, task_id: str, sig: int) -> bool:
+        return self._control(task_id, "signal", sig)
+
+    def suspend(self, task_id: str) -> bool:
+        return self._control(task_id, "suspend")
+
+    def resume(self, task_id: str) -> bool:
+        return self._control(task_id, "resume")
+
+    def cancel(self, task_id: str, sig: int = _SIGTERM) -> bool:
+        return self._control(task_id, "cancel", sig)
+
+    async def cancel_all(self, grace: float = 2.0) -> None:
+        # 服务端负责宽限期和强制终止
+        for task_id in self.running():
+            self.cancel(task_id)
+        if self._pending_controls:
+            await asyncio.gather(*self._pending_controls)
+
+    def shutdown(self) -> None:
+        if self._control_executor is not None:
+            self._control_executor.shutdown(wait=False)
+            self._control_executor = None
+
+
+BACKENDS = {
+    ThreadBackend.name: ThreadBackend,
+    AsyncioBackend.name: AsyncioBackend,
+    ProcessPoolBackend.name: ProcessPoolBackend,
+    RemoteBackend.name: RemoteBackend,
+}
+
+
+def create_backend(
+    name: str = "thread",
+    max_workers: int = 4,
+    address: Optional[str] = None,
+    token: Optional[str] = None,
+) -> ExecutionBackend:
+    """按名称创建执行后端"""
+    if name not in BACKENDS:
+        raise ValueError(f"未知的执行后端: {name}（可选: {', '.join(BACKENDS)}）")
+    if name == RemoteBackend.name:
+        return RemoteBackend(address or "", max_workers=max_workers, token=token)
+    return BACKENDS[name](max_workers=max_workers)
+
+
+def backend_from_config(
+    settings: Optional[Dict[str, Any]],
+    max_workers: int,
+    default: str = "thread",
+    override: Optional[str] = None,
+) -> ExecutionBackend:
+    """根据 execution.executor 配置创建后端；override 为命令行指定的后端名"""
+    settings = settings or {}
+    return create_backend(
+        override or settings.get("backend") or default,
+        max_workers=int(settings.get("max_workers") or max_workers),
+        address=settings.get("address"),
+        token=settings.get("token"),
+    )
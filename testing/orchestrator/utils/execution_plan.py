@@ -0,0 +1,108 @@
+"""
+预编译执行计划：将解析后的配置、环境变量、命令、依赖 DAG 和资源等级序列化为 JSON，
+按输入文件哈希校验是否过期；`run --plan` 直接加载，跳过 YAML 解析、环境文件读取和任务生成
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from utils.change_detection import workspace_fingerprint
+
+PLAN_VERSION = 1
+DEFAULT_PLAN_PATH = Path(__file__).resolve().parents[2] / ".cache" / "execution-plan.json"
+
+# 套件 -> 资源等级（light 可高并发，heavy 需要浏览器/服务等重资源）
+SUITE_RESOURCE_CLASSES = {
+    "unit": "light",
+    "contract": "light",
+    "integration": "standard",
+    "security": "standard",
+    "e2e": "heavy",
+    "performance": "heavy",
+}
+
+
+def resource_class(suite: str, app_type: str = "") -> str:
+    """任务的资源等级"""
+    level = SUITE_RESOURCE_CLASSES.get(suite, "standard")
+    if level == "light" and app_type in ("nestjs", "nextjs") and suite != "unit":
+        return "standard"
+    return level
+
+
+def hash_file(path: str) -> str:
+    """文件内容哈希，不存在时返回 "-" """
+    try:
+        return hashlib.sha1(Path(path).read_bytes()).hexdigest()
+    except OSError:
+        return "-"
+
+
+def collect_inputs(
+    config_path: Optional[str],
+    env_files: List[str],
+    include_workspace: bool,
+) -> Dict[str, str]:
+    """计划依赖的输入及其哈希：配置文件、环境文件，以及（变更驱动时的）工作区状态"""
+    inputs: Dict[str, str] = {}
+    if config_path:
+        inputs[f"config:{config_path}"] = hash_file(config_path)
+    for env_file in sorted(set(env_files)):
+        inputs[f"env:{env_file}"] = hash_file(env_file)
+    if include_workspace:
+        inputs["workspace"] = workspace_fingerprint()
+    return inputs
+
+
+@dataclass
+class ExecutionPlan:
+    """执行计划"""
+
+    options: Dict[str, Any]
+    inputs: Dict[str, str]
+    config: Dict[str, Any]
+    tasks: List[Dict[str, Any]]
+    version: int = PLAN_VERSION
+    created_at: float = field(default_factory=time.time)
+
+    @property
+    def key(self) -> str:
+        """计划的输入键：相同的选项和输入得到相同的计划"""
+        payload = json.dumps([self.options, self.inputs], sort_keys=True)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def stale_inputs(self) -> List[str]:
+        """与当前文件相比已变化的输入"""
+        current = collect_inputs(
+            next((k[len("config:") :] for k in self.inputs if k.startswith("config:")), None),
+            [k[len("env:") :] for k in self.inputs if k.startswith("env:")],
+            "workspace" in self.inputs,
+        )
+        return sorted(k for k, digest in self.inputs.items() if current.get(k) != digest)
+
+    def save(self, path: Path) -> None:
+        """原子写入计划文件"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {**asdict(self), "key": self.key}
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "ExecutionPlan":
+        """读取计划文件，版本不匹配时抛出 ValueError"""
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        if data.get("version") != PLAN_VERSION:
+            raise ValueError(
+                f"执行计划版本不匹配: {data.get('version')} (需要 {PLAN_VERSION})"
+            )
+        data.pop("key", None)
+        return cls(**data)
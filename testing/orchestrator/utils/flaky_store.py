@@ -1,43 +1,448 @@
 """
 Flaky 用例存储与读取
+
+计数与隔离状态保存在 SQLite（WAL 模式）中，支持多线程、多进程并发写入；
+查询走内存索引，只有其他连接提交过写入时才重新加载。
+隔离清单同时导出到 flaky-list.json，供人工查看和旧工具读取
+
+flaky 评分基于最近 N 次尝试的滑动窗口：同一代码版本上的通过/失败翻转是确定的 flaky 证据，
+不同版本之间的翻转可能是真实的破坏或修复，按较低权重计入。窗口以字符串保存，
+计数随结果增量更新，每次记录 O(1)
 """
 
 from __future__ import annotations
 
 import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, fields
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 
 DEFAULT_PATH = Path(__file__).resolve().parents[2] / "flaky-list.json"
+DEFAULT_DB_PATH = Path(__file__).resolve().parents[2] / ".cache" / "flaky.db"
+
+# 通过 ↔ 失败翻转达到该次数后自动隔离
+DEFAULT_QUARANTINE_AFTER = 3
+
+# 跨代码版本的翻转计入评分的权重（同一版本上的翻转权重为 1）
+CROSS_VERSION_FLIP_WEIGHT = 0.5
+
+# 窗口字符：大写表示与上一次尝试不是同一代码版本（或版本未知），小写表示同一版本
+_PASS, _FAIL = "P", "F"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS flaky_tests (
+    test_id TEXT PRIMARY KEY,
+    passes INTEGER NOT NULL DEFAULT 0,
+    failures INTEGER NOT NULL DEFAULT 0,
+    flips INTEGER NOT NULL DEFAULT 0,
+    last_status TEXT NOT NULL DEFAULT '',
+    last_run REAL NOT NULL DEFAULT 0,
+    quarantined INTEGER NOT NULL DEFAULT 0,
+    quarantined_at REAL
+)
+"""
+
+# 在旧表结构上追加的列
+_MIGRATIONS = {
+    "last_version": "TEXT NOT NULL DEFAULT ''",
+    "window": "TEXT NOT NULL DEFAULT ''",
+    "window_failures": "INTEGER NOT NULL DEFAULT 0",
+    "window_flips": "INTEGER NOT NULL DEFAULT 0",
+    "window_version_flips": "INTEGER NOT NULL DEFAULT 0",
+    "pass_streak": "INTEGER NOT NULL DEFAULT 0",
+}
+
+
+@dataclass
+class FlakyStats:
+    """单个用例的执行计数与滑动窗口"""
+
+    test_id: str
+    passes: int = 0
+    failures: int = 0
+    flips: int = 0  # 累计翻转次数
+    last_status: str = ""
+    last_run: float = 0.0
+    quarantined: bool = False
+    quarantined_at: Optional[float] = None
+    last_version: str = ""  # 上一次尝试的代码版本
+    window: str = ""  # 最近的尝试结果，见 _PASS / _FAIL
+    window_failures: int = 0
+    window_flips: int = 0  # 窗口内相邻尝试结果不同的次数
+    window_version_flips: int = 0  # 其中发生在同一代码版本上的次数
+    pass_streak: int = 0  # 连续通过次数
+
+    @property
+    def runs(self) -> int:
+        return self.passes + self.failures
+
+    @property
+    def flip_rate(self) -> float:
+        """窗口内翻转率：翻转次数 / 可能翻转的次数"""
+        n = len(self.window)
+        return self.window_flips / (n - 1) if n > 1 else 0.0
+
+    @property
+    def failure_rate(self) -> float:
+        """窗口内失败概率"""
+        return self.window_failures / len(self.window) if self.window else 0.0
+
+    @property
+    def score(self) -> float:
+        """flaky 评分（0~1）：同版本翻转按 1、跨版本翻转按 CROSS_VERSION_FLIP_WEIGHT 加权的翻转率
+
+        持续失败的用例没有翻转，评分为 0，不会被当作 flaky
+        """
+        n = len(self.window)
+        if n < 2:
+            return 0.0
+        cross = self.window_flips - self.window_version_flips
+        return (self.window_version_flips + CROSS_VERSION_FLIP_WEIGHT * cross) / (n - 1)
+
+    @property
+    def deterministic_failure(self) -> bool:
+        """同一代码版本上连续失败且窗口内从未在同版本上翻转：重试大概率仍失败"""
+        return (
+            self.window[-2:] in (_FAIL + _FAIL.lower(), _FAIL.lower() * 2)
+            and self.window_version_flips == 0
+        )
+
+
+@dataclass
+class FlakyPolicy:
+    """自动隔离 / 解除隔离阈值"""
+
+    window: int = 50  # 滑动窗口大小（尝试次数）
+    quarantine_after: int = DEFAULT_QUARANTINE_AFTER  # 窗口内同版本翻转达到该次数时隔离
+    quarantine_score: float = 0.2  # 评分达到该值时隔离
+    # 解除隔离：评分不高于 release_score 且连续通过 release_after 次
+    release_score: float = 0.05
+    release_after: int = 10
+    min_runs: int = 5  # 按评分隔离所需的最少尝试次数
+
+    @classmethod
+    def from_config(cls, settings: Optional[Dict[str, Any]]) -> "FlakyPolicy":
+        settings = settings or {}
+        names = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in settings.items() if k in names and v is not None})
+
+    def should_quarantine(self, stats: FlakyStats) -> bool:
+        if stats.window_version_flips >= self.quarantine_after:
+            return True
+        return len(stats.window) >= self.min_runs and stats.score >= self.quarantine_score
+
+    def should_release(self, stats: FlakyStats) -> bool:
+        return stats.pass_streak >= self.release_after and stats.score <= self.release_score
+
+
+_FIELDS = [f.name for f in fields(FlakyStats)]
+_COLUMNS = ", ".join(f'"{name}"' for name in _FIELDS)
 
 
 class FlakyStore:
-    def __init__(self, store_path: Optional[Path] = None) -> None:
+    def __init__(
+        self,
+        store_path: Optional[Path] = None,
+        quarantine_after: Optional[int] = None,
+        db_path: Optional[Path] = None,
+        policy: Optional[FlakyPolicy] = None,
+    ) -> None:
         self.path = Path(store_path) if store_path else DEFAULT_PATH
+        if db_path:
+            self.db_path = Path(db_path)
+        elif store_path:
+            self.db_path = self.path.with_suffix(".db")
+        else:
+            self.db_path = DEFAULT_DB_PATH
+        self.policy = policy or FlakyPolicy()
+        if quarantine_after:
+            self.policy.quarantine_after = quarantine_after
+
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._index: Dict[str, FlakyStats] = {}
+        self._data_version: Optional[int] = None
+
+    @property
+    def quarantine_after(self) -> int:
+        return self.policy.quarantine_after
+
+    # ------------------------------------------------------------------
+    # 连接与内存索引
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                str(self.db_path),
+                timeout=30,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(_SCHEMA)
+            self._conn = conn
+            self._migrate()
+            self._import_legacy_list()
+        return self._conn
+
+    def _migrate(self) -> None:
+        """为旧表结构补齐列"""
+        conn = self._conn
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(flaky_tests)")}
+        for name, ddl in _MIGRATIONS.items():
+            if name not in existing:
+                try:
+                    conn.execute(f'ALTER TABLE flaky_tests ADD COLUMN "{name}" {ddl}')
+                except sqlite3.OperationalError:
+                    # 其他进程已并发添加
+                    pass
+
+    def _import_legacy_list(self) -> None:
+        """首次使用时导入 flaky-list.json 中已隔离的用例"""
+        conn = self._conn
+        if conn.execute("SELECT 1 FROM flaky_tests LIMIT 1").fetchone():
+            return
+        tests = self._read_json().get("tests", [])
+        if tests:
+            now = time.time()
+            conn.executemany(
+                "INSERT OR IGNORE INTO flaky_tests (test_id, quarantined, quarantined_at) "
+                "VALUES (?, 1, ?)",
+                [(test_id, now) for test_id in tests],
+            )
+
+    def _refresh(self) -> None:
+        """其他连接提交过写入时重新加载索引（PRAGMA data_version 不读表数据）"""
+        conn = self._connect()
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._data_version:
+            rows = conn.execute(f"SELECT {_COLUMNS} FROM flaky_tests").fetchall()
+            self._index = {row[0]: self._row_to_stats(row) for row in rows}
+            self._data_version = version
+
+    @staticmethod
+    def _row_to_stats(row: tuple) -> FlakyStats:
+        stats = FlakyStats(**dict(zip(_FIELDS, row)))
+        stats.quarantined = bool(stats.quarantined)
+        return stats
+
+    def _write(self, test_id: str, update: Any) -> FlakyStats:
+        """在写事务中读取、修改并写回一条记录；update(stats) 原地修改"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    f"SELECT {_COLUMNS} FROM flaky_tests WHERE test_id = ?", (test_id,)
+                ).fetchone()
+                stats = self._row_to_stats(row) if row else FlakyStats(test_id)
+                was_quarantined = stats.quarantined
+                update(stats)
+                values = [getattr(stats, name) for name in _FIELDS]
+                values[_FIELDS.index("quarantined")] = int(stats.quarantined)
+                conn.execute(
+                    f"INSERT OR REPLACE INTO flaky_tests ({_COLUMNS}) "
+                    f"VALUES ({', '.join('?' * len(_FIELDS))})",
+                    values,
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            # 自己的提交不改变本连接的 data_version，直接更新索引
+            self._index[test_id] = stats
+            if stats.quarantined != was_quarantined:
+                self._export()
+            return stats
+
+    # ------------------------------------------------------------------
+    # 记录执行结果
+    # ------------------------------------------------------------------
+
+    def record(
+        self, test_id: str, passed: bool, version: Optional[str] = None
+    ) -> FlakyStats:
+        """记录一次执行结果并增量更新窗口计数；version 为被测代码版本（提交 + 工作区指纹）
+
+        评分或同版本翻转达到阈值时自动隔离，隔离后连续通过且评分回落时自动解除
+        """
+        policy = self.policy
+        outcome = _PASS if passed else _FAIL
+
+        def update(stats: FlakyStats) -> None:
+            same_version = bool(version) and version == stats.last_version
+            if stats.window and stats.window[-1].upper() != outcome:
+                stats.flips += 1
+                stats.window_flips += 1
+                stats.window_version_flips += same_version
+            stats.window += outcome.lower() if same_version else outcome
+            stats.window_failures += not passed
+
+            # 移出最旧的结果，并扣除它与下一个结果之间的翻转
+            if len(stats.window) > policy.window:
+                oldest, following = stats.window[0], stats.window[1]
+                stats.window_failures -= oldest.upper() == _FAIL
+                if oldest.upper() != following.upper():
+                    stats.window_flips -= 1
+                    stats.window_version_flips -= following.islower()
+                stats.window = stats.window[1:]
+
+            if passed:
+                stats.passes += 1
+                stats.pass_streak += 1
+            else:
+                stats.failures += 1
+                stats.pass_streak = 0
+            stats.last_status = "passed" if passed else "failed"
+            stats.last_version = version or ""
+            stats.last_run = time.time()
+
+            if not stats.quarantined and policy.should_quarantine(stats):
+                stats.quarantined = True
+                stats.quarantined_at = stats.last_run
+            elif stats.quarantined and policy.should_release(stats):
+                stats.quarantined = False
+                stats.quarantined_at = None
+
+        return self._write(test_id, update)
+
+    def record_success(self, test_id: str, version: Optional[str] = None) -> FlakyStats:
+        return self.record(test_id, True, version)
+
+    def record_failure(self, test_id: str, version: Optional[str] = None) -> FlakyStats:
+        return self.record(test_id, False, version)
+
+    def update_test_status(
+        self, test_id: str, status: Any, version: Optional[str] = None
+    ) -> Optional[FlakyStats]:
+        """按状态记录结果（接受状态枚举或字符串），非通过/失败的状态不计数"""
+        value = getattr(status, "value", status)
+        if value == "passed":
+            return self.record(test_id, True, version)
+        if value in ("failed", "timeout"):
+            return self.record(test_id, False, version)
+        return None
+
+    def ranked(self, limit: Optional[int] = None) -> List[FlakyStats]:
+        """按 flaky 评分降序排列（隔离中的优先）"""
+        with self._lock:
+            self._refresh()
+            ranked = sorted(
+                self._index.values(),
+                key=lambda s: (-s.score, not s.quarantined, -s.failure_rate, s.test_id),
+            )
+        return ranked[:limit] if limit else ranked
+
+    # ------------------------------------------------------------------
+    # 隔离清单
+    # ------------------------------------------------------------------
+
+    def add(self, test_id: str) -> None:
+        """手动隔离用例"""
+
+        def update(stats: FlakyStats) -> None:
+            if not stats.quarantined:
+                stats.quarantined = True
+                stats.quarantined_at = time.time()
+
+        self._write(test_id, update)
+
+    def remove(self, test_id: str) -> bool:
+        """移除用例的隔离状态和计数，返回之前是否处于隔离中"""
+        with self._lock:
+            was_quarantined = self.contains(test_id)
+            self._connect().execute("DELETE FROM flaky_tests WHERE test_id = ?", (test_id,))
+            self._index.pop(test_id, None)
+            if was_quarantined:
+                self._export()
+            return was_quarantined
+
+    def clear(self) -> None:
+        """清空所有隔离状态和计数"""
+        with self._lock:
+            self._connect().execute("DELETE FROM flaky_tests")
+            self._index.clear()
+            self._export()
+
+    def contains(self, test_id: str) -> bool:
+        with self._lock:
+            self._refresh()
+            stats = self._index.get(test_id)
+            return bool(stats and stats.quarantined)
+
+    is_flaky = contains
+
+    def get(self, test_id: str) -> Optional[FlakyStats]:
+        with self._lock:
+            self._refresh()
+            return self._index.get(test_id)
+
+    def all_stats(self) -> List[FlakyStats]:
+        with self._lock:
+            self._refresh()
+            return sorted(self._index.values(), key=lambda s: s.test_id)
 
     def read(self) -> Dict[str, List[str]]:
+        """隔离中的用例（与旧版 flaky-list.json 格式一致）"""
+        with self._lock:
+            self._refresh()
+            return {
+                "tests": sorted(t for t, s in self._index.items() if s.quarantined)
+            }
+
+    def save_state(self) -> None:
+        """导出隔离清单并将 WAL 合并回主库"""
+        with self._lock:
+            self._export()
+            self._connect().execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+                self._data_version = None
+
+    # ------------------------------------------------------------------
+    # flaky-list.json
+    # ------------------------------------------------------------------
+
+    def _read_json(self) -> Dict[str, List[str]]:
         if not self.path.exists():
             return {"tests": []}
         try:
             data = json.loads(self.path.read_text(encoding="utf-8"))
-            if not isinstance(data, dict) or "tests" not in data:
+            if not isinstance(data, dict) or not isinstance(data.get("tests"), list):
                 return {"tests": []}
-            if not isinstance(data["tests"], list):
-                data["tests"] = []
             return data
         except Exception:
             return {"tests": []}
 
-    def add(self, test_id: str) -> None:
-        data = self.read()
-        tests = set(data.get("tests", []))
-        tests.add(test_id)
+    def _export(self) -> None:
+        """原子写入隔离清单（以数据库为准，并发写入时最后一次导出仍是完整清单）"""
+        tests = [
+            row[0]
+            for row in self._connect().execute(
+                "SELECT test_id FROM flaky_tests WHERE quarantined = 1 ORDER BY test_id"
+            )
+        ]
         self.path.parent.mkdir(parents=True, exist_ok=True)
-        self.path.write_text(
-            json.dumps({"tests": sorted(tests)}, indent=2, ensure_ascii=False),
+        tmp_path = self.path.with_name(
+            f".{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        tmp_path.write_text(
+            json.dumps({"tests": tests}, indent=2, ensure_ascii=False),
             encoding="utf-8",
         )
+        os.replace(tmp_path, self.path)
 
-    def contains(self, test_id: str) -> bool:
-        data = self.read()
-        return test_id in set(data.get("tests", []))
+
+# enhanced_orchestrator 使用的名称
+FlakyTestStore = FlakyStore
@@ -9,12 +9,21 @@ import subprocess
 from pathlib import Path
 from typing import List, Optional, Set, Tuple
 
+from utils.change_detection import ChangeDetector
+from utils.dependency_graph import WorkspaceGraph
+
 
 class GitManager:
-    def __init__(self, repo_root: Optional[str] = None) -> None:
+    def __init__(
+        self,
+        repo_root: Optional[str] = None,
+        dependency_graph: Optional[WorkspaceGraph] = None,
+    ) -> None:
         self.repo_root = Path(
             repo_root or Path(__file__).resolve().parents[3]
         ).as_posix()
+        # 未提供配置时仅根据 workspace 的 package.json 推导依赖
+        self.dependency_graph = dependency_graph or WorkspaceGraph(self.repo_root)
 
     def _run(self, args: List[str], cwd: Optional[str] = None) -> Tuple[int, str, str]:
         process = subprocess.Popen(
@@ -28,37 +37,19 @@ class GitManager:
         return process.returncode, out.strip(), err.strip()
 
     def get_changed_files(
-        self, base_ref: str = "origin/main", head_ref: str = "HEAD"
+        self, base_ref: Optional[str] = None, head_ref: str = "HEAD"
     ) -> List[str]:
-        # 优先确保有远程引用，失败则退回 HEAD~1
-        code, out, _ = self._run(["git", "rev-parse", "--verify", base_ref])
-        if code != 0:
-            base_ref = f"{head_ref}~1"
-
-        code, out, err = self._run(
-            ["git", "diff", "--name-only", f"{base_ref}..{head_ref}"]
+        # 对比 merge-base；检测 HEAD 时同时包含未提交和未跟踪的文件
+        return (
+            ChangeDetector(self.repo_root)
+            .detect(base_ref, head_ref, include_worktree=head_ref == "HEAD")
+            .files
         )
-        if code != 0:
-            return []
-        files = [f for f in out.splitlines() if f]
-        return files
 
     def map_files_to_apps(self, files: List[str]) -> Set[str]:
-        affected: Set[str] = set()
-        for f in files:
-            parts = f.split("/")
-            if len(parts) >= 2 and parts[0] == "apps":
-                affected.add(parts[1])
-            elif parts[0] == "shared":
-                # 共享代码影响所有前端，以及可能的后端
-                affected.update({"blog", "mobile", "server"})
-        return affected
+        # 共享库变更通过 workspace 依赖图映射到实际依赖它的应用
+        return self.dependency_graph.affected_apps(files)
 
     def expand_with_dependencies(self, apps: Set[str]) -> Set[str]:
-        # 简单依赖展开：blog/lowcode/mobile 依赖 server
-        expanded = set(apps)
-        deps = {"blog": ["server"], "mobile": ["server"]}
-        for a in list(expanded):
-            for d in deps.get(a, []):
-                expanded.add(d)
-        return expanded
+        # 反向依赖闭包：被依赖的应用变更时，依赖它的应用也需要测试
+        return self.dependency_graph.dependents_closure(apps)
@@ -0,0 +1,231 @@
+"""
+健康检查引擎：TCP 预检 + 复用连接池的 HTTP 探测 + 抖动指数退避，支持并发检查所有应用
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional, Tuple
+from urllib.parse import urlparse
+
+import aiohttp
+from utils.logger import get_logger
+
+from config import AppConfig, HealthCheckConfig
+
+
+@dataclass
+class HealthCheckResult:
+    """健康检查结果"""
+
+    name: str
+    url: str
+    healthy: bool
+    status: Optional[int] = None
+    attempts: int = 0
+    latency: float = 0.0  # 最后一次探测耗时（秒）
+    elapsed: float = 0.0  # 整体耗时（秒）
+    error: str = ""
+
+
+def resolve_health_check(app_config: AppConfig) -> Optional[HealthCheckConfig]:
+    """解析应用的健康检查配置，未配置时按端口推断"""
+    hc = app_config.health_check
+    if isinstance(hc, HealthCheckConfig):
+        return hc
+    if isinstance(hc, str) and hc:
+        return HealthCheckConfig(url=hc)
+    if app_config.port:
+        return HealthCheckConfig(url=f"http://localhost:{app_config.port}")
+    return None
+
+
+def backoff_delays(
+    base: float = 0.05, cap: float = 2.0, factor: float = 2.0
+) -> Iterator[float]:
+    """Full-jitter 指数退避：第 n 次等待 uniform(0, min(cap, base * factor^n))"""
+    attempt = 0
+    while True:
+        ceiling = min(cap, base * (factor**attempt))
+        yield random.uniform(0, ceiling)
+        if ceiling < cap:
+            attempt += 1
+
+
+def _host_port(url: str) -> Tuple[str, int]:
+    """从 URL 中解析主机和端口"""
+    parsed = urlparse(url)
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    return parsed.hostname or "localhost", port
+
+
+class HealthChecker:
+    """健康检查器（单个 HTTP 连接池，在多次探测和多个应用间复用）"""
+
+    def __init__(
+        self,
+        max_connections: int = 20,
+        base_delay: float = 0.05,
+        max_delay: float = 2.0,
+        ready_poll_cap: float = 0.1,
+    ):
+        self.logger = get_logger("health_check")
+        self.max_connections = max_connections
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.ready_poll_cap = ready_poll_cap
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self) -> "HealthChecker":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """惰性创建共享会话"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections, ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self) -> None:
+        """关闭连接池"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def tcp_probe(self, host: str, port: int, timeout: float = 1.0) -> bool:
+        """TCP 连接预检：端口未监听时无需发起 HTTP 请求"""
+        try:
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port), timeout=timeout
+            )
+        except (OSError, asyncio.TimeoutError):
+            return False
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        return True
+
+    async def http_probe(self, url: str, timeout: float) -> int:
+        """发起一次 HTTP GET，返回状态码"""
+        session = self._get_session()
+        client_timeout = aiohttp.ClientTimeout(total=max(timeout, 0.05))
+        async with session.get(url, timeout=client_timeout) as response:
+            return response.status
+
+    async def _probe_once(
+        self, result: HealthCheckResult, hc: HealthCheckConfig, remaining: float
+    ) -> bool:
+        """执行一轮 TCP + HTTP 探测，结果写入 result"""
+        host, port = _host_port(hc.url)
+        probe_start = time.perf_counter()
+        result.attempts += 1
+        try:
+            if not await self.tcp_probe(host, port, timeout=min(1.0, remaining)):
+                result.error = f"端口未就绪: {host}:{port}"
+                return False
+            result.status = await self.http_probe(hc.url, remaining)
+            if result.status == hc.expected_status:
+                result.error = ""
+                return True
+            result.error = f"状态码 {result.status}，期望 {hc.expected_status}"
+            return False
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+            result.error = str(e) or e.__class__.__name__
+            return False
+        finally:
+            result.latency = time.perf_counter() - probe_start
+
+    async def check(self, name: str, hc: HealthCheckConfig) -> HealthCheckResult:
+        """检查单个服务：最多 1 + retries 次探测，整体不超过 hc.timeout"""
+        result = HealthCheckResult(name=name, url=hc.url, healthy=False)
+        start = time.perf_counter()
+        deadline = start + hc.timeout
+        delays = backoff_delays(self.base_delay, self.max_delay)
+
+        for attempt in range(hc.retries + 1):
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            if await self._probe_once(result, hc, remaining):
+                result.healthy = True
+                break
+            if attempt < hc.retries:
+                delay = min(next(delays), max(0.0, deadline - time.perf_counter()))
+                await asyncio.sleep(delay)
+
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    async def wait_until_ready(
+        self, name: str, hc: HealthCheckConfig, timeout: float
+    ) -> HealthCheckResult:
+        """等待服务就绪：以短周期 TCP 轮询代替固定 startup_wait 休眠"""
+        result = HealthCheckResult(name=name, url=hc.url, healthy=False)
+        start = time.perf_counter()
+        deadline = start + timeout
+        delays = backoff_delays(0.005, self.ready_poll_cap)
+
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            if await self._probe_once(result, hc, remaining):
+                result.healthy = True
+                break
+            await asyncio.sleep(
+                min(next(delays), max(0.0, deadline - time.perf_counter()))
+            )
+
+        result.elapsed = time.perf_counter() - start
+        if not result.healthy:
+            self.logger.warning(f"服务 {name} 在 {timeout}s 内未就绪: {result.error}")
+        return result
+
+    async def check_all(
+        self, targets: Dict[str, HealthCheckConfig]
+    ) -> Dict[str, HealthCheckResult]:
+        """并发检查所有服务"""
+        names = list(targets.keys())
+        results = await asyncio.gather(
+            *(self.check(name, targets[name]) for name in names)
+        )
+        return dict(zip(names, results))
+
+    async def wait_all(
+        self, apps: Dict[str, AppConfig]
+    ) -> Dict[str, HealthCheckResult]:
+        """并发等待所有应用就绪，每个应用以其 startup_wait 为上限"""
+        pending = {}
+        for name, app_config in apps.items():
+            hc = resolve_health_check(app_config)
+            if hc:
+                pending[name] = self.wait_until_ready(
+                    name, hc, max(app_config.startup_wait, hc.timeout)
+                )
+        results = await asyncio.gather(*pending.values())
+        return dict(zip(pending.keys(), results))
+
+
+async def check_apps_health(
+    apps: Dict[str, AppConfig], wait: bool = False
+) -> Dict[str, HealthCheckResult]:
+    """检查（或等待）一组应用的健康状态"""
+    async with HealthChecker() as checker:
+        if wait:
+            return await checker.wait_all(apps)
+        targets = {}
+        for name, app_config in apps.items():
+            hc = resolve_health_check(app_config)
+            if hc:
+                targets[name] = hc
+        return await checker.check_all(targets)
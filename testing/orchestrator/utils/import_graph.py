@@ -0,0 +1,378 @@
+"""
+JS/TS import 图索引：解析 import/require，解析 tsconfig paths 与 workspace 包名，
+按 mtime + 内容哈希增量更新，并反查「哪些测试文件传递依赖了这些变更文件」
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from utils.dependency_graph import discover_workspace_packages
+from utils.metrics import record_cache
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parents[2] / ".cache" / "import-graph"
+
+SOURCE_EXTENSIONS = (".ts", ".tsx", ".js", ".jsx", ".mjs", ".cjs")
+EXCLUDED_DIRS = {
+    "node_modules",
+    "dist",
+    "build",
+    "out",
+    "coverage",
+    ".next",
+    ".turbo",
+    ".cache",
+    "docs-dist",
+    "public",
+}
+
+_STATIC_IMPORT = re.compile(
+    r"""\b(?:import|export)\s(?:[^'";]*?\sfrom\s*)?['"]([^'"\n]+)['"]""", re.S
+)
+_CALL_IMPORT = re.compile(
+    r"""\b(?:require|import|require\.resolve|jest\.mock|vi\.mock)\s*\(\s*['"]([^'"\n]+)['"]"""
+)
+_TEST_FILE = re.compile(r"\.(?:test|spec)\.[cm]?[jt]sx?$")
+# 按路径约定区分测试类型：目录或文件名中的 e2e / integration 片段
+_TEST_KIND = {
+    "e2e": re.compile(r"(?:^|[/._-])e2e(?:[/._-]|$)"),
+    "integration": re.compile(r"(?:^|[/._-])integration(?:[/._-]|$)"),
+}
+
+
+def is_test_file(path: str) -> bool:
+    """是否为测试文件"""
+    return bool(_TEST_FILE.search(path)) or "/__tests__/" in f"/{path}"
+
+
+def test_kind(path: str) -> str:
+    """测试文件的类型（unit / integration / e2e），用于在运行器没有文件过滤时按套件分流"""
+    for kind, pattern in _TEST_KIND.items():
+        if pattern.search(path):
+            return kind
+    return "unit"
+
+
+def parse_imports(source: str) -> List[str]:
+    """提取源码中的模块说明符"""
+    specs = _STATIC_IMPORT.findall(source) + _CALL_IMPORT.findall(source)
+    return list(dict.fromkeys(specs))
+
+
+def _load_jsonc(path: Path) -> dict:
+    """读取带注释和尾逗号的 JSON（tsconfig 格式）"""
+    text = path.read_text(encoding="utf-8")
+    out = []
+    i, n = 0, len(text)
+    in_string = False
+    while i < n:
+        ch = text[i]
+        if in_string:
+            out.append(ch)
+            if ch == "\\" and i + 1 < n:
+                out.append(text[i + 1])
+                i += 1
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+            out.append(ch)
+        elif text.startswith("//", i):
+            i = text.find("\n", i)
+            i = n if i == -1 else i
+            continue
+        elif text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+            continue
+        else:
+            out.append(ch)
+        i += 1
+    cleaned = re.sub(r",(\s*[}\]])", r"\1", "".join(out))
+    return json.loads(cleaned)
+
+
+class ModuleResolver:
+    """模块说明符解析：相对路径、tsconfig baseUrl/paths、workspace 包名"""
+
+    def __init__(self, repo_root: Path, app_dir: Path):
+        self.repo_root = repo_root
+        self.app_dir = app_dir
+        self.base_url: Optional[Path] = None
+        self.paths: List[Tuple[str, List[Path]]] = []
+        self.packages: Dict[str, Path] = {}
+        self._config_files: List[Path] = []
+        self._load_tsconfig(app_dir / "tsconfig.json")
+        self._load_workspace_packages()
+
+    @property
+    def fingerprint(self) -> str:
+        """解析配置的指纹，配置变化时整个缓存失效"""
+        digest = hashlib.sha1()
+        for path in sorted(self._config_files):
+            try:
+                digest.update(path.read_bytes())
+            except OSError:
+                pass
+        digest.update(json.dumps(sorted(self.packages)).encode())
+        return digest.hexdigest()
+
+    def _load_tsconfig(self, path: Path, depth: int = 0) -> None:
+        if depth > 5 or not path.is_file():
+            return
+        self._config_files.append(path)
+        try:
+            data = _load_jsonc(path)
+        except (OSError, ValueError):
+            return
+
+        # 先加载 extends，当前文件的设置覆盖基础配置
+        extends = data.get("extends")
+        for base in extends if isinstance(extends, list) else [extends]:
+            if isinstance(base, str) and base.startswith("."):
+                base_path = (path.parent / base).resolve()
+                if base_path.suffix != ".json":
+                    base_path = base_path.with_name(base_path.name + ".json")
+                self._load_tsconfig(base_path, depth + 1)
+
+        options = data.get("compilerOptions", {}) or {}
+        if "baseUrl" in options:
+            self.base_url = (path.parent / options["baseUrl"]).resolve()
+        if "paths" in options:
+            root = self.base_url or path.parent
+            self.paths = [
+                (pattern, [(root / target).resolve() for target in targets])
+                for pattern, targets in options["paths"].items()
+            ]
+            # 更具体（前缀更长）的模式优先
+            self.paths.sort(key=lambda item: -len(item[0].split("*")[0]))
+
+    def _load_workspace_packages(self) -> None:
+        workspace = self.repo_root / "pnpm-workspace.yaml"
+        if workspace.is_file():
+            self._config_files.append(workspace)
+        self.packages = discover_workspace_packages(self.repo_root)
+
+    @staticmethod
+    def _resolve_file(base: Path) -> Optional[Path]:
+        """按扩展名和 index 文件规则查找实际文件"""
+        if base.is_file():
+            return base
+        candidates = [base.with_name(base.name + ext) for ext in SOURCE_EXTENSIONS]
+        if base.suffix in (".js", ".jsx", ".mjs", ".cjs"):
+            # TS ESM 写法：import './a.js' 实际指向 a.ts
+            stem = base.with_suffix("")
+            candidates += [stem.with_name(stem.name + ext) for ext in (".ts", ".tsx")]
+        candidates += [base / f"index{ext}" for ext in SOURCE_EXTENSIONS]
+        for candidate in candidates:
+            if candidate.is_file():
+                return candidate
+        return None
+
+    def _resolve_package(self, package_dir: Path, subpath: str) -> Optional[Path]:
+        if subpath:
+            return self._resolve_file(package_dir / subpath) or self._resolve_file(
+                package_dir / "src" / subpath
+            )
+        try:
+            manifest = json.loads((package_dir / "package.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            manifest = {}
+        for field in ("source", "main", "module", "types"):
+            entry = manifest.get(field)
+            if isinstance(entry, str):
+                resolved = self._resolve_file(package_dir / entry)
+                # 跳过指向构建产物的入口，回退到源码
+                if (
+                    resolved
+                    and resolved.suffix in SOURCE_EXTENSIONS
+                    and not EXCLUDED_DIRS.intersection(resolved.parent.parts)
+                ):
+                    return resolved
+        return self._resolve_file(package_dir / "src" / "index") or self._resolve_file(
+            package_dir / "index"
+        )
+
+    def resolve(self, spec: str, importer: Path) -> Optional[Path]:
+        """解析说明符为仓库内的文件，第三方依赖返回 None"""
+        spec = spec.split("?")[0]
+        if spec.startswith("."):
+            return self._resolve_file((importer.parent / spec).resolve())
+
+        for pattern, targets in self.paths:
+            prefix, star, suffix = pattern.partition("*")
+            if star:
+                if not (spec.startswith(prefix) and spec.endswith(suffix)):
+                    continue
+                matched = spec[len(prefix) : len(spec) - len(suffix) or None]
+            elif spec != pattern:
+                continue
+            else:
+                matched = ""
+            for target in targets:
+                resolved = self._resolve_file(Path(str(target).replace("*", matched)))
+                if resolved:
+                    return resolved
+
+        parts = spec.split("/")
+        name_parts = 2 if spec.startswith("@") else 1
+        package_dir = self.packages.get("/".join(parts[:name_parts]))
+        if package_dir:
+            return self._resolve_package(package_dir, "/".join(parts[name_parts:]))
+
+        if self.base_url:
+            return self._resolve_file(self.base_url / spec)
+        return None
+
+
+class ImportGraph:
+    """单个应用的 import 图（节点为仓库相对路径）"""
+
+    def __init__(
+        self,
+        repo_root: Path,
+        app_dir: Path,
+        cache_path: Optional[Path] = None,
+    ):
+        self.repo_root = Path(repo_root).resolve()
+        self.app_dir = Path(app_dir).resolve()
+        self.cache_path = cache_path or DEFAULT_CACHE_DIR / self._cache_name()
+        self.resolver = ModuleResolver(self.repo_root, self.app_dir)
+        # path -> [mtime, size, sha1, imports]
+        self.files: Dict[str, list] = {}
+        self.importers: Dict[str, Set[str]] = {}
+        self._dirty = False
+
+    def _cache_name(self) -> str:
+        """缓存文件名：目录名便于识别，加上仓库相对路径的哈希避免同名目录冲突"""
+        try:
+            key = self.app_dir.relative_to(self.repo_root).as_posix()
+        except ValueError:
+            key = self.app_dir.as_posix()
+        digest = hashlib.sha1(key.encode()).hexdigest()[:12]
+        return f"{self.app_dir.name}-{digest}.json"
+
+    def _rel(self, path: Path) -> str:
+        return path.relative_to(self.repo_root).as_posix()
+
+    def _load_cache(self, fingerprint: str) -> None:
+        try:
+            data = json.loads(self.cache_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if data.get("version") == CACHE_VERSION and data.get("fingerprint") == fingerprint:
+            self.files = data.get("files", {})
+
+    def _save_cache(self, fingerprint: str) -> None:
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"version": CACHE_VERSION, "fingerprint": fingerprint, "files": self.files}
+        tmp_path = self.cache_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(payload), encoding="utf-8")
+        os.replace(tmp_path, self.cache_path)
+
+    def _scan_sources(self) -> List[Path]:
+        sources = []
+        for dirpath, dirnames, filenames in os.walk(self.app_dir):
+            dirnames[:] = [
+                d for d in dirnames if d not in EXCLUDED_DIRS and not d.startswith(".")
+            ]
+            for filename in filenames:
+                if filename.endswith(SOURCE_EXTENSIONS) and not filename.endswith(".d.ts"):
+                    sources.append(Path(dirpath) / filename)
+        return sources
+
+    def _index_file(self, path: Path) -> List[str]:
+        """索引单个文件：mtime/大小未变直接复用，内容哈希未变只更新 mtime"""
+        rel = self._rel(path)
+        try:
+            stat = path.stat()
+        except OSError:
+            return []
+        entry = self.files.get(rel)
+        if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            record_cache("import_graph", hit=True)
+            return entry[3]
+
+        content = path.read_bytes()
+        digest = hashlib.sha1(content).hexdigest()
+        if entry and entry[2] == digest:
+            entry[0], entry[1] = stat.st_mtime_ns, stat.st_size
+            self._dirty = True
+            record_cache("import_graph", hit=True)
+            return entry[3]
+
+        record_cache("import_graph", hit=False)
+
+        imports = []
+        for spec in parse_imports(content.decode("utf-8", errors="ignore")):
+            resolved = self.resolver.resolve(spec, path)
+            if resolved is None:
+                continue
+            try:
+                imports.append(self._rel(resolved))
+            except ValueError:
+                continue  # 仓库外的文件
+        self.files[rel] = [stat.st_mtime_ns, stat.st_size, digest, sorted(set(imports))]
+        self._dirty = True
+        return self.files[rel][3]
+
+    def refresh(self) -> "ImportGraph":
+        """增量刷新索引：应用内源文件，以及它们传递引用到的应用外源文件"""
+        fingerprint = self.resolver.fingerprint
+        if not self.files:
+            self._load_cache(fingerprint)
+
+        seen: Set[str] = set()
+        queue = deque(self._scan_sources())
+        while queue:
+            path = queue.popleft()
+            rel = self._rel(path)
+            if rel in seen:
+                continue
+            seen.add(rel)
+            for target in self._index_file(path):
+                if target not in seen and target.endswith(SOURCE_EXTENSIONS):
+                    queue.append(self.repo_root / target)
+
+        removed = set(self.files) - seen
+        for rel in removed:
+            del self.files[rel]
+        if removed or self._dirty:
+            self._save_cache(fingerprint)
+            self._dirty = False
+
+        self.importers = {}
+        for rel, entry in self.files.items():
+            for target in entry[3]:
+                self.importers.setdefault(target, set()).add(rel)
+        return self
+
+    def contains(self, path: str) -> bool:
+        """文件是否为图中的节点（源文件或被引用的资源文件）"""
+        return path in self.files or path in self.importers
+
+    def affected_tests(self, changed_files: Iterable[str]) -> List[str]:
+        """反查传递依赖这些文件的测试文件"""
+        seen: Set[str] = set()
+        queue = deque(f for f in changed_files if self.contains(f))
+        while queue:
+            rel = queue.popleft()
+            if rel in seen:
+                continue
+            seen.add(rel)
+            queue.extend(self.importers.get(rel, ()))
+        return sorted(
+            rel
+            for rel in seen
+            if rel in self.files and is_test_file(rel) and self._in_app(rel)
+        )
+
+    def _in_app(self, rel: str) -> bool:
+        return (self.repo_root / rel).is_relative_to(self.app_dir)
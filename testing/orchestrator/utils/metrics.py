@@ -0,0 +1,335 @@
+"""
+编排器内部指标：计数器 / 仪表 / 直方图注册表，按 OpenMetrics 文本格式导出
+
+调度器、执行后端和缓存在运行时更新指标，队列深度、资源采样等瞬时值在抓取时由 collector 计算。
+start_http_server 在本地地址上提供 /metrics（serve 守护进程直接挂在自己的 HTTP 服务上），
+外部监控按 Prometheus 方式抓取即可，不需要解析报告 JSON
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# 任务耗时（秒）：单测秒级，e2e / 集成测试可到数十分钟
+DURATION_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 3600)
+# 进程启动延迟（秒）
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+@dataclass
+class Sample:
+    name: str  # 含 _total / _bucket 等后缀
+    labels: Dict[str, str]
+    value: float
+
+
+@dataclass
+class MetricFamily:
+    """一个指标族：collector 的输出，也是渲染的单位"""
+
+    name: str
+    type: str  # counter / gauge / histogram
+    documentation: str
+    samples: List[Sample] = field(default_factory=list)
+
+    def add(self, value: float, suffix: str = "", **labels: str) -> "MetricFamily":
+        self.samples.append(
+            Sample(self.name + suffix, {k: str(v) for k, v in labels.items()}, value)
+        )
+        return self
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    if float(value).is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+class _Metric:
+    type = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: Optional["Registry"] = None,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelKey:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} 需要标签 {self.labelnames}，收到 {tuple(labels)}")
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+    def collect(self) -> MetricFamily:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """单调递增计数器（样本名带 _total 后缀）"""
+
+    type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def items(self) -> List[Tuple[Dict[str, str], float]]:
+        with self._lock:
+            return [(dict(key), value) for key, value in self._values.items()]
+
+    def collect(self) -> MetricFamily:
+        family = MetricFamily(self.name, self.type, self.documentation)
+        for labels, value in self.items():
+            family.add(value, "_total", **labels)
+        return family
+
+
+class Gauge(_Metric):
+    """可增可减的瞬时值"""
+
+    type = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def collect(self) -> MetricFamily:
+        family = MetricFamily(self.name, self.type, self.documentation)
+        with self._lock:
+            for key, value in self._values.items():
+                family.add(value, **dict(key))
+        return family
+
+
+class Histogram(_Metric):
+    """累积分桶直方图：_bucket{le} / _count / _sum"""
+
+    type = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DURATION_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # 每组标签：各桶计数（非累积，最后一个为 +Inf）、总和
+        self._values: Dict[LabelKey, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            counts, total = self._values.setdefault(
+                key, ([0] * (len(self.buckets) + 1), [0.0])
+            )
+            counts[index] += 1
+            total[0] += value
+
+    def collect(self) -> MetricFamily:
+        family = MetricFamily(self.name, self.type, self.documentation)
+        with self._lock:
+            for key, (counts, total) in self._values.items():
+                labels = dict(key)
+                cumulative = 0
+                for bound, count in zip(self.buckets + (math.inf,), counts):
+                    cumulative += count
+                    family.add(cumulative, "_bucket", **labels, le=_format_value(bound))
+                family.add(cumulative, "_count", **labels)
+                family.add(total[0], "_sum", **labels)
+        return family
+
+
+Collector = Callable[[], Iterable[MetricFamily]]
+
+
+class Registry:
+    """指标注册表
+
+    collector 在抓取时调用；多个 collector 产出同名同标签的 gauge 时数值相加
+    （例如 serve 模式下同时运行的多个调度器的队列深度）
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: Dict[str, Collector] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"指标 {metric.name} 已注册")
+            self._metrics[metric.name] = metric
+
+    def register_collector(self, key: str, collector: Collector) -> None:
+        """按 key 登记 collector，同一 key 重复登记时替换"""
+        with self._lock:
+            self._collectors[key] = collector
+
+    def unregister_collector(
+        self, key: str, collector: Optional[Collector] = None
+    ) -> None:
+        """注销 collector；给出 collector 时只有仍是它时才注销"""
+        with self._lock:
+            if collector is None or self._collectors.get(key) == collector:
+                self._collectors.pop(key, None)
+
+    def collect(self) -> List[MetricFamily]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors.values())
+
+        families: Dict[str, MetricFamily] = {}
+        for metric in metrics:
+            families[metric.name] = metric.collect()
+        for collector in collectors:
+            try:
+                produced = list(collector())
+            except Exception:
+                # 单个 collector 出错不影响其他指标
+                continue
+            for family in produced:
+                merged = families.setdefault(
+                    family.name,
+                    MetricFamily(family.name, family.type, family.documentation),
+                )
+                merged.samples.extend(family.samples)
+
+        for family in families.values():
+            if family.type == "gauge":
+                family.samples = _sum_duplicates(family.samples)
+        return list(families.values())
+
+    def render(self) -> str:
+        """OpenMetrics 文本格式"""
+        lines = []
+        for family in self.collect():
+            if not family.samples:
+                continue
+            lines.append(f"# TYPE {family.name} {family.type}")
+            lines.append(f"# HELP {family.name} {_escape(family.documentation)}")
+            for sample in family.samples:
+                labels = _format_labels(sample.labels)
+                lines.append(f"{sample.name}{labels} {_format_value(sample.value)}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+def _sum_duplicates(samples: List[Sample]) -> List[Sample]:
+    merged: Dict[Tuple[str, LabelKey], Sample] = {}
+    for sample in samples:
+        key = (sample.name, tuple(sorted(sample.labels.items())))
+        if key in merged:
+            merged[key].value += sample.value
+        else:
+            merged[key] = Sample(sample.name, dict(sample.labels), sample.value)
+    return list(merged.values())
+
+
+REGISTRY = Registry()
+
+# 各模块共用的缓存命中计数：cache 为缓存名，result 为 hit / miss
+CACHE_REQUESTS = Counter(
+    "orchestrator_cache_requests",
+    "缓存查询次数",
+    ("cache", "result"),
+)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def _cache_hit_ratio() -> Iterable[MetricFamily]:
+    totals: Dict[str, List[float]] = {}
+    for labels, value in CACHE_REQUESTS.items():
+        counts = totals.setdefault(labels["cache"], [0.0, 0.0])
+        counts[0 if labels["result"] == "hit" else 1] += value
+    family = MetricFamily("orchestrator_cache_hit_ratio", "gauge", "缓存命中率（0~1）")
+    for cache, (hits, misses) in totals.items():
+        if hits + misses:
+            family.add(hits / (hits + misses), cache=cache)
+    yield family
+
+
+REGISTRY.register_collector("cache_hit_ratio", _cache_hit_ratio)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: Registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 抓取请求频繁，不输出访问日志
+        pass
+
+
+def start_http_server(
+    port: int, host: str = "127.0.0.1", registry: Optional[Registry] = None
+) -> ThreadingHTTPServer:
+    """在后台线程中提供 /metrics，返回的服务器可用 shutdown() 停止"""
+    handler = type(
+        "MetricsHandler", (_MetricsHandler,), {"registry": registry or REGISTRY}
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name="metrics-http", daemon=True
+    ).start()
+    return server
@@ -0,0 +1,169 @@
+"""
+预测性测试选择：根据历史结果学习「变更路径 → 任务失败」的共现关系，
+只运行失败置信度超过阈值的任务，并定期全量运行兜底
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterable, List, Optional
+
+DEFAULT_PATH = Path(__file__).resolve().parents[2] / "co-failure.json"
+
+# 每个变更文件最多向上泛化的目录层数（apps/blog/src/a.ts → apps/blog/src → apps/blog → apps）
+MAX_PATH_DEPTH = 3
+
+# 先验强度：观测次数较少时向任务基础失败率收缩
+PRIOR_WEIGHT = 2.0
+
+
+def path_keys(changed_file: str) -> List[str]:
+    """变更文件及其上层目录，作为共现矩阵的行"""
+    path = PurePosixPath(changed_file)
+    keys = [path.as_posix()]
+    for parent in list(path.parents)[:MAX_PATH_DEPTH]:
+        if parent.as_posix() != ".":
+            keys.append(parent.as_posix())
+    return keys
+
+
+@dataclass
+class SelectionResult:
+    """选择结果"""
+
+    selected: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+    scores: Dict[str, float] = field(default_factory=dict)
+    full_run: bool = False
+    reason: str = ""
+
+
+class CoFailureModel:
+    """共现矩阵：observations[path][task] 为该路径变更时任务运行次数，failures 同理"""
+
+    def __init__(self, store_path: Optional[Path] = None) -> None:
+        self.path = Path(store_path) if store_path else DEFAULT_PATH
+        self.runs = 0
+        self.runs_since_full = 0
+        self.task_runs: Dict[str, int] = {}
+        self.task_failures: Dict[str, int] = {}
+        self.observations: Dict[str, Dict[str, int]] = {}
+        self.failures: Dict[str, Dict[str, int]] = {}
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except Exception:
+            return
+        if not isinstance(data, dict):
+            return
+        self.runs = data.get("runs", 0)
+        self.runs_since_full = data.get("runs_since_full", 0)
+        self.task_runs = data.get("task_runs", {})
+        self.task_failures = data.get("task_failures", {})
+        self.observations = data.get("observations", {})
+        self.failures = data.get("failures", {})
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "runs": self.runs,
+            "runs_since_full": self.runs_since_full,
+            "task_runs": self.task_runs,
+            "task_failures": self.task_failures,
+            "observations": self.observations,
+            "failures": self.failures,
+        }
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def update(
+        self, changed_files: Iterable[str], results: Dict[str, bool], full_run: bool
+    ) -> None:
+        """增量更新：results 为本次实际运行的任务 → 是否通过"""
+        keys = {key for f in changed_files for key in path_keys(f)}
+        for task_id, passed in results.items():
+            self.task_runs[task_id] = self.task_runs.get(task_id, 0) + 1
+            if not passed:
+                self.task_failures[task_id] = self.task_failures.get(task_id, 0) + 1
+            for key in keys:
+                row = self.observations.setdefault(key, {})
+                row[task_id] = row.get(task_id, 0) + 1
+                if not passed:
+                    row = self.failures.setdefault(key, {})
+                    row[task_id] = row.get(task_id, 0) + 1
+
+        self.runs += 1
+        self.runs_since_full = 0 if full_run else self.runs_since_full + 1
+
+    def base_rate(self, task_id: str) -> float:
+        """任务的基础失败率"""
+        return (self.task_failures.get(task_id, 0) + 1) / (
+            self.task_runs.get(task_id, 0) + 2
+        )
+
+    def score(
+        self, task_id: str, changed_files: Iterable[str], min_observations: int
+    ) -> Optional[float]:
+        """给定变更文件时任务失败的置信度
+
+        每个文件取观测次数足够的最具体路径（文件本身优先，其次逐级上层目录），
+        多个文件取最大值；任一文件没有足够观测时返回 None。
+        """
+        prior = self.base_rate(task_id)
+        best = 0.0
+        for changed_file in changed_files:
+            for key in path_keys(changed_file):
+                n = self.observations.get(key, {}).get(task_id, 0)
+                if n >= min_observations:
+                    fails = self.failures.get(key, {}).get(task_id, 0)
+                    best = max(
+                        best, (fails + PRIOR_WEIGHT * prior) / (n + PRIOR_WEIGHT)
+                    )
+                    break
+            else:
+                return None
+        return best
+
+    def select(
+        self,
+        task_ids: List[str],
+        changed_files: List[str],
+        threshold: float = 0.1,
+        min_observations: int = 5,
+        full_run_every: int = 20,
+    ) -> SelectionResult:
+        """选择需要运行的任务；数据不足的任务总是运行（用于继续学习）"""
+        result = SelectionResult()
+
+        if not changed_files:
+            result.full_run, result.reason = True, "未检测到变更"
+        elif full_run_every and self.runs_since_full + 1 >= full_run_every:
+            result.full_run, result.reason = True, f"每 {full_run_every} 次全量运行兜底"
+        if result.full_run:
+            result.selected = list(task_ids)
+            return result
+
+        for task_id in task_ids:
+            score = self.score(task_id, changed_files, min_observations)
+            result.scores[task_id] = 1.0 if score is None else score
+            if score is None or score >= threshold:
+                result.selected.append(task_id)
+            else:
+                result.skipped.append(task_id)
+
+        if task_ids and not result.selected:
+            # 置信度全部低于阈值时至少运行得分最高的任务
+            best = max(task_ids, key=lambda t: result.scores.get(t, 0.0))
+            result.selected.append(best)
+            result.skipped.remove(best)
+
+        result.reason = f"置信度阈值 {threshold:.0%}"
+        return result
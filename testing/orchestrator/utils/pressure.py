@@ -0,0 +1,124 @@
+"""
+Linux PSI（Pressure Stall Information）读取：/proc/pressure/{cpu,memory,io}
+
+PSI 给出任务因争用 CPU / 内存 / I/O 而停顿的时间占比，比 CPU 使用率和内存占用率更能反映
+测试是否正在被拖慢。优先读取当前 cgroup v2 的 *.pressure（容器内只反映本容器的争用），
+不支持 PSI 的平台上 read_pressure 返回 None，调用方回退到使用率指标
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+RESOURCES = ("cpu", "memory", "io")
+
+_PROC_PRESSURE = Path("/proc/pressure")
+_CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+
+@dataclass
+class PressureStat:
+    """单个资源的停顿占比（百分比，10s / 60s / 300s 指数平均）和累计停顿时间（微秒）"""
+
+    some_avg10: float = 0.0
+    some_avg60: float = 0.0
+    some_avg300: float = 0.0
+    some_total: int = 0
+    # full：所有非空闲任务同时停顿（cpu 在较旧内核上没有 full 行）
+    full_avg10: float = 0.0
+    full_avg60: float = 0.0
+    full_avg300: float = 0.0
+    full_total: int = 0
+
+
+def _cgroup_dir() -> Optional[Path]:
+    """当前进程所在的 cgroup v2 目录（含 *.pressure 文件时）"""
+    try:
+        with open("/proc/self/cgroup", "r", encoding="utf-8") as f:
+            for line in f:
+                hierarchy, _, path = line.rstrip("\n").split(":", 2)
+                if hierarchy == "0":
+                    directory = _CGROUP_ROOT / path.lstrip("/")
+                    if (directory / "cpu.pressure").exists():
+                        return directory
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _parse(text: str) -> PressureStat:
+    stat = PressureStat()
+    for line in text.splitlines():
+        kind, _, rest = line.partition(" ")
+        if kind not in ("some", "full"):
+            continue
+        for item in rest.split():
+            key, _, value = item.partition("=")
+            field_name = f"{kind}_{key}"
+            if hasattr(stat, field_name):
+                setattr(stat, field_name, int(value) if key == "total" else float(value))
+    return stat
+
+
+class PressureReader:
+    """PSI 读取器：首次使用时确定数据源（cgroup 优先，其次 /proc/pressure）"""
+
+    def __init__(self, prefer_cgroup: bool = True):
+        self.prefer_cgroup = prefer_cgroup
+        self._paths: Optional[Dict[str, Path]] = None
+        self._resolved = False
+
+    def _resolve(self) -> Optional[Dict[str, Path]]:
+        if self._resolved:
+            return self._paths
+        self._resolved = True
+        cgroup = _cgroup_dir() if self.prefer_cgroup else None
+        # 根 cgroup 没有 *.pressure 文件，使用系统级数据
+        if cgroup is not None and cgroup != _CGROUP_ROOT:
+            paths = {r: cgroup / f"{r}.pressure" for r in RESOURCES}
+        else:
+            paths = {r: _PROC_PRESSURE / r for r in RESOURCES}
+        if all(os.access(path, os.R_OK) for path in paths.values()):
+            self._paths = paths
+        return self._paths
+
+    @property
+    def available(self) -> bool:
+        return self._resolve() is not None
+
+    def read(self) -> Optional[Dict[str, PressureStat]]:
+        """读取三类资源的 PSI；不支持时返回 None"""
+        paths = self._resolve()
+        if paths is None:
+            return None
+        stats = {}
+        for resource, path in paths.items():
+            try:
+                stats[resource] = _parse(path.read_text())
+            except (OSError, ValueError):
+                return None
+        return stats
+
+
+_default_reader = PressureReader()
+
+
+def read_pressure() -> Optional[Dict[str, PressureStat]]:
+    """读取 PSI（进程内共享同一个读取器）"""
+    return _default_reader.read()
+
+
+def pressure_percentages(stats: Optional[Dict[str, PressureStat]]) -> Dict[str, float]:
+    """常用的 10 秒停顿占比：cpu / memory / io 的 some 以及 memory / io 的 full"""
+    if not stats:
+        return {}
+    return {
+        "cpu_pressure": stats["cpu"].some_avg10,
+        "memory_pressure": stats["memory"].some_avg10,
+        "memory_pressure_full": stats["memory"].full_avg10,
+        "io_pressure": stats["io"].some_avg10,
+        "io_pressure_full": stats["io"].full_avg10,
+    }
@@ -0,0 +1,209 @@
+"""
+按任务进程树归因资源占用：CPU、RSS 和磁盘 I/O
+
+Linux 上每轮只扫描一次 /proc/<pid>/stat 建立父子关系，仅对属于被跟踪任务的进程额外读取
+/proc/<pid>/io；其他平台回退到 psutil。CPU 包含已回收子进程的时间（cutime/cstime），
+进程树中的短命子进程退出后仍计入所属任务
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+_PROC = "/proc"
+_HAS_PROC = os.path.isdir(os.path.join(_PROC, "self"))
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+@dataclass
+class TaskUsage:
+    """一个任务进程树在一次采样中的资源占用"""
+
+    task_id: str
+    timestamp: float
+    cpu_percent: float  # 相对单核，可超过 100
+    rss_mb: float
+    read_bytes: int  # 累计值
+    write_bytes: int
+    read_rate: float  # 字节/秒
+    write_rate: float
+    processes: int
+
+    def to_dict(self) -> Dict:
+        return {
+            "task_id": self.task_id,
+            "timestamp": self.timestamp,
+            "cpu_percent": round(self.cpu_percent, 2),
+            "rss_mb": round(self.rss_mb, 2),
+            "read_bytes": self.read_bytes,
+            "write_bytes": self.write_bytes,
+            "read_rate": round(self.read_rate, 2),
+            "write_rate": round(self.write_rate, 2),
+            "processes": self.processes,
+        }
+
+
+def _read_stat(pid: str) -> Optional[Tuple[int, int, float, int]]:
+    """读取 /proc/<pid>/stat：(ppid, session, cpu_seconds, rss_bytes)"""
+    try:
+        with open(f"{_PROC}/{pid}/stat", "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    # comm 可能包含空格和括号，从最后一个 ')' 之后解析
+    fields = data[data.rfind(b")") + 2 :].split()
+    try:
+        ppid = int(fields[1])
+        session = int(fields[3])
+        # utime stime cutime cstime
+        ticks = int(fields[11]) + int(fields[12]) + int(fields[13]) + int(fields[14])
+        rss = int(fields[21]) * _PAGE_SIZE
+    except (IndexError, ValueError):
+        return None
+    return ppid, session, ticks / _CLOCK_TICKS, rss
+
+
+def _read_io(pid: int) -> Tuple[int, int]:
+    """读取 /proc/<pid>/io 的 read_bytes / write_bytes（无权限时为 0）"""
+    read_bytes = write_bytes = 0
+    try:
+        with open(f"{_PROC}/{pid}/io", "rb") as f:
+            for line in f:
+                if line.startswith(b"read_bytes:"):
+                    read_bytes = int(line.split()[1])
+                elif line.startswith(b"write_bytes:"):
+                    write_bytes = int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return read_bytes, write_bytes
+
+
+class ProcessTreeSampler:
+    """对一组任务根进程做周期采样，输出每个任务的 TaskUsage
+
+    CPU 和 I/O 速率由相邻两次采样的累计值求差得到，任务的第一次采样速率为 0
+    """
+
+    def __init__(self):
+        # task_id -> (timestamp, cpu_seconds, read_bytes, write_bytes)
+        self._last: Dict[str, Tuple[float, float, int, int]] = {}
+
+    def forget(self, task_id: str) -> None:
+        """任务结束后清除其差分基准"""
+        self._last.pop(task_id, None)
+
+    def sample(self, roots: Dict[str, int]) -> List[TaskUsage]:
+        """采样 {task_id: 根进程 pid} 中每个任务的进程树"""
+        roots = {task_id: pid for task_id, pid in roots.items() if pid}
+        for task_id in list(self._last):
+            if task_id not in roots:
+                self.forget(task_id)
+        if not roots:
+            return []
+
+        now = time.time()
+        totals = self._collect(roots)
+        usages = []
+        for task_id, (cpu_seconds, rss, read_bytes, write_bytes, processes) in totals.items():
+            last = self._last.get(task_id)
+            cpu_percent = read_rate = write_rate = 0.0
+            if last:
+                elapsed = max(now - last[0], 1e-6)
+                # 子进程未被回收就退出时累计值可能回落，按 0 处理
+                cpu_percent = max(0.0, cpu_seconds - last[1]) / elapsed * 100
+                read_rate = max(0, read_bytes - last[2]) / elapsed
+                write_rate = max(0, write_bytes - last[3]) / elapsed
+            self._last[task_id] = (now, cpu_seconds, read_bytes, write_bytes)
+            usages.append(
+                TaskUsage(
+                    task_id=task_id,
+                    timestamp=now,
+                    cpu_percent=cpu_percent,
+                    rss_mb=rss / 1024 / 1024,
+                    read_bytes=read_bytes,
+                    write_bytes=write_bytes,
+                    read_rate=read_rate,
+                    write_rate=write_rate,
+                    processes=processes,
+                )
+            )
+        return usages
+
+    def _collect(self, roots: Dict[str, int]) -> Dict[str, Tuple[float, int, int, int, int]]:
+        """每个任务进程树的 (cpu_seconds, rss, read_bytes, write_bytes, 进程数)"""
+        if not _HAS_PROC:
+            return self._collect_psutil(roots)
+
+        stats: Dict[int, Tuple[int, int, float, int]] = {}
+        children: Dict[int, List[int]] = {}
+        sessions: Dict[int, List[int]] = {}
+        for entry in os.listdir(_PROC):
+            if not entry.isdigit():
+                continue
+            stat = _read_stat(entry)
+            if stat is None:
+                continue
+            pid = int(entry)
+            stats[pid] = stat
+            children.setdefault(stat[0], []).append(pid)
+            sessions.setdefault(stat[1], []).append(pid)
+
+        totals = {}
+        for task_id, root in roots.items():
+            if root not in stats:
+                continue
+            cpu_seconds = 0.0
+            rss = read_bytes = write_bytes = processes = 0
+            seen = set()
+            # 进程树 + 同一会话（任务以独立会话启动，被重新挂到 init 下的孙进程也能归属）
+            stack = [root] + sessions.get(root, [])
+            while stack:
+                pid = stack.pop()
+                if pid in seen or pid not in stats:
+                    continue
+                seen.add(pid)
+                _, _, cpu, process_rss = stats[pid]
+                io_read, io_write = _read_io(pid)
+                cpu_seconds += cpu
+                rss += process_rss
+                read_bytes += io_read
+                write_bytes += io_write
+                processes += 1
+                stack.extend(children.get(pid, ()))
+            totals[task_id] = (cpu_seconds, rss, read_bytes, write_bytes, processes)
+        return totals
+
+    def _collect_psutil(
+        self, roots: Dict[str, int]
+    ) -> Dict[str, Tuple[float, int, int, int, int]]:
+        """无 /proc 时通过 psutil 遍历进程树"""
+        import psutil
+
+        totals = {}
+        for task_id, root in roots.items():
+            try:
+                parent = psutil.Process(root)
+                tree = [parent] + parent.children(recursive=True)
+            except psutil.Error:
+                continue
+            cpu_seconds = 0.0
+            rss = read_bytes = write_bytes = processes = 0
+            for process in tree:
+                try:
+                    with process.oneshot():
+                        times = process.cpu_times()
+                        cpu_seconds += times.user + times.system
+                        rss += process.memory_info().rss
+                        if hasattr(process, "io_counters"):
+                            io = process.io_counters()
+                            read_bytes += io.read_bytes
+                            write_bytes += io.write_bytes
+                    processes += 1
+                except psutil.Error:
+                    continue
+            totals[task_id] = (cpu_seconds, rss, read_bytes, write_bytes, processes)
+        return totals
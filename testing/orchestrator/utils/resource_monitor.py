@@ -3,12 +3,44 @@
 """
 
 import time
+from collections import OrderedDict
 from dataclasses import dataclass
-from threading import Event, Thread
-from typing import Dict, List, Optional
+from threading import Event, Lock, Thread
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 
 import psutil
+from utils.alert_rules import AlertEngine, AlertEvent
 from utils.logger import get_logger
+from utils.metrics import REGISTRY, MetricFamily
+from utils.pressure import PressureReader, pressure_percentages
+from utils.process_tree import ProcessTreeSampler, TaskUsage
+from utils.ring_buffer import RingBuffer, RollingWindow
+
+# 按指标保存的时间序列：ResourceSnapshot 字段名（负载取 1 分钟均值，PSI 取 10 秒停顿占比）
+METRICS = (
+    "cpu_percent",
+    "memory_percent",
+    "disk_usage_percent",
+    "load_average_1m",
+    "cpu_pressure",
+    "memory_pressure",
+    "memory_pressure_full",
+    "io_pressure",
+    "io_pressure_full",
+)
+
+# is_system_under_pressure 使用的 PSI 阈值（停顿时间占比 %）；告警由 alert_rules 规则决定
+PRESSURE_THRESHOLDS = {
+    "cpu_pressure": 50.0,
+    "memory_pressure": 20.0,
+    "io_pressure": 40.0,
+}
+
+# 增量维护的统计窗口（分钟），其他窗口按环形缓冲区二分截取
+DEFAULT_WINDOWS = (5, 15)
+
+# 每个任务进程树的时间序列：TaskUsage 字段名
+TASK_METRICS = ("cpu_percent", "rss_mb", "read_rate", "write_rate")
 
 
 @dataclass
@@ -21,15 +53,65 @@ class ResourceSnapshot:
     disk_usage_percent: float
     network_io: Dict
     load_average: List[float]
+    # PSI 停顿占比（avg10，%），pressure_available 为 False 时均为 0
+    pressure_available: bool = False
+    cpu_pressure: float = 0.0
+    memory_pressure: float = 0.0
+    memory_pressure_full: float = 0.0
+    io_pressure: float = 0.0
+    io_pressure_full: float = 0.0
 
+    @property
+    def load_average_1m(self) -> float:
+        return self.load_average[0] if self.load_average else 0.0
 
-class ResourceMonitor:
-    """资源监控器"""
 
-    def __init__(self, interval: float = 5.0):
+class ResourceMonitor:
+    """资源监控器
+
+    每个指标一个定长环形缓冲区（array('d')），另为常用时间窗口增量维护均值、最值和分位数，
+    长时间运行时内存固定、统计查询不随样本数线性增长
+    """
+
+    def __init__(
+        self,
+        interval: float = 5.0,
+        capacity: int = 1000,
+        windows: Sequence[int] = DEFAULT_WINDOWS,
+        task_source: Optional[Callable[[], Dict[str, int]]] = None,
+        task_interval: float = 1.0,
+        task_capacity: int = 600,
+        max_tasks: int = 500,
+        alert_engine: Optional[AlertEngine] = None,
+    ):
+        """task_source 返回运行中任务的 {task_id: 根进程 pid}，用于按进程树归因资源占用；
+        alert_engine 默认加载 testing/alert_rules.yml"""
         self.interval = interval
         self.logger = get_logger("resource_monitor")
-        self.snapshots: List[ResourceSnapshot] = []
+        self.capacity = capacity
+        self.series: Dict[str, RingBuffer] = {m: RingBuffer(capacity) for m in METRICS}
+        self.windows: Dict[int, Dict[str, RollingWindow]] = {
+            minutes: {m: RollingWindow(minutes * 60, max_samples=capacity) for m in METRICS}
+            for minutes in windows
+        }
+        self.latest: Optional[ResourceSnapshot] = None
+        self.pressure = PressureReader()
+        self.alert_engine = alert_engine or AlertEngine()
+        self.alert_engine.add_listener(self._log_alert)
+
+        # 按任务归因：每个任务一组定长序列和汇总，超过 max_tasks 时淘汰最早的任务
+        self.task_source = task_source
+        self.task_interval = task_interval
+        self.task_capacity = task_capacity
+        self.max_tasks = max_tasks
+        self.sampler = ProcessTreeSampler()
+        self.task_series: "OrderedDict[str, Dict[str, RingBuffer]]" = OrderedDict()
+        self.task_summary: "OrderedDict[str, Dict]" = OrderedDict()
+        # 最近一次进程树采样（/metrics 导出运行中任务的瞬时占用）
+        self.latest_tasks: List[TaskUsage] = []
+        # 监控线程写入、调度器读取
+        self._lock = Lock()
+        self._cpu_times = None
         self._monitoring = False
         self._stop_event = Event()
         self._monitor_thread: Optional[Thread] = None
@@ -41,8 +123,15 @@ class ResourceMonitor:
 
         self._monitoring = True
         self._stop_event.clear()
+        # 预热 CPU 采样基准，之后每次快照计算距上次快照以来的使用率，不阻塞
+        self._cpu_percent_since_last()
         self._monitor_thread = Thread(target=self._monitor_loop, daemon=True)
         self._monitor_thread.start()
+        # 主机指标全局只导出一份（以最近启动的监控器为准），任务指标按监控器分别导出
+        REGISTRY.register_collector("resource_monitor", self.collect_metrics)
+        REGISTRY.register_collector(
+            f"task_resources:{id(self)}", self.collect_task_metrics
+        )
         self.logger.info("开始资源监控")
 
     def stop(self):
@@ -52,6 +141,9 @@ class ResourceMonitor:
 
         self._monitoring = False
         self._stop_event.set()
+        REGISTRY.unregister_collector("resource_monitor", self.collect_metrics)
+        REGISTRY.unregister_collector(f"task_resources:{id(self)}")
+        self.latest_tasks = []
 
         if self._monitor_thread:
             self._monitor_thread.join(timeout=5)
@@ -60,25 +152,29 @@ class ResourceMonitor:
 
     def _monitor_loop(self):
         """监控循环"""
-        while not self._stop_event.wait(self.interval):
+        tick = min(self.interval, self.task_interval) if self.task_source else self.interval
+        next_snapshot = time.monotonic() + self.interval
+        while not self._stop_event.wait(tick):
             try:
-                snapshot = self._take_snapshot()
-                self.snapshots.append(snapshot)
+                if self.task_source:
+                    self.sample_tasks()
 
-                # 保留最近1000个快照
-                if len(self.snapshots) > 1000:
-                    self.snapshots = self.snapshots[-1000:]
+                if time.monotonic() < next_snapshot:
+                    continue
+                next_snapshot = time.monotonic() + self.interval
+                snapshot = self._take_snapshot()
+                self.record(snapshot)
 
-                # 检查资源使用情况
-                self._check_resource_thresholds(snapshot)
+                # 每个快照增量评估告警规则
+                self.evaluate_alerts(snapshot)
 
             except Exception as e:
                 self.logger.error(f"资源监控错误: {e}")
 
     def _take_snapshot(self) -> ResourceSnapshot:
         """拍摄资源快照"""
-        # CPU 使用率
-        cpu_percent = psutil.cpu_percent(interval=1)
+        # CPU 使用率（距上次快照以来）
+        cpu_percent = self._cpu_percent_since_last()
 
         # 内存使用率
         memory = psutil.virtual_memory()
@@ -98,6 +194,9 @@ class ResourceMonitor:
             # Windows 不支持 getloadavg
             load_average = [0.0, 0.0, 0.0]
 
+        # 资源争用导致的停顿（PSI），不支持时为空
+        pressure = pressure_percentages(self.pressure.read())
+
         return ResourceSnapshot(
             timestamp=time.time(),
             cpu_percent=cpu_percent,
@@ -105,52 +204,240 @@ class ResourceMonitor:
             disk_usage_percent=disk_usage_percent,
             network_io=network_io,
             load_average=load_average,
+            pressure_available=bool(pressure),
+            **pressure,
         )
 
-    def _check_resource_thresholds(self, snapshot: ResourceSnapshot):
-        """检查资源阈值"""
-        # CPU 使用率过高
-        if snapshot.cpu_percent > 90:
-            self.logger.warning(f"CPU 使用率过高: {snapshot.cpu_percent:.1f}%")
-
-        # 内存使用率过高
-        if snapshot.memory_percent > 90:
-            self.logger.warning(f"内存使用率过高: {snapshot.memory_percent:.1f}%")
-
-        # 磁盘使用率过高
-        if snapshot.disk_usage_percent > 95:
-            self.logger.warning(f"磁盘使用率过高: {snapshot.disk_usage_percent:.1f}%")
+    def record(self, snapshot: ResourceSnapshot):
+        """写入一个快照：各指标 O(1) 追加并更新窗口统计"""
+        with self._lock:
+            self.latest = snapshot
+            for metric in METRICS:
+                value = float(getattr(snapshot, metric))
+                self.series[metric].append(snapshot.timestamp, value)
+                for window in self.windows.values():
+                    window[metric].push(snapshot.timestamp, value)
+
+    def sample_tasks(self) -> List[TaskUsage]:
+        """采样运行中任务的进程树并写入各任务的时间序列"""
+        try:
+            roots = self.task_source() if self.task_source else {}
+        except Exception as e:
+            self.logger.debug(f"获取运行中任务失败: {e}")
+            return []
+        usages = self.sampler.sample(roots)
+        with self._lock:
+            for usage in usages:
+                self._record_task(usage)
+            self.latest_tasks = usages
+        return usages
+
+    def _record_task(self, usage: TaskUsage):
+        series = self.task_series.get(usage.task_id)
+        if series is None:
+            series = {m: RingBuffer(self.task_capacity) for m in TASK_METRICS}
+            self.task_series[usage.task_id] = series
+            self.task_summary[usage.task_id] = {
+                "samples": 0,
+                "cpu_sum": 0.0,
+                "peak_cpu_percent": 0.0,
+                "peak_rss_mb": 0.0,
+                "read_bytes": 0,
+                "write_bytes": 0,
+                "max_processes": 0,
+                "first_seen": usage.timestamp,
+            }
+            while len(self.task_series) > self.max_tasks:
+                evicted, _ = self.task_series.popitem(last=False)
+                self.task_summary.pop(evicted, None)
+        for metric in TASK_METRICS:
+            series[metric].append(usage.timestamp, getattr(usage, metric))
+
+        summary = self.task_summary[usage.task_id]
+        summary["samples"] += 1
+        summary["cpu_sum"] += usage.cpu_percent
+        summary["peak_cpu_percent"] = max(summary["peak_cpu_percent"], usage.cpu_percent)
+        summary["peak_rss_mb"] = max(summary["peak_rss_mb"], usage.rss_mb)
+        summary["read_bytes"] = max(summary["read_bytes"], usage.read_bytes)
+        summary["write_bytes"] = max(summary["write_bytes"], usage.write_bytes)
+        summary["max_processes"] = max(summary["max_processes"], usage.processes)
+        summary["last_seen"] = usage.timestamp
+
+    def get_task_usage(self, task_id: str) -> Optional[Dict]:
+        """任务进程树的资源占用汇总（峰值 / 平均 CPU、峰值 RSS、累计 I/O）"""
+        with self._lock:
+            summary = self.task_summary.get(task_id)
+            if summary is None:
+                return None
+            samples = summary["samples"]
+            return {
+                "samples": samples,
+                "avg_cpu_percent": round(summary["cpu_sum"] / samples, 2),
+                "peak_cpu_percent": round(summary["peak_cpu_percent"], 2),
+                "peak_rss_mb": round(summary["peak_rss_mb"], 2),
+                "read_bytes": summary["read_bytes"],
+                "write_bytes": summary["write_bytes"],
+                "max_processes": summary["max_processes"],
+                "first_seen": summary["first_seen"],
+                "last_seen": summary["last_seen"],
+            }
+
+    def get_task_series(
+        self, task_id: str, metric: str = "cpu_percent"
+    ) -> List[Tuple[float, float]]:
+        """任务某个指标的 (timestamp, value) 序列"""
+        with self._lock:
+            series = self.task_series.get(task_id)
+            return series[metric].items() if series else []
+
+    def top_tasks(self, metric: str = "peak_cpu_percent", limit: int = 5) -> List[Dict]:
+        """按汇总指标排序的资源占用最高的任务"""
+        usages = [
+            {"task_id": task_id, **usage}
+            for task_id in list(self.task_summary)
+            for usage in [self.get_task_usage(task_id)]
+            if usage
+        ]
+        usages.sort(key=lambda u: u.get(metric, 0), reverse=True)
+        return usages[:limit]
+
+    @property
+    def sample_count(self) -> int:
+        """缓冲区中的样本数"""
+        return len(self.series[METRICS[0]])
+
+    def _cpu_percent_since_last(self) -> float:
+        """基于 cpu_times 差分计算使用率
+
+        不使用 psutil.cpu_percent(interval=None)：它的基准是进程全局的，
+        调度器等其他调用方会把统计区间截短
+        """
+        times = psutil.cpu_times()
+        last, self._cpu_times = self._cpu_times, times
+        if last is None:
+            return 0.0
+        idle = times.idle + getattr(times, "iowait", 0.0)
+        last_idle = last.idle + getattr(last, "iowait", 0.0)
+        total_delta = sum(times) - sum(last)
+        if total_delta <= 0:
+            return 0.0
+        busy_delta = total_delta - (idle - last_idle)
+        return round(min(100.0, max(0.0, busy_delta / total_delta * 100)), 1)
+
+    def evaluate_alerts(self, snapshot: ResourceSnapshot) -> List[AlertEvent]:
+        """用快照评估告警规则，返回触发 / 恢复事件"""
+        values = {metric: getattr(snapshot, metric) for metric in METRICS}
+        if not snapshot.pressure_available:
+            # 不支持 PSI 时压力指标恒为 0，不参与评估
+            values = {k: v for k, v in values.items() if "pressure" not in k}
+        return self.alert_engine.observe_many(values, snapshot.timestamp)
+
+    def _log_alert(self, event: AlertEvent):
+        if event.status == "firing":
+            self.logger.warning(event.message)
+        else:
+            self.logger.info(event.message)
+
+    def collect_metrics(self) -> List[MetricFamily]:
+        """最近一次主机快照（不支持 PSI 时不导出 pressure 指标）"""
+        snapshot = self.latest
+        if snapshot is None:
+            return []
+        return [
+            MetricFamily(
+                f"orchestrator_resource_{metric}", "gauge", f"资源采样：{metric}"
+            ).add(float(getattr(snapshot, metric)))
+            for metric in METRICS
+            if snapshot.pressure_available or "pressure" not in metric
+        ]
+
+    def collect_task_metrics(self) -> List[MetricFamily]:
+        """运行中任务进程树的最近一次采样"""
+        families = {
+            metric: MetricFamily(
+                f"orchestrator_task_{metric}", "gauge", f"任务进程树资源占用：{metric}"
+            )
+            for metric in TASK_METRICS
+        }
+        for usage in self.latest_tasks:
+            for metric, family in families.items():
+                family.add(getattr(usage, metric), task=usage.task_id)
+        return list(families.values())
 
     def get_current_stats(self) -> Optional[ResourceSnapshot]:
         """获取当前资源状态"""
-        if not self.snapshots:
+        if self.latest is None:
             return self._take_snapshot()
-        return self.snapshots[-1]
+        return self.latest
+
+    def get_metric_stats(self, metric: str, duration_minutes: int = 5) -> Optional[Dict]:
+        """单个指标在最近 duration_minutes 分钟内的样本数、均值、最值和分位数
+
+        已登记的窗口直接读取增量统计；其他窗口二分截取环形缓冲区，均值由累计和 O(1) 得到，
+        最值和分位数需要复制窗口内的样本
+        """
+        cutoff = time.time() - duration_minutes * 60
+        with self._lock:
+            window = self.windows.get(duration_minutes, {}).get(metric)
+            if window is not None:
+                window.expire(cutoff)
+                if not len(window):
+                    return None
+                return {
+                    "count": len(window),
+                    "mean": window.mean,
+                    "min": window.min,
+                    "max": window.max,
+                    "p50": window.percentile(50),
+                    "p95": window.percentile(95),
+                }
+
+            series = self.series[metric]
+            count, total = series.window_sum(cutoff)
+            if not count:
+                return None
+            values = sorted(series.values(cutoff))
+
+        def percentile(q: float) -> float:
+            position = (count - 1) * q / 100
+            lower = int(position)
+            upper = min(lower + 1, count - 1)
+            return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+        return {
+            "count": count,
+            "mean": total / count,
+            "min": values[0],
+            "max": values[-1],
+            "p50": percentile(50),
+            "p95": percentile(95),
+        }
 
     def get_average_stats(self, duration_minutes: int = 5) -> Optional[Dict]:
         """获取平均统计信息"""
-        if not self.snapshots:
-            return None
-
-        cutoff_time = time.time() - (duration_minutes * 60)
-        recent_snapshots = [s for s in self.snapshots if s.timestamp >= cutoff_time]
-
-        if not recent_snapshots:
+        cpu = self.get_metric_stats("cpu_percent", duration_minutes)
+        if cpu is None:
             return None
+        memory = self.get_metric_stats("memory_percent", duration_minutes) or {}
+        disk = self.get_metric_stats("disk_usage_percent", duration_minutes) or {}
 
-        avg_cpu = sum(s.cpu_percent for s in recent_snapshots) / len(recent_snapshots)
-        avg_memory = sum(s.memory_percent for s in recent_snapshots) / len(
-            recent_snapshots
-        )
-        avg_disk = sum(s.disk_usage_percent for s in recent_snapshots) / len(
-            recent_snapshots
-        )
+        pressure = {}
+        if self.latest is not None and self.latest.pressure_available:
+            for metric in ("cpu_pressure", "memory_pressure", "io_pressure"):
+                stats = self.get_metric_stats(metric, duration_minutes) or {}
+                pressure[f"average_{metric}"] = stats.get("mean")
+                pressure[f"max_{metric}"] = stats.get("max")
 
         return {
-            "average_cpu_percent": avg_cpu,
-            "average_memory_percent": avg_memory,
-            "average_disk_percent": avg_disk,
-            "sample_count": len(recent_snapshots),
+            **pressure,
+            "average_cpu_percent": cpu["mean"],
+            "average_memory_percent": memory.get("mean"),
+            "average_disk_percent": disk.get("mean"),
+            "max_cpu_percent": cpu["max"],
+            "max_memory_percent": memory.get("max"),
+            "p95_cpu_percent": cpu["p95"],
+            "p95_memory_percent": memory.get("p95"),
+            "sample_count": cpu["count"],
             "duration_minutes": duration_minutes,
         }
 
@@ -160,6 +447,13 @@ class ResourceMonitor:
         if not current:
             return False
 
+        # PSI 可用时以停顿时间为准
+        if current.pressure_available:
+            return any(
+                getattr(current, metric) > threshold
+                for metric, threshold in PRESSURE_THRESHOLDS.items()
+            )
+
         # 任一资源使用率超过80%则认为系统有压力
         return (
             current.cpu_percent > 80
@@ -169,10 +463,14 @@ class ResourceMonitor:
 
     def get_resource_report(self) -> Dict:
         """生成资源使用报告"""
-        if not self.snapshots:
-            return {"status": "no_data"}
-
-        current = self.snapshots[-1]
+        tasks = {task_id: self.get_task_usage(task_id) for task_id in list(self.task_summary)}
+        current = self.latest
+        if current is None:
+            return {"status": "no_data", "tasks": tasks}
+
+        with self._lock:
+            first = self.series[METRICS[0]].oldest()
+            count = self.sample_count
         avg_5min = self.get_average_stats(5)
         avg_15min = self.get_average_stats(15)
 
@@ -183,13 +481,21 @@ class ResourceMonitor:
                 "memory_percent": current.memory_percent,
                 "disk_percent": current.disk_usage_percent,
                 "load_average": current.load_average,
+                "pressure": (
+                    {
+                        "cpu": current.cpu_pressure,
+                        "memory": current.memory_pressure,
+                        "memory_full": current.memory_pressure_full,
+                        "io": current.io_pressure,
+                        "io_full": current.io_pressure_full,
+                    }
+                    if current.pressure_available
+                    else None
+                ),
                 "timestamp": current.timestamp,
             },
             "averages": {"5_minutes": avg_5min, "15_minutes": avg_15min},
-            "total_snapshots": len(self.snapshots),
-            "monitoring_duration": (
-                self.snapshots[-1].timestamp - self.snapshots[0].timestamp
-                if len(self.snapshots) > 1
-                else 0
-            ),
+            "tasks": tasks,
+            "total_snapshots": count,
+            "monitoring_duration": current.timestamp - first[0] if count > 1 else 0,
         }
@@ -0,0 +1,187 @@
+"""
+定长时间序列缓冲区与增量滑动窗口统计
+长时间运行的监控只占用固定内存，均值 / 最值 / 分位数查询不需要遍历全部样本
+"""
+
+from __future__ import annotations
+
+import bisect
+import math
+from array import array
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+
+class RingBuffer:
+    """定长环形缓冲区
+
+    时间戳、数值和累计和存放在 array('d') 中：写入 O(1)，
+    按时间截取窗口 O(log n)（时间戳单调递增，二分查找），窗口求和 O(1)。
+    NaN / inf 样本会污染累计和，写入时直接忽略
+    """
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("capacity 必须大于 0")
+        self.capacity = capacity
+        self._timestamps = array("d", bytes(8 * capacity))
+        self._values = array("d", bytes(8 * capacity))
+        # 第 i 个槽位写入时的累计和，窗口和 = 两端累计和之差
+        self._cumsum = array("d", bytes(8 * capacity))
+        self._total = 0.0
+        self._start = 0  # 最旧样本所在槽位
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _slot(self, index: int) -> int:
+        """逻辑序号（0 为最旧）对应的槽位"""
+        return (self._start + index) % self.capacity
+
+    def append(self, timestamp: float, value: float) -> None:
+        """写入一个样本，满时覆盖最旧的样本；非有限值被忽略"""
+        if not math.isfinite(value):
+            return
+        if self._size < self.capacity:
+            slot = self._slot(self._size)
+            self._size += 1
+        else:
+            slot = self._start
+            self._start = (self._start + 1) % self.capacity
+        self._total += value
+        self._timestamps[slot] = timestamp
+        self._values[slot] = value
+        self._cumsum[slot] = self._total
+
+    def latest(self) -> Optional[Tuple[float, float]]:
+        """最新样本 (timestamp, value)"""
+        if not self._size:
+            return None
+        slot = self._slot(self._size - 1)
+        return self._timestamps[slot], self._values[slot]
+
+    def oldest(self) -> Optional[Tuple[float, float]]:
+        """最旧样本 (timestamp, value)"""
+        if not self._size:
+            return None
+        return self._timestamps[self._start], self._values[self._start]
+
+    def index_since(self, cutoff: float) -> int:
+        """第一个时间戳 >= cutoff 的逻辑序号（二分查找）"""
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._timestamps[self._slot(mid)] < cutoff:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def window_sum(self, cutoff: Optional[float] = None) -> Tuple[int, float]:
+        """时间戳 >= cutoff 的样本数和数值和"""
+        first = self.index_since(cutoff) if cutoff is not None else 0
+        count = self._size - first
+        if count <= 0:
+            return 0, 0.0
+        first_slot = self._slot(first)
+        before = self._cumsum[first_slot] - self._values[first_slot]
+        return count, self._total - before
+
+    def values(self, cutoff: Optional[float] = None) -> List[float]:
+        """时间戳 >= cutoff 的数值（按时间顺序）"""
+        first = self.index_since(cutoff) if cutoff is not None else 0
+        return [self._values[self._slot(i)] for i in range(first, self._size)]
+
+    def items(self, cutoff: Optional[float] = None) -> List[Tuple[float, float]]:
+        """时间戳 >= cutoff 的 (timestamp, value)（按时间顺序）"""
+        first = self.index_since(cutoff) if cutoff is not None else 0
+        return [
+            (self._timestamps[self._slot(i)], self._values[self._slot(i)])
+            for i in range(first, self._size)
+        ]
+
+
+class RollingWindow:
+    """按时间跨度滑动的增量统计
+
+    写入和过期时维护和、单调队列和有序列表：均值、最值 O(1)，分位数 O(1) 取值。
+    有序列表按二分定位后插入 / 删除，每个样本有一次 O(n) 的内存移动（n 为窗口内样本数），
+    几千个样本以内开销可以忽略；窗口可能很大时应设置 max_samples 限制 n。
+    NaN / inf 样本会破坏有序列表和单调队列，写入时忽略（仍按其时间戳淘汰过期样本）
+    """
+
+    def __init__(self, horizon: float, max_samples: Optional[int] = None):
+        self.horizon = horizon
+        self.max_samples = max_samples
+        self._samples: Deque[Tuple[float, float]] = deque()
+        self._sum = 0.0
+        # 单调队列元素为 (写入序号, 数值)，序号用于判断队首是否已过期
+        self._min: Deque[Tuple[int, float]] = deque()  # 单调递增
+        self._max: Deque[Tuple[int, float]] = deque()  # 单调递减
+        self._pushed = 0
+        self._expired = 0
+        self._sorted: List[float] = []
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def push(self, timestamp: float, value: float) -> None:
+        """写入一个样本并淘汰超出时间跨度的样本"""
+        if not math.isfinite(value):
+            self.expire(timestamp - self.horizon)
+            return
+        seq = self._pushed
+        self._pushed += 1
+        self._samples.append((timestamp, value))
+        self._sum += value
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((seq, value))
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((seq, value))
+        bisect.insort(self._sorted, value)
+        self.expire(timestamp - self.horizon)
+
+    def expire(self, cutoff: float) -> None:
+        """淘汰时间戳早于 cutoff 的样本（以及超出 max_samples 的样本）"""
+        samples = self._samples
+        while samples and (
+            samples[0][0] < cutoff
+            or (self.max_samples is not None and len(samples) > self.max_samples)
+        ):
+            _, value = samples.popleft()
+            seq = self._expired
+            self._expired += 1
+            self._sum -= value
+            if self._min and self._min[0][0] == seq:
+                self._min.popleft()
+            if self._max and self._max[0][0] == seq:
+                self._max.popleft()
+            del self._sorted[bisect.bisect_left(self._sorted, value)]
+        if not samples:
+            # 清空时重置累计和，避免浮点误差累积
+            self._sum = 0.0
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self._sum / len(self._samples) if self._samples else None
+
+    @property
+    def min(self) -> Optional[float]:
+        return self._min[0][1] if self._min else None
+
+    @property
+    def max(self) -> Optional[float]:
+        return self._max[0][1] if self._max else None
+
+    def percentile(self, q: float) -> Optional[float]:
+        """分位数（q 取 0~100，线性插值）"""
+        values = self._sorted
+        if not values:
+            return None
+        position = (len(values) - 1) * min(max(q, 0.0), 100.0) / 100
+        lower = math.floor(position)
+        upper = min(lower + 1, len(values) - 1)
+        return values[lower] + (values[upper] - values[lower]) * (position - lower)
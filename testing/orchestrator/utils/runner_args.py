@@ -0,0 +1,256 @@
+"""
+测试运行器参数注入：识别命令中直接或经由 package.json 脚本调用的 jest/vitest/playwright，
+并在对应位置追加参数
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import json
+import os
+import re
+import shlex
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+# 识别测试运行器的正则（用于 package.json 脚本内容）
+_RUNNER_PATTERNS = {
+    "jest": re.compile(r"(?:^|[\s/])jest(?:\s|$)"),
+    "vitest": re.compile(r"(?:^|[\s/])vitest(?:\s|$)"),
+    "playwright": re.compile(r"(?:^|[\s/])playwright\s+test(?:\s|$)"),
+}
+
+_SEPARATOR = re.compile(r"(\s*(?:&&|\|\||;)\s*)")
+
+# 运行器子命令，不是文件过滤参数
+_SUBCOMMANDS = {"run", "watch", "dev", "test"}
+_PATH_PATTERN_OPTIONS = {"--testPathPattern", "--testPathPatterns"}
+# 以下一个参数为取值的常用选项（其取值不是文件过滤）
+_VALUE_OPTIONS = {
+    "-c",
+    "--config",
+    "--project",
+    "--projects",
+    "--reporter",
+    "--reporters",
+    "--root",
+    "--dir",
+    "--environment",
+    "--env",
+    "--outputFile",
+    "--maxWorkers",
+    "--shard",
+    "-t",
+    "--testNamePattern",
+    "--coverageDirectory",
+    "--testTimeout",
+    "--workers",
+    "--grep",
+    "-g",
+    *_PATH_PATTERN_OPTIONS,
+}
+
+# 参数为运行器名和实际传给运行器的参数（经由 package.json 脚本时为脚本内容加透传参数），
+# 返回需要追加的参数；返回 None 表示不改写该命令
+ArgsBuilder = Callable[[str, List[str]], Optional[List[str]]]
+
+
+def _read_scripts(cwd: Path) -> Dict[str, str]:
+    """读取 package.json 中的 scripts"""
+    try:
+        with open(cwd / "package.json", "r", encoding="utf-8") as f:
+            return json.load(f).get("scripts", {}) or {}
+    except (OSError, ValueError):
+        return {}
+
+
+def detect_runner(text: str) -> Optional[str]:
+    """识别命令中使用的测试运行器，存在多个时无法确定"""
+    found = [name for name, pattern in _RUNNER_PATTERNS.items() if pattern.search(text)]
+    return found[0] if len(found) == 1 else None
+
+
+def _rewrite_segment(segment: str, cwd: Path, build_args: ArgsBuilder) -> str:
+    """改写单条命令：直接调用或通过包管理器脚本调用测试运行器时追加参数"""
+    try:
+        tokens = shlex.split(segment)
+    except ValueError:
+        return segment
+    if not tokens:
+        return segment
+
+    head = os.path.basename(tokens[0])
+    runner: Optional[str] = None
+    separator = False
+
+    if head in ("npx", "bunx") or tokens[:2] in (["pnpm", "exec"], ["yarn", "exec"]):
+        # npx jest / pnpm exec playwright test
+        runner = detect_runner(" ".join(tokens[1:]))
+    elif head in ("npm", "pnpm", "yarn"):
+        args = tokens[1:]
+        if args and args[0] in ("run", "run-script"):
+            args = args[1:]
+        if args:
+            runner = detect_runner(_read_scripts(cwd).get(args[0], ""))
+            # npm 需要 -- 才会把参数透传给脚本
+            separator = head == "npm" and "--" not in tokens
+    else:
+        runner = detect_runner(" ".join(tokens))
+
+    if runner is None:
+        return segment
+
+    # 脚本内容中已有的参数（如 "test": "jest --maxWorkers=2"）也要交给 build_args 判断
+    extra = build_args(runner, _runner_tokens(segment, cwd) or tokens)
+    if not extra:
+        return segment
+    if separator:
+        extra = ["--"] + extra
+    return f"{segment} {shlex.join(extra)}"
+
+
+def append_runner_args(command: str, cwd: Path, build_args: ArgsBuilder) -> str:
+    """对命令中每个测试运行器调用追加参数，识别 `cd dir &&` 前缀"""
+    parts = _SEPARATOR.split(command)
+    current = Path(cwd)
+    rewritten = []
+    for index, part in enumerate(parts):
+        if index % 2 == 1:
+            rewritten.append(part)
+            continue
+        stripped = part.strip()
+        if stripped.startswith("cd "):
+            try:
+                target = shlex.split(stripped)[1]
+                current = (current / target).resolve()
+            except (ValueError, IndexError):
+                pass
+            rewritten.append(part)
+            continue
+        rewritten.append(_rewrite_segment(part, current, build_args))
+    return "".join(rewritten)
+
+
+def is_extended_command(command: str, base: str) -> bool:
+    """command 是否由 base 经 append_runner_args 得到：子命令一一对应，
+    每条子命令只在末尾追加了经 shlex 转义的参数（不含未转义的 shell 元字符）"""
+    parts = _SEPARATOR.split(command)
+    base_parts = _SEPARATOR.split(base)
+    if len(parts) != len(base_parts):
+        return False
+    for index, (part, base_part) in enumerate(zip(parts, base_parts)):
+        if part == base_part:
+            continue
+        if index % 2 == 1 or not part.startswith(base_part + " "):
+            return False
+        extra = part[len(base_part) + 1 :]
+        try:
+            if not extra or shlex.join(shlex.split(extra)) != extra:
+                return False
+        except ValueError:
+            return False
+    return True
+
+
+def is_extended_argv(args: List[str], base: str) -> bool:
+    """列表形式的 args 是否由 base 追加参数得到（不经 shell 执行，逐个参数比较；
+    含 && / || / ; 的 base 无法以列表形式执行）"""
+    if _SEPARATOR.search(base):
+        return False
+    try:
+        base_args = shlex.split(base)
+    except ValueError:
+        return False
+    return bool(base_args) and args[: len(base_args)] == base_args
+
+
+def _runner_tokens(segment: str, cwd: Path) -> List[str]:
+    """单条命令中实际调用测试运行器的参数列表（经由包管理器脚本时展开脚本内容）"""
+    try:
+        tokens = shlex.split(segment)
+    except ValueError:
+        return []
+    if not tokens:
+        return []
+    head = os.path.basename(tokens[0])
+    if head in ("npm", "pnpm", "yarn") and tokens[1:2] != ["exec"]:
+        args = tokens[1:]
+        if args and args[0] in ("run", "run-script"):
+            args = args[1:]
+        if not args:
+            return []
+        script = _read_scripts(cwd).get(args[0], "")
+        extra = [arg for arg in args[1:] if arg != "--"]
+        for part in _SEPARATOR.split(script)[::2]:
+            if detect_runner(part):
+                try:
+                    return shlex.split(part) + extra
+                except ValueError:
+                    return []
+        return []
+    return tokens if detect_runner(" ".join(tokens)) else []
+
+
+def _runner_invocations(command: str, cwd: Path) -> List[List[str]]:
+    """命令中各次 jest/vitest/playwright 调用在运行器名之后的参数"""
+    invocations = []
+    current = Path(cwd)
+    for part in _SEPARATOR.split(command)[::2]:
+        stripped = part.strip()
+        if stripped.startswith("cd "):
+            try:
+                current = (current / shlex.split(stripped)[1]).resolve()
+            except (ValueError, IndexError):
+                pass
+            continue
+        tokens = _runner_tokens(stripped, current)
+        for i, token in enumerate(tokens):
+            if os.path.basename(token) in ("jest", "vitest", "playwright"):
+                invocations.append(tokens[i + 1 :])
+                break
+    return invocations
+
+
+def runner_filters(command: str, cwd: Path) -> List[str]:
+    """运行器调用已有的位置参数（测试文件过滤 / glob），跳过子命令和选项的取值"""
+    filters: List[str] = []
+    for args in _runner_invocations(command, cwd):
+        skip = False
+        for token in args:
+            if skip:
+                skip = False
+            elif token.startswith("-"):
+                skip = "=" not in token and token in _VALUE_OPTIONS
+            elif token not in _SUBCOMMANDS:
+                filters.append(token)
+    return filters
+
+
+def runner_path_patterns(command: str, cwd: Path) -> List[str]:
+    """jest 的 --testPathPattern(s) 正则（按路径筛选测试文件）"""
+    patterns: List[str] = []
+    for args in _runner_invocations(command, cwd):
+        for i, token in enumerate(args):
+            name, _, value = token.partition("=")
+            if name in _PATH_PATTERN_OPTIONS:
+                if not value and i + 1 < len(args):
+                    value = args[i + 1]
+                if value:
+                    patterns.append(value)
+    return patterns
+
+
+def matches_glob(path: str, pattern: str) -> bool:
+    """路径是否匹配运行器参数中的 glob（`**/` 可匹配零层目录）"""
+    pattern = pattern[2:] if pattern.startswith("./") else pattern
+    return fnmatch.fnmatch(path, pattern) or fnmatch.fnmatch(
+        path, pattern.replace("**/", "")
+    )
+
+
+def matches_pattern(path: str, pattern: str) -> bool:
+    """路径是否匹配 jest 的 testPathPattern 正则（无效正则视为匹配）"""
+    try:
+        return re.search(pattern, path) is not None
+    except re.error:
+        return True
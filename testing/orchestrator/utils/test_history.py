@@ -0,0 +1,84 @@
+"""
+测试任务历史：记录每个任务的耗时和失败情况，为预算选择等功能提供估计值
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+DEFAULT_PATH = Path(__file__).resolve().parents[2] / "test-history.json"
+
+# 耗时使用指数加权平均，近期运行权重更高
+DURATION_ALPHA = 0.3
+
+
+@dataclass
+class TaskStats:
+    """任务历史统计"""
+
+    runs: int = 0
+    failures: int = 0
+    avg_duration: float = 0.0
+    last_status: str = ""
+    last_run: float = 0.0
+
+    @property
+    def failure_probability(self) -> float:
+        """失败概率（拉普拉斯平滑，无历史时为 0.5）"""
+        return (self.failures + 1) / (self.runs + 2)
+
+
+class TestHistory:
+    def __init__(self, store_path: Optional[Path] = None) -> None:
+        self.path = Path(store_path) if store_path else DEFAULT_PATH
+
+    def read(self) -> Dict[str, TaskStats]:
+        if not self.path.exists():
+            return {}
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            tasks = data.get("tasks", {}) if isinstance(data, dict) else {}
+            return {
+                task_id: TaskStats(**stats)
+                for task_id, stats in tasks.items()
+                if isinstance(stats, dict)
+            }
+        except Exception:
+            return {}
+
+    def get(self, task_id: str) -> Optional[TaskStats]:
+        return self.read().get(task_id)
+
+    def record(self, results: Iterable[Tuple[str, float, bool]]) -> None:
+        """批量记录 (task_id, duration, passed)"""
+        history = self.read()
+        now = time.time()
+        for task_id, duration, passed in results:
+            stats = history.setdefault(task_id, TaskStats())
+            if stats.runs == 0:
+                stats.avg_duration = duration
+            else:
+                stats.avg_duration += DURATION_ALPHA * (duration - stats.avg_duration)
+            stats.runs += 1
+            stats.failures += 0 if passed else 1
+            stats.last_status = "passed" if passed else "failed"
+            stats.last_run = now
+        self._write(history)
+
+    def _write(self, history: Dict[str, TaskStats]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "tasks": {
+                task_id: stats.__dict__ for task_id, stats in sorted(history.items())
+            }
+        }
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(
+            json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8"
+        )
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,478 @@
+"""
+按指标名 + 标签索引的列式时间序列存储，自动降采样（原始 → 1 分钟 → 1 小时）
+
+每条序列的三个精度层都是定长环形列存（array('d')），超出容量或保留时长的数据被覆盖；
+序列数超过上限时淘汰最久未更新的序列，因此内存占用与运行时长无关。
+时间戳单调递增，区间查询二分定位，O(log n + k)
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+SeriesKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+RESOLUTIONS = ("raw", "1m", "1h")
+_BUCKET_SECONDS = {"1m": 60, "1h": 3600}
+
+
+def series_key(name: str, tags: Optional[Dict[str, str]] = None) -> SeriesKey:
+    """序列键：指标名 + 排序后的标签"""
+    return name, tuple(sorted((tags or {}).items()))
+
+
+@dataclass(frozen=True, order=True)
+class Cursor:
+    """原始点的全序位置：(时间戳, 序列键, 序列内序号)
+
+    多条序列可能在同一时间戳写入，只按时间戳翻页会跳过与边界同时刻的点
+    """
+
+    timestamp: float
+    key: SeriesKey
+    seq: int
+
+    def to_json(self) -> List[Any]:
+        return [self.timestamp, self.key[0], dict(self.key[1]), self.seq]
+
+    @classmethod
+    def from_json(cls, value: Any) -> Optional["Cursor"]:
+        """解析客户端传回的游标；只给时间戳时取严格早于该时刻的点，无法解析返回 None"""
+        try:
+            if isinstance(value, (int, float)):
+                # 空指标名和 -1 序号排在该时刻所有点之前
+                return cls(float(value), ("", ()), -1)
+            timestamp, name, tags, seq = value
+            return cls(float(timestamp), series_key(str(name), tags), int(seq))
+        except (TypeError, ValueError, AttributeError):
+            return None
+
+
+class _ColumnRing:
+    """定长环形列存：第一列为时间戳（单调递增），其余为数值列"""
+
+    def __init__(self, capacity: int, columns: int):
+        self.capacity = capacity
+        self._columns = [array("d", bytes(8 * capacity)) for _ in range(columns)]
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _slot(self, index: int) -> int:
+        return (self._start + index) % self.capacity
+
+    def append(self, *row: float) -> None:
+        if self._size < self.capacity:
+            slot = self._slot(self._size)
+            self._size += 1
+        else:
+            slot = self._start
+            self._start = (self._start + 1) % self.capacity
+        for column, value in zip(self._columns, row):
+            column[slot] = value
+
+    def drop_before(self, cutoff: float) -> None:
+        """丢弃时间戳早于 cutoff 的行"""
+        first = self.index_since(cutoff)
+        self._start = self._slot(first)
+        self._size -= first
+
+    def index_since(self, cutoff: float) -> int:
+        """第一个时间戳 >= cutoff 的逻辑序号（二分查找）"""
+        timestamps = self._columns[0]
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if timestamps[self._slot(mid)] < cutoff:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def index_after(self, cutoff: float) -> int:
+        """第一个时间戳 > cutoff 的逻辑序号（二分查找）"""
+        timestamps = self._columns[0]
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if timestamps[self._slot(mid)] <= cutoff:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def first_timestamp(self) -> Optional[float]:
+        return self._columns[0][self._start] if self._size else None
+
+    def last(self) -> Optional[Tuple[float, ...]]:
+        if not self._size:
+            return None
+        slot = self._slot(self._size - 1)
+        return tuple(column[slot] for column in self._columns)
+
+    def rows(self, start: Optional[float] = None, end: Optional[float] = None):
+        """[start, end) 区间内的行"""
+        first = self.index_since(start) if start is not None else 0
+        last = self.index_since(end) if end is not None else self._size
+        columns = self._columns
+        for index in range(first, last):
+            slot = self._slot(index)
+            yield tuple(column[slot] for column in columns)
+
+    def tail(self, limit: int, last: Optional[int] = None):
+        """逻辑序号 last 之前的最近 limit 行：(序号, *列)"""
+        last = self._size if last is None else min(max(0, last), self._size)
+        for index in range(max(0, last - limit), last):
+            slot = self._slot(index)
+            yield (index, *(column[slot] for column in self._columns))
+
+
+@dataclass
+class _Bucket:
+    """未封口的降采样桶"""
+
+    start: float
+    min: float = math.inf
+    max: float = -math.inf
+    sum: float = 0.0
+    count: int = 0
+
+    def add(self, value: float) -> None:
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other: "_Bucket") -> None:
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sum += other.sum
+        self.count += other.count
+
+    def copy(self, start: Optional[float] = None) -> "_Bucket":
+        return _Bucket(
+            self.start if start is None else start, self.min, self.max, self.sum, self.count
+        )
+
+    def row(self) -> Tuple[float, float, float, float, float]:
+        return self.start, self.min, self.max, self.sum, float(self.count)
+
+
+@dataclass
+class RetentionPolicy:
+    """各精度层的保留时长（秒）、原始点容量和序列数上限"""
+
+    raw_seconds: float = 3600
+    minute_seconds: float = 86400
+    hour_seconds: float = 30 * 86400
+    raw_capacity: int = 4096
+    max_series: int = 2000
+
+    @classmethod
+    def from_config(cls, settings: Optional[Dict]) -> "RetentionPolicy":
+        settings = settings or {}
+        defaults = cls()
+        return cls(
+            raw_seconds=settings.get("raw_seconds", defaults.raw_seconds),
+            minute_seconds=settings.get("minute_seconds", defaults.minute_seconds),
+            hour_seconds=settings.get("hour_seconds", defaults.hour_seconds),
+            raw_capacity=settings.get("raw_capacity", defaults.raw_capacity),
+            max_series=settings.get("max_series", defaults.max_series),
+        )
+
+
+class Series:
+    """一条序列：原始点 (ts, value) + 1 分钟 / 1 小时汇总 (ts, min, max, sum, count)
+
+    汇总在写入时增量完成：新点落入下一个分钟桶时封口上一个桶，封口的分钟桶再并入小时桶
+    """
+
+    def __init__(self, name: str, tags: Dict[str, str], unit: str, policy: RetentionPolicy):
+        self.name = name
+        self.tags = tags
+        self.key = series_key(name, tags)
+        self.unit = unit
+        self.policy = policy
+        self.raw = _ColumnRing(policy.raw_capacity, 2)
+        # 累计写入的原始点数，用于给原始点分配稳定序号（环形覆盖后序号不变）
+        self.appended = 0
+        self.minutes = _ColumnRing(max(1, int(policy.minute_seconds // 60)), 5)
+        self.hours = _ColumnRing(max(1, int(policy.hour_seconds // 3600)), 5)
+        self.first_seen: Optional[float] = None
+        self._minute: Optional[_Bucket] = None
+        self._hour: Optional[_Bucket] = None
+
+    def append(self, timestamp: float, value: float) -> None:
+        last = self.raw.last()
+        if last is not None and timestamp < last[0]:
+            # 时钟回拨：按最后时间戳写入，保持单调
+            timestamp = last[0]
+        if self.first_seen is None:
+            self.first_seen = timestamp
+        self.raw.append(timestamp, value)
+        self.appended += 1
+        self.raw.drop_before(timestamp - self.policy.raw_seconds)
+
+        minute_start = timestamp - timestamp % 60
+        if self._minute is None or minute_start > self._minute.start:
+            self._close_minute()
+            self._minute = _Bucket(minute_start)
+        self._minute.add(value)
+
+    def _close_minute(self) -> None:
+        bucket = self._minute
+        if bucket is None or not bucket.count:
+            return
+        self.minutes.append(*bucket.row())
+        self.minutes.drop_before(bucket.start - self.policy.minute_seconds)
+
+        hour_start = bucket.start - bucket.start % 3600
+        if self._hour is not None and hour_start > self._hour.start:
+            self.hours.append(*self._hour.row())
+            self.hours.drop_before(self._hour.start - self.policy.hour_seconds)
+            self._hour = None
+        if self._hour is None:
+            self._hour = bucket.copy(hour_start)
+        else:
+            self._hour.merge(bucket)
+
+    def recent(
+        self, limit: int, before: Optional[Cursor] = None
+    ) -> List[Tuple[Cursor, float]]:
+        """游标之前的最近 limit 个原始点"""
+        raw = self.raw
+        first_seq = self.appended - len(raw)
+        if before is None:
+            last = len(raw)
+        elif self.key == before.key:
+            # 同一序列内序号与时间戳同序
+            last = before.seq - first_seq
+        elif self.key < before.key:
+            last = raw.index_after(before.timestamp)
+        else:
+            last = raw.index_since(before.timestamp)
+        return [
+            (Cursor(t, self.key, first_seq + index), value)
+            for index, t, value in raw.tail(limit, last)
+        ]
+
+    @property
+    def last_timestamp(self) -> Optional[float]:
+        last = self.raw.last()
+        return last[0] if last else None
+
+    def latest(self) -> Optional[Tuple[float, float]]:
+        last = self.raw.last()
+        return (last[0], last[1]) if last else None
+
+    def _open_rows(self, resolution: str) -> List[Tuple[float, ...]]:
+        """尚未封口的桶（查询时一并返回，最近的数据立即可见）"""
+        minute = self._minute
+        if resolution == "1m":
+            return [minute.row()] if minute is not None and minute.count else []
+        # 小时桶只累计了已封口的分钟桶，需要并入当前分钟桶
+        buckets = [self._hour.copy()] if self._hour is not None else []
+        if minute is not None and minute.count:
+            hour_start = minute.start - minute.start % 3600
+            if buckets and buckets[-1].start == hour_start:
+                buckets[-1].merge(minute)
+            else:
+                buckets.append(minute.copy(hour_start))
+        return [bucket.row() for bucket in buckets]
+
+    def _covers(self, resolution: str, start: float) -> bool:
+        """该精度层是否还保留着 start 之后的全部数据"""
+        if resolution == "raw":
+            first = self.raw.first_timestamp()
+        elif len(self.minutes):
+            first = self.minutes.first_timestamp()
+        else:
+            first = self._minute.start if self._minute is not None else None
+        if first is None or self.first_seen is None:
+            return True
+        return first <= start or first <= self.first_seen
+
+    def resolution_for(self, start: Optional[float], finest: str = "raw") -> str:
+        """能完整覆盖 start 之后数据的最高精度（不高于 finest）"""
+        candidates = RESOLUTIONS[RESOLUTIONS.index(finest) :]
+        for resolution in candidates[:-1]:
+            if start is not None and self._covers(resolution, start):
+                return resolution
+        return candidates[-1]
+
+    def query(
+        self,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        resolution: str = "auto",
+    ) -> Tuple[str, List[Tuple[float, ...]]]:
+        """区间查询 [start, end)；raw 返回 (ts, value)，汇总层返回 (ts, min, max, avg, count)
+
+        resolution 为 auto 时选择能覆盖 start 的最高精度，返回实际使用的精度
+        """
+        if resolution == "auto":
+            resolution = self.resolution_for(start)
+        if resolution == "raw":
+            return resolution, list(self.raw.rows(start, end))
+
+        width = _BUCKET_SECONDS[resolution]
+        # 起点向下取整到桶边界，包含 start 所在的桶
+        floor = start - start % width if start is not None else None
+        ring = self.minutes if resolution == "1m" else self.hours
+        rows = list(ring.rows(floor, end))
+        for row in self._open_rows(resolution):
+            if (floor is None or row[0] >= floor) and (end is None or row[0] < end):
+                rows.append(row)
+        return resolution, [
+            (t, low, high, total / count, int(count)) for t, low, high, total, count in rows
+        ]
+
+    def aggregate(self, start: Optional[float] = None) -> Optional[Dict[str, float]]:
+        """start 之后的 count / min / max / avg，基于汇总层计算，不遍历原始点"""
+        _, rows = self.query(start, None, self.resolution_for(start, finest="1m"))
+        if not rows:
+            return None
+        count = sum(row[4] for row in rows)
+        return {
+            "count": count,
+            "min": min(row[1] for row in rows),
+            "max": max(row[2] for row in rows),
+            "avg": sum(row[3] * row[4] for row in rows) / count,
+        }
+
+
+class TimeSeriesStore:
+    """指标存储：按 (指标名, 标签) 索引序列，另按指标名建二级索引"""
+
+    def __init__(self, policy: Optional[RetentionPolicy] = None):
+        self.policy = policy or RetentionPolicy()
+        self._series: "OrderedDict[SeriesKey, Series]" = OrderedDict()
+        self._by_name: Dict[str, Dict[SeriesKey, Series]] = {}
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def append(
+        self,
+        name: str,
+        timestamp: float,
+        value: float,
+        tags: Optional[Dict[str, str]] = None,
+        unit: str = "",
+    ) -> Series:
+        """写入一个点：O(1)（均摊）"""
+        key = series_key(name, tags)
+        series = self._series.get(key)
+        if series is None:
+            series = Series(name, dict(tags or {}), unit, self.policy)
+            self._series[key] = series
+            self._by_name.setdefault(name, {})[key] = series
+            while len(self._series) > self.policy.max_series:
+                self._remove(next(iter(self._series)))
+        else:
+            # 最近更新的序列移到末尾，淘汰时从头部开始
+            self._series.move_to_end(key)
+        series.append(timestamp, float(value))
+        return series
+
+    def _remove(self, key: SeriesKey) -> None:
+        self._series.pop(key, None)
+        by_name = self._by_name.get(key[0])
+        if by_name is not None:
+            by_name.pop(key, None)
+            if not by_name:
+                del self._by_name[key[0]]
+
+    def names(self) -> List[str]:
+        return list(self._by_name)
+
+    def series(
+        self, name: Optional[str] = None, tags: Optional[Dict[str, str]] = None
+    ) -> List[Series]:
+        """按指标名和标签子集筛选序列"""
+        candidates: Iterable[Series] = (
+            self._by_name.get(name, {}).values() if name is not None else self._series.values()
+        )
+        if not tags:
+            return list(candidates)
+        return [
+            s for s in candidates if all(s.tags.get(k) == v for k, v in tags.items())
+        ]
+
+    def get(self, name: str, tags: Optional[Dict[str, str]] = None) -> Optional[Series]:
+        """精确匹配一条序列"""
+        return self._series.get(series_key(name, tags))
+
+    def latest(
+        self, name: str, tags: Optional[Dict[str, str]] = None
+    ) -> Optional[Tuple[float, float]]:
+        """最新的点：精确匹配标签；未给标签时取该指标下最近更新的序列"""
+        if tags is not None:
+            series = self.get(name, tags)
+            return series.latest() if series else None
+        newest = None
+        for series in self._by_name.get(name, {}).values():
+            point = series.latest()
+            if point and (newest is None or point[0] > newest[0]):
+                newest = point
+        return newest
+
+    def query(
+        self,
+        name: str,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        tags: Optional[Dict[str, str]] = None,
+        resolution: str = "auto",
+    ) -> List[Dict]:
+        """区间查询，每条匹配的序列返回一项"""
+        results = []
+        for series in self.series(name, tags):
+            used, points = series.query(start, end, resolution)
+            results.append(
+                {
+                    "name": series.name,
+                    "tags": series.tags,
+                    "unit": series.unit,
+                    "resolution": used,
+                    "points": points,
+                }
+            )
+        return results
+
+    def recent(
+        self, limit: int = 100, before: Optional[Cursor] = None
+    ) -> List[Tuple[Cursor, Series, float]]:
+        """所有序列中位于游标 before 之前的最近 limit 个原始点，按游标排序
+
+        返回 (cursor, series, value)；以上一页第一个点的游标作为 before 即可向前翻页
+        """
+        series_list = list(self._series.values())
+        # 每条序列取最近 limit 个点做多路归并（游标全序唯一，不会比较到 value）
+        merged = heapq.merge(
+            *(
+                [(cursor, i, value) for cursor, value in series.recent(limit, before)]
+                for i, series in enumerate(series_list)
+            )
+        )
+        points = [(cursor, series_list[i], value) for cursor, i, value in merged]
+        return points[-limit:]
+
+    def prune(self, now: float) -> int:
+        """删除超过保留时长没有更新的序列，返回删除数量"""
+        horizon = max(self.policy.raw_seconds, self.policy.minute_seconds, self.policy.hour_seconds)
+        stale = [
+            key
+            for key, series in self._series.items()
+            if (series.last_timestamp or 0) < now - horizon
+        ]
+        for key in stale:
+            self._remove(key)
+        return len(stale)
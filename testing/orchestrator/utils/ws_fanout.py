@@ -0,0 +1,248 @@
+"""
+WebSocket 广播：每个客户端一个有界发送队列，按 tick 合并成批量帧
+
+发布数据只是追加到待发送批次，不等待任何客户端；每个 tick 把批次按每种编码各编码一次，
+非阻塞地放进各客户端队列，由客户端自己的发送协程写出。队列满时丢弃最旧的帧（或直接断开），
+累计丢弃过多、单帧发送超时的客户端会被断开，慢客户端不会拖慢指标记录和其他客户端
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Set, Union
+from urllib.parse import parse_qs, urlparse
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+Frame = Union[str, bytes]
+
+
+def available_encodings() -> List[str]:
+    return ["json", "msgpack"] if msgpack is not None else ["json"]
+
+
+def negotiate_encoding(path: Optional[str]) -> str:
+    """从连接路径的查询参数选择编码（/?encoding=msgpack），不可用时回退 json"""
+    query = parse_qs(urlparse(path or "").query)
+    requested = (query.get("encoding") or ["json"])[0]
+    return requested if requested in available_encodings() else "json"
+
+
+def encode(payload: Dict[str, Any], encoding: str = "json") -> Frame:
+    """msgpack 编码为二进制帧，json 使用紧凑分隔符"""
+    if encoding == "msgpack" and msgpack is not None:
+        return msgpack.packb(payload, use_bin_type=True)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+@dataclass
+class FanOutSettings:
+    """广播参数"""
+
+    tick: float = 0.25  # 合并批次的间隔（秒）
+    queue_size: int = 64  # 每个客户端最多积压的帧数
+    send_timeout: float = 5.0  # 单帧发送超时，超时即断开
+    overflow: str = "drop"  # 队列满时：drop 丢弃最旧的帧，disconnect 直接断开
+    max_dropped: int = 256  # drop 模式下累计丢弃超过该数量则断开
+    max_batch: int = 1000  # 每帧最多合并的条目，超出部分顺延到下一帧
+    history_page: int = 500  # 历史回放每页最多条目
+
+    @classmethod
+    def from_config(cls, settings: Optional[Dict[str, Any]]) -> "FanOutSettings":
+        settings = settings or {}
+        defaults = cls()
+        return cls(
+            **{
+                name: settings.get(name, getattr(defaults, name))
+                for name in defaults.__dataclass_fields__
+            }
+        )
+
+
+class ClientChannel:
+    """一个客户端的发送队列和发送协程"""
+
+    def __init__(
+        self,
+        websocket: Any,
+        encoding: str,
+        settings: FanOutSettings,
+        on_close: Callable[["ClientChannel", str], None],
+    ):
+        self.websocket = websocket
+        self.encoding = encoding
+        self.settings = settings
+        self.queue: "asyncio.Queue[Frame]" = asyncio.Queue(settings.queue_size)
+        # 客户端请求的回复（如历史分页）单独排队，不会被广播挤掉，发送时优先
+        self.replies: "asyncio.Queue[Frame]" = asyncio.Queue(1)
+        self._pending = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+        self._on_close = on_close
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def remote_address(self) -> Any:
+        return getattr(self.websocket, "remote_address", None)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._sender())
+
+    def offer(self, frame: Frame) -> bool:
+        """非阻塞入队；返回 False 表示客户端跟不上，应断开"""
+        self._pending.set()
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            if self.settings.overflow == "disconnect":
+                return False
+        # 丢弃最旧的帧，保留最新数据
+        self.queue.get_nowait()
+        self.queue.put_nowait(frame)
+        self.dropped += 1
+        return self.dropped <= self.settings.max_dropped
+
+    async def send(self, frame: Frame) -> None:
+        """客户端主动请求的数据（如历史分页）：不会被丢弃，上一条回复发出前等待"""
+        await self.replies.put(frame)
+        self._pending.set()
+
+    def _next_frame(self) -> Optional[Frame]:
+        if not self.replies.empty():
+            return self.replies.get_nowait()
+        if not self.queue.empty():
+            return self.queue.get_nowait()
+        return None
+
+    async def _sender(self) -> None:
+        reason = "closed"
+        try:
+            while True:
+                frame = self._next_frame()
+                if frame is None:
+                    self._pending.clear()
+                    await self._pending.wait()
+                    continue
+                await asyncio.wait_for(
+                    self.websocket.send(frame), self.settings.send_timeout
+                )
+                self.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            reason = "send timeout"
+        except Exception as e:
+            reason = str(e) or type(e).__name__
+        self._on_close(self, reason)
+
+    async def close(self, reason: str = "") -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+        try:
+            # 1008：策略原因关闭（发送跟不上）
+            await self.websocket.close(code=1008, reason=reason[:120])
+        except Exception:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "address": str(self.remote_address),
+            "encoding": self.encoding,
+            "queued": self.queue.qsize() + self.replies.qsize(),
+            "sent": self.sent,
+            "dropped": self.dropped,
+        }
+
+
+class FanOut:
+    """把发布的条目按 tick 合并为 {"type": "batch", "seq", "items"} 帧广播给所有客户端"""
+
+    def __init__(
+        self,
+        settings: Optional[FanOutSettings] = None,
+        logger: Optional[logging.Logger] = None,
+    ):
+        self.settings = settings or FanOutSettings()
+        self.logger = logger or logging.getLogger("ws_fanout")
+        self.clients: Set[ClientChannel] = set()
+        self.disconnected_slow = 0
+        self._pending: List[Dict[str, Any]] = []
+        self._seq = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, websocket: Any, encoding: str = "json") -> ClientChannel:
+        """登记客户端（需在事件循环中调用），首次登记时启动合并循环"""
+        channel = ClientChannel(websocket, encoding, self.settings, self._closed)
+        self.clients.add(channel)
+        channel.start()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+        return channel
+
+    def unregister(self, channel: ClientChannel) -> None:
+        self.clients.discard(channel)
+        if channel._task and not channel._task.done():
+            channel._task.cancel()
+
+    def _closed(self, channel: ClientChannel, reason: str) -> None:
+        if channel in self.clients:
+            self.clients.discard(channel)
+            self.logger.info(f"WebSocket 客户端停止接收: {channel.remote_address} ({reason})")
+            asyncio.ensure_future(channel.close(reason))
+
+    def publish(self, item: Dict[str, Any]) -> None:
+        """追加到待发送批次；没有客户端时直接丢弃"""
+        if self.clients:
+            self._pending.append(item)
+
+    def flush(self) -> int:
+        """把待发送批次编码后放入各客户端队列，返回本帧条目数"""
+        if not self._pending or not self.clients:
+            self._pending.clear()
+            return 0
+        items = self._pending[: self.settings.max_batch]
+        del self._pending[: self.settings.max_batch]
+        self._seq += 1
+        payload = {"type": "batch", "seq": self._seq, "items": items}
+
+        frames: Dict[str, Frame] = {}
+        for channel in list(self.clients):
+            frame = frames.get(channel.encoding)
+            if frame is None:
+                frame = frames[channel.encoding] = encode(payload, channel.encoding)
+            if not channel.offer(frame):
+                self.disconnected_slow += 1
+                self._closed(channel, "slow consumer")
+        return len(items)
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.settings.tick)
+            try:
+                self.flush()
+            except Exception as e:
+                self.logger.error(f"WebSocket 广播异常: {e}")
+
+    async def stop(self) -> None:
+        """停止合并循环并关闭所有客户端，队列中未发出的帧丢弃"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        for channel in list(self.clients):
+            self.clients.discard(channel)
+            await channel.close("server shutdown")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "clients": [channel.stats() for channel in self.clients],
+            "pending": len(self._pending),
+            "frames": self._seq,
+            "disconnected_slow": self.disconnected_slow,
+        }
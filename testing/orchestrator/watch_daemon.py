@@ -0,0 +1,231 @@
+"""
+常驻 watch 守护进程
+配置、import 图和数据库模板只加载一次；文件事件在防抖窗口内合并，
+按 import 图增量计算受影响的测试，新的变更到来时取消正在进行的运行，并实时输出结果
+"""
+
+import asyncio
+import time
+from pathlib import Path
+from typing import List, Optional, Set
+
+from rich.console import Console
+from scheduler import TestScheduler, TestTask
+from utils.db_isolation import DatabaseProvisioner
+from utils.import_graph import EXCLUDED_DIRS, ImportGraph
+from utils.logger import get_logger
+
+from config import TestConfig, TestStatus, TestSuite
+
+console = Console()
+
+STATUS_ICONS = {
+    TestStatus.PASSED: "✅",
+    TestStatus.FAILED: "❌",
+    TestStatus.ERROR: "💥",
+    TestStatus.SKIPPED: "⏭️ ",
+}
+
+
+class WatchDaemon:
+    """监视单个应用的常驻进程"""
+
+    def __init__(
+        self,
+        config: TestConfig,
+        app_name: str,
+        suite: TestSuite = TestSuite.UNIT,
+        debounce: float = 0.3,
+    ):
+        self.config = config
+        self.app_name = app_name
+        self.suite = suite
+        self.debounce = debounce
+        self.logger = get_logger("watch")
+
+        # watch 模式追求快速反馈：失败不重试
+        self.config.execution.retry_failed = 0
+
+        # 跨运行复用的状态
+        self.import_graphs = {}
+        self.db_provisioner = DatabaseProvisioner(config)
+        self.repo_root: Optional[Path] = None
+
+        self._events: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Set[str] = set()
+        self._current: Optional[asyncio.Task] = None
+        self._scheduler: Optional[TestScheduler] = None
+        self._first_event_at: Optional[float] = None
+
+    # ------------------------------------------------------------------
+    # 启动与文件监听
+    # ------------------------------------------------------------------
+
+    def _warm_up(self) -> List[Path]:
+        """预热：构建 import 图、准备数据库模板，返回需要监听的目录"""
+        scheduler = TestScheduler(
+            self.config,
+            import_graphs=self.import_graphs,
+            db_provisioner=self.db_provisioner,
+        )
+        self.repo_root = Path(scheduler.git.repo_root)
+        app_config = self.config.apps[self.app_name]
+        app_dir = (scheduler._command_root() / app_config.path).resolve()
+
+        start = time.perf_counter()
+        graph = self.import_graphs.setdefault(
+            self.app_name, ImportGraph(self.repo_root, app_dir)
+        ).refresh()
+        console.print(
+            f"🧭 [dim]import 图就绪: {len(graph.files)} 个文件 "
+            f"({(time.perf_counter() - start) * 1000:.0f}ms)[/dim]"
+        )
+
+        if app_config.database:
+            try:
+                self.db_provisioner.prepare(self.app_name, app_config)
+            except Exception as e:
+                self.logger.warning(f"准备 {self.app_name} 数据库失败: {e}")
+        scheduler.executor.shutdown(wait=False)
+
+        # 监听应用目录，以及 import 图引用到的应用外 workspace 包（如 shared/auth）
+        roots = {app_dir}
+        for rel in graph.files:
+            path = self.repo_root / rel
+            if not path.is_relative_to(app_dir):
+                roots.add(self.repo_root.joinpath(*Path(rel).parts[:2]))
+        return sorted(roots)
+
+    def _on_fs_event(self, path: str) -> None:
+        """文件系统事件回调（在 watchdog 线程中调用）"""
+        if not path.endswith((".ts", ".tsx", ".js", ".jsx", ".mjs", ".cjs", ".json")):
+            return
+        if EXCLUDED_DIRS.intersection(Path(path).parts):
+            return
+        self._loop.call_soon_threadsafe(self._events.put_nowait, path)
+
+    def _start_observer(self, roots: List[Path]):
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        daemon = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    return
+                daemon._on_fs_event(event.src_path)
+                dest = getattr(event, "dest_path", None)
+                if dest:
+                    daemon._on_fs_event(dest)
+
+        observer = Observer()
+        for root in roots:
+            observer.schedule(Handler(), str(root), recursive=True)
+        observer.start()
+        return observer
+
+    # ------------------------------------------------------------------
+    # 事件循环
+    # ------------------------------------------------------------------
+
+    async def serve_forever(self) -> None:
+        """运行守护进程直到被中断"""
+        self._loop = asyncio.get_running_loop()
+        self._events = asyncio.Queue()
+
+        roots = await self._loop.run_in_executor(None, self._warm_up)
+        observer = self._start_observer(roots)
+        for root in roots:
+            console.print(f"📁 [yellow]监视路径: {root}[/yellow]")
+        console.print("按 Ctrl+C 停止监视\n")
+
+        try:
+            while True:
+                batch = await self._collect_batch()
+                await self._cancel_current()
+                self._pending.update(batch)
+                self._current = asyncio.create_task(self._run(set(self._pending)))
+        finally:
+            observer.stop()
+            await self._cancel_current()
+            self.db_provisioner.cleanup()
+            observer.join()
+
+    async def _collect_batch(self) -> Set[str]:
+        """等待第一个事件，然后在防抖窗口内合并后续事件"""
+        batch = {await self._events.get()}
+        if self._first_event_at is None:
+            self._first_event_at = time.perf_counter()
+        while True:
+            try:
+                batch.add(
+                    await asyncio.wait_for(self._events.get(), timeout=self.debounce)
+                )
+            except asyncio.TimeoutError:
+                return batch
+
+    async def _cancel_current(self) -> None:
+        """取消正在进行的运行（其变更会并入下一次运行）"""
+        if self._current and not self._current.done():
+            console.print("⏹️  [yellow]检测到新的变更，取消当前运行[/yellow]")
+            self._current.cancel()
+            try:
+                await self._current
+            except asyncio.CancelledError:
+                pass
+        self._current = None
+
+    def _relative(self, path: str) -> Optional[str]:
+        try:
+            return Path(path).resolve().relative_to(self.repo_root).as_posix()
+        except ValueError:
+            return None
+
+    def _report_task(self, task: TestTask) -> None:
+        """流式输出单个任务结果"""
+        icon = STATUS_ICONS.get(task.status, "•")
+        duration = f"{task.duration:.1f}s" if task.duration else "-"
+        console.print(f"{icon} {task.id} [dim]({duration})[/dim]")
+        if task.status in (TestStatus.FAILED, TestStatus.ERROR) and task.output:
+            console.print(f"[dim]{task.output[-2000:]}[/dim]")
+
+    async def _run(self, paths: Set[str]) -> None:
+        changed = sorted(filter(None, (self._relative(p) for p in paths)))
+        console.print(
+            f"🔄 [yellow]{len(changed)} 个文件变更: {', '.join(changed[:5])}"
+            f"{' ...' if len(changed) > 5 else ''}[/yellow]"
+        )
+
+        scheduler = TestScheduler(
+            self.config,
+            import_graphs=self.import_graphs,
+            db_provisioner=self.db_provisioner,
+        )
+        scheduler.on_task_complete = self._report_task
+        self._scheduler = scheduler
+        try:
+            await scheduler.add_tasks_for_changes(self.suite, self.app_name, changed)
+            if not scheduler.tasks:
+                console.print("✨ [green]没有受影响的测试[/green]\n")
+            else:
+                results = await scheduler.run_all()
+                failed = [t for t in results.values() if t.is_blocking_failure]
+                latency = time.perf_counter() - (self._first_event_at or time.perf_counter())
+                if failed:
+                    console.print(
+                        f"❌ [red]{len(failed)}/{len(results)} 失败[/red] "
+                        f"[dim](保存到结果 {latency:.1f}s)[/dim]\n"
+                    )
+                else:
+                    console.print(
+                        f"🎉 [green]{len(results)} 个任务全部通过[/green] "
+                        f"[dim](保存到结果 {latency:.1f}s)[/dim]\n"
+                    )
+            # 本批变更已验证
+            self._pending.difference_update(paths)
+            self._first_event_at = None
+        finally:
+            await scheduler.stop()
+            self._scheduler = None
@@ -6,10 +6,13 @@ AI-Code 实时测试监控系统
 
 import asyncio
 import json
+import os
+import sys
+from collections import deque
 from dataclasses import asdict, dataclass
 from datetime import datetime
 from enum import Enum
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Deque, Dict, List, Optional
 
 try:
     import psutil
@@ -22,6 +25,12 @@ from rich.console import Console
 from rich.layout import Layout
 from rich.live import Live
 from rich.panel import Panel
+from rich.table import Table
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "orchestrator"))
+from utils.alert_rules import AlertEngine  # noqa: E402
+from utils.pressure import PressureReader, pressure_percentages  # noqa: E402
+from utils.process_tree import ProcessTreeSampler, TaskUsage  # noqa: E402
 
 console = Console()
 
@@ -58,6 +67,10 @@ class SystemMetrics:
     network_sent_mb: float
     network_recv_mb: float
     load_average: List[float]
+    # PSI 停顿占比（avg10，%），不支持的平台上为 None
+    cpu_pressure: Optional[float] = None
+    memory_pressure: Optional[float] = None
+    io_pressure: Optional[float] = None
 
 
 @dataclass
@@ -77,16 +90,32 @@ class TestMetrics:
 class RealtimeMonitor:
     """实时监控系统"""
 
-    def __init__(self, config_path: str = "config.yml"):
+    def __init__(
+        self,
+        config_path: str = "config.yml",
+        task_source: Optional[Callable[[], Dict[str, int]]] = None,
+    ):
+        """task_source 返回运行中任务的 {task_id: 根进程 pid}；也可用 track_task 逐个登记"""
         self.config_path = config_path
         self.config = self._load_config()
         self.monitoring = False
         self.metrics_history: List[SystemMetrics] = []
         self.test_metrics_history: List[TestMetrics] = []
+        # 按任务进程树归因的资源占用，每个任务保留最近 100 次采样
+        self.task_source = task_source
+        self.tracked_tasks: Dict[str, int] = {}
+        self.task_sampler = ProcessTreeSampler()
+        self.task_metrics_history: Dict[str, Deque[TaskUsage]] = {}
+        self.latest_task_metrics: List[TaskUsage] = []
         self.alerts: List[Alert] = []
         self.alert_callbacks: List[Callable[[Alert], None]] = []
         self.start_time = None
         self.network_io_start = None
+        self.pressure = PressureReader()
+        # monitoring.alert_rules 为规则列表或 YAML 路径，默认 testing/alert_rules.yml
+        self.alert_engine = AlertEngine.from_config(
+            self._get_monitoring_config().get("alert_rules")
+        )
 
     def _load_config(self) -> Dict[str, Any]:
         """加载配置文件"""
@@ -104,12 +133,7 @@ class RealtimeMonitor:
             {
                 "enabled": True,
                 "interval": 5.0,
-                "alerts": {
-                    "cpu_threshold": 80.0,
-                    "memory_threshold": 85.0,
-                    "disk_threshold": 90.0,
-                    "test_failure_threshold": 0.2,
-                },
+                "alert_rules": None,
             },
         )
 
@@ -141,6 +165,9 @@ class RealtimeMonitor:
             else [0.0, 0.0, 0.0]
         )
 
+        # 资源压力（PSI）
+        pressure = pressure_percentages(self.pressure.read())
+
         return SystemMetrics(
             timestamp=timestamp,
             cpu_percent=cpu_percent,
@@ -150,8 +177,33 @@ class RealtimeMonitor:
             network_sent_mb=network_sent_mb,
             network_recv_mb=network_recv_mb,
             load_average=load_average,
+            cpu_pressure=pressure.get("cpu_pressure"),
+            memory_pressure=pressure.get("memory_pressure"),
+            io_pressure=pressure.get("io_pressure"),
         )
 
+    def track_task(self, task_id: str, pid: int):
+        """登记一个运行中任务的根进程"""
+        self.tracked_tasks[task_id] = pid
+
+    def untrack_task(self, task_id: str):
+        """任务结束后取消登记（历史采样保留）"""
+        self.tracked_tasks.pop(task_id, None)
+
+    def _collect_task_metrics(self) -> List[TaskUsage]:
+        """采样每个运行中任务的进程树（CPU、RSS、I/O）"""
+        roots = dict(self.tracked_tasks)
+        if self.task_source:
+            try:
+                roots.update(self.task_source())
+            except Exception as e:
+                console.print(f"[red]❌ 获取运行中任务失败: {e}[/red]")
+        usages = self.task_sampler.sample(roots)
+        for usage in usages:
+            history = self.task_metrics_history.setdefault(usage.task_id, deque(maxlen=100))
+            history.append(usage)
+        return usages
+
     def _collect_test_metrics(self, test_results: Dict[str, Any]) -> TestMetrics:
         """收集测试指标"""
         timestamp = datetime.now()
@@ -195,72 +247,43 @@ class RealtimeMonitor:
     def _check_alerts(
         self, system_metrics: SystemMetrics, test_metrics: TestMetrics
     ) -> List[Alert]:
-        """检查告警条件"""
-        alerts = []
-        config = self._get_monitoring_config()
-        alert_config = config.get("alerts", {})
-
-        # CPU 告警
-        if system_metrics.cpu_percent > alert_config.get("cpu_threshold", 80.0):
-            alerts.append(
-                Alert(
-                    level=(
-                        AlertLevel.WARNING
-                        if system_metrics.cpu_percent < 90
-                        else AlertLevel.CRITICAL
-                    ),
-                    message=f"CPU 使用率过高: {system_metrics.cpu_percent:.1f}%",
-                    timestamp=datetime.now(),
-                    source="system",
-                    details={"cpu_percent": system_metrics.cpu_percent},
-                )
-            )
-
-        # 内存告警
-        if system_metrics.memory_percent > alert_config.get("memory_threshold", 85.0):
-            alerts.append(
-                Alert(
-                    level=(
-                        AlertLevel.WARNING
-                        if system_metrics.memory_percent < 95
-                        else AlertLevel.CRITICAL
-                    ),
-                    message=f"内存使用率过高: {system_metrics.memory_percent:.1f}%",
-                    timestamp=datetime.now(),
-                    source="system",
-                    details={"memory_percent": system_metrics.memory_percent},
-                )
+        """用本轮指标增量评估告警规则，只返回触发和恢复的告警（持续告警不重复产生）"""
+        values = {
+            "cpu_percent": system_metrics.cpu_percent,
+            "memory_percent": system_metrics.memory_percent,
+            "disk_usage_percent": system_metrics.disk_percent,
+            # 不支持 PSI 的平台上为 None，不参与评估
+            "cpu_pressure": system_metrics.cpu_pressure,
+            "memory_pressure": system_metrics.memory_pressure,
+            "io_pressure": system_metrics.io_pressure,
+        }
+        if test_metrics.total_tests > 0:
+            values["test_failure_rate"] = (
+                test_metrics.failed_tests / test_metrics.total_tests
             )
 
-        # 磁盘告警
-        if system_metrics.disk_percent > alert_config.get("disk_threshold", 90.0):
+        alerts = []
+        events = self.alert_engine.observe_many(
+            values, system_metrics.timestamp.timestamp()
+        )
+        for event in events:
+            firing = event.status == "firing"
             alerts.append(
                 Alert(
-                    level=AlertLevel.CRITICAL,
-                    message=f"磁盘使用率过高: {system_metrics.disk_percent:.1f}%",
-                    timestamp=datetime.now(),
-                    source="system",
-                    details={"disk_percent": system_metrics.disk_percent},
+                    level=AlertLevel(event.severity) if firing else AlertLevel.INFO,
+                    message=event.message,
+                    timestamp=datetime.fromtimestamp(event.timestamp),
+                    source="test" if event.rule.metric.startswith("test_") else "system",
+                    details={
+                        "rule": event.rule.name,
+                        "status": event.status,
+                        event.rule.metric: event.value,
+                        "threshold": event.rule.threshold,
+                        **event.rule.labels,
+                    },
                 )
             )
 
-        # 测试失败率告警
-        if test_metrics.total_tests > 0:
-            failure_rate = test_metrics.failed_tests / test_metrics.total_tests
-            if failure_rate > alert_config.get("test_failure_threshold", 0.2):
-                alerts.append(
-                    Alert(
-                        level=AlertLevel.ERROR,
-                        message=f"测试失败率过高: {failure_rate:.1%}",
-                        timestamp=datetime.now(),
-                        source="test",
-                        details={
-                            "failure_rate": failure_rate,
-                            "failed_tests": test_metrics.failed_tests,
-                        },
-                    )
-                )
-
         return alerts
 
     def _create_system_panel(self, metrics: SystemMetrics) -> Panel:
@@ -295,6 +318,14 @@ class RealtimeMonitor:
             20 - int(metrics.disk_percent / 5)
         )
 
+        # 资源压力（PSI），不支持时不显示
+        pressure_line = (
+            f"\n[bold]资源压力 (PSI):[/bold] CPU {metrics.cpu_pressure:.1f}% | "
+            f"内存 {metrics.memory_pressure:.1f}% | I/O {metrics.io_pressure:.1f}%"
+            if metrics.cpu_pressure is not None
+            else ""
+        )
+
         content = f"""
 [bold blue]💻 系统资源监控[/bold blue]
 
@@ -304,7 +335,7 @@ class RealtimeMonitor:
 [bold]磁盘使用率:[/bold] [{disk_color}]{metrics.disk_percent:.1f}%[/{disk_color}] {disk_bar}
 [bold]网络发送:[/bold] {metrics.network_sent_mb:.1f} MB
 [bold]网络接收:[/bold] {metrics.network_recv_mb:.1f} MB
-[bold]系统负载:[/bold] {', '.join(f'{load:.2f}' for load in metrics.load_average)}
+[bold]系统负载:[/bold] {', '.join(f'{load:.2f}' for load in metrics.load_average)}{pressure_line}
         """
 
         return Panel(content, title="系统监控", border_style="blue")
@@ -337,6 +368,34 @@ class RealtimeMonitor:
 
         return Panel(content, title="测试监控", border_style="green")
 
+    def _create_tasks_panel(self, usages: List[TaskUsage]) -> Panel:
+        """创建任务资源面板：按 CPU 排序的运行中任务"""
+        if not usages:
+            return Panel(
+                "[dim]没有运行中的任务[/dim]", title="任务资源", border_style="magenta"
+            )
+
+        table = Table(expand=True, box=None)
+        table.add_column("任务", style="cyan", overflow="ellipsis")
+        table.add_column("CPU", justify="right")
+        table.add_column("RSS", justify="right")
+        table.add_column("读/写 MB/s", justify="right")
+        table.add_column("进程", justify="right")
+        for usage in sorted(usages, key=lambda u: u.cpu_percent, reverse=True)[:8]:
+            cpu_color = (
+                "green"
+                if usage.cpu_percent < 100
+                else "yellow" if usage.cpu_percent < 200 else "red"
+            )
+            table.add_row(
+                usage.task_id,
+                f"[{cpu_color}]{usage.cpu_percent:.0f}%[/{cpu_color}]",
+                f"{usage.rss_mb:.0f} MB",
+                f"{usage.read_rate / 1048576:.1f}/{usage.write_rate / 1048576:.1f}",
+                str(usage.processes),
+            )
+        return Panel(table, title="任务资源", border_style="magenta")
+
     def _create_alerts_panel(self, alerts: List[Alert]) -> Panel:
         """创建告警面板"""
         if not alerts:
@@ -376,7 +435,9 @@ class RealtimeMonitor:
 
         layout["left"].split_column(Layout(name="system"), Layout(name="test"))
 
-        layout["right"].split_column(Layout(name="alerts"), Layout(name="status"))
+        layout["right"].split_column(
+            Layout(name="alerts"), Layout(name="tasks"), Layout(name="status")
+        )
 
         # 头部
         layout["header"].update(
@@ -397,6 +458,9 @@ class RealtimeMonitor:
         # 告警监控
         layout["alerts"].update(self._create_alerts_panel(alerts))
 
+        # 任务资源
+        layout["tasks"].update(self._create_tasks_panel(self.latest_task_metrics))
+
         # 状态
         layout["status"].update(
             Panel(
@@ -468,6 +532,7 @@ class RealtimeMonitor:
                     # 收集指标
                     system_metrics = self._collect_system_metrics()
                     test_metrics = self._collect_test_metrics(test_results or {})
+                    self.latest_task_metrics = self._collect_task_metrics()
 
                     # 检查告警
                     alerts = self._check_alerts(system_metrics, test_metrics)
@@ -519,8 +584,22 @@ class RealtimeMonitor:
                 "memory_percent": latest_metrics.memory_percent,
                 "disk_percent": latest_metrics.disk_percent,
                 "load_average": latest_metrics.load_average,
+                "cpu_pressure": latest_metrics.cpu_pressure,
+                "memory_pressure": latest_metrics.memory_pressure,
+                "io_pressure": latest_metrics.io_pressure,
             },
             "test": latest_test_metrics.__dict__ if latest_test_metrics else {},
+            "tasks": {
+                task_id: {
+                    "samples": len(history),
+                    "peak_cpu_percent": max(u.cpu_percent for u in history),
+                    "peak_rss_mb": max(u.rss_mb for u in history),
+                    "read_bytes": history[-1].read_bytes,
+                    "write_bytes": history[-1].write_bytes,
+                }
+                for task_id, history in self.task_metrics_history.items()
+                if history
+            },
             "alerts": {
                 "total": len(self.alerts),
                 "recent": [alert.__dict__ for alert in self.alerts[-5:]],
@@ -534,6 +613,10 @@ class RealtimeMonitor:
             "summary": self.get_metrics_summary(),
             "system_metrics": [asdict(m) for m in self.metrics_history],
             "test_metrics": [asdict(m) for m in self.test_metrics_history],
+            "task_metrics": {
+                task_id: [u.to_dict() for u in history]
+                for task_id, history in self.task_metrics_history.items()
+            },
             "alerts": [asdict(a) for a in self.alerts],
         }
 
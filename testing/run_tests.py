@@ -11,7 +11,6 @@ import os
 import signal
 import subprocess
 import sys
-import time
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
@@ -20,14 +19,23 @@ try:
 except ImportError:
     yaml = None
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "orchestrator"))
+from utils.execution_engine import ExecutionRequest, backend_from_config  # noqa: E402
+
 
 class TestRunner:
     """测试运行器"""
 
-    def __init__(self, config_path: str = "config.yml"):
+    def __init__(self, config_path: str = "config.yml", backend: Optional[str] = None):
         self.config_path = config_path
         self.config = self._load_config()
-        self.running_processes = []
+        execution = (self.config or {}).get("execution", {}) or {}
+        self.backend = backend_from_config(
+            execution.get("executor"),
+            execution.get("parallel_workers", 4),
+            default="asyncio",
+            override=backend,
+        )
         self.test_results = {}
         self.start_time = None
         self.end_time = None
@@ -81,6 +89,7 @@ class TestRunner:
             results = await self._run_sequential_tests(target_apps, target_test_types)
 
         self.end_time = datetime.now()
+        self.backend.shutdown()
 
         # 生成报告
         await self._generate_comprehensive_report(results)
@@ -173,36 +182,34 @@ class TestRunner:
             return {"error": f"未找到测试命令: {command_key}"}
 
         # 执行测试
-        start_time = time.time()
         print(f"    ⏳ 执行命令: {command}")
 
         try:
-            process = await asyncio.create_subprocess_shell(
-                command,
-                cwd=app_config.get("path", "."),
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
+            execution = await self.backend.execute(
+                ExecutionRequest(
+                    task_id=f"{app}_{test_type}",
+                    command=command,
+                    cwd=app_config.get("path", "."),
+                )
             )
-
-            stdout, stderr = await process.communicate()
-
-            end_time = time.time()
-            duration = end_time - start_time
+            if execution.error:
+                raise RuntimeError(execution.error)
 
             result = {
                 "app": app,
                 "test_type": test_type,
                 "command": command,
-                "return_code": process.returncode,
-                "duration": duration,
-                "stdout": stdout.decode("utf-8", errors="ignore"),
-                "stderr": stderr.decode("utf-8", errors="ignore"),
-                "success": process.returncode == 0,
-                "start_time": start_time,
-                "end_time": end_time,
+                "return_code": execution.return_code,
+                "duration": execution.duration,
+                "stdout": execution.stdout,
+                "stderr": execution.stderr,
+                "success": execution.success,
+                "start_time": execution.start_time,
+                "end_time": execution.end_time,
             }
+            duration = execution.duration
 
-            if process.returncode == 0:
+            if execution.success:
                 print(f"    ✅ 测试通过 ({duration:.2f}s)")
             else:
                 print(f"    ❌ 测试失败 ({duration:.2f}s)")
@@ -287,13 +294,10 @@ class TestRunner:
         """停止所有测试"""
         print("🛑 停止所有测试进程")
 
-        for process in self.running_processes:
-            try:
-                process.terminate()
-            except Exception as e:
-                print(f"停止进程异常: {e}")
-
-        self.running_processes.clear()
+        try:
+            self.backend.kill_all()
+        except Exception as e:
+            print(f"停止进程异常: {e}")
 
 
 class TestEnvironmentSetup:
@@ -385,11 +389,16 @@ async def main():
     parser.add_argument("--sequential", action="store_true", help="顺序执行测试")
     parser.add_argument("--changed-only", action="store_true", help="只测试变更的应用")
     parser.add_argument("--setup-only", action="store_true", help="只设置环境")
+    parser.add_argument(
+        "--backend",
+        choices=["thread", "asyncio", "process", "remote"],
+        help="执行后端（默认 asyncio，可在 execution.executor 中配置）",
+    )
 
     args = parser.parse_args()
 
     # 创建测试运行器
-    runner = TestRunner(args.config)
+    runner = TestRunner(args.config, backend=args.backend)
 
     try:
         # 设置测试环境
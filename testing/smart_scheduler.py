@@ -6,8 +6,10 @@ AI-Code 智能测试调度器
 
 import asyncio
 import os
+import shutil
+import shlex
 import subprocess
-import time
+import sys
 from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
@@ -24,6 +26,12 @@ from rich.console import Console
 from rich.panel import Panel
 from rich.table import Table
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "orchestrator"))
+from utils.change_detection import get_changed_files  # noqa: E402
+from utils.core_budget import CoreBudget, inject_worker_flags  # noqa: E402
+from utils.execution_engine import ExecutionRequest, backend_from_config  # noqa: E402
+from utils.pressure import pressure_percentages, read_pressure  # noqa: E402
+
 console = Console()
 
 
@@ -62,6 +70,29 @@ class TestTask:
     end_time: Optional[datetime] = None
     result: Optional[Dict[str, Any]] = None
 
+    # 运行时控制
+    suspended: bool = False
+    requeue_requested: bool = False
+    preempt_count: int = 0
+
+    @property
+    def task_id(self) -> str:
+        return f"{self.app_name}_{self.test_type}"
+
+    @property
+    def is_foreground(self) -> bool:
+        """CRITICAL/HIGH 任务走前台通道，其余走后台通道"""
+        return self.priority in (TestPriority.CRITICAL, TestPriority.HIGH)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (
+            TestStatus.PASSED,
+            TestStatus.FAILED,
+            TestStatus.SKIPPED,
+            TestStatus.TIMEOUT,
+        )
+
 
 @dataclass
 class ResourceLimits:
@@ -71,19 +102,41 @@ class ResourceLimits:
     max_memory_percent: float = 85.0
     max_concurrent_tasks: int = 4
     max_disk_usage_percent: float = 90.0
+    # PSI 停顿占比上限（avg10 %），可用时替代 CPU 使用率判断
+    max_cpu_pressure: float = 40.0
+    max_memory_pressure: float = 10.0
+    max_io_pressure: float = 30.0
+
+    # 优先级通道
+    reserved_priority_slots: int = 1  # 仅供 CRITICAL/HIGH 使用的槽位
+    preemption: str = "suspend"  # none / suspend (SIGSTOP) / requeue
+    background_nice: int = 10  # 后台通道进程的 nice 值
+    background_ionice: bool = True  # 后台通道使用 idle I/O 调度类
 
 
 class SmartTestScheduler:
     """智能测试调度器"""
 
-    def __init__(self, config_path: str = "real-world-config.yml"):
+    def __init__(
+        self, config_path: str = "real-world-config.yml", backend: Optional[str] = None
+    ):
         self.config_path = config_path
         self.config = self._load_config()
         self.tasks: List[TestTask] = []
         self.running_tasks: Set[str] = set()
         self.completed_tasks: Set[str] = set()
         self.failed_tasks: Set[str] = set()
-        self.resource_limits = ResourceLimits()
+        self._task_index: Dict[str, TestTask] = {}
+        self.resource_limits = self._load_resource_limits()
+        self.core_budget = CoreBudget.from_config(
+            self.resource_limits.max_concurrent_tasks,
+            (self.config.get("execution", {}) or {}).get("core_budget"),
+        )
+        self.backend = backend_from_config(
+            (self.config.get("execution", {}) or {}).get("executor"),
+            self.resource_limits.max_concurrent_tasks,
+            override=backend,
+        )
         self.resource_monitor = None
         self.start_time = None
 
@@ -96,6 +149,36 @@ class SmartTestScheduler:
             console.print(f"[red]❌ 加载配置文件失败: {e}[/red]")
             return {}
 
+    def _load_resource_limits(self) -> ResourceLimits:
+        """从 execution 配置加载资源限制和优先级通道设置"""
+        execution = self.config.get("execution", {}) or {}
+        thresholds = execution.get("resource_threshold", {}) or {}
+        lanes = execution.get("priority_lanes", {}) or {}
+        defaults = ResourceLimits()
+
+        return ResourceLimits(
+            max_cpu_percent=thresholds.get("cpu_percent", defaults.max_cpu_percent),
+            max_memory_percent=thresholds.get(
+                "memory_percent", defaults.max_memory_percent
+            ),
+            max_cpu_pressure=thresholds.get("cpu_pressure", defaults.max_cpu_pressure),
+            max_memory_pressure=thresholds.get(
+                "memory_pressure", defaults.max_memory_pressure
+            ),
+            max_io_pressure=thresholds.get("io_pressure", defaults.max_io_pressure),
+            max_concurrent_tasks=execution.get(
+                "parallel_workers", defaults.max_concurrent_tasks
+            ),
+            reserved_priority_slots=lanes.get(
+                "reserved_slots", defaults.reserved_priority_slots
+            ),
+            preemption=lanes.get("preemption", defaults.preemption),
+            background_nice=lanes.get("background_nice", defaults.background_nice),
+            background_ionice=lanes.get(
+                "background_ionice", defaults.background_ionice
+            ),
+        )
+
     def _get_project_root(self) -> str:
         """获取项目根目录"""
         return self.config.get("project", {}).get(
@@ -223,24 +306,15 @@ class SmartTestScheduler:
         }
 
     def _get_changed_files(self) -> List[str]:
-        """获取变更文件列表"""
+        """获取变更文件列表（与编排器共享同一变更检测结果）"""
         try:
-            result = subprocess.run(
-                ["git", "diff", "--name-only", "HEAD~1", "HEAD"],
-                capture_output=True,
-                text=True,
-            )
-
-            if result.returncode != 0:
-                return []
-
-            return result.stdout.strip().split("\n")
+            return get_changed_files()
         except Exception:
             return []
 
-    def _check_system_resources(self) -> Dict[str, float]:
-        """检查系统资源使用情况"""
-        cpu_percent = psutil.cpu_percent(interval=1)
+    def _check_system_resources(self, interval: Optional[float] = 1) -> Dict[str, float]:
+        """检查系统资源使用情况（interval=None 时不阻塞，返回距上次调用的 CPU 使用率）"""
+        cpu_percent = psutil.cpu_percent(interval=interval)
         memory = psutil.virtual_memory()
         disk = psutil.disk_usage("/")
 
@@ -249,20 +323,37 @@ class SmartTestScheduler:
             "memory_percent": memory.percent,
             "disk_percent": disk.percent,
             "available_memory_mb": memory.available / 1024 / 1024,
+            # Linux PSI：cpu_pressure / memory_pressure / io_pressure 等，不支持时不含这些键
+            **pressure_percentages(read_pressure()),
         }
 
-    def _can_run_task(self, task: TestTask) -> bool:
-        """检查是否可以运行任务"""
-        # 检查依赖是否完成
+    def _dependencies_satisfied(self, task: TestTask) -> Optional[bool]:
+        """依赖检查：True 已满足，False 尚未满足，None 依赖已失败"""
         for dep in task.dependencies:
-            if dep not in self.completed_tasks:
+            dep_task = self._task_index.get(f"{dep}_{task.test_type}")
+            if dep_task is None or dep_task.status == TestStatus.SKIPPED:
+                # 依赖应用没有同类型的测试任务，或其测试未执行
+                continue
+            if dep_task.task_id in self.failed_tasks:
+                return None
+            if dep_task.task_id not in self.completed_tasks:
                 return False
+        return True
 
-        # 检查系统资源
-        resources = self._check_system_resources()
+    def _resources_allow(self, task: TestTask, resources: Dict[str, float]) -> bool:
+        """检查系统资源是否允许启动任务"""
         requirements = task.resource_requirements
-
-        if (
+        limits = self.resource_limits
+
+        if "cpu_pressure" in resources:
+            # 按真实停顿时间准入：有任务在排队等 CPU / 内存 / I/O 时不再启动新任务
+            if (
+                resources["cpu_pressure"] >= limits.max_cpu_pressure
+                or resources["memory_pressure"] >= limits.max_memory_pressure
+                or resources["io_pressure"] >= limits.max_io_pressure
+            ):
+                return False
+        elif (
             resources["cpu_percent"] + requirements["cpu_percent"]
             > self.resource_limits.max_cpu_percent
         ):
@@ -277,11 +368,35 @@ class SmartTestScheduler:
         if resources["disk_percent"] > self.resource_limits.max_disk_usage_percent:
             return False
 
-        # 检查并发限制
-        if len(self.running_tasks) >= self.resource_limits.max_concurrent_tasks:
+        return True
+
+    def _lane_capacity(self, task: TestTask) -> int:
+        """任务所在通道可用的槽位上限：有前台任务等待时后台不能占用预留槽位"""
+        limit = self.resource_limits.max_concurrent_tasks
+        if task.is_foreground:
+            return limit
+
+        foreground_pending = any(
+            t.is_foreground and t.status == TestStatus.PENDING for t in self.tasks
+        )
+        if foreground_pending:
+            return max(0, limit - self.resource_limits.reserved_priority_slots)
+        return limit
+
+    def _can_run_task(
+        self, task: TestTask, resources: Dict[str, float], active_count: int
+    ) -> bool:
+        """检查是否可以运行任务"""
+        # 检查依赖是否完成
+        if not self._dependencies_satisfied(task):
+            return False
+
+        # 检查系统资源（没有运行中的任务时总是放行，外部负载不会让调度饿死）
+        if active_count and not self._resources_allow(task, resources):
             return False
 
-        return True
+        # 检查通道并发限制
+        return active_count < self._lane_capacity(task)
 
     def _create_test_tasks(
         self, apps: Dict[str, Any], test_types: List[str]
@@ -336,14 +451,80 @@ class SmartTestScheduler:
         """按优先级排序任务"""
         return sorted(tasks, key=lambda t: (t.priority.value, -t.estimated_duration))
 
-    def _run_task(self, task: TestTask) -> Dict[str, Any]:
+    def _background_prefix(self) -> List[str]:
+        """后台通道命令前缀：降低 CPU 和 I/O 调度优先级"""
+        prefix: List[str] = []
+        if os.name != "posix":
+            return prefix
+        if self.resource_limits.background_nice > 0 and shutil.which("nice"):
+            prefix += ["nice", "-n", str(self.resource_limits.background_nice)]
+        if self.resource_limits.background_ionice and shutil.which("ionice"):
+            prefix += ["ionice", "-c", "3"]
+        return prefix
+
+    def _suspend_task(self, task: TestTask) -> bool:
+        """挂起任务（SIGSTOP），释放其占用的槽位"""
+        if not self.backend.suspend(task.task_id):
+            return False
+        task.suspended = True
+        task.preempt_count += 1
+        console.print(f"[yellow]⏸️  挂起后台任务: {task.task_id}[/yellow]")
+        return True
+
+    def _resume_task(self, task: TestTask) -> None:
+        """恢复被挂起的任务（SIGCONT）"""
+        if task.suspended:
+            self.backend.resume(task.task_id)
+        task.suspended = False
+        console.print(f"[blue]▶️  恢复后台任务: {task.task_id}[/blue]")
+
+    def _requeue_task(self, task: TestTask) -> bool:
+        """终止任务并放回等待队列"""
+        task.requeue_requested = True
+        task.preempt_count += 1
+        if not self.backend.cancel(task.task_id):
+            task.requeue_requested = False
+            return False
+        console.print(f"[yellow]↩️  重新排队后台任务: {task.task_id}[/yellow]")
+        return True
+
+    def _preempt_background_task(self, in_flight: Dict[str, "asyncio.Task"]) -> bool:
+        """为等待中的前台任务抢占一个后台任务的槽位"""
+        mode = self.resource_limits.preemption
+        if mode not in ("suspend", "requeue"):
+            return False
+
+        victims = [
+            self._task_index[task_id]
+            for task_id in in_flight
+            if not self._task_index[task_id].is_foreground
+            and not self._task_index[task_id].suspended
+            and not self._task_index[task_id].requeue_requested
+            and self.backend.is_running(task_id)
+        ]
+        if not victims:
+            return False
+
+        # 优先抢占优先级最低、最晚启动的任务
+        victim = max(
+            victims,
+            key=lambda t: (t.priority.value, t.start_time or datetime.min),
+        )
+        if mode == "suspend" and self._suspend_task(victim):
+            return True
+        return self._requeue_task(victim)
+
+    async def _run_task(self, task: TestTask) -> Dict[str, Any]:
         """运行单个测试任务"""
-        task_id = f"{task.app_name}_{task.test_type}"
+        task_id = task.task_id
         task.status = TestStatus.RUNNING
         task.start_time = datetime.now()
         self.running_tasks.add(task_id)
 
-        console.print(f"[blue]🧪 运行测试: {task.app_name} - {task.test_type}[/blue]")
+        lane = "前台" if task.is_foreground else "后台"
+        console.print(
+            f"[blue]🧪 运行测试 ({lane}): {task.app_name} - {task.test_type}[/blue]"
+        )
 
         try:
             # 获取应用配置
@@ -357,33 +538,67 @@ class SmartTestScheduler:
             command = app_config.get("commands", {}).get(command_key)
 
             if not command:
+                task.status = TestStatus.SKIPPED
                 return {"status": "skipped", "reason": "No command found"}
 
-            # 执行测试
-            start_time = time.time()
-            result = subprocess.run(
-                command.split(),
-                cwd=full_path,
-                capture_output=True,
-                text=True,
-                timeout=int(task.estimated_duration * 2),  # 2倍超时时间
+            # 按并发任务数切分 CPU 核心，限制测试运行器的 worker 数
+            env: Dict[str, str] = {}
+            cores = None
+            if self.core_budget:
+                active = sum(
+                    1
+                    for t in self.tasks
+                    if t.status in (TestStatus.PENDING, TestStatus.RUNNING)
+                )
+                cores = self.core_budget.acquire(task_id, concurrent=active)
+                command = inject_worker_flags(command, cores.workers, full_path)
+                env.update(cores.env())
+
+            args = shlex.split(command)
+            if not task.is_foreground:
+                args = self._background_prefix() + args
+
+            # 执行测试（独立进程组，便于整体挂起/终止；挂起期间不计入超时）
+            timeout = int(task.estimated_duration * 2)  # 2倍超时时间
+
+            result = await self.backend.execute(
+                ExecutionRequest(
+                    task_id=task_id,
+                    command=args,
+                    cwd=full_path,
+                    env=env,
+                    timeout=timeout,
+                ),
+                on_start=cores.apply_affinity if cores else None,
             )
 
-            end_time = time.time()
-            duration = end_time - start_time
+            if task.requeue_requested:
+                # 被抢占：放回等待队列，不计入失败
+                task.requeue_requested = False
+                task.status = TestStatus.PENDING
+                task.start_time = None
+                return {"status": "requeued"}
+
+            if result.error:
+                raise RuntimeError(result.error)
+            if result.timed_out:
+                raise subprocess.TimeoutExpired(command, timeout)
+
+            duration = result.duration
 
             task_result = {
                 "app": task.app_name,
                 "test_type": task.test_type,
                 "command": command,
-                "return_code": result.returncode,
+                "return_code": result.return_code,
                 "stdout": result.stdout,
                 "stderr": result.stderr,
                 "duration": duration,
-                "status": "passed" if result.returncode == 0 else "failed",
+                "status": "passed" if result.return_code == 0 else "failed",
+                "preempted": task.preempt_count,
             }
 
-            if result.returncode == 0:
+            if result.return_code == 0:
                 task.status = TestStatus.PASSED
                 self.completed_tasks.add(task_id)
                 console.print(
@@ -405,16 +620,21 @@ class SmartTestScheduler:
             task.status = TestStatus.TIMEOUT
             self.failed_tasks.add(task_id)
             console.print(f"[red]❌ {task.app_name} - {task.test_type} 超时[/red]")
-            return {"status": "timeout", "duration": task.estimated_duration * 2}
+            task.result = {"status": "timeout", "duration": task.estimated_duration * 2}
+            return task.result
 
         except Exception as e:
             task.status = TestStatus.FAILED
             self.failed_tasks.add(task_id)
             console.print(f"[red]❌ {task.app_name} - {task.test_type} 异常: {e}[/red]")
-            return {"status": "error", "error": str(e)}
+            task.result = {"status": "error", "error": str(e)}
+            return task.result
 
         finally:
+            task.suspended = False
             self.running_tasks.discard(task_id)
+            if self.core_budget:
+                self.core_budget.release(task_id)
 
     def _display_schedule(self, tasks: List[TestTask]) -> None:
         """显示调度计划"""
@@ -452,10 +672,42 @@ class SmartTestScheduler:
         )
 
         # 显示资源使用情况
-        resources = self._check_system_resources()
+        resources = self._check_system_resources(interval=None)
         console.print(
             f"[blue]💻 系统资源: CPU {resources['cpu_percent']:.1f}%, 内存 {resources['memory_percent']:.1f}%[/blue]"
         )
+        if "cpu_pressure" in resources:
+            console.print(
+                f"[blue]⏱️  资源压力 (PSI avg10): CPU {resources['cpu_pressure']:.1f}%, "
+                f"内存 {resources['memory_pressure']:.1f}%, I/O {resources['io_pressure']:.1f}%[/blue]"
+            )
+
+    def _next_runnable_task(
+        self, resources: Dict[str, float], active_count: int
+    ) -> Optional[TestTask]:
+        """按优先级取出下一个可运行的任务，依赖失败的任务直接标记跳过"""
+        for task in self.tasks:
+            if task.status != TestStatus.PENDING:
+                continue
+            if self._dependencies_satisfied(task) is None:
+                task.status = TestStatus.SKIPPED
+                task.result = {"status": "skipped", "reason": "Dependency failed"}
+                console.print(
+                    f"[yellow]⏭️  跳过 {task.task_id}: 依赖测试失败[/yellow]"
+                )
+                continue
+            if self._can_run_task(task, resources, active_count):
+                return task
+        return None
+
+    def _foreground_waiting(self) -> bool:
+        """是否有依赖已满足、正在等待槽位的前台任务"""
+        return any(
+            t.is_foreground
+            and t.status == TestStatus.PENDING
+            and self._dependencies_satisfied(t)
+            for t in self.tasks
+        )
 
     async def schedule_and_run(
         self, apps: Dict[str, Any], test_types: List[str]
@@ -480,62 +732,95 @@ class SmartTestScheduler:
 
         # 按优先级排序
         self.tasks = self._sort_tasks_by_priority(self.tasks)
+        self._task_index = {task.task_id: task for task in self.tasks}
 
         # 显示调度计划
         self._display_schedule(self.tasks)
 
-        # 执行任务
+        # 执行任务：任一任务结束即重新调度，而不是等待整批完成
         total_tasks = len(self.tasks)
+        in_flight: Dict[str, asyncio.Task] = {}
+        self._check_system_resources(interval=None)  # 初始化 CPU 采样基线
+
+        while True:
+            # 挂起的任务和已请求重新排队（正在终止）的任务不占用槽位，
+            # 避免同一个前台任务在 victim 退出前连续抢占多个后台任务
+            active = [
+                task_id
+                for task_id in in_flight
+                if not self._task_index[task_id].suspended
+                and not self._task_index[task_id].requeue_requested
+            ]
+            resources = self._check_system_resources(interval=None)
+
+            # 有前台任务等待且槽位已满时抢占后台任务
+            if (
+                len(active) >= self.resource_limits.max_concurrent_tasks
+                and self._foreground_waiting()
+                and self._preempt_background_task(in_flight)
+            ):
+                continue
 
-        while self.tasks:
-            # 找到可以运行的任务
-            runnable_tasks = [task for task in self.tasks if self._can_run_task(task)]
-
-            if not runnable_tasks:
-                # 没有可运行的任务，等待一段时间
+            # 没有前台任务等待时恢复被挂起的后台任务
+            suspended = [
+                self._task_index[task_id]
+                for task_id in in_flight
+                if self._task_index[task_id].suspended
+            ]
+            if suspended and not self._foreground_waiting():
+                for task in suspended:
+                    if len(active) >= self.resource_limits.max_concurrent_tasks:
+                        break
+                    self._resume_task(task)
+                    active.append(task.task_id)
+
+            # 启动所有可运行的任务
+            started = False
+            while True:
+                task = self._next_runnable_task(resources, len(active))
+                if task is None:
+                    break
+                task.status = TestStatus.RUNNING
+                in_flight[task.task_id] = asyncio.create_task(
+                    self._run_task(task)
+                )
+                active.append(task.task_id)
+                started = True
+
+            if not in_flight:
+                pending = [t for t in self.tasks if t.status == TestStatus.PENDING]
+                if not pending:
+                    break
+                if not started and all(
+                    self._dependencies_satisfied(t) is False for t in pending
+                ):
+                    # 依赖无法满足（例如循环依赖）
+                    for task in pending:
+                        task.status = TestStatus.SKIPPED
+                        task.result = {
+                            "status": "skipped",
+                            "reason": "Unresolvable dependency",
+                        }
+                    break
                 console.print("[yellow]⏳ 等待资源释放...[/yellow]")
-                await asyncio.sleep(5)
+                await asyncio.sleep(1)
                 continue
 
-            # 运行可执行的任务
-            running_tasks = []
-            for task in runnable_tasks[
-                : self.resource_limits.max_concurrent_tasks - len(self.running_tasks)
-            ]:
-                if task not in [
-                    t for t in self.tasks if t.status == TestStatus.RUNNING
-                ]:
-                    # 创建异步任务
-                    async_task = asyncio.create_task(
-                        asyncio.to_thread(self._run_task, task)
-                    )
-                    running_tasks.append(async_task)
-
-            # 等待任务完成
-            if running_tasks:
-                await asyncio.gather(*running_tasks, return_exceptions=True)
-
-            # 移除已完成的任务
-            self.tasks = [
-                task
-                for task in self.tasks
-                if task.status
-                not in [TestStatus.PASSED, TestStatus.FAILED, TestStatus.TIMEOUT]
-            ]
+            done, _ = await asyncio.wait(
+                in_flight.values(), timeout=1, return_when=asyncio.FIRST_COMPLETED
+            )
+            if done:
+                for task_id in [k for k, v in in_flight.items() if v in done]:
+                    in_flight.pop(task_id)
+                self._display_progress(total_tasks)
 
-            # 显示进度
-            self._display_progress(total_tasks)
+        self.backend.shutdown()
 
         # 生成最终结果
         all_results = {}
-        for task in self.tasks + [
-            t
-            for t in self.tasks
-            if t.status in [TestStatus.PASSED, TestStatus.FAILED, TestStatus.TIMEOUT]
-        ]:
+        for task in self.tasks:
             if task.result:
-                key = f"{task.app_name}_{task.test_type}"
-                all_results[key] = task.result
+                all_results[task.task_id] = task.result
 
         self.end_time = datetime.now()
 
@@ -553,6 +838,7 @@ class SmartTestScheduler:
                 "total_tasks": total_tasks,
                 "completed": len(self.completed_tasks),
                 "failed": len(self.failed_tasks),
+                "preempted": sum(t.preempt_count for t in self.tasks),
                 "duration": (self.end_time - self.start_time).total_seconds(),
             },
             "results": all_results,
@@ -572,11 +858,16 @@ def main():
         choices=["unit", "integration", "e2e", "performance", "security"],
         help="测试类型",
     )
+    parser.add_argument(
+        "--backend",
+        choices=["thread", "asyncio", "process", "remote"],
+        help="执行后端（默认读取 execution.executor 配置）",
+    )
 
     args = parser.parse_args()
 
     # 创建调度器
-    scheduler = SmartTestScheduler(args.config)
+    scheduler = SmartTestScheduler(args.config, backend=args.backend)
 
     # 获取应用配置
     apps = scheduler.config.get("apps", {})
@@ -9,12 +9,18 @@ import asyncio
 import json
 import os
 import shutil
+import sqlite3
 import subprocess
 import sys
 import time
 from dataclasses import dataclass
 from datetime import datetime
+from enum import Enum
 from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+TESTING_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(TESTING_DIR, "orchestrator"))
 
 try:
     import aiofiles
@@ -290,12 +296,93 @@ class TestDataGenerator:
         return docs
 
 
+class ResetStrategy(Enum):
+    """数据库重置策略（按典型速度从快到慢排列）"""
+
+    TRANSACTION = "transaction"  # 回滚包裹测试套件的事务/保存点
+    SNAPSHOT = "snapshot"  # 从快照恢复（SQLite backup API / pg_dump 数据快照）
+    TRUNCATE = "truncate"  # 单条语句批量 TRUNCATE 并重置序列
+
+
 class TestDatabaseManager:
     """测试数据库管理器"""
 
-    def __init__(self, database_url: str):
+    SAVEPOINT = "suite_reset"
+
+    def __init__(self, database_url: str, exclude_tables: Optional[List[str]] = None):
         self.database_url = database_url
         self.connection = None
+        self.backend = self._detect_backend(database_url)
+        self.exclude_tables = set(exclude_tables or ["_prisma_migrations", "migrations"])
+        self.last_reset_duration: Optional[float] = None
+
+        self._in_transaction = False
+        self._snapshot = None  # SQLite: 内存库; PostgreSQL: pg_dump 文件路径
+
+    @staticmethod
+    def _detect_backend(database_url: str) -> str:
+        """根据连接串识别数据库类型"""
+        if database_url.startswith(("sqlite:", "file:")) or database_url == ":memory:":
+            return "sqlite"
+        if database_url.startswith(("postgres://", "postgresql://")):
+            return "postgresql"
+        return "unknown"
+
+    def _sqlite_path(self) -> str:
+        """解析 SQLite 文件路径（支持 file:path 与 sqlite:///path）"""
+        url = self.database_url
+        if url.startswith("sqlite:///"):
+            return url[len("sqlite:///") :]
+        if url.startswith("file:"):
+            return url[len("file:") :].split("?", 1)[0]
+        return url
+
+    def _connect(self):
+        """获取（复用）数据库连接"""
+        if self.connection is not None:
+            return self.connection
+
+        if self.backend == "sqlite":
+            # isolation_level=None：由本类显式控制事务边界
+            self.connection = sqlite3.connect(self._sqlite_path(), isolation_level=None)
+        elif self.backend == "postgresql":
+            import psycopg2
+
+            self.connection = psycopg2.connect(self.database_url)
+            self.connection.autocommit = True
+        else:
+            raise ValueError(f"不支持的数据库类型: {self.database_url}")
+        return self.connection
+
+    def _execute(self, sql: str):
+        """执行单条语句"""
+        cursor = self._connect().cursor()
+        try:
+            cursor.execute(sql)
+        finally:
+            cursor.close()
+
+    def _list_tables(self) -> List[str]:
+        """列出需要重置的业务表"""
+        cursor = self._connect().cursor()
+        try:
+            if self.backend == "sqlite":
+                cursor.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' "
+                    "AND name NOT LIKE 'sqlite_%'"
+                )
+            else:
+                cursor.execute(
+                    "SELECT tablename FROM pg_tables WHERE schemaname = 'public'"
+                )
+            tables = [row[0] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+        return [t for t in tables if t not in self.exclude_tables]
+
+    @staticmethod
+    def _quote(name: str) -> str:
+        return '"' + name.replace('"', '""') + '"'
 
     async def setup_test_database(self) -> bool:
         """设置测试数据库"""
@@ -319,23 +406,148 @@ class TestDatabaseManager:
             return False
 
     async def cleanup_test_database(self) -> bool:
-        """清理测试数据库"""
+        """清理测试数据库（自动选择最快的可用重置策略）"""
         try:
             print("🧹 清理测试数据库...")
 
-            # 删除测试数据
-            await self._delete_test_data()
-
-            # 重置序列
-            await self._reset_sequences()
+            strategy = await self.reset_database()
 
-            print("✅ 测试数据库清理完成")
+            print(
+                f"✅ 测试数据库清理完成 ({strategy.value}, "
+                f"{self.last_reset_duration * 1000:.1f}ms)"
+            )
             return True
 
         except Exception as e:
             print(f"❌ 测试数据库清理失败: {e}")
             return False
 
+    def available_strategies(self) -> List[ResetStrategy]:
+        """当前可用的重置策略，最快的在前"""
+        strategies = []
+        if self._in_transaction:
+            strategies.append(ResetStrategy.TRANSACTION)
+        if self._snapshot is not None:
+            strategies.append(ResetStrategy.SNAPSHOT)
+        if self.backend in ("sqlite", "postgresql"):
+            strategies.append(ResetStrategy.TRUNCATE)
+        # PostgreSQL 的 pg_restore 需要启动外部进程，比单条 TRUNCATE 慢
+        if self.backend == "postgresql" and ResetStrategy.SNAPSHOT in strategies:
+            strategies.remove(ResetStrategy.SNAPSHOT)
+            strategies.append(ResetStrategy.SNAPSHOT)
+        return strategies
+
+    async def reset_database(
+        self, strategy: Optional[ResetStrategy] = None
+    ) -> ResetStrategy:
+        """在测试套件之间重置数据库，返回实际使用的策略"""
+        available = self.available_strategies()
+        if not available:
+            raise ValueError(f"不支持的数据库类型: {self.database_url}")
+        if strategy is None:
+            strategy = available[0]
+        elif strategy not in available:
+            raise ValueError(f"当前不可用的重置策略: {strategy.value}")
+
+        start = time.perf_counter()
+        if strategy == ResetStrategy.TRANSACTION:
+            await self.rollback_transaction()
+        elif strategy == ResetStrategy.SNAPSHOT:
+            await self.restore_snapshot()
+        else:
+            await self._delete_test_data()
+            await self._reset_sequences()
+        self.last_reset_duration = time.perf_counter() - start
+        return strategy
+
+    async def begin_transaction(self):
+        """开启包裹测试套件的事务（测试需复用 self.connection 才能被回滚）"""
+        if self.backend == "postgresql":
+            self._execute("BEGIN")
+        # SQLite 中 SAVEPOINT 在事务外执行时会隐式开启事务
+        self._execute(f"SAVEPOINT {self.SAVEPOINT}")
+        self._in_transaction = True
+
+    async def rollback_transaction(self):
+        """回滚到套件开始时的保存点，保存点保持有效以供下一个套件使用"""
+        self._execute(f"ROLLBACK TO SAVEPOINT {self.SAVEPOINT}")
+
+    async def end_transaction(self):
+        """结束包裹事务并丢弃所有变更"""
+        if not self._in_transaction:
+            return
+        self._execute("ROLLBACK")
+        self._in_transaction = False
+
+    async def take_snapshot(self, snapshot_path: Optional[str] = None):
+        """记录当前数据快照，供后续快速恢复"""
+        if self.backend == "sqlite":
+            snapshot = sqlite3.connect(":memory:")
+            self._connect().backup(snapshot)
+            self._snapshot = snapshot
+        elif self.backend == "postgresql":
+            path = snapshot_path or os.path.join(
+                "./testing/temp", f"db_snapshot_{os.getpid()}.dump"
+            )
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            # 排除表（迁移记录等）不会被 restore_snapshot 清空，也不能写入快照
+            excluded = [
+                f'--exclude-table-data="{t}"' for t in sorted(self.exclude_tables)
+            ]
+            result = subprocess.run(
+                [
+                    "pg_dump",
+                    "--data-only",
+                    "-Fc",
+                    *excluded,
+                    "-f",
+                    path,
+                    self.database_url,
+                ],
+                capture_output=True,
+                text=True,
+            )
+            if result.returncode != 0:
+                raise RuntimeError(f"pg_dump 失败: {result.stderr.strip()}")
+            self._snapshot = path
+        else:
+            raise ValueError(f"不支持的数据库类型: {self.database_url}")
+
+    async def restore_snapshot(self):
+        """从快照恢复数据"""
+        if self._snapshot is None:
+            raise ValueError("尚未创建数据库快照")
+
+        if self.backend == "sqlite":
+            self._snapshot.backup(self._connect())
+            return
+
+        await self._delete_test_data()
+        result = subprocess.run(
+            [
+                "pg_restore",
+                "--data-only",
+                "--disable-triggers",
+                "-d",
+                self.database_url,
+                self._snapshot,
+            ],
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"pg_restore 失败: {result.stderr.strip()}")
+
+    def close(self):
+        """关闭连接"""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+        if self.backend == "sqlite" and self._snapshot is not None:
+            self._snapshot.close()
+        self._snapshot = None
+        self._in_transaction = False
+
     async def _create_test_database(self):
         """创建测试数据库"""
         # 这里需要根据具体的数据库类型实现
@@ -353,13 +565,52 @@ class TestDatabaseManager:
 
     async def _delete_test_data(self):
         """删除测试数据"""
-        # 这里需要根据具体的数据模型实现
-        pass
+        tables = self._list_tables()
+        if not tables:
+            return
+
+        if self.backend == "postgresql":
+            # 单条语句批量清空所有表，同时重置表拥有的序列
+            self._execute(
+                "TRUNCATE TABLE "
+                + ", ".join(self._quote(t) for t in tables)
+                + " RESTART IDENTITY CASCADE"
+            )
+            return
+
+        # SQLite 没有 TRUNCATE：批量 DELETE（无 WHERE 时走快速清空路径）
+        conn = self._connect()
+        if conn.in_transaction:
+            # 已在包裹事务 / 保存点中：不能提交外层事务，foreign_keys 在事务内也无法修改，
+            # 改为把外键检查推迟到事务结束（事务结束时自动恢复）
+            conn.execute("PRAGMA defer_foreign_keys = ON")
+            for table in tables:
+                conn.execute(f"DELETE FROM {self._quote(table)}")
+            return
+
+        foreign_keys = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+        conn.execute("PRAGMA foreign_keys = OFF")
+        try:
+            conn.execute("BEGIN")
+            try:
+                for table in tables:
+                    conn.execute(f"DELETE FROM {self._quote(table)}")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.execute(f"PRAGMA foreign_keys = {'ON' if foreign_keys else 'OFF'}")
 
     async def _reset_sequences(self):
         """重置序列"""
-        # 这里需要根据具体的数据库类型实现
-        pass
+        if self.backend == "sqlite":
+            has_sequence = self._connect().execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'"
+            ).fetchone()
+            if has_sequence:
+                self._execute("DELETE FROM sqlite_sequence")
+        # PostgreSQL: 表拥有的序列已由 TRUNCATE ... RESTART IDENTITY 重置
 
 
 class TestPerformanceAnalyzer:
@@ -539,22 +790,38 @@ class TestUtilities:
     """测试工具集"""
 
     @staticmethod
-    async def wait_for_service(url: str, timeout: int = 30, interval: int = 1) -> bool:
-        """等待服务启动"""
+    async def wait_for_service(
+        url: str,
+        timeout: int = 30,
+        interval: float = 1,
+        expected_status: int = 200,
+    ) -> bool:
+        """等待服务启动（TCP 预检 + 复用单个会话 + 抖动指数退避，interval 为退避上限）"""
+        from utils.health_check import HealthChecker, backoff_delays
+
         print(f"⏳ 等待服务启动: {url}")
 
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(url, timeout=5) as response:
-                        if response.status == 200:
+        parsed = urlparse(url)
+        host = parsed.hostname or "localhost"
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        deadline = time.monotonic() + timeout
+        # full-jitter 指数退避：从 5ms 起步，上限为 interval
+        delays = backoff_delays(base=0.005, cap=interval)
+        async with HealthChecker(max_connections=1) as checker:
+            while time.monotonic() < deadline:
+                remaining = deadline - time.monotonic()
+                if await checker.tcp_probe(host, port, min(1.0, remaining)):
+                    try:
+                        status = await checker.http_probe(url, min(5, remaining))
+                        if status == expected_status:
                             print(f"✅ 服务已启动: {url}")
                             return True
-            except Exception:
-                pass
+                    except Exception:
+                        pass
 
-            await asyncio.sleep(interval)
+                await asyncio.sleep(
+                    min(next(delays), max(0.0, deadline - time.monotonic()))
+                )
 
         print(f"❌ 服务启动超时: {url}")
         return False